@@ -22,6 +22,22 @@ export interface RegressionMetrics {
   val_mse?: number | null;
 }
 
+export interface MetricInterval {
+  low: number | null;
+  high: number | null;
+  std?: number | null;
+  valid_replicates?: number;
+}
+
+export interface EvalSlice {
+  dimension: 'phase' | 'source' | 'webcam_id' | 'label_bucket';
+  value: string;
+  n: number;
+  primary_metric: 'f1' | 'mae';
+  delta_vs_overall: number | null;
+  [metric: string]: string | number | null;
+}
+
 export interface ManifestEntry {
   slug: string;
   display_name: string;
@@ -32,6 +48,7 @@ export interface ManifestEntry {
   regression_metrics: RegressionMetrics;
   best_metric_name: string;
   best_metric_value: number;
+  best_metric_ci?: MetricInterval | null;
   best_epoch: number | null;
   epochs_total: number | null;
   early_stopped: boolean;
@@ -105,6 +122,9 @@ export interface RunIndex {
     f1: number;
   } | null;
   decision_threshold?: number | null;
+  confidence_intervals?: Record<string, MetricInterval>;
+  slices?: EvalSlice[];
+  worst_slices?: EvalSlice[];
 }
 
 export interface FailureGalleryItem {
@@ -0,0 +1,80 @@
+-- Per-snapshot rating statistics, maintained incrementally by
+-- ml/refresh_rating_stats.py (ml/common/rating_stats.py).
+--
+-- ml/export_dataset.py, ml/audit_snapshot_integrity.py and ml/llm_rater.py
+-- used to aggregate all of webcam_snapshot_ratings (GROUP BY snapshot_id)
+-- on every run. They now LEFT JOIN this table instead. The refresh only
+-- re-aggregates snapshots whose ratings have created_at past the stored
+-- watermark (the rate endpoint bumps created_at on every upsert).
+-- Deleting a rating (the un-vote path) leaves no timestamp, so a trigger
+-- records the snapshot in webcam_snapshot_rating_stats_dirty and the
+-- refresh re-aggregates those snapshots too.
+--
+-- Forward-only, idempotent. Apply via:
+--   psql "$DATABASE_URL" -f database/migrations/20261019_snapshot_rating_stats.sql
+
+CREATE TABLE IF NOT EXISTS webcam_snapshot_rating_stats (
+  snapshot_id        INTEGER PRIMARY KEY REFERENCES webcam_snapshots(id) ON DELETE CASCADE,
+  rating_count       INTEGER NOT NULL,
+  unique_rater_count INTEGER NOT NULL,
+  first_rating_at    TIMESTAMPTZ,
+  last_rating_at     TIMESTAMPTZ,
+  refreshed_at       TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Export gates on rating_count (--min-rating-count).
+CREATE INDEX IF NOT EXISTS webcam_snapshot_rating_stats_count_idx
+  ON webcam_snapshot_rating_stats (rating_count);
+
+-- Single-row refresh state. `watermark` is the max ratings created_at
+-- folded into the table so far.
+CREATE TABLE IF NOT EXISTS webcam_snapshot_rating_stats_state (
+  id           BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  watermark    TIMESTAMPTZ,
+  refreshed_at TIMESTAMPTZ
+);
+
+-- The incremental refresh scans ratings newer than the watermark.
+CREATE INDEX IF NOT EXISTS webcam_snapshot_ratings_created_at_idx
+  ON webcam_snapshot_ratings (created_at);
+
+-- Snapshots whose ratings were deleted since the last refresh. No foreign
+-- key: deleting a snapshot cascades to its ratings, which fires the trigger
+-- for an id that no longer exists (its stats row cascades away as well).
+CREATE TABLE IF NOT EXISTS webcam_snapshot_rating_stats_dirty (
+  snapshot_id INTEGER PRIMARY KEY,
+  marked_at   TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION mark_snapshot_rating_stats_dirty() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO webcam_snapshot_rating_stats_dirty (snapshot_id)
+  VALUES (OLD.snapshot_id)
+  ON CONFLICT (snapshot_id) DO NOTHING;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS webcam_snapshot_ratings_mark_stats_dirty ON webcam_snapshot_ratings;
+CREATE TRIGGER webcam_snapshot_ratings_mark_stats_dirty
+  AFTER DELETE ON webcam_snapshot_ratings
+  FOR EACH ROW EXECUTE FUNCTION mark_snapshot_rating_stats_dirty();
+
+-- Initial backfill. A re-run leaves existing rows to the refresh command.
+INSERT INTO webcam_snapshot_rating_stats (
+  snapshot_id, rating_count, unique_rater_count, first_rating_at, last_rating_at
+)
+SELECT
+  snapshot_id,
+  COUNT(*)::int,
+  COUNT(DISTINCT user_session_id)::int,
+  MIN(created_at),
+  MAX(created_at)
+FROM webcam_snapshot_ratings
+GROUP BY snapshot_id
+ON CONFLICT (snapshot_id) DO NOTHING;
+
+INSERT INTO webcam_snapshot_rating_stats_state (id, watermark, refreshed_at)
+SELECT TRUE, MAX(created_at), now()
+FROM webcam_snapshot_ratings
+ON CONFLICT (id) DO NOTHING;
@@ -11,6 +11,7 @@ import psycopg2
 import psycopg2.extras
 
 from common.io import ensure_dir, env_required, utc_timestamp, write_csv, write_json
+from common.rating_stats import refresh_rating_stats
 
 
 def parse_args() -> argparse.Namespace:
@@ -28,6 +29,10 @@ def parse_args() -> argparse.Namespace:
         choices=["captured_desc", "captured_asc", "id_desc", "id_asc"],
         default="captured_desc",
     )
+    parser.add_argument(
+        "--skip-rating-stats-refresh", action="store_true",
+        help="Read webcam_snapshot_rating_stats as-is instead of folding in new ratings first",
+    )
     return parser.parse_args()
 
 
@@ -47,20 +52,9 @@ def _limit_clause(limit: int) -> str:
     return "LIMIT %(limit)s"
 
 
-def fetch_snapshot_rows(
-    conn: psycopg2.extensions.connection, sort: str, limit: int
-) -> list[dict[str, Any]]:
-    query = f"""
-    WITH rating_stats AS (
-      SELECT
-        snapshot_id,
-        COUNT(*)::int AS rating_count,
-        COUNT(DISTINCT user_session_id)::int AS unique_rater_count,
-        MIN(created_at) AS first_rating_at,
-        MAX(created_at) AS last_rating_at
-      FROM webcam_snapshot_ratings
-      GROUP BY snapshot_id
-    )
+def build_snapshot_rows_query(sort: str, limit: int) -> str:
+    """Per-snapshot audit rows; rating stats come from webcam_snapshot_rating_stats."""
+    return f"""
     SELECT
       s.id AS snapshot_id,
       s.webcam_id,
@@ -81,11 +75,17 @@ def fetch_snapshot_rows(
       (s.calculated_rating IS NOT NULL)::boolean AS has_calculated_rating,
       (COALESCE(rs.rating_count, 0) > 0)::boolean AS has_rating_rows
     FROM webcam_snapshots s
-    LEFT JOIN rating_stats rs
+    LEFT JOIN webcam_snapshot_rating_stats rs
       ON rs.snapshot_id = s.id
     {_order_by_clause(sort)}
     {_limit_clause(limit)}
     """
+
+
+def fetch_snapshot_rows(
+    conn: psycopg2.extensions.connection, sort: str, limit: int
+) -> list[dict[str, Any]]:
+    query = build_snapshot_rows_query(sort, limit)
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
         cur.execute(query, {"limit": limit})
         return [dict(row) for row in cur.fetchall()]
@@ -130,6 +130,8 @@ def main() -> None:
     database_url = args.database_url or env_required("DATABASE_URL")
 
     with psycopg2.connect(database_url) as conn:
+        if not args.skip_rating_stats_refresh:
+            refresh_rating_stats(conn)
         rows = fetch_snapshot_rows(conn, sort=args.sort, limit=args.limit)
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute(
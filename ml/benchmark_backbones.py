@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""
+Measure ONNX CPU latency for every backbone in the model registry.
+
+Exports each registry entry (random weights — latency does not depend on
+weight values) with our task head, times it with onnxruntime, and writes a
+JSON report. Copy the p50 figures into `ml/common/models.py` when they
+change.
+"""
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from tqdm.auto import tqdm
+
+from common.io import write_json
+from common.models import MODEL_NAMES, build_model, count_params, get_spec
+from common.onnx_utils import cpu_latency, export_model, file_size_mb
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark registry backbones on ONNX Runtime CPU")
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=MODEL_NAMES)
+    parser.add_argument("--target-type", choices=["binary", "regression"], default="regression")
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--output", default="ml/artifacts/reports/backbone_benchmark.json")
+    parser.add_argument("--no-progress", action="store_true")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in tqdm(args.models, desc="Backbones", unit="model", disable=args.no_progress):
+            model = build_model(name, args.target_type)
+            onnx_path = export_model(model, Path(tmp) / f"{name}.onnx", args.image_size, args.opset)
+            latency = cpu_latency(
+                onnx_path,
+                image_size=args.image_size,
+                runs=args.runs,
+                warmup=args.warmup,
+                threads=args.threads,
+            )
+            results.append(
+                {
+                    "model_name": name,
+                    **get_spec(name).cost(),
+                    "params_m_with_head": count_params(model) / 1e6,
+                    "onnx_size_mb": file_size_mb(onnx_path),
+                    "latency": latency,
+                }
+            )
+
+    report = {
+        "target_type": args.target_type,
+        "image_size": args.image_size,
+        "threads": args.threads,
+        "opset": args.opset,
+        "results": results,
+    }
+    write_json(args.output, report)
+    print(json.dumps({"ok": True, "output": args.output, "report": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
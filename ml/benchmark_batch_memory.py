@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""
+Peak memory and throughput per training batch configuration.
+
+Runs a few optimizer steps of train.py's epoch loop on synthetic images
+for every (micro-batch size, gradient checkpointing) pair. Each pair runs
+in a fresh spawned process because the process RSS high-water mark
+cannot be reset. Then it picks the fastest configuration that fits
+`--memory-budget-mb` and the `--grad-accum-steps` that reach
+`--target-effective-batch`.
+
+Usage:
+  python ml/benchmark_batch_memory.py --model-name resnet18 \\
+    --batch-sizes 8 16 32 64 --memory-budget-mb 3000 --target-effective-batch 64
+"""
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import time
+from typing import Any
+
+from common.io import write_csv, write_json
+from common.models import MODEL_NAMES
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark training peak memory per batch configuration")
+    parser.add_argument("--model-name", choices=MODEL_NAMES, default="resnet18")
+    parser.add_argument("--target-type", choices=["binary", "regression"], default="regression")
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument(
+        "--checkpointing",
+        choices=["both", "off", "on"],
+        default="both",
+        help="Which gradient checkpointing settings to measure.",
+    )
+    parser.add_argument("--steps", type=int, default=5, help="Timed optimizer steps per configuration.")
+    parser.add_argument("--warmup-steps", type=int, default=1)
+    parser.add_argument("--memory-budget-mb", type=float, default=0.0, help="0 = no budget.")
+    parser.add_argument("--target-effective-batch", type=int, default=32)
+    parser.add_argument("--output", default="ml/artifacts/reports/batch_memory_benchmark.json")
+    args = parser.parse_args()
+    if any(b <= 0 for b in args.batch_sizes):
+        parser.error("--batch-sizes must be > 0.")
+    if args.steps <= 0:
+        parser.error("--steps must be > 0.")
+    return args
+
+
+def measure(config: dict[str, Any]) -> dict[str, Any]:
+    """Run in a fresh process: a few training steps, then read peak memory."""
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+
+    from common.models import build_model, enable_gradient_checkpointing
+    from train import peak_memory_mb, reset_peak_memory, select_device, train_one_epoch
+
+    torch.manual_seed(0)
+    device = select_device()
+    target_type = config["target_type"]
+    batch_size = config["batch_size"]
+    size = config["image_size"]
+    model = build_model(config["model_name"], target_type).to(device)
+    if config["grad_checkpointing"]:
+        enable_gradient_checkpointing(model, config["model_name"])
+    optimizer = optim.Adam(model.parameters(), lr=1e-4)
+    criterion = nn.MSELoss() if target_type == "regression" else nn.CrossEntropyLoss()
+    if target_type == "regression":
+        y = torch.rand(batch_size)
+    else:
+        y = torch.randint(0, 2, (batch_size,))
+    batch = (torch.rand(batch_size, 3, size, size), y)
+
+    def run(steps: int) -> None:
+        train_one_epoch(
+            model, [batch] * steps, criterion, optimizer, device, target_type, show_progress=False
+        )
+
+    reset_peak_memory(device)
+    try:
+        run(config["warmup_steps"])
+        start = time.perf_counter()
+        run(config["steps"])
+        if device.type == "cuda":
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+    except RuntimeError as exc:  # CUDA/MPS OOM surfaces as RuntimeError
+        return {**config, "device": str(device), "error": str(exc).splitlines()[0]}
+    return {
+        **config,
+        "device": str(device),
+        "samples_per_sec": batch_size * config["steps"] / elapsed,
+        "step_ms": 1000.0 * elapsed / config["steps"],
+        **peak_memory_mb(device),
+    }
+
+
+def peak_of(row: dict[str, Any]) -> float | None:
+    """Memory figure compared against the budget: CUDA allocator peak if any, else process RSS (CPU, MPS)."""
+    if row.get("device_peak_mb") is not None:
+        return row["device_peak_mb"]
+    return row.get("process_peak_rss_mb")
+
+
+def recommend(rows: list[dict[str, Any]], budget_mb: float, target_effective_batch: int) -> dict | None:
+    """Highest-throughput configuration within budget, with accumulation for the target batch."""
+    fitting = [
+        r for r in rows if "error" not in r and (budget_mb <= 0 or (peak_of(r) or 0.0) <= budget_mb)
+    ]
+    if not fitting:
+        return None
+    best = max(fitting, key=lambda r: r["samples_per_sec"])
+    accum = max(1, math.ceil(target_effective_batch / best["batch_size"]))
+    return {
+        "batch_size": best["batch_size"],
+        "grad_checkpointing": best["grad_checkpointing"],
+        "grad_accum_steps": accum,
+        "effective_batch_size": best["batch_size"] * accum,
+        "samples_per_sec": best["samples_per_sec"],
+        "peak_mb": peak_of(best),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    checkpointing = {"both": [False, True], "off": [False], "on": [True]}[args.checkpointing]
+    configs = [
+        {
+            "model_name": args.model_name,
+            "target_type": args.target_type,
+            "image_size": args.image_size,
+            "batch_size": batch_size,
+            "grad_checkpointing": ckpt,
+            "steps": args.steps,
+            "warmup_steps": args.warmup_steps,
+        }
+        for batch_size in args.batch_sizes
+        for ckpt in checkpointing
+    ]
+    rows = []
+    # maxtasksperchild=1: every configuration gets its own process and RSS.
+    with mp.get_context("spawn").Pool(processes=1, maxtasksperchild=1) as pool:
+        for row in pool.imap(measure, configs):
+            rows.append(row)
+            print(json.dumps(row))
+
+    report = {
+        "model_name": args.model_name,
+        "image_size": args.image_size,
+        "memory_budget_mb": args.memory_budget_mb or None,
+        "target_effective_batch": args.target_effective_batch,
+        "recommendation": recommend(rows, args.memory_budget_mb, args.target_effective_batch),
+        "results": rows,
+    }
+    write_json(args.output, report)
+    write_csv(str(args.output).removesuffix(".json") + ".csv", rows)
+    print(json.dumps({"ok": True, "output": args.output, "recommendation": report["recommendation"]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""
+Measure manifest row access cost: pandas `df.iloc[idx]` vs ManifestRecords.
+
+Two numbers per storage layout:
+1) Per-item lookup time in the main process (no image decoding).
+2) Private memory growth of forked DataLoader workers during one pass over
+   the manifest. Copy-on-write page copies show up as private pages in
+   /proc/self/smaps_rollup (Linux only; reported as null elsewhere).
+
+Uses a synthetic manifest (firebase-style URLs) unless --manifest is
+given, so it runs without a database or image downloads.
+
+Usage:
+  python ml/benchmark_dataset_access.py --rows 200000 --num-workers 4
+"""
+
+import argparse
+import gc
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from torch.utils.data import DataLoader, Dataset
+
+from common.io import write_json
+from common.manifest import read_manifest
+from common.manifest_records import ManifestRecords
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark manifest row access in DataLoader workers")
+    parser.add_argument("--manifest", default="", help="Real manifest CSV. Default: synthetic rows.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--num-workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--lookup-samples", type=int, default=50_000)
+    parser.add_argument("--output", default="ml/artifacts/reports/dataset_access_benchmark.json")
+    return parser.parse_args()
+
+
+def synthetic_manifest(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows) + 1_000_000
+    return pd.DataFrame(
+        {
+            "snapshot_id": ids,
+            "webcam_id": rng.integers(0, 5000, rows),
+            "image_path_or_url": [
+                f"https://firebasestorage.googleapis.com/v0/b/sunset-map/o/snapshots%2F{i}_{rng.integers(1 << 40)}.jpg"
+                f"?alt=media&token={rng.integers(1 << 60):x}"
+                for i in ids
+            ],
+            "target_label": rng.random(rows),
+            "phase": rng.choice(["sunrise", "sunset"], rows),
+        }
+    )
+
+
+def private_mb() -> float | None:
+    try:
+        text = Path("/proc/self/smaps_rollup").read_text()
+    except OSError:
+        return None
+    kb = sum(int(line.split()[1]) for line in text.splitlines() if line.startswith(("Private_Dirty", "Private_Clean")))
+    return kb / 1024
+
+
+class _FrameLookup(Dataset):
+    """The previous layout: DataFrame + iloc per sample."""
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.df = df
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def row(self, idx: int) -> tuple[str, float]:
+        r = self.df.iloc[idx]
+        return str(r["image_path_or_url"]), float(r["target_label"])
+
+    def __getitem__(self, idx: int):
+        ref, y = self.row(idx)
+        return len(ref), y, private_mb() if idx % 1000 == 0 else -1.0
+
+
+class _RecordLookup(_FrameLookup):
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.records = ManifestRecords.from_frame(df)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def row(self, idx: int) -> tuple[str, float]:
+        return self.records.row(idx)
+
+
+def _worker_memory(ds: Dataset, args: argparse.Namespace) -> dict:
+    loader = DataLoader(
+        ds,
+        batch_size=args.batch_size,
+        shuffle=True,
+        num_workers=args.num_workers,
+        multiprocessing_context="fork",
+    )
+    samples: list[float] = []
+    start = time.perf_counter()
+    for _, _, mem in loader:
+        samples.extend(v for v in mem.tolist() if v >= 0)
+    elapsed = time.perf_counter() - start
+    if not samples:
+        return {"epoch_sec": elapsed, "worker_private_mb_start": None, "worker_private_mb_end": None}
+    # Samples arrive in shuffled order across workers; the first/last
+    # readings per pass approximate start/end private memory.
+    head, tail = samples[: args.num_workers], samples[-args.num_workers :]
+    return {
+        "epoch_sec": elapsed,
+        "worker_private_mb_start": float(np.mean(head)),
+        "worker_private_mb_end": float(np.mean(tail)),
+        "worker_private_mb_growth": float(np.mean(tail) - np.mean(head)),
+    }
+
+
+def _lookup_us(ds: _FrameLookup, samples: int) -> float:
+    idx = np.random.default_rng(0).integers(0, len(ds), samples)
+    start = time.perf_counter()
+    for i in idx:
+        ds.row(int(i))
+    return 1e6 * (time.perf_counter() - start) / samples
+
+
+def main() -> None:
+    args = parse_args()
+
+    def load() -> pd.DataFrame:
+        return read_manifest(args.manifest) if args.manifest else synthetic_manifest(args.rows)
+
+    results = {}
+    for name, cls in (("dataframe_iloc", _FrameLookup), ("manifest_records", _RecordLookup)):
+        # Build each layout from a fresh frame and drop every other reference,
+        # as train.py does, so workers only inherit what the dataset keeps.
+        ds = cls(load())
+        gc.collect()
+        if name == "manifest_records":
+            storage_mb = ds.records.nbytes / (1024 * 1024)
+        else:
+            storage_mb = ds.df.memory_usage(deep=True).sum() / (1024 * 1024)
+        results[name] = {
+            "rows": len(ds),
+            "storage_mb": storage_mb,
+            "lookup_us_per_item": _lookup_us(ds, min(args.lookup_samples, len(ds))),
+            **(_worker_memory(ds, args) if args.num_workers > 0 else {}),
+        }
+        print(json.dumps({name: results[name]}))
+        del ds
+        gc.collect()
+
+    report = {
+        "rows": results["manifest_records"]["rows"],
+        "manifest": args.manifest or "synthetic",
+        "num_workers": args.num_workers,
+        "results": results,
+        "lookup_speedup": results["dataframe_iloc"]["lookup_us_per_item"]
+        / results["manifest_records"]["lookup_us_per_item"],
+    }
+    write_json(args.output, report)
+    print(json.dumps({"ok": True, "output": args.output, "report": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
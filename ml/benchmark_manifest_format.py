@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""
+Compare manifest formats (common/manifest.py): CSV vs Parquet vs Arrow IPC.
+
+Reported for each format:
+1) File size on disk.
+2) Write time for the whole manifest.
+3) Full load time through `read_manifest`, typed as the pipeline uses it.
+4) Load time for two columns (what evaluate.py's bootstrap/slice helpers read).
+
+Uses a synthetic manifest (firebase-style URLs) unless --manifest is given.
+
+Usage:
+  python ml/benchmark_manifest_format.py --rows 500000
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmark_dataset_access import synthetic_manifest
+from common.io import write_json
+from common.manifest import MANIFEST_FORMATS, SUFFIXES, read_manifest, write_manifest
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark manifest storage formats")
+    parser.add_argument("--manifest", default="", help="Real manifest (any format). Default: synthetic rows.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeats", type=int, default=3, help="Loads per format; the best time is reported.")
+    parser.add_argument("--formats", nargs="+", choices=MANIFEST_FORMATS, default=list(MANIFEST_FORMATS))
+    parser.add_argument("--output", default="ml/artifacts/reports/manifest_format_benchmark.json")
+    return parser.parse_args()
+
+
+def with_manifest_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Fill the export columns synthetic_manifest leaves out so every format stores the same schema."""
+    rng = np.random.default_rng(1)
+    out = df.copy()
+    n = len(out)
+    out["label_value"] = out["target_label"]
+    out["label_source"] = "manual_only"
+    out["split"] = rng.choice(["train", "val", "test"], n, p=[0.7, 0.15, 0.15])
+    out["captured_at"] = pd.Timestamp("2026-03-01", tz="UTC") + pd.to_timedelta(rng.integers(0, 10**7, n), "s")
+    out["rating_count"] = rng.integers(0, 6, n)
+    out["source"] = "webcam"
+    return out
+
+
+def _best_of(repeats: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    args = parse_args()
+    df = read_manifest(args.manifest) if args.manifest else with_manifest_columns(synthetic_manifest(args.rows))
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats:
+            path = Path(tmp) / f"manifest_full{SUFFIXES[fmt]}"
+            start = time.perf_counter()
+            write_manifest(path, df)
+            write_sec = time.perf_counter() - start
+            results[fmt] = {
+                "size_mb": path.stat().st_size / (1024 * 1024),
+                "write_sec": write_sec,
+                "load_sec": _best_of(args.repeats, lambda: read_manifest(path)),
+                "load_two_columns_sec": _best_of(
+                    args.repeats, lambda: read_manifest(path, columns=["webcam_id", "image_path_or_url"])
+                ),
+            }
+            print(json.dumps({fmt: results[fmt]}))
+
+    report = {
+        "rows": len(df),
+        "manifest": args.manifest or "synthetic",
+        "results": results,
+    }
+    if "csv" in results:
+        report["load_speedup_vs_csv"] = {
+            fmt: results["csv"]["load_sec"] / r["load_sec"] for fmt, r in results.items() if fmt != "csv"
+        }
+        report["size_ratio_vs_csv"] = {
+            fmt: r["size_mb"] / results["csv"]["size_mb"] for fmt, r in results.items() if fmt != "csv"
+        }
+    write_json(args.output, report)
+    print(json.dumps({"ok": True, "output": args.output, "report": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""
+Time training-run sample membership writes: per-row executemany vs COPY + merge.
+
+Both methods upsert the same (training_run_id, snapshot_id) rows from a
+manifest into model_training_snapshot_labels via
+`export_dataset.write_training_run_labels`, so the table ends up as the
+export would leave it. Use the training run the manifest belongs to.
+The executemany pass costs one network round-trip per row, so on a remote
+database expect minutes for 10k+ rows.
+
+Usage:
+  python ml/benchmark_membership_write.py \\
+    --manifest ml/artifacts/datasets/<ts>/manifest_full.csv --training-run-id 12
+"""
+
+import argparse
+import json
+import os
+
+import psycopg2
+
+from common.io import env_required, write_json
+from common.manifest import iter_manifest_rows
+from export_dataset import write_training_run_labels
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark training-run membership writes")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--manifest", required=True, help="Manifest the training run was exported with")
+    parser.add_argument("--training-run-id", type=int, required=True)
+    parser.add_argument("--label-source", default="manual_only")
+    parser.add_argument("--methods", nargs="+", choices=["copy", "executemany"], default=["copy", "executemany"])
+    parser.add_argument("--chunk-rows", type=int, default=50_000)
+    parser.add_argument("--output", default="ml/artifacts/reports/membership_write_benchmark.json")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    database_url = args.database_url or env_required("DATABASE_URL")
+    results = {}
+    with psycopg2.connect(database_url) as conn:
+        for method in args.methods:
+            results[method] = write_training_run_labels(
+                conn,
+                args.training_run_id,
+                (row for row in iter_manifest_rows(args.manifest) if row["source"] == "webcam"),
+                args.label_source,
+                method=method,
+                chunk_rows=args.chunk_rows,
+            )
+            print(json.dumps({method: results[method]}))
+
+    report = {"manifest": args.manifest, "training_run_id": args.training_run_id, "results": results}
+    if "copy" in results and "executemany" in results:
+        report["speedup_copy_vs_executemany"] = results["executemany"]["total_sec"] / results["copy"]["total_sec"]
+    write_json(args.output, report)
+    print(json.dumps({"ok": True, "output": args.output, "report": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
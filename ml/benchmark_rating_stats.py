@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""
+EXPLAIN ANALYZE the rating-count queries before and after webcam_snapshot_rating_stats.
+
+For each reader (export_dataset manual_only / public_aggregate / llm_only,
+audit_snapshot_integrity, llm_rater), the original GROUP BY over all of
+webcam_snapshot_ratings ("before") is planned and executed next to the
+current query that joins the stats table ("after"). Planning and
+execution times from `EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)` go to the
+report. The stats table is refreshed first, so both sides see the same
+ratings. Everything else runs in a transaction that is rolled back.
+
+Usage:
+  python ml/benchmark_rating_stats.py --repeats 3
+"""
+
+import argparse
+import json
+import os
+
+import psycopg2
+
+from audit_snapshot_integrity import build_snapshot_rows_query
+from common.io import env_required, write_json
+from common.rating_stats import refresh_rating_stats
+from export_dataset import build_snapshot_query
+from llm_rater import build_webcam_rows_query
+
+# The queries as they were before the stats table (kept only for this comparison).
+_EXPORT_COLUMNS = """
+          s.id AS snapshot_id,
+          s.webcam_id,
+          s.firebase_url AS image_path_or_url,
+          s.phase,
+          s.captured_at,
+          s.calculated_rating AS label_value,
+          s.llm_quality,"""
+
+BEFORE = {
+    "export_manual_only": f"""
+        SELECT{_EXPORT_COLUMNS}
+          COUNT(r.id)::int AS rating_count
+        FROM webcam_snapshots s
+        LEFT JOIN webcam_snapshot_ratings r
+          ON r.snapshot_id = s.id
+        WHERE s.firebase_url IS NOT NULL
+          AND s.calculated_rating IS NOT NULL
+        GROUP BY
+          s.id, s.webcam_id, s.firebase_url, s.phase, s.captured_at, s.calculated_rating, s.llm_quality
+        HAVING COUNT(r.id) >= %(min_rating_count)s
+        """,
+    "export_public_aggregate": f"""
+        SELECT{_EXPORT_COLUMNS}
+          COUNT(r.id)::int AS rating_count
+        FROM webcam_snapshots s
+        JOIN webcam_snapshot_ratings r
+          ON r.snapshot_id = s.id
+        WHERE s.firebase_url IS NOT NULL
+          AND s.calculated_rating IS NOT NULL
+        GROUP BY
+          s.id, s.webcam_id, s.firebase_url, s.phase, s.captured_at, s.calculated_rating, s.llm_quality
+        HAVING COUNT(r.id) >= %(min_rating_count)s
+        """,
+    "export_llm_only": f"""
+        SELECT{_EXPORT_COLUMNS}
+          COALESCE(c.rating_count, 0)::int AS rating_count
+        FROM webcam_snapshots s
+        LEFT JOIN (
+          SELECT snapshot_id, COUNT(*) AS rating_count
+          FROM webcam_snapshot_ratings
+          GROUP BY snapshot_id
+        ) c ON c.snapshot_id = s.id
+        WHERE s.firebase_url IS NOT NULL
+        """,
+    "audit_snapshot_rows": """
+    WITH rating_stats AS (
+      SELECT
+        snapshot_id,
+        COUNT(*)::int AS rating_count,
+        COUNT(DISTINCT user_session_id)::int AS unique_rater_count,
+        MIN(created_at) AS first_rating_at,
+        MAX(created_at) AS last_rating_at
+      FROM webcam_snapshot_ratings
+      GROUP BY snapshot_id
+    )
+    SELECT
+      s.id AS snapshot_id,
+      s.webcam_id,
+      s.phase,
+      s.rank,
+      s.captured_at,
+      s.created_at,
+      s.firebase_url,
+      s.firebase_path,
+      s.initial_rating,
+      s.calculated_rating,
+      s.ai_rating,
+      COALESCE(rs.rating_count, 0)::int AS rating_count,
+      COALESCE(rs.unique_rater_count, 0)::int AS unique_rater_count,
+      rs.first_rating_at,
+      rs.last_rating_at,
+      (s.firebase_url IS NOT NULL)::boolean AS has_firebase_url,
+      (s.calculated_rating IS NOT NULL)::boolean AS has_calculated_rating,
+      (COALESCE(rs.rating_count, 0) > 0)::boolean AS has_rating_rows
+    FROM webcam_snapshots s
+    LEFT JOIN rating_stats rs
+      ON rs.snapshot_id = s.id
+    ORDER BY s.captured_at DESC NULLS LAST, s.id DESC
+    """,
+    "llm_rater_webcam_rows": """
+    SELECT
+      s.id AS record_id,
+      'webcam' AS source_table,
+      s.webcam_id,
+      s.firebase_url AS image_url,
+      s.calculated_rating AS human_calculated_rating,
+      COUNT(r.id)::int AS human_rating_count
+    FROM webcam_snapshots s
+    LEFT JOIN webcam_snapshot_ratings r ON r.snapshot_id = s.id
+    WHERE s.firebase_url IS NOT NULL
+    GROUP BY s.id, s.webcam_id, s.firebase_url, s.calculated_rating
+    ORDER BY s.id
+    {limit_clause}
+    """,
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE rating queries before/after the stats table")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--min-rating-count", type=int, default=2)
+    parser.add_argument("--rater-limit", type=int, default=500, help="llm_rater --limit to compare")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per query; the fastest is reported")
+    parser.add_argument("--output", default="ml/artifacts/reports/rating_stats_explain.json")
+    return parser.parse_args()
+
+
+def after_queries(rater_limit: int) -> dict[str, str]:
+    return {
+        "export_manual_only": build_snapshot_query("manual_only"),
+        "export_public_aggregate": build_snapshot_query("public_aggregate"),
+        "export_llm_only": build_snapshot_query("manual_only", "llm_only"),
+        "audit_snapshot_rows": build_snapshot_rows_query("captured_desc", 0),
+        "llm_rater_webcam_rows": build_webcam_rows_query(skip_rated=False, limit=rater_limit),
+    }
+
+
+def explain(cur, query: str, params: dict, repeats: int) -> dict:
+    best = None
+    for _ in range(repeats):
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params)
+        plan = cur.fetchone()[0][0]
+        result = {
+            "planning_ms": plan["Planning Time"],
+            "execution_ms": plan["Execution Time"],
+            "rows": plan["Plan"].get("Actual Rows"),
+            "top_node": plan["Plan"]["Node Type"],
+        }
+        if best is None or result["execution_ms"] < best["execution_ms"]:
+            best = result
+    return best
+
+
+def main() -> None:
+    args = parse_args()
+    database_url = args.database_url or env_required("DATABASE_URL")
+    params = {"min_rating_count": args.min_rating_count}
+    before = dict(BEFORE)
+    before["llm_rater_webcam_rows"] = before["llm_rater_webcam_rows"].format(
+        limit_clause=f"LIMIT {args.rater_limit}" if args.rater_limit > 0 else ""
+    )
+    results = {}
+    with psycopg2.connect(database_url) as conn:
+        refresh = refresh_rating_stats(conn)
+        with conn.cursor() as cur:
+            for name, query in after_queries(args.rater_limit).items():
+                results[name] = {
+                    "before": explain(cur, before[name], params, args.repeats),
+                    "after": explain(cur, query, params, args.repeats),
+                }
+                results[name]["speedup"] = (
+                    results[name]["before"]["execution_ms"] / max(results[name]["after"]["execution_ms"], 1e-3)
+                )
+                print(json.dumps({name: results[name]}))
+        conn.rollback()
+
+    report = {"min_rating_count": args.min_rating_count, "refresh": refresh, "queries": results}
+    write_json(args.output, report)
+    print(json.dumps({"ok": True, "output": args.output, "report": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
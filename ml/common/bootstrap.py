@@ -0,0 +1,173 @@
+"""
+Webcam-grouped (cluster) bootstrap confidence intervals for eval metrics.
+
+Test images are not independent. One webcam contributes many
+near-identical frames, so per-image metrics overstate certainty. Each
+replicate here resamples *webcams* with replacement and keeps every
+frame of a picked webcam. The result is a per-sample multiplicity weight
+matrix W (replicates x samples), built from one pre-generated
+(replicates x webcams) index matrix.
+
+Every metric is then a weighted statistic computed on whole blocks of
+replicates at once:
+
+- Threshold metrics: weighted confusion counts (W @ indicator).
+- MAE, RMSE, R² and Pearson: weighted sums.
+- AUC and Spearman: weighted mid-ranks. The data is sorted once and
+  tie groups are summed with `np.add.reduceat`. With integer weights
+  this equals recomputing the statistic on the expanded resample.
+
+Only a loop over fixed-size blocks of replicates remains, which bounds
+memory at about `block x samples` floats.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+BINARY_METRICS = ("precision", "recall", "f1", "balanced_accuracy", "auc")
+REGRESSION_METRICS = ("mae", "rmse", "r_squared", "pearson_r", "spearman_r")
+
+
+def resample_index_matrix(n_groups: int, n_boot: int, seed: int) -> np.ndarray:
+    """(n_boot, n_groups) matrix of group indices drawn with replacement."""
+    return np.random.default_rng(seed).integers(0, n_groups, size=(n_boot, n_groups))
+
+
+def group_weights(picks: np.ndarray, codes: np.ndarray, n_groups: int) -> np.ndarray:
+    """Per-sample multiplicities (rows of `picks` x samples) for sample group codes."""
+    rows = picks.shape[0]
+    flat = (picks + np.arange(rows)[:, None] * n_groups).ravel()
+    counts = np.bincount(flat, minlength=rows * n_groups).reshape(rows, n_groups)
+    return counts[:, codes].astype(np.float64)
+
+
+def _div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / np.where(den > 0, den, 1.0), np.nan)
+
+
+def _tie_groups(values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ascending order, start of each tie group in that order, tie group of each sorted position)."""
+    order = np.argsort(values, kind="mergesort")
+    sorted_vals = values[order]
+    new_group = np.r_[True, sorted_vals[1:] != sorted_vals[:-1]]
+    return order, np.flatnonzero(new_group), np.cumsum(new_group) - 1
+
+
+def weighted_midranks(values: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """Mid-ranks of `values` in each weighted replicate (same shape as w)."""
+    order, starts, group = _tie_groups(values)
+    tie_w = np.add.reduceat(w[:, order], starts, axis=1)
+    below = np.cumsum(tie_w, axis=1) - tie_w
+    ranks = np.empty_like(w)
+    ranks[:, order] = (below + (tie_w + 1.0) / 2.0)[:, group]
+    return ranks
+
+
+def weighted_pearson(x: np.ndarray, y: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """Per-replicate Pearson r; x and y are (samples,) or (replicates, samples)."""
+    total = w.sum(axis=1)
+    mx = _div((w * x).sum(axis=1), total)
+    my = _div((w * y).sum(axis=1), total)
+    dx = x - mx[:, None]
+    dy = y - my[:, None]
+    cov = (w * dx * dy).sum(axis=1)
+    return _div(cov, np.sqrt((w * dx * dx).sum(axis=1) * (w * dy * dy).sum(axis=1)))
+
+
+def weighted_auc(y_true: np.ndarray, scores: np.ndarray, w: np.ndarray) -> np.ndarray:
+    """Per-replicate tie-averaged AUC: P(score_pos > score_neg) + 0.5 P(tie)."""
+    order, starts, _ = _tie_groups(scores)
+    pos = y_true[order].astype(bool)
+    w_sorted = w[:, order]
+    pos_g = np.add.reduceat(w_sorted * pos, starts, axis=1)
+    neg_g = np.add.reduceat(w_sorted * ~pos, starts, axis=1)
+    neg_below = np.cumsum(neg_g, axis=1) - neg_g
+    wins = (pos_g * (neg_below + 0.5 * neg_g)).sum(axis=1)
+    return _div(wins, pos_g.sum(axis=1) * neg_g.sum(axis=1))
+
+
+def _binary_block(y_true: np.ndarray, y_pred: np.ndarray, scores: np.ndarray | None, w: np.ndarray) -> dict:
+    t, p = y_true.astype(bool), y_pred.astype(bool)
+    tp, fp, fn, tn = w @ (t & p), w @ (~t & p), w @ (t & ~p), w @ (~t & ~p)
+    recall = _div(tp, tp + fn)
+    out = {
+        "precision": np.nan_to_num(_div(tp, tp + fp)),
+        "recall": np.nan_to_num(recall),
+        "f1": np.nan_to_num(_div(2 * tp, 2 * tp + fp + fn)),
+        "balanced_accuracy": (recall + _div(tn, tn + fp)) / 2,
+    }
+    if scores is not None:
+        out["auc"] = weighted_auc(y_true, scores, w)
+    return out
+
+
+def _regression_block(y_true: np.ndarray, y_pred: np.ndarray, w: np.ndarray) -> dict:
+    total = w.sum(axis=1)
+    err = y_pred - y_true
+    mean_t = _div(w @ y_true, total)
+    ss_tot = (w * (y_true - mean_t[:, None]) ** 2).sum(axis=1)
+    sq = w @ (err * err)
+    return {
+        "mae": _div(w @ np.abs(err), total),
+        "rmse": np.sqrt(_div(sq, total)),
+        "r_squared": 1.0 - _div(sq, ss_tot),
+        "pearson_r": weighted_pearson(y_true, y_pred, w),
+        "spearman_r": weighted_pearson(weighted_midranks(y_true, w), weighted_midranks(y_pred, w), w),
+    }
+
+
+def cluster_bootstrap(
+    target_type: str,
+    y_true,
+    y_pred,
+    groups,
+    y_scores=None,
+    n_boot: int = 2000,
+    confidence: float = 0.95,
+    seed: int = 0,
+    block_elements: int = 4_000_000,
+) -> dict:
+    """Percentile CIs for every reported metric, resampling whole groups (webcams)."""
+    t = np.asarray(y_true, dtype=np.float64)
+    p = np.asarray(y_pred, dtype=np.float64)
+    s = np.asarray(y_scores, dtype=np.float64) if y_scores is not None and len(y_scores) else None
+    _, codes = np.unique(np.asarray(groups), return_inverse=True)
+    n_groups = int(codes.max()) + 1 if len(codes) else 0
+    picks = resample_index_matrix(n_groups, n_boot, seed)
+
+    names = BINARY_METRICS if target_type == "binary" else REGRESSION_METRICS
+    reps: dict[str, list[np.ndarray]] = {}
+    block = max(1, block_elements // max(1, len(t)))
+    for start in range(0, n_boot, block):
+        w = group_weights(picks[start : start + block], codes, n_groups)
+        values = _binary_block(t, p, s, w) if target_type == "binary" else _regression_block(t, p, w)
+        for name, arr in values.items():
+            reps.setdefault(name, []).append(arr)
+
+    alpha = (1.0 - confidence) / 2.0
+    metrics = {}
+    for name in names:
+        if name not in reps:
+            continue
+        arr = np.concatenate(reps[name])
+        valid = arr[np.isfinite(arr)]
+        if not valid.size:
+            metrics[name] = {"low": None, "high": None, "std": None, "valid_replicates": 0}
+            continue
+        low, high = np.quantile(valid, [alpha, 1.0 - alpha])
+        metrics[name] = {
+            "low": float(low),
+            "high": float(high),
+            "std": float(valid.std(ddof=1)) if valid.size > 1 else 0.0,
+            "valid_replicates": int(valid.size),
+        }
+    return {
+        "method": "cluster_bootstrap_percentile",
+        "n_boot": n_boot,
+        "n_groups": n_groups,
+        "confidence": confidence,
+        "seed": seed,
+        "metrics": metrics,
+    }
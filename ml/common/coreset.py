@@ -0,0 +1,183 @@
+"""
+Coreset selection for pilot-run training subsets.
+
+A uniform `df.sample(n)` of the train manifest mirrors its skew: most
+snapshots are near-identical overcast/boring webcam frames and the rare
+great sunsets barely show up in a 1,000-image pilot. Selecting over
+backbone embeddings instead keeps the subset spread across the visual
+space:
+
+- `k_center`: k-center greedy. Repeatedly adds the image farthest from
+  everything chosen so far (a 2-approximation of the minimax cover).
+- `cluster`: k-means into `n_clusters` groups, then a per-cluster quota
+  proportional to sqrt(cluster size) so small clusters are
+  over-represented relative to uniform sampling, large ones still get
+  more than one slot.
+
+Embeddings come from an ImageNet-pretrained registry backbone with the
+classifier removed and are cached per image ref in an .npz file, so
+repeated pilots only embed new images. An image that fails to load
+(`load_image` returns None) gets a NaN row, is not cached, and is left
+out of the selection.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+STRATEGIES = ["random", "k_center", "cluster"]
+
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    x = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def k_center_greedy(embeddings: np.ndarray, n: int, seed: int = 0) -> np.ndarray:
+    """Indices of `n` points chosen by farthest-first traversal (cosine geometry)."""
+    x = _normalize(embeddings)
+    total = len(x)
+    if n >= total:
+        return np.arange(total)
+    rng = np.random.default_rng(seed)
+    chosen = np.empty(n, dtype=np.int64)
+    chosen[0] = rng.integers(total)
+    sq_norms = np.einsum("ij,ij->i", x, x)
+    # Squared distance of every point to its nearest chosen center.
+    min_dist = sq_norms + sq_norms[chosen[0]] - 2.0 * x @ x[chosen[0]]
+    for i in range(1, n):
+        chosen[i] = int(np.argmax(min_dist))
+        dist = sq_norms + sq_norms[chosen[i]] - 2.0 * x @ x[chosen[i]]
+        np.minimum(min_dist, dist, out=min_dist)
+    return np.sort(chosen)
+
+
+def cluster_quotas(cluster_sizes: np.ndarray, n: int) -> np.ndarray:
+    """Split `n` slots across clusters proportional to sqrt(size), capped at size."""
+    sizes = np.asarray(cluster_sizes, dtype=np.int64)
+    quotas = np.zeros_like(sizes)
+    remaining = n
+    open_ = sizes > 0
+    while remaining > 0 and open_.any():
+        weights = np.where(open_, np.sqrt(sizes), 0.0)
+        share = np.floor(remaining * weights / weights.sum()).astype(np.int64)
+        if share.sum() == 0:
+            # Hand out the last few slots to the largest open clusters.
+            order = np.argsort(-np.where(open_, sizes - quotas, -1), kind="stable")
+            share[order[:remaining]] = 1
+        share = np.minimum(share, sizes - quotas)
+        quotas += share
+        remaining -= int(share.sum())
+        open_ = quotas < sizes
+    return quotas
+
+
+def cluster_stratified(
+    embeddings: np.ndarray, n: int, n_clusters: int = 0, seed: int = 0
+) -> np.ndarray:
+    """Indices of `n` points sampled per k-means cluster with sqrt-size quotas."""
+    from sklearn.cluster import MiniBatchKMeans
+
+    x = _normalize(embeddings)
+    total = len(x)
+    if n >= total:
+        return np.arange(total)
+    k = n_clusters or max(2, min(n // 10, int(np.sqrt(total))))
+    labels = MiniBatchKMeans(n_clusters=k, random_state=seed, n_init=3).fit_predict(x)
+    sizes = np.bincount(labels, minlength=k)
+    quotas = cluster_quotas(sizes, n)
+    rng = np.random.default_rng(seed)
+    picked = [
+        rng.choice(np.flatnonzero(labels == c), size=q, replace=False)
+        for c, q in enumerate(quotas)
+        if q > 0
+    ]
+    return np.sort(np.concatenate(picked))
+
+
+def select_indices(
+    strategy: str, embeddings: np.ndarray, n: int, seed: int = 0
+) -> np.ndarray:
+    if strategy == "k_center":
+        return k_center_greedy(embeddings, n, seed)
+    if strategy == "cluster":
+        return cluster_stratified(embeddings, n, seed=seed)
+    raise ValueError(f"Unknown coreset strategy: {strategy!r}. Choose one of: k_center, cluster")
+
+
+def cached_embeddings(
+    image_refs: list[str],
+    load_image: Callable,
+    cache_path: str | Path,
+    model_name: str = "mobilenet_v3_small",
+    image_size: int = 224,
+    batch_size: int = 64,
+    show_progress: bool = True,
+) -> np.ndarray:
+    """Backbone embeddings for `image_refs`, computing only refs missing from the cache.
+
+    Rows of images that failed to load are NaN and are retried next time.
+    """
+    cache_path = Path(cache_path)
+    cached: dict[str, np.ndarray] = {}
+    if cache_path.exists():
+        data = np.load(cache_path, allow_pickle=False)
+        cached = dict(zip(data["refs"].tolist(), data["embeddings"]))
+
+    missing = sorted({ref for ref in image_refs if ref not in cached})
+    if missing:
+        computed = dict(zip(missing, _embed(missing, load_image, model_name, image_size, batch_size, show_progress)))
+        failed = {ref for ref, vector in computed.items() if np.isnan(vector).any()}
+        cached.update({ref: vector for ref, vector in computed.items() if ref not in failed})
+        refs = sorted(cached)
+        if refs:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            np.savez(
+                cache_path,
+                refs=np.array(refs),
+                embeddings=np.stack([cached[r] for r in refs]).astype(np.float32),
+            )
+        # Failed rows are returned (as NaN) but never written to the cache.
+        cached.update({ref: computed[ref] for ref in failed})
+    return np.stack([cached[ref] for ref in image_refs])
+
+
+def _embed(
+    refs: list[str],
+    load_image: Callable,
+    model_name: str,
+    image_size: int,
+    batch_size: int,
+    show_progress: bool,
+) -> np.ndarray:
+    import torch
+    import torch.nn as nn
+    from torchvision import transforms
+    from tqdm.auto import tqdm
+
+    from common.models import _set_head, build_model, get_spec
+
+    model = build_model(model_name, "regression", pretrained=True)
+    _set_head(model, get_spec(model_name), nn.Identity())
+    model.eval()
+    tf = transforms.Compose([transforms.Resize((image_size, image_size)), transforms.ToTensor()])
+    vectors: list[np.ndarray | None] = []
+    with torch.no_grad():
+        for start in tqdm(
+            range(0, len(refs), batch_size),
+            desc="Coreset embeddings",
+            unit="batch",
+            disable=not show_progress,
+        ):
+            images = [load_image(ref) for ref in refs[start : start + batch_size]]
+            loaded = [tf(image) for image in images if image is not None]
+            features = iter(model(torch.stack(loaded)).numpy() if loaded else [])
+            vectors.extend(None if image is None else next(features) for image in images)
+    dim = next((len(v) for v in vectors if v is not None), None)
+    if dim is None:
+        raise OSError(f"None of the {len(refs)} images could be loaded for coreset embeddings")
+    return np.stack([np.full(dim, np.nan, dtype=np.float32) if v is None else v for v in vectors])
@@ -0,0 +1,97 @@
+"""
+Progressive unfreezing for transfer-learning fine-tunes.
+
+The schedule trains the new head from epoch 1 and unfreezes named
+backbone modules (`layer4`, `layer3`, ... or any dotted submodule path
+such as `features.12`) from a given epoch, each with its own learning
+rate. The pseudo-module `rest` covers every parameter that is neither
+head nor listed; parameters outside the schedule stay frozen.
+
+Frozen parameters have `requires_grad=False`, so autograd records
+nothing below the lowest trainable module and backward stops there. All
+groups are registered with the optimizer up front; Adam skips
+parameters whose `.grad` is None, so no optimizer rebuild is needed when
+a group unfreezes, and LR schedulers scale every group's own base LR.
+
+CLI form: "module:epoch[:learning_rate]", e.g. "layer4:3:1e-4".
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+REST = "rest"
+HEAD = "head"
+
+
+@dataclass(frozen=True)
+class UnfreezeStage:
+    module: str
+    epoch: int  # 1-based: trainable from this epoch on (same numbering as history)
+    learning_rate: float | None = None
+
+
+def parse_unfreeze_schedule(entries: list[str]) -> list[UnfreezeStage]:
+    stages = []
+    for entry in entries:
+        parts = entry.split(":")
+        if len(parts) not in (2, 3) or not parts[0]:
+            raise ValueError(f"Unfreeze stage must be 'module:epoch[:learning_rate]', got {entry!r}")
+        epoch = int(parts[1])
+        if epoch < 1:
+            raise ValueError(f"Unfreeze epoch must be >= 1, got {entry!r}")
+        lr = float(parts[2]) if len(parts) == 3 else None
+        stages.append(UnfreezeStage(parts[0], epoch, lr))
+    names = [s.module for s in stages]
+    if len(set(names)) != len(names) or HEAD in names:
+        raise ValueError("Unfreeze schedule modules must be unique and must not include 'head'.")
+    return stages
+
+
+def stage_to_cli(stage: dict) -> str:
+    """YAML `{module, epoch, learning_rate}` mapping -> CLI entry."""
+    text = f"{stage['module']}:{int(stage['epoch'])}"
+    if stage.get("learning_rate") is not None:
+        text += f":{float(stage['learning_rate'])}"
+    return text
+
+
+def assign_param_groups(model, head_path: str, stages: list[UnfreezeStage]) -> dict[str, list]:
+    """Map group name -> parameters; longest matching module prefix wins."""
+    paths = [head_path] + [s.module for s in stages if s.module != REST]
+    for path in paths[1:]:
+        model.get_submodule(path)  # raises AttributeError for unknown modules
+    names = {head_path: HEAD, **{s.module: s.module for s in stages}}
+    groups: dict[str, list] = {HEAD: [], **{s.module: [] for s in stages}}
+    frozen: list = []
+    for param_name, param in model.named_parameters():
+        matches = [p for p in paths if param_name.startswith(p + ".")]
+        if matches:
+            groups[names[max(matches, key=len)]].append(param)
+        elif REST in groups:
+            groups[REST].append(param)
+        else:
+            frozen.append(param)
+    for param in frozen:
+        param.requires_grad_(False)
+    return groups
+
+
+def optimizer_param_groups(
+    groups: dict[str, list], stages: list[UnfreezeStage], head_lr: float, default_lr: float
+) -> list[dict]:
+    lrs = {HEAD: head_lr, **{s.module: s.learning_rate or default_lr for s in stages}}
+    return [{"params": params, "lr": lrs[name], "name": name} for name, params in groups.items() if params]
+
+
+def apply_unfreeze(groups: dict[str, list], stages: list[UnfreezeStage], epoch: int) -> list[str]:
+    """Set requires_grad for `epoch` (1-based); returns the trainable group names."""
+    start = {HEAD: 1, **{s.module: s.epoch for s in stages}}
+    trainable = []
+    for name, params in groups.items():
+        active = epoch >= start[name]
+        for param in params:
+            param.requires_grad_(active)
+        if active:
+            trainable.append(name)
+    return trainable
@@ -7,6 +7,8 @@ training target used by the selected task type.
 
 from dataclasses import dataclass
 
+import numpy as np
+
 
 @dataclass(frozen=True)
 class LabelPolicy:
@@ -48,3 +50,13 @@ def map_label(label_value: float, policy: LabelPolicy) -> float | int:
     if policy.target_type == "regression":
         return float(label_value)
     raise ValueError(f"Unsupported target_type: {policy.target_type}")
+
+
+def map_labels(label_values, policy: LabelPolicy) -> np.ndarray:
+    """Column version of `map_label`: int64 classes or float64 targets for a whole array."""
+    values = np.asarray(label_values, dtype=np.float64)
+    if policy.target_type == "binary":
+        return (values >= policy.binary_threshold).astype(np.int64)
+    if policy.target_type == "regression":
+        return values
+    raise ValueError(f"Unsupported target_type: {policy.target_type}")
@@ -0,0 +1,273 @@
+"""
+Typed manifest I/O shared by export, train, evaluate, plots and publish.
+
+Manifests used to be CSV only, and every reader re-parsed text and
+re-inferred types. A missing value turned `snapshot_id` into float64
+(1694 -> 1694.0). `webcam_id` mixed integers with external source names,
+and `captured_at` stayed a string. This module fixes one schema
+(`MANIFEST_DTYPES`) and supports three on-disk formats:
+
+- parquet: columnar, compressed and typed (pyarrow)
+- arrow: an Arrow IPC file, uncompressed and memory-mapped, so it loads fastest
+- csv: text. Still readable everywhere, and what export_dataset.py writes
+  by default or as a `--csv-copy` next to a columnar manifest.
+
+Readers call `read_manifest(path)` whatever the format, and
+`manifest_file(dir, name)` finds the file an export wrote. Every frame
+comes back with the same dtypes. pyarrow is only imported for
+parquet/arrow, so CSV-only setups keep working without it.
+"""
+
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import pandas as pd
+
+MANIFEST_FORMATS = ("csv", "parquet", "arrow")
+SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+MANIFEST_COLUMNS = [
+    "snapshot_id",
+    "webcam_id",
+    "label_source",
+    "label_value",
+    "target_label",
+    "split",
+    "image_path_or_url",
+    "phase",
+    "captured_at",
+    "rating_count",
+    "source",
+    # Sun position at capture time (common/solar.py); NaN without a location.
+    "sun_elevation_deg",
+    "sun_azimuth_deg",
+    "minutes_from_sunset",
+    "minutes_from_sunrise",
+]
+# webcam_id is a string: external rows carry their source name there.
+MANIFEST_DTYPES = {
+    "snapshot_id": "Int64",
+    "webcam_id": "string",
+    "label_source": "string",
+    "label_value": "float64",
+    "target_label": "float64",
+    "split": "string",
+    "image_path_or_url": "string",
+    "phase": "string",
+    "captured_at": "datetime64[us, UTC]",
+    "rating_count": "Int64",
+    "source": "string",
+    "sun_elevation_deg": "float64",
+    "sun_azimuth_deg": "float64",
+    "minutes_from_sunset": "float64",
+    "minutes_from_sunrise": "float64",
+}
+
+
+def manifest_format(path: str | Path) -> str:
+    suffix = Path(path).suffix.lower()
+    for fmt, fmt_suffix in SUFFIXES.items():
+        if suffix == fmt_suffix:
+            return fmt
+    raise ValueError(f"Unknown manifest format for {path} (expected one of {sorted(SUFFIXES.values())})")
+
+
+def manifest_file(directory: str | Path, name: str) -> Path:
+    """`manifest_<name>` in the first format present (parquet, arrow, csv); the .csv path if none is."""
+    directory = Path(directory)
+    for suffix in SUFFIXES.values():
+        path = directory / f"manifest_{name}{suffix}"
+        if path.exists():
+            return path
+    return directory / f"manifest_{name}.csv"
+
+
+def coerce_manifest_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast known manifest columns to MANIFEST_DTYPES; other columns pass through."""
+    out = df.copy()
+    for column, dtype in MANIFEST_DTYPES.items():
+        if column not in out.columns or str(out[column].dtype) == dtype:
+            continue
+        values = out[column]
+        if dtype.startswith("datetime"):
+            out[column] = pd.to_datetime(values, utc=True, format="mixed", errors="coerce").astype(dtype)
+        elif dtype in ("Int64", "float64"):
+            out[column] = pd.to_numeric(values, errors="coerce").astype(dtype)
+        else:
+            out[column] = values.astype(dtype)
+    return out
+
+
+def _arrow_schema(table):
+    """Known columns cast to fixed Arrow types; extra columns keep their inferred type."""
+    import pyarrow as pa
+
+    fixed = {
+        "snapshot_id": pa.int64(),
+        "label_value": pa.float64(),
+        "target_label": pa.float64(),
+        "captured_at": pa.timestamp("us", tz="UTC"),
+        "rating_count": pa.int64(),
+        **{column: pa.float64() for column, dtype in MANIFEST_DTYPES.items() if dtype == "float64"},
+    }
+    fields = [
+        pa.field(f.name, fixed.get(f.name, pa.string() if f.name in MANIFEST_DTYPES else f.type))
+        for f in table.schema
+    ]
+    return pa.schema(fields)
+
+
+def _to_arrow(df: pd.DataFrame):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(coerce_manifest_frame(df), preserve_index=False)
+    return table.cast(_arrow_schema(table))
+
+
+def read_manifest(path: str | Path, columns: Iterable[str] | None = None) -> pd.DataFrame:
+    """Load a manifest in any supported format with MANIFEST_DTYPES applied.
+
+    `columns` limits the load to those columns. Names the file does not
+    have are ignored, so callers can ask for optional columns.
+    """
+    path = Path(path)
+    wanted = list(columns) if columns is not None else None
+    fmt = manifest_format(path)
+    if fmt == "csv":
+        if path.stat().st_size == 0:
+            # export_dataset.py writes an empty file for an empty split.
+            return coerce_manifest_frame(pd.DataFrame(columns=wanted or MANIFEST_COLUMNS))
+        usecols = (lambda c: c in wanted) if wanted is not None else None
+        return coerce_manifest_frame(pd.read_csv(path, usecols=usecols, dtype={"webcam_id": "string"}))
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        names = pq.read_schema(path).names
+        select = [c for c in wanted if c in names] if wanted is not None else None
+        table = pq.read_table(path, columns=select)
+    else:
+        with pa.memory_map(str(path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        if wanted is not None:
+            table = table.select([c for c in wanted if c in table.column_names])
+    return coerce_manifest_frame(table.to_pandas())
+
+
+def write_manifest(path: str | Path, df: pd.DataFrame) -> None:
+    """Write a whole manifest frame in the format implied by the suffix."""
+    writer = ManifestWriter(path, columns=list(df.columns))
+    writer.write_frame(df)
+    writer.close()
+
+
+def iter_manifest_rows(path: str | Path) -> Iterator[dict[str, Any]]:
+    """Stream manifest rows as dicts without loading the whole file.
+
+    CSV values are strings; parquet/arrow values are typed Python objects.
+    """
+    path = Path(path)
+    fmt = manifest_format(path)
+    if fmt == "csv":
+        with path.open(newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        batches = pq.ParquetFile(path).iter_batches(batch_size=50_000)
+        for batch in batches:
+            yield from batch.to_pylist()
+        return
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield from reader.get_batch(i).to_pylist()
+
+
+class ManifestWriter:
+    """Row-at-a-time manifest writer with bounded memory.
+
+    CSV rows go straight to a DictWriter. For parquet/arrow, rows are
+    buffered and written `batch_rows` at a time as typed record batches.
+    A writer that never receives a row still produces a valid file: an
+    empty file for CSV (as `common.io.write_csv([])` does), and a
+    zero-row file with the manifest schema for parquet/arrow.
+    """
+
+    def __init__(self, path: str | Path, columns: list[str] | None = None, batch_rows: int = 50_000) -> None:
+        self.path = Path(path)
+        self.format = manifest_format(self.path)
+        self.columns = columns or MANIFEST_COLUMNS
+        self.batch_rows = batch_rows
+        self.rows_written = 0
+        self._buffer: list[dict[str, Any]] = []
+        self._handle = None
+        self._csv: csv.DictWriter | None = None
+        self._sink = None
+        self._schema = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _open_csv(self) -> csv.DictWriter:
+        if self._csv is None:
+            self._handle = self.path.open("w", newline="", encoding="utf-8")
+            self._csv = csv.DictWriter(self._handle, fieldnames=self.columns)
+            self._csv.writeheader()
+        return self._csv
+
+    def write(self, row: dict[str, Any]) -> None:
+        self.rows_written += 1
+        if self.format == "csv":
+            self._open_csv().writerow(row)
+            return
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_rows:
+            self._flush()
+
+    def write_frame(self, df: pd.DataFrame) -> None:
+        if self.format == "csv":
+            if len(df):
+                self._open_csv()
+                # Same line terminator as the DictWriter rows around it.
+                df.reindex(columns=self.columns).to_csv(self._handle, header=False, index=False, lineterminator="\r\n")
+                self.rows_written += len(df)
+            return
+        self._flush()
+        self._write_table(_to_arrow(df[self.columns]))
+        self.rows_written += len(df)
+
+    def _write_table(self, table) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._sink is None:
+            self._schema = table.schema
+            if self.format == "parquet":
+                self._sink = pq.ParquetWriter(self.path, self._schema, compression="zstd")
+            else:
+                self._sink = pa.ipc.new_file(str(self.path), self._schema)
+        self._sink.write_table(table.cast(self._schema))
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._write_table(_to_arrow(pd.DataFrame(self._buffer, columns=self.columns)))
+            self._buffer = []
+
+    def close(self) -> None:
+        if self.format == "csv":
+            if self._handle is not None:
+                self._handle.close()
+            elif not self.rows_written:
+                self.path.write_text("", encoding="utf-8")
+            return
+        self._flush()
+        if self._sink is None:
+            empty = pd.DataFrame({c: pd.Series(dtype=MANIFEST_DTYPES.get(c, "string")) for c in self.columns})
+            self._write_table(_to_arrow(empty))
+        self._sink.close()
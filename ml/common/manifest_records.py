@@ -0,0 +1,112 @@
+"""
+Compact, array-backed manifest rows for DataLoader datasets.
+
+A pandas DataFrame holds every image URL as a separate Python `str` in an
+object column. With `num_workers > 0` under fork, each
+`df.iloc[idx]` in a worker updates refcounts on those objects and on
+the row Series it builds. The kernel then copies the touched pages, so
+every worker slowly ends up with a private copy of the manifest. The
+lookup also builds a Series per sample.
+
+`ManifestRecords` keeps only what `__getitem__` needs, in a few flat
+NumPy buffers that are never written after construction:
+
+- image refs: one uint8 byte buffer plus int64 offsets (`StringColumn`)
+- targets: float64. That is 8 bytes per row, and it keeps labels
+  bit-identical to the CSV so eval reports and predictions.csv match the
+  manifest.
+- snapshot ids: int64 (-1 when the manifest has no `snapshot_id`)
+
+Reading a row decodes one slice of bytes. No Python objects are shared
+with the parent process.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+class StringColumn:
+    """Immutable list of strings stored as offsets + one UTF-8 byte buffer."""
+
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray) -> None:
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, values) -> "StringColumn":
+        encoded = [str(v).encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).copy()
+        return cls(offsets, data)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def tolist(self) -> list[str]:
+        return [self[i] for i in range(len(self))]
+
+    def take(self, indices) -> "StringColumn":
+        return StringColumn.from_strings(self[int(i)] for i in indices)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.offsets.nbytes + self.data.nbytes)
+
+
+@dataclass(frozen=True)
+class ManifestRecords:
+    image_refs: StringColumn
+    targets: np.ndarray
+    snapshot_ids: np.ndarray
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ManifestRecords":
+        if "snapshot_id" in df.columns:
+            ids = pd.to_numeric(df["snapshot_id"], errors="coerce").fillna(-1).to_numpy(np.int64)
+        else:
+            ids = np.full(len(df), -1, dtype=np.int64)
+        return cls(
+            image_refs=StringColumn.from_strings(df["image_path_or_url"].astype(str)),
+            targets=df["target_label"].to_numpy(np.float64),
+            snapshot_ids=ids,
+        )
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def row(self, idx: int) -> tuple[str, float]:
+        """(image ref, target) for one sample."""
+        return self.image_refs[idx], float(self.targets[idx])
+
+    def take(self, indices) -> "ManifestRecords":
+        idx = np.asarray(list(indices), dtype=np.int64)
+        return ManifestRecords(
+            image_refs=self.image_refs.take(idx),
+            targets=self.targets[idx],
+            snapshot_ids=self.snapshot_ids[idx],
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame view for main-process bookkeeping (class counts, samplers)."""
+        return pd.DataFrame(
+            {
+                "snapshot_id": self.snapshot_ids,
+                "image_path_or_url": self.image_refs.tolist(),
+                "target_label": self.targets,
+            }
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.image_refs.nbytes + self.targets.nbytes + self.snapshot_ids.nbytes)
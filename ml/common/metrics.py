@@ -0,0 +1,224 @@
+"""
+Vectorized binary and regression metrics shared by the ML scripts.
+
+Every threshold-dependent number comes from one sort of the scores plus
+cumulative sums. After sorting descending, the confusion counts at *any*
+threshold t are prefix sums up to the number of scores >= t (found with
+`searchsorted`). A 1,000-point threshold sweep then costs about as much
+as a single point. Precision, recall, F1, balanced accuracy, PR/ROC
+curves and AUC all derive from those counts.
+
+The conventions match sklearn so reports stay comparable with older runs:
+- a sample is positive when `score >= threshold`
+- zero_division=0 for precision, recall and F1
+- AUC is the tie-averaged Mann-Whitney statistic
+- p-values are the two-sided t-test values that scipy's pearsonr and
+  spearmanr report
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+from scipy.stats import t as t_dist
+
+
+def _safe_div(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    return np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den > 0)
+
+
+def confusion_at_thresholds(y_true, scores, thresholds) -> dict[str, np.ndarray]:
+    """tn/fp/fn/tp arrays (one entry per threshold) for `scores >= threshold`."""
+    y = np.asarray(y_true).astype(bool)
+    s = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-s, kind="mergesort")
+    desc = s[order]
+    cum_tp = np.concatenate(([0], np.cumsum(y[order])))
+    # Number of scores >= t: searchsorted on the ascending negated scores.
+    n_pred_pos = np.searchsorted(-desc, -np.asarray(thresholds, dtype=np.float64), side="right")
+    tp = cum_tp[n_pred_pos]
+    fp = n_pred_pos - tp
+    positives = int(y.sum())
+    fn = positives - tp
+    tn = len(y) - positives - fp
+    return {"tn": tn, "fp": fp, "fn": fn, "tp": tp}
+
+
+def confusion_from_labels(y_true, y_pred) -> dict[str, int]:
+    """Confusion counts for hard 0/1 predictions."""
+    counts = confusion_at_thresholds(y_true, np.asarray(y_pred, dtype=np.float64), [0.5])
+    return {key: int(value[0]) for key, value in counts.items()}
+
+
+def rates(counts: dict) -> dict[str, np.ndarray]:
+    """Precision, recall, F1, specificity, accuracy and balanced accuracy from counts (any shape)."""
+    tn, fp, fn, tp = (np.asarray(counts[k], dtype=np.float64) for k in ("tn", "fp", "fn", "tp"))
+    precision = _safe_div(tp, tp + fp)
+    recall = _safe_div(tp, tp + fn)
+    specificity = _safe_div(tn, tn + fp)
+    return {
+        "precision": precision,
+        "recall": recall,
+        "f1": _safe_div(2 * tp, 2 * tp + fp + fn),
+        "specificity": specificity,
+        "accuracy": _safe_div(tp + tn, tp + tn + fp + fn),
+        "balanced_accuracy": (recall + specificity) / 2,
+    }
+
+
+def binary_curves(y_true, scores) -> dict[str, np.ndarray]:
+    """PR and ROC curves over every distinct score (highest threshold first)."""
+    y = np.asarray(y_true).astype(bool)
+    s = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(-s, kind="mergesort")
+    desc, y_sorted = s[order], y[order]
+    # Last index of each run of equal scores = the cut for that threshold.
+    cut = np.flatnonzero(np.r_[desc[1:] != desc[:-1], True])
+    tp = np.cumsum(y_sorted)[cut]
+    fp = cut + 1 - tp
+    positives, negatives = int(y.sum()), int(len(y) - y.sum())
+    return {
+        "thresholds": desc[cut],
+        "tp": tp,
+        "fp": fp,
+        "precision": _safe_div(tp, tp + fp),
+        "recall": _safe_div(tp, positives),
+        "tpr": _safe_div(tp, positives),
+        "fpr": _safe_div(fp, negatives),
+    }
+
+
+def downsample_curves(curves: dict[str, np.ndarray], max_points: int) -> dict[str, list]:
+    """`binary_curves` thinned to at most `max_points` evenly spaced points (ends kept), as lists."""
+    n = len(curves["thresholds"])
+    keep = np.unique(np.linspace(0, n - 1, max_points).round().astype(int)) if n > max_points else np.arange(n)
+    return {key: values[keep].tolist() for key, values in curves.items()}
+
+
+def roc_auc(y_true, scores) -> float | None:
+    """Tie-averaged rank AUC; None when only one class is present."""
+    y = np.asarray(y_true).astype(bool)
+    positives = int(y.sum())
+    negatives = len(y) - positives
+    if positives == 0 or negatives == 0:
+        return None
+    ranks = rankdata(np.asarray(scores, dtype=np.float64))
+    return float((ranks[y].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def _correlation_p(r: float, n: int) -> float:
+    if n < 3:
+        return float("nan")
+    r = min(1.0, max(-1.0, r))
+    if abs(r) == 1.0:
+        return 0.0
+    t_stat = r * np.sqrt((n - 2) / (1.0 - r * r))
+    return float(2 * t_dist.sf(abs(t_stat), n - 2))
+
+
+def pearson(x, y) -> float:
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    xc, yc = x - x.mean(), y - y.mean()
+    den = np.sqrt((xc * xc).sum() * (yc * yc).sum())
+    return float((xc * yc).sum() / den) if den > 0 else float("nan")
+
+
+def spearman(x, y) -> float:
+    return pearson(rankdata(x), rankdata(y))
+
+
+def regression_metrics(y_true, y_pred) -> dict[str, float]:
+    """MAE/RMSE always; correlations, p-values and R² from three samples up."""
+    t = np.asarray(y_true, dtype=np.float64)
+    p = np.asarray(y_pred, dtype=np.float64)
+    err = p - t
+    out = {
+        "mae": float(np.abs(err).mean()) if len(t) else float("nan"),
+        "rmse": float(np.sqrt((err * err).mean())) if len(t) else float("nan"),
+    }
+    if len(t) >= 3:
+        r_p, r_s = pearson(t, p), spearman(t, p)
+        ss_tot = float(((t - t.mean()) ** 2).sum())
+        out.update(
+            {
+                "pearson_r": r_p,
+                "pearson_p": _correlation_p(r_p, len(t)),
+                "spearman_r": r_s,
+                "spearman_p": _correlation_p(r_s, len(t)),
+                "r_squared": 1.0 - float((err * err).sum()) / ss_tot if ss_tot > 0 else 0.0,
+            }
+        )
+    return out
+
+
+def derived_binary_counts(y_true, y_pred, thresholds) -> dict[str, np.ndarray]:
+    """Confusion counts when truth *and* prediction are both cut at each threshold.
+
+    Used to judge how well a regression output separates "great sunsets":
+    tp(t) = #{min(y, p) >= t}, so three sorted arrays answer every threshold.
+    """
+    t = np.asarray(y_true, dtype=np.float64)
+    p = np.asarray(y_pred, dtype=np.float64)
+    thr = np.asarray(thresholds, dtype=np.float64)
+
+    def at_least(values: np.ndarray) -> np.ndarray:
+        return len(values) - np.searchsorted(np.sort(values), thr, side="left")
+
+    true_pos, pred_pos, tp = at_least(t), at_least(p), at_least(np.minimum(t, p))
+    fp = pred_pos - tp
+    fn = true_pos - tp
+    return {"tn": len(t) - tp - fp - fn, "fp": fp, "fn": fn, "tp": tp}
+
+
+def grouped_metrics(target_type: str, keys, y_true, y_pred, y_scores=None) -> pd.DataFrame:
+    """Every metric per group key in one group-by pass (index = key, column n = support).
+
+    Counts and sums are grouped once; AUC and Spearman use within-group
+    average ranks, so no per-group Python loop runs.
+    """
+    df = pd.DataFrame({"key": np.asarray(keys), "t": np.asarray(y_true, dtype=np.float64),
+                       "p": np.asarray(y_pred, dtype=np.float64)})
+    grouped = df.groupby("key", sort=True)
+    n = grouped.size().astype(np.float64)
+    out = pd.DataFrame({"n": n.astype(int)})
+    if target_type == "binary":
+        t, p = df["t"].astype(bool), df["p"].astype(bool)
+        counts = pd.DataFrame(
+            {"tp": t & p, "fp": ~t & p, "fn": t & ~p, "tn": ~t & ~p, "key": df["key"]}
+        ).groupby("key", sort=True).sum()
+        for name, values in rates({k: counts[k].to_numpy() for k in ("tn", "fp", "fn", "tp")}).items():
+            out[name] = values
+        positives = counts["tp"] + counts["fn"]
+        negatives = counts["tn"] + counts["fp"]
+        out["positives"] = positives.astype(int)
+        out.loc[(positives == 0) | (negatives == 0), "balanced_accuracy"] = np.nan
+        if y_scores is not None and len(y_scores):
+            df["s"] = np.asarray(y_scores, dtype=np.float64)
+            rank = df.groupby("key", sort=True)["s"].rank(method="average")
+            pos_rank = (rank * df["t"]).groupby(df["key"], sort=True).sum()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                auc = (pos_rank - positives * (positives + 1) / 2) / (positives * negatives)
+            out["auc"] = auc.where((positives > 0) & (negatives > 0))
+        return out
+
+    err = df["p"] - df["t"]
+    out["mae"] = err.abs().groupby(df["key"], sort=True).mean()
+    out["rmse"] = np.sqrt((err * err).groupby(df["key"], sort=True).mean())
+    out["bias"] = err.groupby(df["key"], sort=True).mean()
+    out["mean_true"] = grouped["t"].mean()
+    out["mean_pred"] = grouped["p"].mean()
+
+    def corr(x: pd.Series, y: pd.Series) -> pd.Series:
+        xc = x - x.groupby(df["key"]).transform("mean")
+        yc = y - y.groupby(df["key"]).transform("mean")
+        sums = pd.DataFrame({"xy": xc * yc, "xx": xc * xc, "yy": yc * yc}).groupby(df["key"], sort=True).sum()
+        den = np.sqrt(sums["xx"] * sums["yy"])
+        return (sums["xy"] / den).where((den > 0) & (n >= 3))
+
+    out["pearson_r"] = corr(df["t"], df["p"])
+    out["spearman_r"] = corr(grouped["t"].rank(method="average"), grouped["p"].rank(method="average"))
+    return out
@@ -0,0 +1,243 @@
+"""
+Model registry shared by train/evaluate/export scripts.
+
+Why this exists:
+- `build_model` used to be copy-pasted across three scripts with subtle
+  differences (pretrained weights, dropout head detection).
+- New backbones should be selectable from the YAML `model.name` field
+  with their cost figures visible next to them.
+
+Cost figures per entry:
+- `gflops` / `params_m`: torchvision reference numbers at 224x224 for the
+  ImageNet head. Our 1-2 output head changes params by < 1.3M.
+- `onnx_cpu_ms_p50`: median single-image latency of the exported ONNX
+  graph (our head, opset 17) on onnxruntime CPUExecutionProvider with one
+  intra-op thread. Regenerate with `python ml/benchmark_backbones.py`.
+
+`stage_paths` names the Sequential containers whose children are the
+activation-checkpointing segments (`enable_gradient_checkpointing`).
+
+torch/torchvision are imported lazily so config tooling
+(`run_experiment.py`, sweeps) can read the registry without them.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class BackboneSpec:
+    """Static description of one selectable backbone."""
+
+    name: str
+    builder: str  # torchvision.models constructor name
+    weights: str  # torchvision.models weights enum name
+    head_path: str  # dotted path of the final Linear layer to replace
+    gflops: float
+    params_m: float
+    onnx_cpu_ms_p50: float | None = None
+    stage_paths: tuple[str, ...] = ()
+
+    def cost(self) -> dict[str, Any]:
+        """Cost figures for summaries/reports."""
+        return {
+            "gflops": self.gflops,
+            "params_m": self.params_m,
+            "onnx_cpu_ms_p50": self.onnx_cpu_ms_p50,
+        }
+
+
+MODEL_REGISTRY: dict[str, BackboneSpec] = {
+    spec.name: spec
+    for spec in [
+        BackboneSpec(
+            name="resnet18",
+            builder="resnet18",
+            weights="ResNet18_Weights",
+            head_path="fc",
+            gflops=1.81,
+            params_m=11.69,
+            onnx_cpu_ms_p50=31.6,
+            stage_paths=("layer1", "layer2", "layer3", "layer4"),
+        ),
+        BackboneSpec(
+            name="mobilenet_v3_small",
+            builder="mobilenet_v3_small",
+            weights="MobileNet_V3_Small_Weights",
+            head_path="classifier.3",
+            gflops=0.06,
+            params_m=2.54,
+            onnx_cpu_ms_p50=2.3,
+            stage_paths=("features",),
+        ),
+        BackboneSpec(
+            name="mobilenet_v3_large",
+            builder="mobilenet_v3_large",
+            weights="MobileNet_V3_Large_Weights",
+            head_path="classifier.3",
+            gflops=0.22,
+            params_m=5.48,
+            onnx_cpu_ms_p50=6.8,
+            stage_paths=("features",),
+        ),
+        BackboneSpec(
+            name="efficientnet_b0",
+            builder="efficientnet_b0",
+            weights="EfficientNet_B0_Weights",
+            head_path="classifier.1",
+            gflops=0.39,
+            params_m=5.29,
+            onnx_cpu_ms_p50=13.7,
+            stage_paths=("features",),
+        ),
+        BackboneSpec(
+            name="shufflenet_v2",
+            builder="shufflenet_v2_x1_0",
+            weights="ShuffleNet_V2_X1_0_Weights",
+            head_path="fc",
+            gflops=0.14,
+            params_m=2.28,
+            onnx_cpu_ms_p50=6.0,
+            stage_paths=("stage2", "stage3", "stage4"),
+        ),
+        BackboneSpec(
+            name="regnet_y_400mf",
+            builder="regnet_y_400mf",
+            weights="RegNet_Y_400MF_Weights",
+            head_path="fc",
+            gflops=0.40,
+            params_m=4.34,
+            onnx_cpu_ms_p50=19.1,
+            stage_paths=("trunk_output",),
+        ),
+    ]
+}
+
+MODEL_NAMES: list[str] = list(MODEL_REGISTRY)
+
+
+def get_spec(model_name: str) -> BackboneSpec:
+    """Look up a backbone or raise with the list of valid names."""
+    try:
+        return MODEL_REGISTRY[model_name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown model_name: {model_name!r}. Choose one of: {', '.join(MODEL_NAMES)}"
+        ) from None
+
+
+def out_features_for(target_type: str) -> int:
+    """Regression predicts one score; binary predicts two logits."""
+    return 1 if target_type == "regression" else 2
+
+
+def make_head(
+    in_features: int,
+    out_features: int,
+    dropout: float,
+    with_dropout: bool | None = None,
+):
+    """Linear head, optionally wrapped as Sequential(Dropout, Linear).
+
+    `with_dropout` forces the Sequential layout (needed to load checkpoints
+    trained with dropout); by default it follows `dropout > 0`.
+    """
+    import torch.nn as nn
+
+    if with_dropout is None:
+        with_dropout = dropout > 0
+    if with_dropout:
+        return nn.Sequential(nn.Dropout(p=dropout), nn.Linear(in_features, out_features))
+    return nn.Linear(in_features, out_features)
+
+
+def _split_path(head_path: str) -> tuple[str, str]:
+    parent, _, leaf = head_path.rpartition(".")
+    return parent, leaf
+
+
+def get_head(model, spec: BackboneSpec):
+    """Return the module currently sitting at `spec.head_path`."""
+    return model.get_submodule(spec.head_path)
+
+
+def _set_head(model, spec: BackboneSpec, head) -> None:
+    parent_path, leaf = _split_path(spec.head_path)
+    parent = model.get_submodule(parent_path) if parent_path else model
+    if leaf.isdigit():
+        parent[int(leaf)] = head
+    else:
+        setattr(parent, leaf, head)
+
+
+def state_dict_has_dropout_head(spec: BackboneSpec, state_dict: dict | None) -> bool:
+    """Detect a Sequential(Dropout, Linear) head from checkpoint keys."""
+    return state_dict is not None and f"{spec.head_path}.1.weight" in state_dict
+
+
+def build_model(
+    model_name: str,
+    target_type: str,
+    head_dropout: float = 0.0,
+    pretrained: bool = False,
+    state_dict: dict | None = None,
+):
+    """Build a registry backbone with the task head attached.
+
+    `pretrained=True` loads ImageNet weights (training). When `state_dict`
+    is given the head layout is inferred from its keys so checkpoints
+    trained with head dropout load without knowing the dropout value.
+    """
+    from torchvision import models
+
+    spec = get_spec(model_name)
+    weights = getattr(models, spec.weights).DEFAULT if pretrained else None
+    model = getattr(models, spec.builder)(weights=weights)
+
+    # Only the module layout has to match checkpoint keys; the dropout
+    # probability itself is irrelevant in eval mode.
+    with_dropout = None
+    if state_dict is not None:
+        with_dropout = state_dict_has_dropout_head(spec, state_dict)
+
+    in_features = get_head(model, spec).in_features
+    head = make_head(in_features, out_features_for(target_type), head_dropout, with_dropout=with_dropout)
+    _set_head(model, spec, head)
+    return model
+
+
+def enable_gradient_checkpointing(model, model_name: str) -> int:
+    """Recompute backbone segment activations in backward instead of storing them.
+
+    Each child of a `stage_paths` container gets a forward that runs under
+    `torch.utils.checkpoint` while training with grad enabled; eval and
+    no-grad passes are unchanged. Module names are untouched, so
+    checkpoints and ONNX export are unaffected. BatchNorm running stats
+    see each segment's forward twice per step (momentum effect only).
+    Returns the number of checkpointed segments.
+    """
+    import torch
+    from torch.utils.checkpoint import checkpoint
+
+    def wrap(module) -> None:
+        inner = module.forward
+
+        def forward(*inputs):
+            if module.training and torch.is_grad_enabled():
+                return checkpoint(inner, *inputs, use_reentrant=False)
+            return inner(*inputs)
+
+        module.forward = forward
+
+    segments = 0
+    for path in get_spec(model_name).stage_paths:
+        for child in model.get_submodule(path).children():
+            wrap(child)
+            segments += 1
+    return segments
+
+
+def count_params(model) -> int:
+    return sum(p.numel() for p in model.parameters())
@@ -0,0 +1,99 @@
+"""
+ONNX export + CPU latency helpers.
+
+Production scores images with onnxruntime on CPU (see
+`app/api/cron/update-cameras/lib/aiScoring.ts`), so every "how fast is
+this model" number in the ML pipeline should come from the same runtime
+rather than from PyTorch eager timings.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from pathlib import Path
+from typing import Any
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(8192)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def export_model(model, output: str | Path, image_size: int = 224, opset: int = 17) -> Path:
+    """Export an eval-mode model with a dynamic batch axis."""
+    import torch
+
+    out = Path(output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    model.eval()
+    dummy = torch.randn(1, 3, image_size, image_size)
+    torch.onnx.export(
+        model,
+        dummy,
+        out.as_posix(),
+        input_names=["input"],
+        output_names=["output"],
+        dynamic_axes={"input": {0: "batch"}, "output": {0: "batch"}},
+        opset_version=opset,
+    )
+    return out
+
+
+def make_session(onnx_path: str | Path, threads: int = 1):
+    """CPU inference session with a fixed intra-op thread count (0 = ORT default)."""
+    import onnxruntime as ort
+
+    opts = ort.SessionOptions()
+    if threads > 0:
+        opts.intra_op_num_threads = threads
+        opts.inter_op_num_threads = 1
+    return ort.InferenceSession(
+        Path(onnx_path).as_posix(),
+        sess_options=opts,
+        providers=["CPUExecutionProvider"],
+    )
+
+
+def cpu_latency(
+    onnx_path: str | Path,
+    image_size: int = 224,
+    batch_size: int = 1,
+    runs: int = 50,
+    warmup: int = 5,
+    threads: int = 1,
+) -> dict[str, Any]:
+    """Time repeated runs on random input; report per-image p50/p99/mean ms."""
+    import numpy as np
+
+    sess = make_session(onnx_path, threads=threads)
+    input_name = sess.get_inputs()[0].name
+    x = np.random.default_rng(0).random((batch_size, 3, image_size, image_size), dtype=np.float32)
+    for _ in range(warmup):
+        sess.run(None, {input_name: x})
+
+    timings = np.empty(runs, dtype=np.float64)
+    for i in range(runs):
+        start = time.perf_counter()
+        sess.run(None, {input_name: x})
+        timings[i] = time.perf_counter() - start
+    per_image_ms = timings * 1000.0 / batch_size
+    return {
+        "p50_ms": float(np.percentile(per_image_ms, 50)),
+        "p99_ms": float(np.percentile(per_image_ms, 99)),
+        "mean_ms": float(per_image_ms.mean()),
+        "runs": runs,
+        "batch_size": batch_size,
+        "image_size": image_size,
+        "threads": threads,
+    }
+
+
+def file_size_mb(path: str | Path) -> float:
+    return Path(path).stat().st_size / (1024 * 1024)
@@ -0,0 +1,204 @@
+"""
+Sampler-aware lookahead download of remote images into the URL cache.
+
+With `cache_urls` on and `precache` off, the first epoch used to block
+every `__getitem__` on one 20 s-timeout `requests.get`, so each worker
+fetched one image at a time. `PrefetchingSampler` wraps the loader's
+sampler instead. Each epoch it fixes the sampler's index order up front,
+yields it unchanged to the DataLoader, and a background thread pool
+downloads the next `lookahead` uncached URLs in that same order.
+Workers then find most images already on disk, and first-epoch time
+tends toward max(download bandwidth, compute).
+
+Files are written to a temp name and renamed, so a worker never reads a
+partial image. A failed download leaves a `<cache file>.failed` marker
+holding the failure time. For `FAILURE_TTL_SEC` after that,
+`ManifestDataset(skip_failed=True)` returns None for the sample instead
+of retrying, and `collate_skip_failed` drops None samples from the
+batch. Once the marker is older, the next run tries the URL again, so a
+timeout or 5xx does not drop an image for good.
+
+The cache layout (`url_cache_path`: sha256(url) + image extension) is
+shared by train.py and evaluate.py, so evaluation reuses images that
+training already fetched.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from urllib.parse import urlparse
+
+import requests
+from torch.utils.data import Sampler
+from torch.utils.data.dataloader import default_collate
+
+
+CACHE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+FAILURE_TTL_SEC = 6 * 3600.0
+
+
+def is_url(image_ref: str) -> bool:
+    return image_ref.startswith(("http://", "https://"))
+
+
+def url_cache_path(cache_root: Path, url: str) -> Path:
+    ext = Path(urlparse(url).path).suffix.lower()
+    if ext not in CACHE_EXTENSIONS:
+        ext = ".jpg"
+    return cache_root / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}{ext}"
+
+
+def url_cache_state(image_refs: Iterable[str], cache_root: Path | None) -> dict:
+    """How many unique URLs in `image_refs` are already on disk."""
+    unique_urls = sorted({ref for ref in image_refs if is_url(ref)})
+    if cache_root is None:
+        return {"enabled": False, "unique_url_count": len(unique_urls), "cached_count": 0,
+                "missing_count": len(unique_urls)}
+    cached = sum(1 for url in unique_urls if url_cache_path(cache_root, url).exists())
+    return {
+        "enabled": True,
+        "cache_dir": str(cache_root),
+        "unique_url_count": len(unique_urls),
+        "cached_count": cached,
+        "missing_count": len(unique_urls) - cached,
+    }
+
+
+def failure_marker(cache_path: Path) -> Path:
+    return cache_path.with_name(cache_path.name + ".failed")
+
+
+def record_failure(cache_path: Path, exc: BaseException) -> None:
+    """Write the marker: failure time (epoch seconds) and the error."""
+    failure_marker(cache_path).write_text(f"{time.time()} {type(exc).__name__}: {exc}", encoding="utf-8")
+
+
+def recent_failure(cache_path: Path, ttl_sec: float = FAILURE_TTL_SEC) -> bool:
+    """True if downloading `cache_path` failed less than `ttl_sec` ago."""
+    marker = failure_marker(cache_path)
+    try:
+        failed_at = float(marker.read_text(encoding="utf-8").split(" ", 1)[0])
+    except FileNotFoundError:
+        return False
+    except ValueError:
+        # Marker from before failure times were recorded.
+        failed_at = marker.stat().st_mtime
+    return time.time() - failed_at < ttl_sec
+
+
+def download_to_cache(url: str, cache_path: Path, timeout: float = 20.0) -> int:
+    """Atomically download `url` to `cache_path`; returns bytes written. Clears an old failure marker."""
+    resp = requests.get(url, timeout=timeout)
+    resp.raise_for_status()
+    tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(resp.content)
+    os.replace(tmp, cache_path)
+    failure_marker(cache_path).unlink(missing_ok=True)
+    return len(resp.content)
+
+
+def collate_skip_failed(batch: list):
+    """default_collate without the samples a dataset returned as None."""
+    kept = [sample for sample in batch if sample is not None]
+    if not kept:
+        return None
+    return default_collate(kept)
+
+
+class PrefetchingSampler(Sampler):
+    """Yield `base`'s indices while downloading the next `lookahead` images.
+
+    With `failure_markers=False` (evaluate.py) failed downloads leave no
+    marker and existing markers are ignored, so an evaluation never
+    changes which images later training runs skip.
+    """
+
+    def __init__(
+        self,
+        base: Sampler,
+        image_refs: list[str],
+        cache_path_for: Callable[[str], Path],
+        lookahead: int = 64,
+        threads: int = 16,
+        timeout: float = 20.0,
+        failure_ttl_sec: float = FAILURE_TTL_SEC,
+        failure_markers: bool = True,
+    ) -> None:
+        self.base = base
+        self.image_refs = image_refs
+        self.cache_path_for = cache_path_for
+        self.lookahead = lookahead
+        self.threads = threads
+        self.timeout = timeout
+        self.failure_ttl_sec = failure_ttl_sec
+        self.failure_markers = failure_markers
+        self._lock = threading.Lock()
+        self._stats = {"downloaded": 0, "failed": 0, "already_cached": 0, "bytes": 0}
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def _fetch(self, url: str, cache_path: Path) -> None:
+        try:
+            self._count("bytes", download_to_cache(url, cache_path, self.timeout))
+            self._count("downloaded")
+        except Exception as exc:
+            if self.failure_markers:
+                record_failure(cache_path, exc)
+            self._count("failed")
+
+    def _schedule(self, order: list[int], progress: dict, cond: threading.Condition, stop: threading.Event) -> None:
+        seen: set[str] = set()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="prefetch") as pool:
+            for pos, idx in enumerate(order):
+                with cond:
+                    cond.wait_for(lambda: stop.is_set() or pos < progress["consumed"] + self.lookahead)
+                if stop.is_set():
+                    break
+                url = self.image_refs[idx]
+                if not is_url(url) or url in seen:
+                    continue
+                seen.add(url)
+                cache_path = self.cache_path_for(url)
+                if cache_path.exists() or (
+                    self.failure_markers and recent_failure(cache_path, self.failure_ttl_sec)
+                ):
+                    self._count("already_cached")
+                    continue
+                pool.submit(self._fetch, url, cache_path)
+            if stop.is_set():
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def __iter__(self) -> Iterator[int]:
+        order = [int(i) for i in self.base]
+        progress = {"consumed": 0}
+        cond = threading.Condition()
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._schedule, args=(order, progress, cond, stop), daemon=True, name="prefetch-scheduler"
+        )
+        thread.start()
+        try:
+            for pos, idx in enumerate(order):
+                with cond:
+                    progress["consumed"] = pos
+                    cond.notify_all()
+                yield idx
+        finally:
+            stop.set()
+            with cond:
+                cond.notify_all()
@@ -0,0 +1,126 @@
+"""
+Structured channel pruning for ResNet BasicBlock backbones.
+
+Only the channels *inside* each residual block (conv1 output = bn1 =
+conv2 input) are removed. The block input/output widths are shared with
+the skip connection, so touching them would require rewriting every
+downsample path; the internal channels hold half of each block's conv
+FLOPs and can be cut independently.
+
+Channel importance is the L1 norm of the conv1 filter scaled by |gamma|
+of the following BatchNorm: a filter with large weights whose BN scale
+has collapsed to ~0 contributes nothing downstream.
+
+A pruned model is described by a "prune spec" ({block_name: kept
+channels}). The spec is saved next to the checkpoint so evaluate/export
+can rebuild the narrower shapes before `load_state_dict`.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+
+def _basic_blocks(model) -> list[tuple[str, object]]:
+    from torchvision.models.resnet import BasicBlock
+
+    blocks = [(name, m) for name, m in model.named_modules() if isinstance(m, BasicBlock)]
+    if not blocks:
+        raise ValueError(
+            "Structured pruning currently supports ResNet BasicBlock backbones (e.g. resnet18)."
+        )
+    return blocks
+
+
+def channel_importance(block):
+    """Per-channel importance of a block's internal channels."""
+    filter_l1 = block.conv1.weight.detach().abs().sum(dim=(1, 2, 3))
+    return filter_l1 * block.bn1.weight.detach().abs()
+
+
+def kept_channel_count(channels: int, sparsity: float, multiple: int = 1) -> int:
+    """Channels to keep at a sparsity level, rounded up to `multiple`."""
+    if not 0.0 <= sparsity < 1.0:
+        raise ValueError(f"sparsity must be in [0, 1), got {sparsity}")
+    keep = max(1, round(channels * (1.0 - sparsity)))
+    if multiple > 1:
+        keep = min(channels, -(-keep // multiple) * multiple)
+    return keep
+
+
+def _resize_block(block, keep: int, keep_idx=None) -> None:
+    """Replace conv1/bn1/conv2 with `keep`-wide versions.
+
+    When `keep_idx` is given the surviving weights are copied over;
+    otherwise the new modules are left freshly initialized (shape-only,
+    used before loading a pruned checkpoint).
+    """
+    import torch
+    import torch.nn as nn
+
+    old_conv1, old_bn1, old_conv2 = block.conv1, block.bn1, block.conv2
+    conv1 = nn.Conv2d(
+        old_conv1.in_channels,
+        keep,
+        kernel_size=old_conv1.kernel_size,
+        stride=old_conv1.stride,
+        padding=old_conv1.padding,
+        bias=False,
+    )
+    bn1 = nn.BatchNorm2d(keep, eps=old_bn1.eps, momentum=old_bn1.momentum)
+    conv2 = nn.Conv2d(
+        keep,
+        old_conv2.out_channels,
+        kernel_size=old_conv2.kernel_size,
+        stride=old_conv2.stride,
+        padding=old_conv2.padding,
+        bias=False,
+    )
+    if keep_idx is not None:
+        with torch.no_grad():
+            conv1.weight.copy_(old_conv1.weight[keep_idx])
+            bn1.weight.copy_(old_bn1.weight[keep_idx])
+            bn1.bias.copy_(old_bn1.bias[keep_idx])
+            bn1.running_mean.copy_(old_bn1.running_mean[keep_idx])
+            bn1.running_var.copy_(old_bn1.running_var[keep_idx])
+            bn1.num_batches_tracked.copy_(old_bn1.num_batches_tracked)
+            conv2.weight.copy_(old_conv2.weight[:, keep_idx])
+    device = old_conv1.weight.device
+    block.conv1 = conv1.to(device)
+    block.bn1 = bn1.to(device)
+    block.conv2 = conv2.to(device)
+
+
+def prune_model(model, sparsity: float, channel_multiple: int = 1) -> dict[str, int]:
+    """Physically remove the least important internal channels in-place.
+
+    Returns the prune spec for the resulting model.
+    """
+    import torch
+
+    spec: dict[str, int] = {}
+    for name, block in _basic_blocks(model):
+        channels = block.conv1.out_channels
+        keep = kept_channel_count(channels, sparsity, channel_multiple)
+        if keep < channels:
+            order = torch.argsort(channel_importance(block), descending=True)
+            keep_idx = torch.sort(order[:keep]).values
+            _resize_block(block, keep, keep_idx)
+        spec[name] = keep
+    return spec
+
+
+def apply_prune_spec(model, spec: dict[str, int]) -> None:
+    """Reshape a freshly built model so a pruned checkpoint can be loaded."""
+    blocks = dict(_basic_blocks(model))
+    for name, keep in spec.items():
+        if name not in blocks:
+            raise ValueError(f"Prune spec block {name!r} not found in model.")
+        if blocks[name].conv1.out_channels != keep:
+            _resize_block(blocks[name], keep)
+
+
+def read_prune_spec(path: str | Path) -> dict[str, int]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {str(k): int(v) for k, v in data["blocks"].items()}
@@ -0,0 +1,186 @@
+"""
+Quantization-aware training (QAT) helpers for int8 deployment.
+
+Flow (PyTorch FX graph mode):
+1) Fold BatchNorm into conv weights on the float model (eval-mode fuse).
+   QAT then fine-tunes the folded convs, so the exported graph has no
+   BatchNormalization nodes between QDQ pairs.
+2) `prepare_qat_fx` inserts fake-quant observers (int8 per-channel
+   symmetric weights, uint8 per-tensor affine activations).
+3) After training, observers are frozen and the graph is exported to ONNX,
+   where each fake-quant becomes a QuantizeLinear/DequantizeLinear pair.
+4) `finalize_qdq_onnx` stores weights as int8 initializers and makes
+   per-tensor scales scalar so onnxruntime fuses QLinear* kernels.
+
+The plain `FakeQuantize` module is used instead of the default fused
+observer op because `aten::fused_moving_avg_obs_fake_quant` has no ONNX
+symbolic.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+
+def qat_qconfig_mapping():
+    """QConfigMapping whose fake-quant ops are ONNX-exportable."""
+    import torch
+    from torch.ao.quantization import (
+        FakeQuantize,
+        MovingAverageMinMaxObserver,
+        MovingAveragePerChannelMinMaxObserver,
+        QConfig,
+        QConfigMapping,
+    )
+
+    qconfig = QConfig(
+        activation=FakeQuantize.with_args(
+            observer=MovingAverageMinMaxObserver,
+            quant_min=0,
+            quant_max=255,
+            dtype=torch.quint8,
+            qscheme=torch.per_tensor_affine,
+        ),
+        weight=FakeQuantize.with_args(
+            observer=MovingAveragePerChannelMinMaxObserver,
+            quant_min=-128,
+            quant_max=127,
+            dtype=torch.qint8,
+            qscheme=torch.per_channel_symmetric,
+        ),
+    )
+    return QConfigMapping().set_global(qconfig)
+
+
+def prepare_qat(model, image_size: int = 224):
+    """Fold BN and insert fake-quant observers; returns a train-mode GraphModule."""
+    import torch
+    from torch.ao.quantization.quantize_fx import prepare_qat_fx
+    from torch.fx.experimental.optimization import fuse
+
+    model.eval()
+    folded = fuse(model)
+    folded.train()
+    example_inputs = (torch.randn(2, 3, image_size, image_size),)
+    return prepare_qat_fx(folded, qat_qconfig_mapping(), example_inputs)
+
+
+def build_qat_model(model_name: str, target_type: str, state_dict: dict, image_size: int = 224):
+    """Rebuild a prepared QAT model and load a QAT checkpoint into it."""
+    from common.models import build_model
+
+    model = prepare_qat(build_model(model_name, target_type, state_dict=state_dict), image_size)
+    model.load_state_dict(state_dict)
+    return model
+
+
+def freeze_for_export(model):
+    """Eval mode with observers off so scales stay fixed and export is traceable."""
+    from torch.ao.quantization import disable_observer
+
+    model.eval()
+    model.apply(disable_observer)
+    return model
+
+
+def _const_values(graph) -> dict:
+    import numpy as np
+    from onnx import numpy_helper
+
+    values = {init.name: numpy_helper.to_array(init) for init in graph.initializer}
+    # Nodes are topologically sorted, so Identity chains resolve in one pass.
+    for node in graph.node:
+        if node.op_type == "Constant":
+            for attr in node.attribute:
+                if attr.name == "value":
+                    values[node.output[0]] = np.asarray(numpy_helper.to_array(attr.t))
+        elif node.op_type == "Identity" and node.input[0] in values:
+            values[node.output[0]] = values[node.input[0]]
+    return values
+
+
+def finalize_qdq_onnx(path: str | Path) -> Path:
+    """Rewrite an exported fake-quant graph into a compact int8 QDQ model.
+
+    - Weight QuantizeLinear(float initializer) nodes are constant-folded
+      into int8 initializers feeding DequantizeLinear directly.
+    - Per-tensor scale / zero-point tensors of shape [1] become scalars
+      (onnxruntime's QLinearAdd/QLinearConv fusions require scalars).
+    """
+    import numpy as np
+    import onnx
+    from onnx import numpy_helper
+
+    p = Path(path)
+    model = onnx.load(p.as_posix())
+    graph = model.graph
+    values = _const_values(graph)
+    initializers = {init.name: init for init in graph.initializer}
+    consumers: dict[str, list] = {}
+    for node in graph.node:
+        for name in node.input:
+            consumers.setdefault(name, []).append(node)
+
+    folded_nodes = []
+    new_inits = []
+    for node in graph.node:
+        if node.op_type != "QuantizeLinear" or node.input[0] not in initializers:
+            continue
+        weight = values[node.input[0]].astype(np.float32)
+        scale = values[node.input[1]].astype(np.float32)
+        zero_point = values[node.input[2]]
+        axis = next((a.i for a in node.attribute if a.name == "axis"), 1)
+        if scale.size > 1:
+            shape = [1] * weight.ndim
+            shape[axis] = -1
+            scale_b = scale.reshape(shape)
+            zp_b = zero_point.reshape(shape).astype(np.int32)
+        else:
+            scale_b = scale.reshape(())
+            zp_b = zero_point.reshape(()).astype(np.int32)
+        info = np.iinfo(zero_point.dtype)
+        q = np.clip(np.rint(weight / scale_b) + zp_b, info.min, info.max).astype(zero_point.dtype)
+        q_name = f"{node.input[0]}_quantized"
+        new_inits.append(numpy_helper.from_array(q, q_name))
+        for consumer in consumers.get(node.output[0], []):
+            for i, name in enumerate(consumer.input):
+                if name == node.output[0]:
+                    consumer.input[i] = q_name
+        folded_nodes.append(node)
+
+    for node in folded_nodes:
+        graph.node.remove(node)
+    graph.initializer.extend(new_inits)
+
+    still_used = {name for node in graph.node for name in node.input}
+    for init in list(graph.initializer):
+        if init.name not in still_used:
+            graph.initializer.remove(init)
+
+    constant_tensors = {
+        node.output[0]: attr.t
+        for node in graph.node
+        if node.op_type == "Constant"
+        for attr in node.attribute
+        if attr.name == "value"
+    }
+    identity_src = {n.output[0]: n.input[0] for n in graph.node if n.op_type == "Identity"}
+    for node in graph.node:
+        if node.op_type not in ("QuantizeLinear", "DequantizeLinear"):
+            continue
+        scale = values.get(node.input[1])
+        if scale is None or scale.size != 1:
+            continue
+        for name in node.input[1:]:
+            while name in identity_src:
+                name = identity_src[name]
+            tensor = initializers[name] if name in initializers else constant_tensors.get(name)
+            if tensor is not None and list(tensor.dims) == [1]:
+                del tensor.dims[:]
+        for attr in list(node.attribute):
+            if attr.name == "axis":
+                node.attribute.remove(attr)
+
+    onnx.checker.check_model(model)
+    onnx.save(model, p.as_posix())
+    return p
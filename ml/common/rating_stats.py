@@ -0,0 +1,126 @@
+"""
+Incremental refresh of `webcam_snapshot_rating_stats`.
+
+The table (database/migrations/20261019_snapshot_rating_stats.sql) holds
+per-snapshot rating_count, unique_rater_count and first/last rating time,
+so the export, audit and LLM rater queries join one row per snapshot
+instead of aggregating every rating on each run.
+
+`refresh_rating_stats` re-aggregates only snapshots with a rating whose
+`created_at` is newer than the stored watermark. The rate endpoint bumps
+`created_at` on every upsert. The window reaches `lookback_minutes` behind
+the watermark, so ratings committed late with an earlier NOW() are still
+picked up. Deleted ratings leave no timestamp; a trigger records their
+snapshot ids in `webcam_snapshot_rating_stats_dirty` instead. The refresh
+claims those ids, re-aggregates them and drops the stats rows of snapshots
+with no ratings left.
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import timedelta
+from typing import Any
+
+import psycopg2
+
+STATS_TABLE = "webcam_snapshot_rating_stats"
+STATE_TABLE = "webcam_snapshot_rating_stats_state"
+DIRTY_TABLE = "webcam_snapshot_rating_stats_dirty"
+MIGRATION = "database/migrations/20261019_snapshot_rating_stats.sql"
+# How far behind a stored watermark to re-check rows whose NOW() was taken
+# before the watermark but committed after it.
+LOOKBACK_MINUTES = 10.0
+
+_UPSERT = f"""
+INSERT INTO {STATS_TABLE} (
+  snapshot_id, rating_count, unique_rater_count, first_rating_at, last_rating_at, refreshed_at
+)
+SELECT
+  r.snapshot_id,
+  COUNT(*)::int,
+  COUNT(DISTINCT r.user_session_id)::int,
+  MIN(r.created_at),
+  MAX(r.created_at),
+  NOW()
+FROM webcam_snapshot_ratings r
+{{changed_filter}}
+GROUP BY r.snapshot_id
+ON CONFLICT (snapshot_id) DO UPDATE SET
+  rating_count = EXCLUDED.rating_count,
+  unique_rater_count = EXCLUDED.unique_rater_count,
+  first_rating_at = EXCLUDED.first_rating_at,
+  last_rating_at = EXCLUDED.last_rating_at,
+  refreshed_at = EXCLUDED.refreshed_at
+"""
+
+_CHANGED_FILTER = """WHERE r.snapshot_id IN (
+  SELECT snapshot_id FROM webcam_snapshot_ratings WHERE created_at > %(since)s
+) OR r.snapshot_id = ANY(%(dirty)s)"""
+
+_DELETE_UNRATED = f"""
+DELETE FROM {STATS_TABLE} s
+WHERE s.snapshot_id = ANY(%(dirty)s)
+  AND NOT EXISTS (SELECT 1 FROM webcam_snapshot_ratings r WHERE r.snapshot_id = s.snapshot_id)
+"""
+
+
+def refresh_rating_stats(
+    conn: psycopg2.extensions.connection,
+    full: bool = False,
+    lookback_minutes: float = LOOKBACK_MINUTES,
+) -> dict[str, Any]:
+    """Fold ratings newer than the watermark into the stats table and commit.
+
+    Concurrent refreshes queue on the state row lock. Returns the mode,
+    the old and new watermark, the number of snapshots re-aggregated, the
+    number of stats rows removed because their ratings were all deleted,
+    and the elapsed seconds.
+    """
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT watermark FROM {STATE_TABLE} WHERE id FOR UPDATE")
+        state = cur.fetchone()
+        if state is None:
+            raise RuntimeError(f"{STATE_TABLE} has no row; apply {MIGRATION} first")
+        watermark = state[0]
+        cur.execute("SELECT MAX(created_at) FROM webcam_snapshot_ratings")
+        latest = cur.fetchone()[0]
+
+        # Claim the ids the delete trigger recorded. A rating deleted after
+        # this point waits on these row locks and re-marks its snapshot for
+        # the next refresh.
+        cur.execute(f"DELETE FROM {DIRTY_TABLE} RETURNING snapshot_id")
+        dirty = [row[0] for row in cur.fetchall()]
+
+        mode = "full" if full or watermark is None else "incremental"
+        removed = 0
+        if mode == "full":
+            cur.execute(f"DELETE FROM {STATS_TABLE}")
+            cur.execute(_UPSERT.format(changed_filter=""))
+            refreshed = cur.rowcount
+        else:
+            since = watermark - timedelta(minutes=lookback_minutes)
+            cur.execute(
+                _UPSERT.format(changed_filter=_CHANGED_FILTER),
+                {"since": since, "dirty": dirty},
+            )
+            refreshed = cur.rowcount
+            if dirty:
+                cur.execute(_DELETE_UNRATED, {"dirty": dirty})
+                removed = cur.rowcount
+
+        cur.execute(
+            f"UPDATE {STATE_TABLE} SET watermark = COALESCE(%(latest)s, watermark), refreshed_at = NOW() WHERE id",
+            {"latest": latest},
+        )
+    conn.commit()
+    new_watermark = latest if latest is not None else watermark
+    return {
+        "mode": mode,
+        "previous_watermark": watermark.isoformat() if watermark is not None else None,
+        "watermark": new_watermark.isoformat() if new_watermark is not None else None,
+        "snapshots_refreshed": refreshed,
+        "snapshots_removed": removed,
+        "elapsed_sec": time.perf_counter() - start,
+    }
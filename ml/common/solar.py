@@ -0,0 +1,143 @@
+"""
+Vectorized sun position for manifest features.
+
+Implements the NOAA solar-position equations (the same approximation family
+as `app/lib/solar.ts`) on whole arrays of (latitude, longitude,
+captured_at). Timing is good to about a minute and angles to a fraction of
+a degree, which is enough to window frames around sunset.
+
+- `sun_elevation_deg`: geometric elevation of the sun's centre, without
+  atmospheric refraction.
+- `sun_azimuth_deg`: degrees from true north, clockwise.
+- `minutes_from_sunset` / `minutes_from_sunrise`: signed minutes from
+  that UTC day's event. Negative means before it. Wrapped into
+  [-720, 720).
+
+Sunrise and sunset are when the sun's centre sits 0.833 degrees below the
+horizon (refraction plus solar radius). Rows without a location, or with
+no sunset that day (polar day or night), get NaN.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+SOLAR_COLUMNS = ["sun_elevation_deg", "sun_azimuth_deg", "minutes_from_sunset", "minutes_from_sunrise"]
+SUNSET_ZENITH_DEG = 90.833
+
+
+def _degrees(values: Iterable) -> np.ndarray:
+    if isinstance(values, np.ndarray) and values.dtype.kind == "f":
+        return values.astype(np.float64, copy=False)
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _unix_seconds(captured_at: Iterable) -> np.ndarray:
+    """Seconds since the epoch as float64; naive timestamps are taken as UTC, unparseable ones as NaN.
+
+    A datetime64 array (UTC) skips the parse.
+    """
+    if isinstance(captured_at, np.ndarray) and captured_at.dtype.kind == "M":
+        values = captured_at.astype("datetime64[ns]")
+    else:
+        times = pd.to_datetime(pd.Series(captured_at), utc=True, format="mixed", errors="coerce")
+        values = times.dt.tz_convert(None).to_numpy(dtype="datetime64[ns]")
+    seconds = (values - np.datetime64(0, "ns")) / np.timedelta64(1, "s")
+    return np.where(np.isnat(values), np.nan, seconds)
+
+
+def _sun(unix_seconds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Solar declination (radians) and equation of time (minutes)."""
+    jc = (unix_seconds / 86400.0 + 2440587.5 - 2451545.0) / 36525.0
+    mean_long = np.radians((280.46646 + jc * (36000.76983 + jc * 0.0003032)) % 360.0)
+    mean_anom = np.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    ecc = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+    center = (
+        np.sin(mean_anom) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + np.sin(2 * mean_anom) * (0.019993 - 0.000101 * jc)
+        + np.sin(3 * mean_anom) * 0.000289
+    )
+    omega = np.radians(125.04 - 1934.136 * jc)
+    apparent_long = np.radians(np.degrees(mean_long) + center - 0.00569 - 0.00478 * np.sin(omega))
+    mean_obliq = 23.0 + (26.0 + (21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))) / 60.0) / 60.0
+    obliq = np.radians(mean_obliq + 0.00256 * np.cos(omega))
+
+    declination = np.arcsin(np.sin(obliq) * np.sin(apparent_long))
+    y = np.tan(obliq / 2) ** 2
+    eq_of_time = 4.0 * np.degrees(
+        y * np.sin(2 * mean_long)
+        - 2 * ecc * np.sin(mean_anom)
+        + 4 * ecc * y * np.sin(mean_anom) * np.cos(2 * mean_long)
+        - 0.5 * y * y * np.sin(4 * mean_long)
+        - 1.25 * ecc * ecc * np.sin(2 * mean_anom)
+    )
+    return declination, eq_of_time
+
+
+def _wrap_minutes(delta: np.ndarray) -> np.ndarray:
+    return (delta + 720.0) % 1440.0 - 720.0
+
+
+def solar_position(latitude: Iterable, longitude: Iterable, captured_at: Iterable) -> dict[str, np.ndarray]:
+    """`SOLAR_COLUMNS` for equal-length arrays of degrees (east positive) and timestamps."""
+    lat = np.radians(_degrees(latitude))
+    lon = _degrees(longitude)
+    seconds = _unix_seconds(captured_at)
+    declination, eq_of_time = _sun(seconds)
+
+    with np.errstate(invalid="ignore"):
+        minute_of_day = (seconds % 86400.0) / 60.0
+        hour_angle = np.radians((minute_of_day + eq_of_time + 4.0 * lon) % 1440.0 / 4.0 - 180.0)
+        cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+        elevation = 90.0 - np.degrees(np.arccos(np.clip(cos_zenith, -1.0, 1.0)))
+        azimuth = (
+            np.degrees(
+                np.arctan2(
+                    np.sin(hour_angle),
+                    np.cos(hour_angle) * np.sin(lat) - np.tan(declination) * np.cos(lat),
+                )
+            )
+            + 180.0
+        ) % 360.0
+
+        # Half-day arc in minutes; NaN when the sun never crosses -0.833 deg that day.
+        cos_event = np.cos(np.radians(SUNSET_ZENITH_DEG)) / (np.cos(lat) * np.cos(declination)) - np.tan(
+            lat
+        ) * np.tan(declination)
+        half_day = 4.0 * np.degrees(np.where(np.abs(cos_event) <= 1.0, np.arccos(cos_event), np.nan))
+        solar_noon = 720.0 - 4.0 * lon - eq_of_time
+
+    return {
+        "sun_elevation_deg": elevation,
+        "sun_azimuth_deg": azimuth,
+        "minutes_from_sunset": _wrap_minutes(minute_of_day - (solar_noon + half_day)),
+        "minutes_from_sunrise": _wrap_minutes(minute_of_day - (solar_noon - half_day)),
+    }
+
+
+def solar_window_mask(
+    minutes_from_sunset: np.ndarray,
+    minutes_from_sunrise: np.ndarray,
+    max_minutes_from_sunset: float | None = None,
+    max_minutes_from_sunrise: float | None = None,
+) -> np.ndarray:
+    """Rows within either configured window (absolute minutes).
+
+    With no limit set everything is kept. Rows whose event time is unknown
+    (NaN: no location, polar day/night) are kept too.
+    """
+    sunset = np.asarray(minutes_from_sunset, dtype=np.float64)
+    sunrise = np.asarray(minutes_from_sunrise, dtype=np.float64)
+    limits = [(sunset, max_minutes_from_sunset), (sunrise, max_minutes_from_sunrise)]
+    limits = [(minutes, limit) for minutes, limit in limits if limit is not None]
+    if not limits:
+        return np.ones(len(sunset), dtype=bool)
+    keep = np.zeros(len(sunset), dtype=bool)
+    unknown = np.ones(len(sunset), dtype=bool)
+    for minutes, limit in limits:
+        keep |= np.abs(minutes) <= limit
+        unknown &= np.isnan(minutes)
+    return keep | unknown
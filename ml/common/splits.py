@@ -4,10 +4,31 @@ Deterministic split helpers.
 Why this exists:
 - We want reproducible train/val/test assignment across runs.
 - We also want leakage protection by assigning at webcam-group level.
+
+Group keys are hashed with sha256 (`stable_bucket`), never Python's
+`hash()`, which is salted per process. Webcam rows are grouped by
+webcam id. Each external image is its own group, `ext_<id>`
+(`external_group_keys`).
+
+`SplitTable` persists the assignments keyed by (group key, seed,
+percentages). A repeat export looks known groups up and only hashes
+new ones.
 """
 
+from __future__ import annotations
+
 import hashlib
+import os
 from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+SPLIT_TABLE_COLUMNS = ["group_key", "seed", "train_pct", "val_pct", "test_pct", "split"]
+_CONFIG_COLUMNS = ["seed", "train_pct", "val_pct", "test_pct"]
 
 
 @dataclass(frozen=True)
@@ -26,6 +47,12 @@ class SplitConfig:
             raise ValueError(f"Split percentages must sum to 100, got {total}")
 
 
+@lru_cache(maxsize=None)
+def _validated(config: SplitConfig) -> SplitConfig:
+    config.validate()
+    return config
+
+
 def stable_bucket(group_key: str, seed: int) -> int:
     """
     Convert stable ID + seed into bucket [0..99].
@@ -33,17 +60,130 @@ def stable_bucket(group_key: str, seed: int) -> int:
     Using a stable hash guarantees the same webcam is assigned to
     the same split every export run.
     """
-    digest = hashlib.sha256(f"{group_key}|{seed}".encode("utf-8")).hexdigest()
-    return int(digest[:8], 16) % 100
+    # First 4 digest bytes == int(hexdigest[:8], 16), without the hex round-trip.
+    digest = hashlib.sha256(f"{group_key}|{seed}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % 100
+
+
+def stable_buckets(group_keys: Iterable, seed: int) -> np.ndarray:
+    """`stable_bucket` for an array of distinct keys, as int64."""
+    return np.fromiter((stable_bucket(str(key), seed) for key in group_keys), dtype=np.int64)
+
+
+def bucket_splits(buckets: np.ndarray, config: SplitConfig) -> np.ndarray:
+    """Map buckets [0..99] to split names according to configured ratios."""
+    return np.where(
+        buckets < config.train_pct,
+        "train",
+        np.where(buckets < config.train_pct + config.val_pct, "val", "test"),
+    ).astype(object)
+
+
+def external_group_key(external_id: int) -> str:
+    """Split group of one external image."""
+    return f"ext_{external_id}"
+
+
+def external_group_keys(external_ids: Iterable) -> np.ndarray:
+    """`external_group_key` for a whole id column."""
+    ids = external_ids if isinstance(external_ids, pd.Series) else pd.Series(list(external_ids))
+    return ("ext_" + ids.astype("string")).to_numpy(dtype=object)
 
 
-def assign_split(webcam_id: int, config: SplitConfig) -> str:
+def assign_split(group_key: int | str, config: SplitConfig) -> str:
     """Map webcam group to train/val/test according to configured ratios."""
-    config.validate()
-    bucket = stable_bucket(str(webcam_id), config.seed)
+    config = _validated(config)
+    bucket = stable_bucket(str(group_key), config.seed)
 
     if bucket < config.train_pct:
         return "train"
     if bucket < config.train_pct + config.val_pct:
         return "val"
     return "test"
+
+
+def _factorized(group_keys: Iterable) -> tuple[np.ndarray, np.ndarray]:
+    """Row codes and distinct keys as strings (the form that is hashed and stored)."""
+    keys = group_keys if isinstance(group_keys, (np.ndarray, pd.Series)) else pd.Series(list(group_keys))
+    codes, uniques = pd.factorize(keys)
+    return codes, np.asarray([str(key) for key in uniques], dtype=object)
+
+
+def assign_splits(group_keys: Iterable, config: SplitConfig) -> np.ndarray:
+    """`assign_split` for a whole column: each distinct group key is hashed once."""
+    config = _validated(config)
+    codes, uniques = _factorized(group_keys)
+    if not len(codes):
+        return np.array([], dtype=object)
+    return bucket_splits(stable_buckets(uniques, config.seed), config)[codes]
+
+
+class SplitTable:
+    """Persisted group key -> split assignments for one SplitConfig.
+
+    The file (CSV, `SPLIT_TABLE_COLUMNS`) may hold several configs; only
+    rows matching this one are loaded. `assign` looks keys up and hashes
+    the misses. `save` merges the new rows into whatever is on disk then
+    and replaces the file atomically, so concurrent exports only repeat
+    work, they don't lose rows.
+    """
+
+    def __init__(self, path: str | Path, config: SplitConfig) -> None:
+        self.path = Path(path)
+        self.config = _validated(config)
+        self.looked_up = 0
+        self.hashed = 0
+        self._new: dict[str, str] = {}
+        table = self._read()
+        mine = np.logical_and.reduce(
+            [table[column].to_numpy() == getattr(config, column) for column in _CONFIG_COLUMNS]
+        )
+        # Loaded rows stay in an index for array lookups; new ones go to a dict until save().
+        self._known = pd.Series(table.loc[mine, "split"].to_numpy(dtype=object), index=table.loc[mine, "group_key"])
+
+    def _read(self) -> pd.DataFrame:
+        if not self.path.exists():
+            return pd.DataFrame(columns=SPLIT_TABLE_COLUMNS)
+        return pd.read_csv(self.path, dtype={"group_key": str, "split": str})
+
+    def __len__(self) -> int:
+        return len(self._known) + len(self._new)
+
+    def assign(self, group_keys: Iterable) -> np.ndarray:
+        """Same result as `assign_splits(group_keys, config)`."""
+        codes, uniques = _factorized(group_keys)
+        if not len(codes):
+            return np.array([], dtype=object)
+        positions = self._known.index.get_indexer(uniques)
+        splits = np.full(len(uniques), None, dtype=object)
+        hits = positions >= 0
+        splits[hits] = self._known.to_numpy()[positions[hits]]
+        missing = np.flatnonzero(positions < 0)
+        if self._new and len(missing):
+            splits[missing] = [self._new.get(key) for key in uniques[missing]]
+            missing = missing[pd.isna(splits[missing])]
+        if len(missing):
+            fresh = bucket_splits(stable_buckets(uniques[missing], self.config.seed), self.config)
+            splits[missing] = fresh
+            self._new.update(zip(uniques[missing], fresh))
+        self.hashed += len(missing)
+        self.looked_up += len(uniques) - len(missing)
+        return splits[codes]
+
+    def stats(self) -> dict[str, object]:
+        return {"path": str(self.path), "lookups": self.looked_up, "groups_hashed": self.hashed}
+
+    def save(self) -> None:
+        """Append assignments made since loading; no-op when nothing is new."""
+        if not self._new:
+            return
+        new = pd.DataFrame({"group_key": list(self._new), "split": list(self._new.values())})
+        for column in _CONFIG_COLUMNS:
+            new[column] = getattr(self.config, column)
+        merged = pd.concat([self._read(), new[SPLIT_TABLE_COLUMNS]], ignore_index=True)
+        merged = merged.drop_duplicates(subset=["group_key", *_CONFIG_COLUMNS], keep="first")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        merged.to_csv(tmp, index=False)
+        os.replace(tmp, self.path)
+        self._new = {}
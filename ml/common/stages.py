@@ -0,0 +1,193 @@
+"""
+Content-hash memoization for run_experiment.py stages.
+
+Each stage (export, train, onnx, evaluate, plot) gets a fingerprint over:
+- its command line, with every input file under the run dir or elsewhere
+  replaced by its sha256 (so upstream artifacts count by content, not by
+  the timestamped path they happen to live at);
+- `code_version(script)`: the stage script plus the `common.*` modules it
+  imports, transitively;
+- any extra inputs the caller adds (export: the DB watermark).
+
+`StageCache.run` looks for an earlier run under the same output root whose
+`stages.json` has the same fingerprint for that stage. If it finds one,
+it hardlinks the files that stage produced into the new run dir instead of
+running it. `stages.json` is rewritten after every stage, so a run that
+fails part-way still offers its finished stages for reuse.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from common.onnx_utils import file_sha256
+
+STAGES_FILE = "stages.json"
+ML_DIR = Path(__file__).resolve().parent.parent
+_COMMON_IMPORT = re.compile(r"^\s*(?:from|import)\s+common\.(\w+)", re.MULTILINE)
+# Flags that change how a stage runs but not what it produces. The split
+# table is a lookup cache: assignments are identical with or without it.
+_NEUTRAL_FLAGS = {"--no-progress"}
+_NEUTRAL_OPTIONS = {"--split-table"}
+
+
+def code_version(script: str | Path) -> str:
+    """sha256 over a stage script and the common modules it imports (transitively)."""
+    pending, seen = [ML_DIR / Path(script).name], set()
+    while pending:
+        path = pending.pop()
+        if path in seen or not path.exists():
+            continue
+        seen.add(path)
+        for module in _COMMON_IMPORT.findall(path.read_text(encoding="utf-8")):
+            pending.append(ML_DIR / "common" / f"{module}.py")
+    h = hashlib.sha256()
+    for path in sorted(seen):
+        h.update(path.relative_to(ML_DIR).as_posix().encode("utf-8"))
+        h.update(file_sha256(path).encode("utf-8"))
+    return h.hexdigest()
+
+
+def path_digest(path: Path) -> str:
+    """sha256 of a file, or of (relative path, sha256) for every file under a directory."""
+    if path.is_file():
+        return file_sha256(path)
+    h = hashlib.sha256()
+    for child in sorted(p for p in path.rglob("*") if p.is_file()):
+        h.update(child.relative_to(path).as_posix().encode("utf-8"))
+        h.update(file_sha256(child).encode("utf-8"))
+    return h.hexdigest()
+
+
+def resolved_argv(cmd: list[str], run_dir: Path) -> list[str]:
+    """Command line with input files as content hashes and run-dir paths made relative.
+
+    `cmd[0]` (the interpreter), `_NEUTRAL_FLAGS` and `_NEUTRAL_OPTIONS` with
+    their values are dropped.
+    """
+    run_dir = run_dir.resolve()
+    out = []
+    args = iter(cmd[1:])
+    for arg in args:
+        if arg in _NEUTRAL_FLAGS:
+            continue
+        if arg in _NEUTRAL_OPTIONS:
+            next(args, None)
+            continue
+        path = Path(arg)
+        if path.is_file() and path.suffix != ".py":
+            out.append(f"sha256:{file_sha256(path)}")
+            continue
+        try:
+            out.append(f"<run>/{path.resolve().relative_to(run_dir).as_posix()}")
+        except ValueError:
+            out.append(arg)
+    return out
+
+
+def stage_fingerprint(cmd: list[str], run_dir: Path, script: str, extra: dict[str, Any] | None = None) -> str:
+    """Fingerprint of one stage invocation; `script` is the stage script under ml/."""
+    payload = {
+        "argv": resolved_argv(cmd, run_dir),
+        "code": code_version(script),
+        "extra": extra or {},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _files_under(paths: list[Path]) -> set[Path]:
+    files = set()
+    for path in paths:
+        if path.is_file():
+            files.add(path)
+        elif path.is_dir():
+            files.update(p for p in path.rglob("*") if p.is_file())
+    return files
+
+
+def _link(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem (or no hardlink support): fall back to a copy.
+        shutil.copy2(src, dst)
+
+
+class StageCache:
+    """Reuse or run stages of one experiment run and record which happened.
+
+    `records` maps stage name -> {fingerprint, status, reused_from, outputs,
+    elapsed_sec}, where status is "reused" or "computed" and outputs are the
+    files the stage produced, relative to the run dir.
+    """
+
+    def __init__(self, root: Path, run_dir: Path, reuse: bool = True) -> None:
+        self.root = Path(root)
+        self.run_dir = Path(run_dir)
+        self.reuse = reuse
+        self.records: dict[str, dict[str, Any]] = {}
+
+    def find(self, name: str, fingerprint: str) -> tuple[Path, dict[str, Any]] | None:
+        """Newest earlier run whose `name` stage has this fingerprint and whose outputs still exist."""
+        for stages_path in sorted(self.root.glob(f"*/{STAGES_FILE}"), reverse=True):
+            prior_dir = stages_path.parent
+            if prior_dir.resolve() == self.run_dir.resolve():
+                continue
+            record = json.loads(stages_path.read_text(encoding="utf-8")).get(name)
+            if not record or record.get("fingerprint") != fingerprint:
+                continue
+            if all((prior_dir / rel).is_file() for rel in record["outputs"]):
+                return prior_dir, record
+        return None
+
+    def run(
+        self,
+        name: str,
+        fingerprint: str | None,
+        outputs: list[Path],
+        compute: Callable[[], None],
+    ) -> str:
+        """Hardlink `name`'s outputs from a matching earlier run, or call `compute`.
+
+        `outputs` are the files/dirs (under the run dir) the stage writes.
+        A None fingerprint means the stage cannot be memoized and always runs.
+        Returns "reused" or "computed".
+        """
+        start = time.perf_counter()
+        prior = self.find(name, fingerprint) if self.reuse and fingerprint else None
+        if prior is not None:
+            prior_dir, record = prior
+            for rel in record["outputs"]:
+                _link(prior_dir / rel, self.run_dir / rel)
+            produced = list(record["outputs"])
+            status, reused_from = "reused", str(prior_dir)
+            print(json.dumps({"stage": name, "reused_from": reused_from, "files": len(produced)}))
+        else:
+            before = {p: p.stat().st_mtime_ns for p in _files_under(outputs)}
+            compute()
+            after = _files_under(outputs)
+            produced = sorted(
+                p.relative_to(self.run_dir).as_posix()
+                for p in after
+                if p not in before or p.stat().st_mtime_ns != before[p]
+            )
+            status, reused_from = "computed", None
+        self.records[name] = {
+            "fingerprint": fingerprint,
+            "status": status,
+            "reused_from": reused_from,
+            "outputs": produced,
+            "elapsed_sec": time.perf_counter() - start,
+        }
+        (self.run_dir / STAGES_FILE).write_text(json.dumps(self.records, indent=2), encoding="utf-8")
+        return status
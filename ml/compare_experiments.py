@@ -37,6 +37,7 @@ def flatten_run(run_dir: Path) -> dict[str, Any]:
         "seed": resolved.get("run", {}).get("seed"),
         "target_type": eval_report.get("target_type"),
         "model_name": train_summary.get("model_name"),
+        "image_size": train_summary.get("image_size", 224),
         "epochs": train_summary.get("epochs"),
         "batch_size": train_summary.get("batch_size"),
         "learning_rate": train_summary.get("learning_rate"),
@@ -46,6 +47,8 @@ def flatten_run(run_dir: Path) -> dict[str, Any]:
         "sampler": train_summary.get("sampler"),
         "best_metric": train_summary.get("best_metric"),
     }
+    # Registry cost figures (absent for runs trained before ml/common/models.py).
+    row.update(train_summary.get("model_cost") or {})
 
     if eval_report.get("target_type") == "binary":
         row.update(
@@ -63,13 +66,43 @@ def flatten_run(run_dir: Path) -> dict[str, Any]:
             }
         )
     else:
-        row.update({"mae": eval_report.get("mae"), "rmse": eval_report.get("rmse")})
+        row.update(
+            {
+                "mae": eval_report.get("mae"),
+                "rmse": eval_report.get("rmse"),
+                "pearson_r": eval_report.get("pearson_r"),
+                "spearman_r": eval_report.get("spearman_r"),
+            }
+        )
+    # Webcam-grouped bootstrap CIs (eval_report["bootstrap"], absent for older runs).
+    for metric, ci in (eval_report.get("bootstrap") or {}).get("metrics", {}).items():
+        row[f"{metric}_ci_low"] = ci.get("low")
+        row[f"{metric}_ci_high"] = ci.get("high")
     return row
 
 
+def flag_ci_overlap(rows: list[dict[str, Any]]) -> None:
+    """Mark runs whose primary-metric CI overlaps the best run's CI (difference may be noise).
+
+    Primary metric: F1 for binary, Pearson r for regression; compared within target type.
+    """
+    for target_type, metric in (("binary", "f1"), ("regression", "pearson_r")):
+        group = [r for r in rows if r.get("target_type") == target_type and r.get(metric) is not None]
+        if not group:
+            continue
+        best = max(group, key=lambda r: r[metric])
+        best_low = best.get(f"{metric}_ci_low")
+        for row in group:
+            row["rank_metric"] = metric
+            row["is_best"] = row is best
+            high = row.get(f"{metric}_ci_high")
+            row["ci_overlaps_best"] = None if best_low is None or high is None else bool(high >= best_low)
+
+
 def main() -> None:
     args = parse_args()
     rows = [flatten_run(Path(d)) for d in args.run_dirs]
+    flag_ci_overlap(rows)
 
     json_path = Path(args.output_json)
     json_path.parent.mkdir(parents=True, exist_ok=True)
@@ -48,6 +48,7 @@ from tqdm.auto import tqdm
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 
 from common.io import ensure_dir, get_env_or_file, utc_timestamp
+from common.metrics import confusion_from_labels, rates, regression_metrics
 from llm_rater import (
     DEFAULT_MODELS,
     PROVIDER_RATE_FNS,
@@ -538,6 +539,29 @@ def render_comparison_html(
     Path(output_path).write_text(html, encoding="utf-8")
 
 
+def agreement_summary(df: pd.DataFrame) -> dict[str, Any]:
+    """A-vs-B agreement (and each model vs human consensus) over rows both models rated."""
+    both = df[df["a_quality"].notna() & df["b_quality"].notna()]
+    if both.empty:
+        return {}
+    a_q = both["a_quality"].astype(float).to_numpy()
+    b_q = both["b_quality"].astype(float).to_numpy()
+    quality = regression_metrics(a_q, b_q)
+    sunset = rates(confusion_from_labels(both["a_is_sunset"].astype(bool), both["b_is_sunset"].astype(bool)))
+    out: dict[str, Any] = {
+        "rows": len(both),
+        "quality": {k: quality[k] for k in ("pearson_r", "spearman_r", "mae") if k in quality},
+        "is_sunset_agreement": float(sunset["accuracy"]),
+    }
+    human = both[both["human_calculated_rating"].notna()]
+    if len(human) >= 3:
+        truth = human["human_calculated_rating"].astype(float).to_numpy() / 5.0
+        for side in ("a", "b"):
+            vs_human = regression_metrics(truth, human[f"{side}_quality"].astype(float).to_numpy())
+            out[f"{side}_vs_human"] = {k: vs_human[k] for k in ("pearson_r", "spearman_r", "mae")}
+    return out
+
+
 def main() -> None:
     args = parse_args()
 
@@ -673,7 +697,8 @@ def main() -> None:
             "delta_quality": r.get("max_delta"),
             "rated_at": datetime.now(timezone.utc).isoformat(),
         })
-    pd.DataFrame(csv_rows).to_csv(output_csv, index=False)
+    results_df = pd.DataFrame(csv_rows)
+    results_df.to_csv(output_csv, index=False)
 
     render_comparison_html(rows, a_label, b_label, output_html, args.sample_mode)
 
@@ -693,6 +718,7 @@ def main() -> None:
         "total_images": len(rows),
         "both_succeeded": successes,
         "large_disagreements": big_disagree,
+        "agreement": agreement_summary(results_df),
         "output_html": output_html,
         "output_csv": output_csv,
     }
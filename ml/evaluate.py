@@ -4,84 +4,198 @@ from __future__ import annotations
 import argparse
 import io
 import json
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable
 
 import numpy as np
 import pandas as pd
 import requests
 import torch
 from PIL import Image
-from scipy.stats import pearsonr, spearmanr
-from sklearn.metrics import (
-    balanced_accuracy_score,
-    confusion_matrix,
-    f1_score,
-    mean_absolute_error,
-    mean_squared_error,
-    precision_score,
-    recall_score,
-    roc_auc_score,
-)
-from torch.utils.data import DataLoader, Dataset
+from torch.utils.data import DataLoader, Dataset, SequentialSampler
 from tqdm.auto import tqdm
-from torchvision import models, transforms
+from torchvision import transforms
+
+from common.bootstrap import cluster_bootstrap
+from common.manifest import read_manifest
+from common.manifest_records import ManifestRecords
+from common.metrics import (
+    binary_curves,
+    confusion_at_thresholds,
+    confusion_from_labels,
+    derived_binary_counts,
+    downsample_curves,
+    grouped_metrics,
+    rates,
+    regression_metrics,
+    roc_auc,
+)
+from common.models import MODEL_NAMES, build_model
+from common.onnx_utils import make_session
+from common.prefetch import PrefetchingSampler, download_to_cache, is_url, url_cache_path, url_cache_state
+from common.pruning import apply_prune_spec, read_prune_spec
+from common.splits import external_group_keys
 
 
 class EvalDataset(Dataset):
-    def __init__(self, csv_path: str, target_type: str) -> None:
-        self.df = pd.read_csv(csv_path)
-        self.tf = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor()])
+    def __init__(self, csv_path: str, target_type: str, image_size: int = 224, cache_dir: str = "") -> None:
+        self.records = ManifestRecords.from_frame(read_manifest(csv_path))
+        self.tf = transforms.Compose([transforms.Resize((image_size, image_size)), transforms.ToTensor()])
         self.target_type = target_type
+        self.cache_root = Path(cache_dir) if cache_dir else None
+        if self.cache_root is not None:
+            self.cache_root.mkdir(parents=True, exist_ok=True)
 
     def __len__(self) -> int:
-        return len(self.df)
+        return len(self.records)
+
+    def cache_path_for_url(self, image_ref: str) -> Path:
+        return url_cache_path(self.cache_root or Path("."), image_ref)
 
-    @staticmethod
-    def load_image(image_ref: str) -> Image.Image:
-        if image_ref.startswith("http://") or image_ref.startswith("https://"):
+    def load_image(self, image_ref: str) -> Image.Image:
+        if is_url(image_ref) and self.cache_root is not None:
+            # Same layout as train.py --cache-dir. Evaluation never skips an
+            # image, so a failed download raises instead of leaving a marker.
+            cache_path = self.cache_path_for_url(image_ref)
+            if not cache_path.exists():
+                download_to_cache(image_ref, cache_path)
+            return Image.open(cache_path).convert("RGB")
+        if is_url(image_ref):
             resp = requests.get(image_ref, timeout=20)
             resp.raise_for_status()
             return Image.open(io.BytesIO(resp.content)).convert("RGB")
         return Image.open(image_ref).convert("RGB")
 
     def __getitem__(self, idx: int):
-        row = self.df.iloc[idx]
-        image = self.load_image(str(row["image_path_or_url"]))
+        image_ref, y = self.records.row(idx)
+        image = self.load_image(image_ref)
         x = self.tf(image)
-        y = float(row["target_label"])
         if self.target_type == "binary":
             y = int(y)
         return x, y
 
 
-def _make_head(in_features: int, out_features: int, with_dropout: bool) -> torch.nn.Module:
-    if with_dropout:
-        return torch.nn.Sequential(torch.nn.Dropout(p=0.0), torch.nn.Linear(in_features, out_features))
-    return torch.nn.Linear(in_features, out_features)
+class MultiSizeEvalDataset(EvalDataset):
+    """Decode each image once and emit one tensor per requested input size.
+
+    Targets stay raw floats; each model derives its own y_true.
+    """
+
+    def __init__(self, csv_path: str, image_sizes: list[int], cache_dir: str = "") -> None:
+        super().__init__(csv_path, "regression", cache_dir=cache_dir)
+        self.image_sizes = image_sizes
+        self.tfs = [
+            transforms.Compose([transforms.Resize((size, size)), transforms.ToTensor()]) for size in image_sizes
+        ]
+
+    def __getitem__(self, idx: int):
+        image_ref, y = self.records.row(idx)
+        image = self.load_image(image_ref)
+        return tuple(tf(image) for tf in self.tfs), y
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    checkpoint: str
+    model_name: str
+    target_type: str
+    image_size: int
+
 
+def parse_model_spec(text: str, default_image_size: int) -> ModelSpec:
+    """'name=checkpoint:model_name:target_type[:image_size]' -> ModelSpec."""
+    name, sep, rest = text.partition("=")
+    parts = rest.split(":")
+    image_size = default_image_size
+    if len(parts) >= 4 and parts[-1].isdigit():
+        image_size = int(parts.pop())
+    if not sep or not name or len(parts) < 3:
+        raise ValueError(f"--model must be 'name=checkpoint:model_name:target_type[:image_size]', got {text!r}")
+    checkpoint, model_name, target_type = ":".join(parts[:-2]), parts[-2], parts[-1]
+    if model_name not in MODEL_NAMES:
+        raise ValueError(f"Unknown model_name {model_name!r} in --model {text!r}")
+    if target_type not in ("binary", "regression"):
+        raise ValueError(f"target_type must be binary or regression in --model {text!r}")
+    return ModelSpec(name, checkpoint, model_name, target_type, image_size)
 
-def build_model(model_name: str, target_type: str, state_dict: dict | None = None):
-    out_features = 1 if target_type == "regression" else 2
-    if model_name == "mobilenet_v3_small":
-        model = models.mobilenet_v3_small(weights=None)
-        in_features = model.classifier[-1].in_features
-        last_idx = len(model.classifier) - 1
-        with_dropout = state_dict is not None and f"classifier.{last_idx}.1.weight" in state_dict
-        model.classifier[-1] = _make_head(in_features, out_features, with_dropout)
-        return model
-    model = models.resnet18(weights=None)
-    in_features = model.fc.in_features
-    with_dropout = state_dict is not None and "fc.1.weight" in state_dict
-    model.fc = _make_head(in_features, out_features, with_dropout)
-    return model
 
+def targets_for(raw: np.ndarray, target_type: str, binary_label_threshold: float) -> list:
+    """y_true for one model: binary models on a score manifest compare against score >= threshold."""
+    if target_type == "regression":
+        return raw.astype(float).tolist()
+    if np.isin(raw, (0.0, 1.0)).all():
+        return raw.astype(int).tolist()
+    return (raw >= binary_label_threshold).astype(int).tolist()
 
-def parse_args() -> argparse.Namespace:
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Evaluate trained sunset model")
     parser.add_argument("--test-manifest", required=True)
-    parser.add_argument("--checkpoint", required=True)
+    parser.add_argument("--checkpoint", default="", help="PyTorch best.pt (backends torch and parity).")
+    parser.add_argument(
+        "--model",
+        action="append",
+        default=[],
+        metavar="NAME=CHECKPOINT:MODEL_NAME:TARGET_TYPE[:IMAGE_SIZE]",
+        help="Repeatable. Evaluate several checkpoints on one decode pass of --test-manifest; "
+             "writes <output dir>/<NAME>/{eval_report.json,predictions.csv} and predictions_wide.csv.",
+    )
+    parser.add_argument(
+        "--binary-label-threshold",
+        type=float,
+        default=0.75,
+        help="With --model: binary models on a score manifest use y_true = target >= this "
+             "(export_dataset.py --binary-threshold).",
+    )
     parser.add_argument("--target-type", choices=["binary", "regression"], default="binary")
-    parser.add_argument("--model-name", choices=["resnet18", "mobilenet_v3_small"], default="resnet18")
+    parser.add_argument("--model-name", choices=MODEL_NAMES, default="resnet18")
+    parser.add_argument("--image-size", type=int, default=224, help="Must match training.")
+    parser.add_argument(
+        "--prune-spec",
+        default="",
+        help="prune_spec.json written by prune_model.py when evaluating a pruned checkpoint.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["torch", "onnx", "parity"],
+        default="torch",
+        help="torch: best.pt. onnx: --onnx-model through onnxruntime (what production runs). "
+             "parity: both on the same batches; fails if outputs diverge beyond --parity-tolerance.",
+    )
+    parser.add_argument("--onnx-model", default="", help="Float ONNX from export_onnx.py (backends onnx and parity).")
+    parser.add_argument("--onnx-threads", type=int, default=0, help="onnxruntime intra-op threads (0 = ORT default).")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-workers", type=int, default=0, help="DataLoader workers decoding images.")
+    parser.add_argument("--pin-memory", action="store_true")
+    parser.add_argument("--prefetch-factor", type=int, default=2)
+    parser.add_argument(
+        "--cache-dir",
+        default="",
+        help="URL image cache (train.py --cache-dir layout). Images already fetched by "
+             "training are read from disk; misses are downloaded into it.",
+    )
+    parser.add_argument(
+        "--prefetch-lookahead",
+        type=int,
+        default=64,
+        help="With --cache-dir, download this many upcoming uncached images in background threads (0 = disabled).",
+    )
+    parser.add_argument("--prefetch-threads", type=int, default=16)
+    parser.add_argument(
+        "--parity-tolerance",
+        type=float,
+        default=1e-3,
+        help="Max allowed absolute difference between torch and ONNX raw outputs.",
+    )
+    parser.add_argument(
+        "--int8-onnx",
+        default="",
+        help="int8 QDQ ONNX (export_onnx.py --qat). Runs it on the same batches and "
+             "reports float vs int8 metric deltas under report['int8'].",
+    )
     parser.add_argument(
         "--decision-threshold",
         type=float,
@@ -96,9 +210,53 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--threshold-sweep-start", type=float, default=0.1)
     parser.add_argument("--threshold-sweep-end", type=float, default=0.9)
     parser.add_argument("--threshold-sweep-step", type=float, default=0.1)
+    parser.add_argument(
+        "--curve-points", type=int, default=200,
+        help="Binary targets: PR/ROC curve points written to the report (evenly thinned; 0 = none)",
+    )
+    parser.add_argument(
+        "--bootstrap-replicates",
+        type=int,
+        default=2000,
+        help="Webcam-grouped bootstrap replicates for metric CIs (report['bootstrap']; 0 = off).",
+    )
+    parser.add_argument("--bootstrap-confidence", type=float, default=0.95)
+    parser.add_argument(
+        "--slice-min-support",
+        type=int,
+        default=20,
+        help="Report per-slice metrics (phase, source, webcam_id, label bucket) "
+             "only for slices with at least this many images.",
+    )
+    parser.add_argument("--bootstrap-seed", type=int, default=20260212)
     parser.add_argument("--output", default="ml/artifacts/reports/eval_report.json")
     parser.add_argument("--no-progress", action="store_true")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    try:
+        args.model_specs = [parse_model_spec(text, args.image_size) for text in args.model]
+    except ValueError as exc:
+        parser.error(str(exc))
+    names = [spec.name for spec in args.model_specs]
+    if len(set(names)) != len(names):
+        parser.error("--model names must be unique.")
+    if args.model_specs and (args.checkpoint or args.backend != "torch" or args.int8_onnx or args.prune_spec):
+        parser.error("--model cannot be combined with --checkpoint, --backend, --int8-onnx or --prune-spec.")
+    if args.num_workers < 0 or args.prefetch_factor <= 0:
+        parser.error("--num-workers must be >= 0 and --prefetch-factor > 0.")
+    if args.prefetch_lookahead < 0 or args.prefetch_threads < 1:
+        parser.error("--prefetch-lookahead must be >= 0 and --prefetch-threads >= 1.")
+    if args.bootstrap_replicates < 0 or not 0.0 < args.bootstrap_confidence < 1.0:
+        parser.error("--bootstrap-replicates must be >= 0 and --bootstrap-confidence in (0, 1).")
+    if args.model_specs:
+        return args
+    if args.backend in ("torch", "parity") and not args.checkpoint:
+        parser.error(f"--backend {args.backend} requires --checkpoint.")
+    if args.backend in ("onnx", "parity") and not args.onnx_model:
+        parser.error(f"--backend {args.backend} requires --onnx-model.")
+    if args.batch_size < 1 or args.onnx_threads < 0:
+        parser.error("--batch-size must be >= 1 and --onnx-threads >= 0.")
+    if args.curve_points < 0:
+        parser.error("--curve-points must be >= 0.")
     if args.target_type == "binary" and not (0.0 <= args.decision_threshold <= 1.0):
         parser.error("--decision-threshold must be between 0 and 1 for binary targets.")
     if args.target_type == "binary" and args.threshold_sweep:
@@ -113,131 +271,485 @@ def parse_args() -> argparse.Namespace:
     return args
 
 
-def main() -> None:
-    args = parse_args()
-    if torch.cuda.is_available():
-        device = torch.device("cuda")
-    elif torch.backends.mps.is_available():
-        device = torch.device("mps")
-    else:
-        device = torch.device("cpu")
-    ds = EvalDataset(args.test_manifest, args.target_type)
-    loader = DataLoader(ds, batch_size=32, shuffle=False)
-
-    state = torch.load(args.checkpoint, map_location=device)
-    model = build_model(args.model_name, args.target_type, state_dict=state).to(device)
-    model.load_state_dict(state)
-    model.eval()
-
-    y_true = []
-    y_pred = []
-    y_scores = []
-    with torch.no_grad():
-        for x, y in tqdm(
-            loader,
-            desc="Evaluating",
-            unit="batch",
-            disable=args.no_progress,
-        ):
-            x = x.to(device)
-            out = model(x)
-            if args.target_type == "regression":
-                pred = out.squeeze(1).cpu().numpy()
-                y_pred.extend(pred.tolist())
-                y_true.extend(y.cpu().tolist())
-            else:
-                probs = torch.softmax(out, dim=1)[:, 1].cpu().numpy()
-                pred = (probs >= args.decision_threshold).astype(int)
-                y_scores.extend(probs.tolist())
-                y_pred.extend(pred.tolist())
-                y_true.extend(y.cpu().tolist())
-
-    report = {"target_type": args.target_type, "num_samples": len(y_true)}
+def sweep_thresholds(args: argparse.Namespace) -> list[float]:
+    thresholds: list[float] = []
+    current = args.threshold_sweep_start
+    while current <= args.threshold_sweep_end + 1e-12:
+        thresholds.append(round(current, 6))
+        current += args.threshold_sweep_step
+    return thresholds
+
+
+def compute_metrics(
+    args: argparse.Namespace,
+    y_true: list,
+    y_pred: list,
+    y_scores: list,
+    include_sweep: bool = True,
+) -> dict:
+    """Metric block of eval_report.json for one set of predictions.
+
+    All sweeps come from common.metrics' cumulative counts, so their cost
+    does not grow with the number of thresholds.
+    """
+    report: dict = {"target_type": args.target_type, "num_samples": len(y_true)}
     if args.target_type == "binary":
+        two_classes = len(set(y_true)) > 1
+        confusion = confusion_from_labels(y_true, y_pred)
+        at_threshold = {k: float(v) for k, v in rates(confusion).items()}
         report["decision_threshold"] = args.decision_threshold
-        report["precision"] = precision_score(y_true, y_pred, zero_division=0)
-        report["recall"] = recall_score(y_true, y_pred, zero_division=0)
-        report["f1"] = f1_score(y_true, y_pred, zero_division=0)
-        report["balanced_accuracy"] = balanced_accuracy_score(y_true, y_pred) if len(set(y_true)) > 1 else None
-        report["auc"] = roc_auc_score(y_true, y_scores) if len(set(y_true)) > 1 else None
-        tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
-        report["confusion"] = {"tn": int(tn), "fp": int(fp), "fn": int(fn), "tp": int(tp)}
+        report["precision"] = at_threshold["precision"]
+        report["recall"] = at_threshold["recall"]
+        report["f1"] = at_threshold["f1"]
+        report["balanced_accuracy"] = at_threshold["balanced_accuracy"] if two_classes else None
+        report["auc"] = roc_auc(y_true, y_scores)
+        report["confusion"] = confusion
         report["predicted_positive_rate"] = float(np.mean(np.array(y_pred)))
         report["actual_positive_rate"] = float(np.mean(np.array(y_true)))
-        if args.threshold_sweep:
-            thresholds: list[float] = []
-            current = args.threshold_sweep_start
-            while current <= args.threshold_sweep_end + 1e-12:
-                thresholds.append(round(current, 6))
-                current += args.threshold_sweep_step
-
-            sweep = []
-            for thr in thresholds:
-                preds = (np.array(y_scores) >= thr).astype(int)
-                tn_s, fp_s, fn_s, tp_s = confusion_matrix(y_true, preds, labels=[0, 1]).ravel()
-                sweep.append(
-                    {
-                        "threshold": thr,
-                        "precision": precision_score(y_true, preds, zero_division=0),
-                        "recall": recall_score(y_true, preds, zero_division=0),
-                        "f1": f1_score(y_true, preds, zero_division=0),
-                        "balanced_accuracy": balanced_accuracy_score(y_true, preds)
-                        if len(set(y_true)) > 1
-                        else None,
-                        "confusion": {
-                            "tn": int(tn_s),
-                            "fp": int(fp_s),
-                            "fn": int(fn_s),
-                            "tp": int(tp_s),
-                        },
-                    }
-                )
+        if include_sweep and two_classes and args.curve_points > 0:
+            # thresholds/tp/fp/precision/recall/tpr/fpr, highest threshold first.
+            report["curves"] = downsample_curves(binary_curves(y_true, y_scores), args.curve_points)
+        if include_sweep and args.threshold_sweep:
+            thresholds = sweep_thresholds(args)
+            counts = confusion_at_thresholds(y_true, y_scores, thresholds)
+            sweep_rates = rates(counts)
+            sweep = [
+                {
+                    "threshold": thr,
+                    "precision": float(sweep_rates["precision"][i]),
+                    "recall": float(sweep_rates["recall"][i]),
+                    "f1": float(sweep_rates["f1"][i]),
+                    "balanced_accuracy": float(sweep_rates["balanced_accuracy"][i]) if two_classes else None,
+                    "confusion": {k: int(counts[k][i]) for k in ("tn", "fp", "fn", "tp")},
+                }
+                for i, thr in enumerate(thresholds)
+            ]
             report["threshold_sweep"] = sweep
             if sweep:
                 report["best_threshold_by_f1"] = max(sweep, key=lambda x: x["f1"])
     else:
-        report["mae"] = mean_absolute_error(y_true, y_pred)
-        report["rmse"] = float(np.sqrt(mean_squared_error(y_true, y_pred)))
-
-        if len(y_true) >= 3:
-            r_pearson, p_pearson = pearsonr(y_true, y_pred)
-            r_spearman, p_spearman = spearmanr(y_true, y_pred)
-            ss_res = sum((t - p) ** 2 for t, p in zip(y_true, y_pred))
-            ss_tot = sum((t - float(np.mean(y_true))) ** 2 for t in y_true)
-            r_squared = 1.0 - ss_res / ss_tot if ss_tot > 0 else 0.0
-            report["pearson_r"] = float(r_pearson)
-            report["pearson_p"] = float(p_pearson)
-            report["spearman_r"] = float(r_spearman)
-            report["spearman_p"] = float(p_spearman)
-            report["r_squared"] = float(r_squared)
+        regression = regression_metrics(y_true, y_pred)
+        report["mae"] = regression["mae"]
+        report["rmse"] = regression["rmse"]
+        for key in ("pearson_r", "pearson_p", "spearman_r", "spearman_p", "r_squared"):
+            if key in regression:
+                report[key] = regression[key]
 
         # Derived binary metrics: evaluate how well regression output
         # separates "great sunsets" at various thresholds.
-        if args.threshold_sweep and len(y_true) >= 2:
-            thresholds: list[float] = []
-            current = args.threshold_sweep_start
-            while current <= args.threshold_sweep_end + 1e-12:
-                thresholds.append(round(current, 6))
-                current += args.threshold_sweep_step
-
-            y_true_arr = np.array(y_true)
-            y_pred_arr = np.array(y_pred)
-            sweep = []
-            for thr in thresholds:
-                true_bin = (y_true_arr >= thr).astype(int)
-                pred_bin = (y_pred_arr >= thr).astype(int)
-                if len(set(true_bin)) < 2:
-                    continue
-                sweep.append({
+        if include_sweep and args.threshold_sweep and len(y_true) >= 2:
+            thresholds = sweep_thresholds(args)
+            counts = derived_binary_counts(y_true, y_pred, thresholds)
+            sweep_rates = rates(counts)
+            true_pos = counts["tp"] + counts["fn"]
+            sweep = [
+                {
                     "threshold": thr,
-                    "precision": precision_score(true_bin, pred_bin, zero_division=0),
-                    "recall": recall_score(true_bin, pred_bin, zero_division=0),
-                    "f1": f1_score(true_bin, pred_bin, zero_division=0),
-                })
+                    "precision": float(sweep_rates["precision"][i]),
+                    "recall": float(sweep_rates["recall"][i]),
+                    "f1": float(sweep_rates["f1"][i]),
+                }
+                for i, thr in enumerate(thresholds)
+                if 0 < true_pos[i] < len(y_true)
+            ]
             report["derived_binary_sweep"] = sweep
             if sweep:
                 report["best_derived_threshold_by_f1"] = max(sweep, key=lambda x: x["f1"])
 
+    return report
+
+
+def manifest_groups(csv_path: str) -> tuple[np.ndarray, str]:
+    """Bootstrap resampling units: webcam_id when the manifest has it, else one per image.
+
+    External rows carry their source name in webcam_id; each is its own
+    `ext_<id>` group, as in the split assignment (common/splits.py).
+    """
+    df = read_manifest(csv_path, columns=["snapshot_id", "webcam_id", "source", "image_path_or_url"])
+    if "webcam_id" not in df.columns:
+        return np.arange(len(df)), "image"
+    groups = df["webcam_id"].fillna("-1").astype(str).to_numpy(dtype=object)
+    if "source" in df.columns:
+        external = (df["source"].fillna("webcam") != "webcam").to_numpy(dtype=bool)
+        if external.any():
+            groups[external] = external_group_keys(df.loc[external, "snapshot_id"])
+    return groups, "webcam_id"
+
+
+def bootstrap_block(args: argparse.Namespace, y_true: list, y_pred: list, y_scores: list) -> dict:
+    groups, unit = manifest_groups(args.test_manifest)
+    result = cluster_bootstrap(
+        args.target_type,
+        y_true,
+        y_pred,
+        groups,
+        y_scores=y_scores if args.target_type == "binary" else None,
+        n_boot=args.bootstrap_replicates,
+        confidence=args.bootstrap_confidence,
+        seed=args.bootstrap_seed,
+    )
+    return {"unit": unit, **result}
+
+
+SLICE_DIMENSIONS = ("phase", "source", "webcam_id", "label_bucket")
+
+
+def label_buckets(values: np.ndarray) -> np.ndarray:
+    """Normalized [0, 1] labels -> "1".."5" star buckets (publish_run._bucket_label edges)."""
+    edges = np.array([0.125, 0.375, 0.625, 0.875])
+    buckets = (np.searchsorted(edges, values, side="right") + 1).astype(str).astype(object)
+    buckets[(values < 0) | (values > 1) | np.isnan(values)] = "unnormalized"
+    return buckets
+
+
+def slice_columns(csv_path: str) -> pd.DataFrame:
+    """Slice keys per manifest row, in manifest (= prediction) order."""
+    df = read_manifest(csv_path, columns=["phase", "source", "webcam_id", "label_value", "target_label"])
+    out = pd.DataFrame(index=df.index)
+    for column in ("phase", "source", "webcam_id"):
+        if column in df.columns:
+            out[column] = df[column].astype("string").fillna("unknown").to_numpy()
+    label_col = "label_value" if "label_value" in df.columns else "target_label"
+    out["label_bucket"] = label_buckets(pd.to_numeric(df[label_col], errors="coerce").to_numpy(np.float64))
+    return out
+
+
+def slice_report(
+    target_type: str,
+    slices: pd.DataFrame,
+    y_true: list,
+    y_pred: list,
+    y_scores: list,
+    min_support: int,
+    overall: dict,
+) -> list[dict]:
+    """One row per (dimension, value) with every metric; slices below min_support are dropped.
+
+    `delta_vs_overall` is the slice's primary metric (F1 / MAE) minus the
+    global one, so bad cameras or Flickr-only regressions sort to the top.
+    """
+    primary = "f1" if target_type == "binary" else "mae"
+    rows: list[dict] = []
+    for dimension in SLICE_DIMENSIONS:
+        if dimension not in slices.columns:
+            continue
+        table = grouped_metrics(target_type, slices[dimension].to_numpy(), y_true, y_pred, y_scores or None)
+        table = table[table["n"] >= min_support]
+        for value, metrics in table.iterrows():
+            row = {"dimension": dimension, "value": str(value)}
+            row.update({k: (None if pd.isna(v) else (int(v) if k in ("n", "positives") else float(v)))
+                        for k, v in metrics.items()})
+            row["primary_metric"] = primary
+            both = row.get(primary) is not None and overall.get(primary) is not None
+            row["delta_vs_overall"] = row[primary] - overall[primary] if both else None
+            rows.append(row)
+    return rows
+
+
+def metric_deltas(base: dict, other: dict) -> dict:
+    """other - base for every float metric both reports share (p-values skipped)."""
+    return {
+        key: value - base[key]
+        for key, value in other.items()
+        if isinstance(value, float)
+        and isinstance(base.get(key), float)
+        and not key.endswith("_p")
+        and key != "decision_threshold"
+    }
+
+
+def int8_comparison(
+    args: argparse.Namespace,
+    float_report: dict,
+    int8_report: dict,
+    y_pred: list,
+    y_scores: list,
+    int8_pred: list,
+    int8_scores: list,
+) -> dict:
+    """Float vs int8 deltas, plus how many decisions flip at the threshold.
+
+    The decision threshold is applied to probabilities (binary) or raw
+    scores (regression); flips there are what users would actually see.
+    """
+    if args.target_type == "binary":
+        float_s, int8_s = np.asarray(y_scores), np.asarray(int8_scores)
+    else:
+        float_s, int8_s = np.asarray(y_pred), np.asarray(int8_pred)
+    abs_diff = np.abs(float_s - int8_s)
+    flips = (float_s >= args.decision_threshold) != (int8_s >= args.decision_threshold)
+    return {
+        "onnx_path": args.int8_onnx,
+        "metrics": int8_report,
+        "deltas": metric_deltas(float_report, int8_report),
+        "score_abs_diff_max": float(abs_diff.max()) if abs_diff.size else None,
+        "score_abs_diff_mean": float(abs_diff.mean()) if abs_diff.size else None,
+        "decision_threshold": args.decision_threshold,
+        "decision_flips": int(flips.sum()),
+        "decision_flip_rate": float(flips.mean()) if flips.size else None,
+    }
+
+
+def torch_runner(model: torch.nn.Module, device: torch.device) -> Callable[[torch.Tensor], np.ndarray]:
+    def run(x: torch.Tensor) -> np.ndarray:
+        with torch.no_grad():
+            return model(x.to(device)).float().cpu().numpy()
+
+    return run
+
+
+def onnx_runner(sess) -> Callable[[torch.Tensor], np.ndarray]:
+    input_name = sess.get_inputs()[0].name
+
+    def run(x: torch.Tensor) -> np.ndarray:
+        return sess.run(None, {input_name: x.numpy()})[0]
+
+    return run
+
+
+def predictions_from_outputs(outputs: np.ndarray, target_type: str, threshold: float) -> tuple[list, list]:
+    """Raw model outputs -> (predictions, positive-class probabilities; empty for regression)."""
+    if target_type == "regression":
+        return outputs[:, 0].astype(float).tolist(), []
+    logits = outputs - outputs.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    probs = exp[:, 1] / exp.sum(axis=1)
+    return (probs >= threshold).astype(int).tolist(), probs.astype(float).tolist()
+
+
+def parity_check(args: argparse.Namespace, torch_report: dict, onnx_report: dict, outputs: dict, timings: dict) -> dict:
+    """Torch vs ONNX on identical inputs: output diffs, metric deltas, per-image latency."""
+    diff = np.abs(outputs["torch"] - outputs["onnx"])
+    max_diff = float(diff.max()) if diff.size else 0.0
+    return {
+        "onnx_path": args.onnx_model,
+        "onnx_threads": args.onnx_threads,
+        "tolerance": args.parity_tolerance,
+        "output_abs_diff_max": max_diff,
+        "output_abs_diff_mean": float(diff.mean()) if diff.size else 0.0,
+        "passed": max_diff <= args.parity_tolerance,
+        "onnx_metrics": onnx_report,
+        "deltas": metric_deltas(torch_report, onnx_report),
+        "latency_ms_per_image": {name: timings[name] for name in ("torch", "onnx")},
+    }
+
+
+def snapshot_id_column(snapshot_ids: np.ndarray) -> pd.arrays.IntegerArray:
+    """Manifest ids are int64 already (-1 = no id); missing ones are written blank, never as 1694.0."""
+    ids = np.asarray(snapshot_ids, dtype=np.int64)
+    return pd.arrays.IntegerArray(ids, mask=ids < 0)
+
+
+def prediction_frame(
+    snapshot_ids: np.ndarray, y_true: list, y_pred: list, y_scores: list, target_type: str
+) -> pd.DataFrame:
+    pred_df = pd.DataFrame({"snapshot_id": snapshot_id_column(snapshot_ids)})
+    pred_df["y_true"] = y_true
+    pred_df["y_pred"] = y_pred
+    if target_type == "binary":
+        pred_df["y_pred_proba"] = y_scores
+    return pred_df
+
+
+def select_device() -> torch.device:
+    if torch.cuda.is_available():
+        return torch.device("cuda")
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    return torch.device("cpu")
+
+
+def build_eval_loader(ds: EvalDataset, args: argparse.Namespace) -> DataLoader:
+    """Manifest-order loader; with a cache dir the prefetcher downloads ahead of the workers."""
+    sampler = SequentialSampler(ds)
+    if ds.cache_root is not None and args.prefetch_lookahead > 0:
+        sampler = PrefetchingSampler(
+            sampler,
+            ds.records.image_refs.tolist(),
+            ds.cache_path_for_url,
+            lookahead=args.prefetch_lookahead,
+            threads=args.prefetch_threads,
+            # Evaluation retries every image itself; its failures must not
+            # make training skip images (train.py honours the markers).
+            failure_markers=False,
+        )
+    kwargs: dict = {"batch_size": args.batch_size, "sampler": sampler, "num_workers": args.num_workers,
+                    "pin_memory": args.pin_memory}
+    if args.num_workers > 0:
+        kwargs["prefetch_factor"] = args.prefetch_factor
+    return DataLoader(ds, **kwargs)
+
+
+def image_cache_report(ds: EvalDataset, loader: DataLoader, before: dict) -> dict:
+    """URL cache hits for this run: URLs already on disk before the first batch count as hits."""
+    after = url_cache_state(ds.records.image_refs.tolist(), ds.cache_root)
+    unique = before["unique_url_count"]
+    report = {
+        **before,
+        "hits": before["cached_count"],
+        "misses": before["missing_count"],
+        "hit_rate": before["cached_count"] / unique if unique and before["enabled"] else None,
+        "cached_count_after": after["cached_count"],
+        "num_workers": loader.num_workers,
+    }
+    if isinstance(loader.sampler, PrefetchingSampler):
+        report["prefetch"] = {"enabled": True, "lookahead": loader.sampler.lookahead, **loader.sampler.stats()}
+    else:
+        report["prefetch"] = {"enabled": False}
+    return report
+
+
+def evaluate_many(args: argparse.Namespace) -> None:
+    """Run every --model on the same decoded batches; one report per model + a wide CSV."""
+    device = select_device()
+    specs: list[ModelSpec] = args.model_specs
+    sizes = sorted({spec.image_size for spec in specs})
+    ds = MultiSizeEvalDataset(args.test_manifest, sizes, cache_dir=args.cache_dir)
+    loader = build_eval_loader(ds, args)
+    cache_before = url_cache_state(ds.records.image_refs.tolist(), ds.cache_root)
+
+    runners = {}
+    for spec in specs:
+        state = torch.load(spec.checkpoint, map_location=device)
+        model = build_model(spec.model_name, spec.target_type, state_dict=state).to(device)
+        model.load_state_dict(state)
+        model.eval()
+        runners[spec.name] = torch_runner(model, device)
+
+    raw_targets: list[float] = []
+    batches: dict[str, list[np.ndarray]] = {spec.name: [] for spec in specs}
+    seconds = dict.fromkeys(runners, 0.0)
+    for xs, y in tqdm(iter(loader), total=len(loader), desc="Evaluating", unit="batch", disable=args.no_progress):
+        for spec in specs:
+            start = time.perf_counter()
+            batches[spec.name].append(runners[spec.name](xs[sizes.index(spec.image_size)]))
+            seconds[spec.name] += time.perf_counter() - start
+        raw_targets.extend(y.tolist())
+    targets = np.asarray(raw_targets, dtype=np.float64)
+    image_cache = image_cache_report(ds, loader, cache_before)
+
+    out_root = Path(args.output).parent
+    slices = slice_columns(args.test_manifest)
+    wide = pd.DataFrame({"snapshot_id": snapshot_id_column(ds.records.snapshot_ids)})
+    wide["target"] = targets
+    reports = {}
+    for spec in specs:
+        model_args = argparse.Namespace(**{**vars(args), "target_type": spec.target_type})
+        y_true = targets_for(targets, spec.target_type, args.binary_label_threshold)
+        outputs = np.concatenate(batches[spec.name])
+        y_pred, y_scores = predictions_from_outputs(outputs, spec.target_type, args.decision_threshold)
+        report = compute_metrics(model_args, y_true, y_pred, y_scores)
+        if args.bootstrap_replicates > 0:
+            report["bootstrap"] = bootstrap_block(model_args, y_true, y_pred, y_scores)
+        report["slice_min_support"] = args.slice_min_support
+        report["slices"] = slice_report(
+            spec.target_type, slices, y_true, y_pred, y_scores, args.slice_min_support, report
+        )
+        report.update(
+            {
+                "checkpoint": spec.checkpoint,
+                "model_name": spec.model_name,
+                "image_size": spec.image_size,
+                "latency_ms_per_image": 1000.0 * seconds[spec.name] / max(1, len(y_true)),
+                "image_cache": image_cache,
+            }
+        )
+        model_dir = out_root / spec.name
+        model_dir.mkdir(parents=True, exist_ok=True)
+        (model_dir / "eval_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+        prediction_frame(ds.records.snapshot_ids, y_true, y_pred, y_scores, spec.target_type).to_csv(
+            model_dir / "predictions.csv", index=False
+        )
+        wide[f"{spec.name}_y_pred"] = y_pred
+        if spec.target_type == "binary":
+            wide[f"{spec.name}_y_true"] = y_true
+            wide[f"{spec.name}_y_pred_proba"] = y_scores
+        reports[spec.name] = report
+
+    wide_path = out_root / "predictions_wide.csv"
+    wide.to_csv(wide_path, index=False)
+    combined = {
+        "test_manifest": args.test_manifest,
+        "num_samples": len(targets),
+        "binary_label_threshold": args.binary_label_threshold,
+        "image_cache": image_cache,
+        "models": reports,
+    }
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(combined, indent=2), encoding="utf-8")
+    print(json.dumps({"ok": True, "output": str(out), "predictions_wide_csv": str(wide_path),
+                      "models": sorted(reports)}, indent=2))
+
+
+def main(args: argparse.Namespace | None = None) -> None:
+    args = args if args is not None else parse_args()
+    if args.model_specs:
+        evaluate_many(args)
+        return
+    device = select_device()
+    ds = EvalDataset(args.test_manifest, args.target_type, args.image_size, cache_dir=args.cache_dir)
+    loader = build_eval_loader(ds, args)
+    cache_before = url_cache_state(ds.records.image_refs.tolist(), ds.cache_root)
+
+    # Every backend sees the same decoded batches; only the forward pass is timed.
+    runners: dict[str, Callable[[torch.Tensor], np.ndarray]] = {}
+    if args.backend in ("torch", "parity"):
+        state = torch.load(args.checkpoint, map_location=device)
+        model = build_model(args.model_name, args.target_type, state_dict=state)
+        if args.prune_spec:
+            apply_prune_spec(model, read_prune_spec(args.prune_spec))
+        model = model.to(device)
+        model.load_state_dict(state)
+        model.eval()
+        runners["torch"] = torch_runner(model, device)
+    if args.backend in ("onnx", "parity"):
+        runners["onnx"] = onnx_runner(make_session(args.onnx_model, threads=args.onnx_threads))
+    if args.int8_onnx:
+        runners["int8"] = onnx_runner(make_session(args.int8_onnx, threads=args.onnx_threads))
+
+    y_true: list = []
+    batches: dict[str, list[np.ndarray]] = {name: [] for name in runners}
+    seconds = dict.fromkeys(runners, 0.0)
+    # iter() first: tqdm.auto would otherwise start a throwaway DataLoader iterator (and its workers).
+    for x, y in tqdm(
+        iter(loader),
+        total=len(loader),
+        desc="Evaluating",
+        unit="batch",
+        disable=args.no_progress,
+    ):
+        for name, run in runners.items():
+            start = time.perf_counter()
+            batches[name].append(run(x))
+            seconds[name] += time.perf_counter() - start
+        y_true.extend(y.cpu().tolist())
+    outputs = {name: np.concatenate(chunks) for name, chunks in batches.items()}
+    timings = {name: 1000.0 * sec / max(1, len(y_true)) for name, sec in seconds.items()}
+
+    primary = "onnx" if args.backend == "onnx" else "torch"
+    y_pred, y_scores = predictions_from_outputs(outputs[primary], args.target_type, args.decision_threshold)
+    report = compute_metrics(args, y_true, y_pred, y_scores)
+    report["backend"] = args.backend
+    if args.bootstrap_replicates > 0:
+        report["bootstrap"] = bootstrap_block(args, y_true, y_pred, y_scores)
+    report["slice_min_support"] = args.slice_min_support
+    slices = slice_columns(args.test_manifest)
+    report["slices"] = slice_report(
+        args.target_type, slices, y_true, y_pred, y_scores, args.slice_min_support, report
+    )
+    report["latency_ms_per_image"] = timings[primary]
+    report["batch_size"] = args.batch_size
+    report["image_cache"] = image_cache_report(ds, loader, cache_before)
+    if args.int8_onnx:
+        int8_pred, int8_scores = predictions_from_outputs(outputs["int8"], args.target_type, args.decision_threshold)
+        int8_report = compute_metrics(args, y_true, int8_pred, int8_scores, include_sweep=False)
+        report["int8"] = int8_comparison(args, report, int8_report, y_pred, y_scores, int8_pred, int8_scores)
+    if args.backend == "parity":
+        onnx_pred, onnx_scores = predictions_from_outputs(outputs["onnx"], args.target_type, args.decision_threshold)
+        onnx_report = compute_metrics(args, y_true, onnx_pred, onnx_scores, include_sweep=False)
+        report["parity"] = parity_check(args, report, onnx_report, outputs, timings)
+
     out = Path(args.output)
     out.parent.mkdir(parents=True, exist_ok=True)
     out.write_text(json.dumps(report, indent=2), encoding="utf-8")
@@ -245,27 +757,22 @@ def main() -> None:
     # Also write per-row predictions next to the report so downstream tools
     # (e.g. generate_failure_gallery.py) don't have to re-run inference.
     predictions_path = out.parent / "predictions.csv"
-    pred_df = ds.df.loc[:, ["snapshot_id"]].copy()
-    # Keep snapshot_id as a string of the integer form so downstream tools
-    # (generate_failure_gallery.py) can match against webcam_snapshots.id
-    # without worrying about pandas float-coercion (1694 -> 1694.0).
-    pred_df["snapshot_id"] = (
-        pred_df["snapshot_id"].astype("Int64").astype("string")
+    prediction_frame(ds.records.snapshot_ids, y_true, y_pred, y_scores, args.target_type).to_csv(
+        predictions_path, index=False
     )
-    pred_df["y_true"] = y_true
-    if args.target_type == "regression":
-        pred_df["y_pred"] = y_pred
-    else:
-        pred_df["y_pred"] = y_pred
-        pred_df["y_pred_proba"] = y_scores
-    pred_df.to_csv(predictions_path, index=False)
 
+    parity_ok = args.backend != "parity" or report["parity"]["passed"]
     print(json.dumps({
-        "ok": True,
+        "ok": parity_ok,
         "report": report,
         "output": str(out),
         "predictions_csv": str(predictions_path),
     }, indent=2))
+    if not parity_ok:
+        raise SystemExit(
+            f"ONNX/torch parity failed: max |diff| {report['parity']['output_abs_diff_max']:.3g} "
+            f"> tolerance {args.parity_tolerance:g}"
+        )
 
 
 if __name__ == "__main__":
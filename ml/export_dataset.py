@@ -7,36 +7,88 @@ Manual-first default:
 
 Public-ready later:
   --label-source public_aggregate
+
+Rows are streamed from named (server-side) cursors `--itersize` rows at a
+time and routed straight into the per-split CSV writers, with target
+statistics kept as running totals. Peak memory does not grow with the
+size of `webcam_snapshots`.
+
+Incremental mode (--incremental-from):
+  Every export records a watermark (max snapshot captured_at / llm_rated_at,
+  max rating created_at, and the external_images equivalents) in
+  export_meta.json. Given a previous export with the same label/split
+  parameters, only snapshots changed since its watermark are queried. The
+  new version is the base manifest minus those keys plus the re-queried rows
+  (also written to manifest_delta.csv), with a sha256 content hash per
+  version. Rating deletions leave no timestamp, so run a full export
+  periodically if ratings are ever removed.
+
+Labelling:
+  Each cursor batch becomes a DataFrame. The label merge, normalization,
+  thresholding and split assignment run as column operations
+  (`webcam_manifest_frame` / `external_manifest_frame`).
+  `--llm-labels-from-db` takes LLM labels from `webcam_snapshots.llm_quality`
+  (written by `llm_rater.py --write-to-db`), which the row query already
+  selects, instead of a ratings CSV. `--label-pipeline rows` runs the
+  original row-at-a-time code (`webcam_manifest_row`), which is kept as the
+  reference the vectorized path is tested against.
+
+Splits:
+  Webcam rows are split by webcam id, and each external image is its own
+  `ext_<id>` group, both through the sha256 bucket in common/splits.py.
+  `--split-table` keeps the assignments on disk, so a repeat export looks
+  groups up instead of hashing them again.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
+import io
 import json
 import os
-from dataclasses import asdict
+import time
+from dataclasses import asdict, dataclass
+from datetime import timedelta
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
 
 import psycopg2
 import psycopg2.extras
 from tqdm.auto import tqdm
 
+import numpy as np
 import pandas as pd
 
-from common.io import ensure_dir, env_required, utc_timestamp, write_csv, write_json
-from common.labels import LabelPolicy, map_label
-from common.splits import SplitConfig, assign_split
+from common.io import ensure_dir, env_required, utc_timestamp, write_json
+from common.manifest import (
+    MANIFEST_COLUMNS,
+    MANIFEST_FORMATS,
+    SUFFIXES,
+    ManifestWriter,
+    iter_manifest_rows,
+    manifest_file,
+)
+from common.labels import LabelPolicy, map_label, map_labels
+from common.rating_stats import LOOKBACK_MINUTES, refresh_rating_stats
+from common.solar import SOLAR_COLUMNS, solar_position, solar_window_mask
+from common.splits import (
+    SplitConfig,
+    SplitTable,
+    assign_split,
+    assign_splits,
+    external_group_key,
+    external_group_keys,
+)
 
 
 def load_llm_overrides(csv_path: str) -> dict[int, float]:
     """Load LLM ratings CSV and return {record_id: llm_quality} mapping."""
     df = pd.read_csv(csv_path)
-    overrides: dict[int, float] = {}
-    for _, row in df.iterrows():
-        if row.get("source_table") == "webcam" and pd.notna(row.get("llm_quality")):
-            overrides[int(row["record_id"])] = float(row["llm_quality"])
-    return overrides
+    if "source_table" not in df.columns or "llm_quality" not in df.columns:
+        return {}
+    rated = df[(df["source_table"] == "webcam") & df["llm_quality"].notna()]
+    return dict(zip(rated["record_id"].astype(int).tolist(), rated["llm_quality"].astype(float).tolist()))
 
 
 def merge_label(
@@ -78,30 +130,410 @@ def merge_label(
     return _norm_human(human_value)
 
 
-def summarize_targets(rows: list[dict[str, Any]], target_type: str) -> dict[str, Any]:
-    if not rows:
-        return {"count": 0}
-    values = [r["target_label"] for r in rows]
-    if target_type == "binary":
-        negatives = sum(1 for v in values if int(v) == 0)
-        positives = sum(1 for v in values if int(v) == 1)
-        total = negatives + positives
-        return {
-            "count": total,
-            "negative": negatives,
-            "positive": positives,
-            "positive_rate": (positives / total) if total else None,
-        }
-    numeric = [float(v) for v in values]
+def merge_labels(human_values, llm_values, strategy: str, llm_weight: float) -> np.ndarray:
+    """Column version of `merge_label`; NaN means "no label" on input and output."""
+    human = np.asarray(human_values, dtype=np.float64)
+    llm = np.asarray(llm_values, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        norm = np.clip(np.where(human > 1.0, (human - 1.0) / 4.0, human), 0.0, 1.0)
+    if strategy == "llm_only":
+        return llm
+    if strategy == "human_override":
+        return np.where(np.isnan(human), llm, norm)
+    if strategy == "weighted_average":
+        blended = llm_weight * llm + (1 - llm_weight) * norm
+        return np.where(np.isnan(llm), norm, np.where(np.isnan(norm), llm, blended))
+    return norm
+
+
+@dataclass(frozen=True)
+class ExportLabeling:
+    """Everything that turns a queried row into a manifest row."""
+
+    label_source: str
+    merge_strategy: str
+    llm_weight: float
+    use_llm_labels: bool
+    split: SplitConfig
+    policy: LabelPolicy
+    split_table: SplitTable | None = None
+    max_minutes_from_sunset: float | None = None
+    max_minutes_from_sunrise: float | None = None
+
+    def assign_splits(self, group_keys: Iterable) -> np.ndarray:
+        """Split per row, through the persisted split table when there is one."""
+        if self.split_table is not None:
+            return self.split_table.assign(group_keys)
+        return assign_splits(group_keys, self.split)
+
+    def in_solar_window(self, minutes_from_sunset: Iterable, minutes_from_sunrise: Iterable) -> np.ndarray:
+        """--max-minutes-from-sunset/sunrise mask; rows without a known event time are kept."""
+        return solar_window_mask(
+            minutes_from_sunset, minutes_from_sunrise, self.max_minutes_from_sunset, self.max_minutes_from_sunrise
+        )
+
+
+def _row_solar(row: dict[str, Any]) -> dict[str, float | None]:
+    """Sun-position columns for one row; None (written as an empty field) where unknown."""
+    try:
+        captured = pd.Timestamp(row["captured_at"])
+    except ValueError:
+        captured = pd.NaT
+    if captured is pd.NaT:
+        captured = np.datetime64("NaT")
+    elif captured.tzinfo is not None:
+        captured = captured.tz_convert(None).to_datetime64()
+    # Arrays rather than lists: solar_position then skips the pandas parsing.
+    solar = solar_position(
+        np.array([np.nan if row.get("latitude") is None else float(row["latitude"])]),
+        np.array([np.nan if row.get("longitude") is None else float(row["longitude"])]),
+        np.array([captured], dtype="datetime64[ns]"),
+    )
+    return {column: None if np.isnan(values[0]) else float(values[0]) for column, values in solar.items()}
+
+
+def webcam_manifest_row(
+    row: dict[str, Any],
+    labeling: ExportLabeling,
+    llm_overrides: dict[int, float] | None,
+) -> dict[str, Any] | None:
+    """Row-at-a-time labelling; the reference for `webcam_manifest_frame`.
+
+    `llm_overrides` is the ratings CSV mapping. None means the LLM label is
+    the row's own `llm_quality` column (--llm-labels-from-db).
+    """
+    human_value = float(row["label_value"]) if row["label_value"] is not None else None
+
+    if labeling.use_llm_labels:
+        if llm_overrides is None:
+            llm_quality = row.get("llm_quality")
+            llm_overrides = {row["snapshot_id"]: float(llm_quality)} if llm_quality is not None else {}
+        final_value = merge_label(
+            row["snapshot_id"], human_value, llm_overrides,
+            labeling.merge_strategy, labeling.llm_weight,
+        )
+        if final_value is None:
+            return None
+        effective_label_source = labeling.merge_strategy
+    else:
+        final_value = human_value
+        if final_value is None:
+            return None
+        effective_label_source = labeling.label_source
+
     return {
-        "count": len(numeric),
-        "min": min(numeric),
-        "max": max(numeric),
-        "mean": sum(numeric) / len(numeric),
+        "snapshot_id": row["snapshot_id"],
+        "webcam_id": row["webcam_id"],
+        "label_source": effective_label_source,
+        "label_value": final_value,
+        "target_label": map_label(float(final_value), labeling.policy),
+        "split": assign_split(int(row["webcam_id"]), labeling.split),
+        "image_path_or_url": row["image_path_or_url"],
+        "phase": row["phase"],
+        "captured_at": row["captured_at"],
+        "rating_count": row["rating_count"],
+        "source": "webcam",
+        **_row_solar(row),
     }
 
 
-def parse_args() -> argparse.Namespace:
+def external_manifest_row(row: dict[str, Any], labeling: ExportLabeling) -> dict[str, Any]:
+    return {
+        "snapshot_id": row["snapshot_id"],
+        "webcam_id": row["webcam_id"],
+        "label_source": "llm",
+        "label_value": row["label_value"],
+        "target_label": map_label(float(row["label_value"]), labeling.policy),
+        "split": assign_split(external_group_key(row["snapshot_id"]), labeling.split),
+        "image_path_or_url": row["image_path_or_url"],
+        "phase": row["phase"],
+        "captured_at": row["captured_at"],
+        "rating_count": row["rating_count"],
+        "source": row["data_source"],
+        # External images carry no location.
+        **dict.fromkeys(SOLAR_COLUMNS),
+    }
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype=np.float64)
+    return pd.to_numeric(df[name], errors="coerce").astype(np.float64)
+
+
+def webcam_manifest_frame(
+    df: pd.DataFrame,
+    labeling: ExportLabeling,
+    llm_overrides: pd.Series | None,
+) -> pd.DataFrame:
+    """Label a batch of webcam rows with column operations (same output as `webcam_manifest_row`).
+
+    `llm_overrides` is the ratings CSV as a Series indexed by snapshot id;
+    None reads the LLM label from the batch's `llm_quality` column.
+    """
+    human = _column(df, "label_value")
+    if labeling.use_llm_labels:
+        if llm_overrides is not None:
+            llm = df["snapshot_id"].map(llm_overrides).astype(np.float64)
+        else:
+            llm = _column(df, "llm_quality")
+        final = merge_labels(human, llm, labeling.merge_strategy, labeling.llm_weight)
+        effective_label_source = labeling.merge_strategy
+    else:
+        final = human.to_numpy()
+        effective_label_source = labeling.label_source
+
+    keep = ~np.isnan(final)
+    rows = df[keep]
+    final = final[keep]
+    solar = solar_position(_column(rows, "latitude"), _column(rows, "longitude"), rows["captured_at"])
+    return pd.DataFrame(
+        {
+            "snapshot_id": rows["snapshot_id"].to_numpy(),
+            "webcam_id": rows["webcam_id"].to_numpy(),
+            "label_source": effective_label_source,
+            "label_value": final,
+            "target_label": map_labels(final, labeling.policy),
+            "split": labeling.assign_splits(rows["webcam_id"].to_numpy()),
+            "image_path_or_url": rows["image_path_or_url"].to_numpy(),
+            "phase": rows["phase"].to_numpy(),
+            "captured_at": rows["captured_at"].to_numpy(),
+            "rating_count": rows["rating_count"].to_numpy(),
+            "source": "webcam",
+            **solar,
+        },
+        columns=MANIFEST_COLUMNS,
+    )
+
+
+def external_manifest_frame(df: pd.DataFrame, labeling: ExportLabeling) -> pd.DataFrame:
+    """Column version of `external_manifest_row`."""
+    values = _column(df, "label_value").to_numpy()
+    return pd.DataFrame(
+        {
+            "snapshot_id": df["snapshot_id"].to_numpy(),
+            "webcam_id": df["webcam_id"].to_numpy(),
+            "label_source": "llm",
+            "label_value": df["label_value"].to_numpy(),
+            "target_label": map_labels(values, labeling.policy),
+            "split": labeling.assign_splits(external_group_keys(df["snapshot_id"])),
+            "image_path_or_url": df["image_path_or_url"].to_numpy(),
+            "phase": df["phase"].to_numpy(),
+            "captured_at": df["captured_at"].to_numpy(),
+            "rating_count": df["rating_count"].to_numpy(),
+            "source": df["data_source"].to_numpy(),
+            **dict.fromkeys(SOLAR_COLUMNS, np.nan),
+        },
+        columns=MANIFEST_COLUMNS,
+    )
+
+
+SPLITS = ("train", "val", "test")
+
+
+class TargetSummary:
+    """Running version of the per-split target distribution in export_meta.json."""
+
+    def __init__(self, target_type: str) -> None:
+        self.target_type = target_type
+        self.count = 0
+        self.negative = 0
+        self.positive = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    def add(self, value: float | int) -> None:
+        if self.target_type == "binary":
+            label = int(float(value))
+            if label == 0:
+                self.negative += 1
+            elif label == 1:
+                self.positive += 1
+            else:
+                return
+            self.count += 1
+            return
+        v = float(value)
+        self.count += 1
+        self.total += v
+        self.min = v if self.min is None else min(self.min, v)
+        self.max = v if self.max is None else max(self.max, v)
+
+    def add_many(self, values) -> None:
+        """`add` for a whole column of targets."""
+        v = np.asarray(values, dtype=np.float64)
+        if not len(v):
+            return
+        if self.target_type == "binary":
+            labels = np.trunc(v)
+            self.negative += int((labels == 0).sum())
+            self.positive += int((labels == 1).sum())
+            self.count += int(((labels == 0) | (labels == 1)).sum())
+            return
+        self.count += len(v)
+        self.total += float(v.sum())
+        self.min = float(v.min()) if self.min is None else min(self.min, float(v.min()))
+        self.max = float(v.max()) if self.max is None else max(self.max, float(v.max()))
+
+    def as_dict(self) -> dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        if self.target_type == "binary":
+            return {
+                "count": self.count,
+                "negative": self.negative,
+                "positive": self.positive,
+                "positive_rate": self.positive / self.count,
+            }
+        return {"count": self.count, "min": self.min, "max": self.max, "mean": self.total / self.count}
+
+
+class SplitManifestWriter:
+    """Append manifest rows to manifest_full and the row's split manifest as they arrive.
+
+    `manifest_format` picks the primary format (common/manifest.py); with
+    `csv_copy` a CSV is written next to a columnar manifest. Splits that
+    never receive a row still get a (zero-row) file at close().
+    """
+
+    def __init__(
+        self,
+        out_root: Path,
+        target_type: str,
+        with_delta: bool = False,
+        manifest_format: str = "csv",
+        csv_copy: bool = False,
+    ) -> None:
+        self.out_root = out_root
+        self.names = ("full", *SPLITS, "delta") if with_delta else ("full", *SPLITS)
+        self.formats = [manifest_format] + (["csv"] if csv_copy and manifest_format != "csv" else [])
+        self._writers = {
+            name: [ManifestWriter(self._path(name, fmt)) for fmt in self.formats] for name in self.names
+        }
+        self.summaries = {name: TargetSummary(target_type) for name in ("full", *SPLITS)}
+        self.counts = {"total": 0, **dict.fromkeys(SPLITS, 0), "webcam": 0, "external": 0}
+        self.delta_rows = 0
+        self._closed = False
+
+    def _path(self, name: str, fmt: str) -> Path:
+        return self.out_root / f"manifest_{name}{SUFFIXES[fmt]}"
+
+    def path(self, name: str) -> Path:
+        return self._path(name, self.formats[0])
+
+    def _emit(self, name: str, row: dict[str, Any]) -> None:
+        for writer in self._writers[name]:
+            writer.write(row)
+
+    def write(self, row: dict[str, Any], delta: bool = False) -> None:
+        split = row["split"]
+        self._emit("full", row)
+        self._emit(split, row)
+        if delta:
+            self._emit("delta", row)
+            self.delta_rows += 1
+        self.summaries["full"].add(row["target_label"])
+        self.summaries[split].add(row["target_label"])
+        self.counts["total"] += 1
+        self.counts[split] += 1
+        self.counts["webcam" if row["source"] == "webcam" else "external"] += 1
+
+    def _emit_frame(self, name: str, df: pd.DataFrame) -> None:
+        for writer in self._writers[name]:
+            writer.write_frame(df)
+
+    def write_frame(self, df: pd.DataFrame, delta: bool = False) -> None:
+        """`write` for a labelled batch; rows keep their order within every file."""
+        if df.empty:
+            return
+        self._emit_frame("full", df)
+        self.summaries["full"].add_many(df["target_label"])
+        for split, part in df.groupby("split", sort=False):
+            self._emit_frame(split, part)
+            self.summaries[split].add_many(part["target_label"])
+            self.counts[split] += len(part)
+        if delta:
+            self._emit_frame("delta", df)
+            self.delta_rows += len(df)
+        webcam = int((df["source"] == "webcam").sum())
+        self.counts["total"] += len(df)
+        self.counts["webcam"] += webcam
+        self.counts["external"] += len(df) - webcam
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for writers in self._writers.values():
+            for writer in writers:
+                writer.close()
+
+    def target_distribution(self) -> dict[str, dict[str, Any]]:
+        return {name: summary.as_dict() for name, summary in self.summaries.items()}
+
+    def __enter__(self) -> "SplitManifestWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def row_key(row: dict[str, Any]) -> tuple[str, int]:
+    """Webcam and external ids come from different tables, so the source kind is part of the key."""
+    return ("webcam" if row["source"] == "webcam" else "external", int(row["snapshot_id"]))
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return f"sha256:{digest.hexdigest()}"
+
+
+def params_fingerprint(args: argparse.Namespace) -> str:
+    """Hash of every argument that changes which rows are exported or how they are labelled."""
+    params = {
+        key: getattr(args, key)
+        for key in (
+            "label_source", "target_type", "binary_threshold", "min_rating_count", "seed", "train_pct",
+            "val_pct", "test_pct", "include_external", "external_categories", "label_merge_strategy", "llm_weight",
+        )
+    }
+    params["llm_labels_from_db"] = bool(getattr(args, "llm_labels_from_db", False))
+    for key in ("max_minutes_from_sunset", "max_minutes_from_sunrise"):
+        params[key] = getattr(args, key, None)
+    # Manifests gained sun-position columns; older exports lack them.
+    params["solar_features"] = 1
+    if args.include_external:
+        # External splits used to come from the per-process salted hash(); never reuse those exports.
+        params["external_split_key"] = "sha256"
+    params["llm_ratings_csv"] = file_sha256(Path(args.llm_ratings_csv)) if args.llm_ratings_csv else None
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def find_base_export(path: str, fingerprint: str) -> Path | None:
+    """Newest export with a watermark and matching parameters.
+
+    `path` may be an export dir, an --output-dir, or a run_experiment output root.
+    """
+    root = Path(path)
+    candidates = [root / "export_meta.json", *root.glob("*/export_meta.json"), *root.glob("*/dataset/*/export_meta.json")]
+    best: tuple[str, Path] | None = None
+    for meta_path in candidates:
+        if not meta_path.is_file():
+            continue
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("params_fingerprint") != fingerprint or not meta.get("watermark"):
+            continue
+        exported_at = str(meta.get("exported_at", ""))
+        if best is None or exported_at > best[0]:
+            best = (exported_at, meta_path.parent)
+    return best[1] if best else None
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Export training manifests")
     parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
     parser.add_argument(
@@ -121,6 +553,15 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--test-pct", type=int, default=15)
     parser.add_argument("--output-dir", default="ml/artifacts/datasets")
     parser.add_argument("--training-run-id", type=int)
+    parser.add_argument(
+        "--membership-write", choices=["copy", "executemany"], default="copy",
+        help="How --training-run-id membership is written: COPY into a temp table + one merge, "
+             "or the original per-row upsert",
+    )
+    parser.add_argument(
+        "--membership-chunk-rows", type=int, default=50_000,
+        help="Rows per COPY chunk for --membership-write copy",
+    )
     parser.add_argument("--include-external", action="store_true",
                         help="Include LLM-rated external images (from external_images table)")
     parser.add_argument("--external-categories", nargs="+", default=["sunset", "negative"],
@@ -130,34 +571,138 @@ def parse_args() -> argparse.Namespace:
         help="Path to LLM ratings CSV. When set, overrides label_value with llm_quality "
              "for matching snapshot_ids (webcam source only).",
     )
+    parser.add_argument(
+        "--llm-labels-from-db", action="store_true",
+        help="Take LLM labels from webcam_snapshots.llm_quality (llm_rater.py --write-to-db) "
+             "in the export query instead of --llm-ratings-csv",
+    )
     parser.add_argument(
         "--label-merge-strategy",
         choices=["human_only", "llm_only", "human_override", "weighted_average"],
         default="human_only",
-        help="How to merge human and LLM labels when --llm-ratings-csv is set",
+        help="How to merge human and LLM labels when --llm-ratings-csv or --llm-labels-from-db is set",
     )
     parser.add_argument(
         "--llm-weight", type=float, default=0.7,
         help="LLM weight in weighted_average strategy (human gets 1 - this)",
     )
+    parser.add_argument(
+        "--manifest-format", choices=MANIFEST_FORMATS, default="csv",
+        help="On-disk manifest format (see ml/common/manifest.py). parquet/arrow need pyarrow.",
+    )
+    parser.add_argument(
+        "--csv-copy", action="store_true",
+        help="With --manifest-format parquet/arrow, also write CSV copies for people and spreadsheets",
+    )
+    parser.add_argument(
+        "--incremental-from", default="",
+        help="Previous export dir, --output-dir, or run_experiment output root. The newest export there "
+             "with the same label/split parameters is the base; only rows changed since its watermark "
+             "are queried. Falls back to a full export when none matches.",
+    )
+    parser.add_argument(
+        "--itersize", type=int, default=5000,
+        help="Rows fetched per round-trip from the server-side export cursors",
+    )
+    parser.add_argument(
+        "--label-pipeline", choices=["vectorized", "rows"], default="vectorized",
+        help="vectorized labels each fetched batch with column operations; rows is the original "
+             "row-at-a-time reference path (same output)",
+    )
+    parser.add_argument(
+        "--split-table", default="ml/artifacts/splits/split_table.csv",
+        help="Persisted (group key, seed, percentages) -> split table (common/splits.py). Known groups are "
+             "looked up, new ones hashed and appended. Empty string hashes every group without a table.",
+    )
+    parser.add_argument(
+        "--max-minutes-from-sunset", type=float, default=None,
+        help="Keep only webcam frames within this many minutes of that day's sunset (common/solar.py). "
+             "Combined with --max-minutes-from-sunrise, a frame within either window is kept.",
+    )
+    parser.add_argument(
+        "--max-minutes-from-sunrise", type=float, default=None,
+        help="Keep only webcam frames within this many minutes of that day's sunrise",
+    )
+    parser.add_argument(
+        "--skip-rating-stats-refresh", action="store_true",
+        help="Read webcam_snapshot_rating_stats as-is instead of folding in new ratings first "
+             "(e.g. with a read-only role)",
+    )
     parser.add_argument("--no-progress", action="store_true")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.itersize < 1:
+        parser.error("--itersize must be >= 1")
+    if args.membership_chunk_rows < 1:
+        parser.error("--membership-chunk-rows must be >= 1")
+    for flag in ("max_minutes_from_sunset", "max_minutes_from_sunrise"):
+        if getattr(args, flag) is not None and getattr(args, flag) < 0:
+            parser.error(f"--{flag.replace('_', '-')} must be >= 0")
+    if args.llm_ratings_csv and args.llm_labels_from_db:
+        parser.error("--llm-ratings-csv and --llm-labels-from-db are alternative LLM label sources")
 
-    if args.llm_ratings_csv and args.label_merge_strategy == "human_only":
+    if (args.llm_ratings_csv or args.llm_labels_from_db) and args.label_merge_strategy == "human_only":
         args.label_merge_strategy = "llm_only"
 
-    return parser.parse_args() if False else args
+    return args
 
 
-def fetch_rows(
+def stream_query(
     conn: psycopg2.extensions.connection,
+    cursor_name: str,
+    query: str,
+    params: dict[str, Any],
+    itersize: int,
+) -> Iterator[dict[str, Any]]:
+    """Yield rows from a named server-side cursor, `itersize` rows per round-trip."""
+    with conn.cursor(name=cursor_name, cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.itersize = itersize
+        cur.execute(query, params)
+        for row in cur:
+            yield dict(row)
+
+
+def stream_frames(
+    conn: psycopg2.extensions.connection,
+    cursor_name: str,
+    query: str,
+    params: dict[str, Any],
+    itersize: int,
+) -> Iterator[pd.DataFrame]:
+    """`stream_query` for the vectorized path: one DataFrame per `itersize`-row fetch.
+
+    Batches are built from plain tuples, skipping the per-row dicts.
+    """
+    with conn.cursor(name=cursor_name) as cur:
+        cur.itersize = itersize
+        cur.execute(query, params)
+        while True:
+            batch = cur.fetchmany(itersize)
+            if not batch:
+                break
+            yield pd.DataFrame(batch, columns=[col[0] for col in cur.description])
+
+
+def _stream(as_frames: bool, *args) -> Iterator[dict[str, Any]] | Iterator[pd.DataFrame]:
+    return stream_frames(*args) if as_frames else stream_query(*args)
+
+
+def progress_frames(frames: Iterable[pd.DataFrame], desc: str, disable: bool) -> Iterator[pd.DataFrame]:
+    """Row-count progress bar over a stream of batches."""
+    with tqdm(desc=desc, unit="row", disable=disable) as bar:
+        for frame in frames:
+            bar.update(len(frame))
+            yield frame
+
+
+def build_snapshot_query(
     label_source: str,
-    min_rating_count: int,
     label_merge_strategy: str = "human_only",
-) -> list[dict[str, Any]]:
+    only_ids: bool = False,
+    llm_labels_from_db: bool = False,
+) -> str:
     """
-    Query candidate labeled snapshots for export.
+    SQL for the candidate labeled snapshots (params: min_rating_count, only_ids).
 
     manual_only:
       Uses all snapshots with calculated rating and minimum rating count.
@@ -166,7 +711,14 @@ def fetch_rows(
     llm_only (via --label-merge-strategy):
       Uses *all* snapshots with an image; the LLM override CSV supplies the
       label. Human rating count is not required since the LLM is the label
-      source.
+      source. With `llm_labels_from_db`, unrated snapshots are filtered out
+      in SQL.
+
+    Rating counts come from webcam_snapshot_rating_stats
+    (common/rating_stats.py), one row per rated snapshot, instead of a
+    GROUP BY over every rating. Every variant selects `s.llm_quality` for
+    --llm-labels-from-db, and the webcam's `lat`/`lng` for the sun-position
+    columns.
     """
     if label_merge_strategy == "llm_only":
         query = """
@@ -177,14 +729,16 @@ def fetch_rows(
           s.phase,
           s.captured_at,
           s.calculated_rating AS label_value,
-          COALESCE(c.rating_count, 0)::int AS rating_count
+          s.llm_quality,
+          w.lat AS latitude,
+          w.lng AS longitude,
+          COALESCE(rs.rating_count, 0)::int AS rating_count
         FROM webcam_snapshots s
-        LEFT JOIN (
-          SELECT snapshot_id, COUNT(*) AS rating_count
-          FROM webcam_snapshot_ratings
-          GROUP BY snapshot_id
-        ) c ON c.snapshot_id = s.id
-        WHERE s.firebase_url IS NOT NULL
+        LEFT JOIN webcam_snapshot_rating_stats rs
+          ON rs.snapshot_id = s.id
+        LEFT JOIN webcams w
+          ON w.id = s.webcam_id
+        WHERE s.firebase_url IS NOT NULL{id_filter}{llm_filter}
         """
     elif label_source == "public_aggregate":
         query = """
@@ -195,15 +749,18 @@ def fetch_rows(
           s.phase,
           s.captured_at,
           s.calculated_rating AS label_value,
-          COUNT(r.id)::int AS rating_count
+          s.llm_quality,
+          w.lat AS latitude,
+          w.lng AS longitude,
+          rs.rating_count
         FROM webcam_snapshots s
-        JOIN webcam_snapshot_ratings r
-          ON r.snapshot_id = s.id
-        WHERE s.firebase_url IS NOT NULL
+        JOIN webcam_snapshot_rating_stats rs
+          ON rs.snapshot_id = s.id
+        LEFT JOIN webcams w
+          ON w.id = s.webcam_id
+        WHERE s.firebase_url IS NOT NULL{id_filter}
           AND s.calculated_rating IS NOT NULL
-        GROUP BY
-          s.id, s.webcam_id, s.firebase_url, s.phase, s.captured_at, s.calculated_rating
-        HAVING COUNT(r.id) >= %(min_rating_count)s
+          AND rs.rating_count >= %(min_rating_count)s
         """
     else:
         query = """
@@ -214,28 +771,55 @@ def fetch_rows(
           s.phase,
           s.captured_at,
           s.calculated_rating AS label_value,
-          COUNT(r.id)::int AS rating_count
+          s.llm_quality,
+          w.lat AS latitude,
+          w.lng AS longitude,
+          COALESCE(rs.rating_count, 0)::int AS rating_count
         FROM webcam_snapshots s
-        LEFT JOIN webcam_snapshot_ratings r
-          ON r.snapshot_id = s.id
-        WHERE s.firebase_url IS NOT NULL
+        LEFT JOIN webcam_snapshot_rating_stats rs
+          ON rs.snapshot_id = s.id
+        LEFT JOIN webcams w
+          ON w.id = s.webcam_id
+        WHERE s.firebase_url IS NOT NULL{id_filter}
           AND s.calculated_rating IS NOT NULL
-        GROUP BY
-          s.id, s.webcam_id, s.firebase_url, s.phase, s.captured_at, s.calculated_rating
-        HAVING COUNT(r.id) >= %(min_rating_count)s
+          AND COALESCE(rs.rating_count, 0) >= %(min_rating_count)s
         """
 
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(query, {"min_rating_count": min_rating_count})
-        return [dict(row) for row in cur.fetchall()]
+    id_filter = "\n          AND s.id = ANY(%(only_ids)s)" if only_ids else ""
+    llm_filter = "\n          AND s.llm_quality IS NOT NULL" if llm_labels_from_db else ""
+    return query.replace("{llm_filter}", llm_filter).format(id_filter=id_filter)
+
+
+def fetch_rows(
+    conn: psycopg2.extensions.connection,
+    label_source: str,
+    min_rating_count: int,
+    label_merge_strategy: str = "human_only",
+    itersize: int = 5000,
+    only_ids: list[int] | None = None,
+    llm_labels_from_db: bool = False,
+    as_frames: bool = False,
+) -> Iterator[dict[str, Any]] | Iterator[pd.DataFrame]:
+    """
+    Stream candidate labeled snapshots for export (see `build_snapshot_query`).
+
+    `only_ids` restricts the export to those snapshot ids (incremental mode).
+    `as_frames` yields one DataFrame per fetch instead of row dicts.
+    """
+    query = build_snapshot_query(label_source, label_merge_strategy, only_ids is not None, llm_labels_from_db)
+    params = {"min_rating_count": min_rating_count, "only_ids": only_ids}
+    return _stream(as_frames, conn, "export_snapshots", query, params, itersize)
 
 
 def fetch_external_rows(
     conn: psycopg2.extensions.connection,
     categories: list[str],
-) -> list[dict[str, Any]]:
+    itersize: int = 5000,
+    only_ids: list[int] | None = None,
+    as_frames: bool = False,
+) -> Iterator[dict[str, Any]] | Iterator[pd.DataFrame]:
     """
-    Fetch LLM-rated external images for inclusion in training manifests.
+    Stream LLM-rated external images for inclusion in training manifests.
 
     Only images that have been rated by the LLM (llm_quality IS NOT NULL)
     are included — unrated images are skipped.
@@ -252,24 +836,92 @@ def fetch_external_rows(
       source AS data_source
     FROM external_images
     WHERE llm_quality IS NOT NULL
-      AND category = ANY(%(categories)s)
+      AND category = ANY(%(categories)s){id_filter}
+    """
+    id_filter = "\n      AND id = ANY(%(only_ids)s)" if only_ids is not None else ""
+    params = {"categories": categories, "only_ids": only_ids}
+    return _stream(as_frames, conn, "export_external", query.format(id_filter=id_filter), params, itersize)
+
+
+def fetch_watermark(conn: psycopg2.extensions.connection, include_external: bool) -> dict[str, str | None]:
+    """Latest change timestamps, read in the export's own (repeatable-read) snapshot."""
+    query = """
+    SELECT
+      (SELECT MAX(captured_at) FROM webcam_snapshots) AS snapshot_captured_at,
+      (SELECT MAX(llm_rated_at) FROM webcam_snapshots) AS snapshot_llm_rated_at,
+      (SELECT MAX(created_at) FROM webcam_snapshot_ratings) AS rating_created_at
+    """
+    if include_external:
+        query += """,
+      (SELECT MAX(scraped_at) FROM external_images) AS external_scraped_at,
+      (SELECT MAX(llm_rated_at) FROM external_images) AS external_llm_rated_at
     """
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(query, {"categories": categories})
-        return [dict(row) for row in cur.fetchall()]
+        cur.execute(query)
+        row = cur.fetchone()
+    return {key: value.isoformat() if value is not None else None for key, value in row.items()}
 
 
-def write_training_run_labels(
+def fetch_changed_ids(
     conn: psycopg2.extensions.connection,
-    training_run_id: int,
-    rows: list[dict[str, Any]],
-    label_source: str,
-) -> None:
-    """
-    Persist exact sample membership for auditability/reproducibility.
+    watermark: dict[str, str | None],
+    include_external: bool,
+    lookback_minutes: float = LOOKBACK_MINUTES,
+) -> tuple[list[int], list[int]]:
+    """(webcam snapshot ids, external image ids) touched after `watermark`.
 
-    This enables us to answer: "which snapshots trained model X?"
+    Each comparison reaches `lookback_minutes` behind the stored watermark,
+    the same window as the rating-stats refresh: a rating or LLM score
+    whose NOW() was taken before the base export read its watermark, but
+    committed after it, is still re-queried. Extra ids only cost a re-read.
     """
+    params: dict[str, Any] = {
+        key: watermark.get(key)
+        for key in (
+            "snapshot_captured_at",
+            "snapshot_llm_rated_at",
+            "rating_created_at",
+            "external_scraped_at",
+            "external_llm_rated_at",
+        )
+    }
+    params["lookback"] = timedelta(minutes=lookback_minutes)
+    # A NULL watermark entry means "nothing seen yet", so everything is newer.
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT id FROM webcam_snapshots
+            WHERE captured_at > COALESCE(%(snapshot_captured_at)s::timestamptz - %(lookback)s, '-infinity')
+               OR llm_rated_at > COALESCE(%(snapshot_llm_rated_at)s::timestamptz - %(lookback)s, '-infinity')
+            UNION
+            SELECT snapshot_id FROM webcam_snapshot_ratings
+            WHERE created_at > COALESCE(%(rating_created_at)s::timestamptz - %(lookback)s, '-infinity')
+            """,
+            params,
+        )
+        webcam_ids = [int(r[0]) for r in cur.fetchall()]
+        external_ids: list[int] = []
+        if include_external:
+            cur.execute(
+                """
+                SELECT id FROM external_images
+                WHERE scraped_at > COALESCE(%(external_scraped_at)s::timestamptz - %(lookback)s, '-infinity')
+                   OR llm_rated_at > COALESCE(%(external_llm_rated_at)s::timestamptz - %(lookback)s, '-infinity')
+                """,
+                params,
+            )
+            external_ids = [int(r[0]) for r in cur.fetchall()]
+    return webcam_ids, external_ids
+
+
+def _write_training_run_labels_executemany(
+    conn: psycopg2.extensions.connection,
+    training_run_id: int,
+    rows: Iterable[dict[str, Any]],
+    label_source: str,
+) -> int:
+    """Original per-row upsert (one round-trip per row); kept for --membership-write executemany."""
+    params = [(training_run_id, row["snapshot_id"], label_source, row["label_value"]) for row in rows]
     with conn.cursor() as cur:
         cur.executemany(
             """
@@ -287,21 +939,115 @@ def write_training_run_labels(
               label_value = EXCLUDED.label_value,
               included_at = NOW()
             """,
-            [
-                (
-                    training_run_id,
-                    row["snapshot_id"],
-                    label_source,
-                    row["label_value"],
-                )
-                for row in rows
-            ],
+            params,
+        )
+    return len(params)
+
+
+def _membership_chunks(rows: Iterable[dict[str, Any]], chunk_rows: int) -> Iterator[list[tuple[Any, Any]]]:
+    chunk: list[tuple[Any, Any]] = []
+    for row in rows:
+        chunk.append((row["snapshot_id"], row["label_value"]))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _copy_membership(
+    conn: psycopg2.extensions.connection,
+    training_run_id: int,
+    rows: Iterable[dict[str, Any]],
+    label_source: str,
+    chunk_rows: int,
+    progress: bool,
+) -> tuple[int, int, float]:
+    """COPY (snapshot_id, label_value) into a temp table, then merge it in one statement.
+
+    Returns (rows copied, COPY round-trips, seconds spent copying).
+    """
+    copied = 0
+    chunks = 0
+    copy_sec = 0.0
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TEMP TABLE training_run_labels_stage (
+              snapshot_id INTEGER NOT NULL,
+              label_value DECIMAL(3,2) NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+        with tqdm(desc="Copying sample membership", unit="row", disable=not progress) as bar:
+            for chunk in _membership_chunks(rows, chunk_rows):
+                buf = io.StringIO("".join(f"{int(float(sid))}\t{value}\n" for sid, value in chunk))
+                start = time.perf_counter()
+                cur.copy_expert("COPY training_run_labels_stage (snapshot_id, label_value) FROM STDIN", buf)
+                copy_sec += time.perf_counter() - start
+                copied += len(chunk)
+                chunks += 1
+                bar.update(len(chunk))
+        # DISTINCT ON: ON CONFLICT cannot update the same row twice in one statement.
+        cur.execute(
+            """
+            INSERT INTO model_training_snapshot_labels (
+              training_run_id,
+              snapshot_id,
+              label_source,
+              label_value,
+              included_at
+            )
+            SELECT DISTINCT ON (snapshot_id)
+              %(training_run_id)s, snapshot_id, %(label_source)s, label_value, NOW()
+            FROM training_run_labels_stage
+            ORDER BY snapshot_id
+            ON CONFLICT (training_run_id, snapshot_id)
+            DO UPDATE SET
+              label_source = EXCLUDED.label_source,
+              label_value = EXCLUDED.label_value,
+              included_at = NOW()
+            """,
+            {"training_run_id": training_run_id, "label_source": label_source},
         )
+    return copied, chunks, copy_sec
+
+
+def write_training_run_labels(
+    conn: psycopg2.extensions.connection,
+    training_run_id: int,
+    rows: Iterable[dict[str, Any]],
+    label_source: str,
+    method: str = "copy",
+    chunk_rows: int = 50_000,
+    progress: bool = True,
+) -> dict[str, Any]:
+    """
+    Persist exact sample membership for auditability/reproducibility.
+
+    This enables us to answer: "which snapshots trained model X?"
+
+    `rows` must be webcam rows (snapshot_id references webcam_snapshots).
+    The default `copy` method streams them into a temp table with COPY in
+    `chunk_rows` chunks and upserts everything with one INSERT ... SELECT,
+    so the round-trips no longer grow with the manifest. `executemany` is
+    the original per-row upsert. Returns row counts and timings.
+    """
+    start = time.perf_counter()
+    if method == "executemany":
+        written = _write_training_run_labels_executemany(conn, training_run_id, rows, label_source)
+        stats: dict[str, Any] = {"rows": written, "round_trips": written}
+    else:
+        written, chunks, copy_sec = _copy_membership(conn, training_run_id, rows, label_source, chunk_rows, progress)
+        # CREATE TEMP TABLE + one COPY per chunk + the merge.
+        stats = {"rows": written, "chunks": chunks, "round_trips": chunks + 2, "copy_sec": copy_sec}
     conn.commit()
+    stats.update({"method": method, "total_sec": time.perf_counter() - start})
+    return stats
 
 
-def main() -> None:
-    args = parse_args()
+def main(args: argparse.Namespace | None = None) -> None:
+    args = args if args is not None else parse_args()
     database_url = args.database_url or env_required("DATABASE_URL")
 
     split_cfg = SplitConfig(
@@ -321,145 +1067,166 @@ def main() -> None:
         llm_overrides = load_llm_overrides(args.llm_ratings_csv)
         print(f"  Loaded {len(llm_overrides)} LLM ratings from {args.llm_ratings_csv}")
 
-    use_llm_labels = bool(llm_overrides) and args.label_merge_strategy != "human_only"
+    use_llm_labels = (bool(llm_overrides) or args.llm_labels_from_db) and args.label_merge_strategy != "human_only"
+    labeling = ExportLabeling(
+        label_source=args.label_source,
+        merge_strategy=args.label_merge_strategy,
+        llm_weight=args.llm_weight,
+        use_llm_labels=use_llm_labels,
+        split=split_cfg,
+        policy=label_policy,
+        split_table=SplitTable(args.split_table, split_cfg) if args.split_table else None,
+        max_minutes_from_sunset=args.max_minutes_from_sunset,
+        max_minutes_from_sunrise=args.max_minutes_from_sunrise,
+    )
+    row_overrides = None if args.llm_labels_from_db else llm_overrides
+    frame_overrides = None if args.llm_labels_from_db else pd.Series(llm_overrides, dtype=np.float64)
+
+    fingerprint = params_fingerprint(args)
+    base_dir = find_base_export(args.incremental_from, fingerprint) if args.incremental_from else None
+    base_meta = json.loads((base_dir / "export_meta.json").read_text(encoding="utf-8")) if base_dir else None
+    if args.incremental_from and base_dir is None:
+        print(f"  No export with matching parameters under {args.incremental_from}; running a full export")
 
-    with psycopg2.connect(database_url) as conn:
-        rows = fetch_rows(
+    out_root = ensure_dir(Path(args.output_dir) / utc_timestamp())
+    writer = SplitManifestWriter(
+        out_root,
+        args.target_type,
+        with_delta=base_dir is not None,
+        manifest_format=args.manifest_format,
+        csv_copy=args.csv_copy,
+    )
+    with psycopg2.connect(database_url) as conn, writer:
+        if not args.skip_rating_stats_refresh:
+            stats_refresh = refresh_rating_stats(conn)
+            print(f"  Rating stats: {stats_refresh['snapshots_refreshed']} snapshots refreshed "
+                  f"in {stats_refresh['elapsed_sec']:.2f}s")
+        # One consistent snapshot for the watermark, the changed-id scan and the row queries.
+        conn.set_session(isolation_level=psycopg2.extensions.ISOLATION_LEVEL_REPEATABLE_READ)
+        watermark = fetch_watermark(conn, args.include_external)
+        webcam_ids: list[int] | None = None
+        external_ids: list[int] | None = None
+        delta_info: dict[str, Any] | None = None
+        if base_meta is not None:
+            webcam_ids, external_ids = fetch_changed_ids(conn, base_meta["watermark"], args.include_external)
+            changed = {("webcam", i) for i in webcam_ids} | {("external", i) for i in external_ids}
+            kept = 0
+            for row in iter_manifest_rows(manifest_file(base_dir, "full")):
+                if row_key(row) not in changed:
+                    writer.write(row)
+                    kept += 1
+            delta_info = {"changed_webcam_ids": len(webcam_ids), "changed_external_ids": len(external_ids),
+                          "base_rows_kept": kept}
+            print(f"  Incremental from {base_dir}: {kept} base rows kept, "
+                  f"{len(webcam_ids)} webcam / {len(external_ids)} external ids changed")
+        is_delta = base_meta is not None
+
+        rows_or_frames = fetch_rows(
             conn,
             args.label_source,
             args.min_rating_count,
             label_merge_strategy=args.label_merge_strategy,
+            itersize=args.itersize,
+            only_ids=webcam_ids,
+            llm_labels_from_db=args.llm_labels_from_db,
+            as_frames=args.label_pipeline == "vectorized",
         )
-
-        manifest: list[dict[str, Any]] = []
-        for row in tqdm(
-            rows,
-            desc="Building webcam manifest",
-            unit="row",
-            disable=args.no_progress,
-        ):
-            human_value = float(row["label_value"]) if row["label_value"] is not None else None
-
-            if use_llm_labels:
-                final_value = merge_label(
-                    row["snapshot_id"], human_value, llm_overrides,
-                    args.label_merge_strategy, args.llm_weight,
-                )
-                if final_value is None:
+        llm_db_labels = 0
+        solar_dropped = 0
+        if args.label_pipeline == "rows":
+            for row in tqdm(rows_or_frames, desc="Building webcam manifest", unit="row", disable=args.no_progress):
+                llm_db_labels += row.get("llm_quality") is not None
+                manifest_row = webcam_manifest_row(row, labeling, row_overrides)
+                if manifest_row is None:
                     continue
-                effective_label_source = args.label_merge_strategy
-            else:
-                final_value = human_value
-                if final_value is None:
+                if not labeling.in_solar_window(
+                    [manifest_row["minutes_from_sunset"]], [manifest_row["minutes_from_sunrise"]]
+                )[0]:
+                    solar_dropped += 1
                     continue
-                effective_label_source = args.label_source
-
-            split = assign_split(int(row["webcam_id"]), split_cfg)
-            mapped_label = map_label(float(final_value), label_policy)
-            manifest.append(
-                {
-                    "snapshot_id": row["snapshot_id"],
-                    "webcam_id": row["webcam_id"],
-                    "label_source": effective_label_source,
-                    "label_value": final_value,
-                    "target_label": mapped_label,
-                    "split": split,
-                    "image_path_or_url": row["image_path_or_url"],
-                    "phase": row["phase"],
-                    "captured_at": row["captured_at"],
-                    "rating_count": row["rating_count"],
-                    "source": "webcam",
-                }
-            )
+                writer.write(manifest_row, delta=is_delta)
+        else:
+            for frame in progress_frames(rows_or_frames, "Building webcam manifest", args.no_progress):
+                if "llm_quality" in frame.columns:
+                    llm_db_labels += int(frame["llm_quality"].notna().sum())
+                manifest = webcam_manifest_frame(frame, labeling, frame_overrides)
+                keep = labeling.in_solar_window(manifest["minutes_from_sunset"], manifest["minutes_from_sunrise"])
+                solar_dropped += int((~keep).sum())
+                writer.write_frame(manifest[keep], delta=is_delta)
+        if solar_dropped:
+            print(f"  Solar window: dropped {solar_dropped} webcam frames")
 
         if args.include_external:
-            ext_rows = fetch_external_rows(conn, args.external_categories)
-            print(f"  External images found: {len(ext_rows)}")
-            for row in tqdm(
-                ext_rows,
-                desc="Building external manifest",
-                unit="row",
-                disable=args.no_progress,
-            ):
-                # External images use their source name as the split group key
-                # so they don't leak into webcam-based splits.
-                split = assign_split(
-                    hash(f"ext_{row['snapshot_id']}") % 10_000_000,
-                    split_cfg,
-                )
-                mapped_label = map_label(float(row["label_value"]), label_policy)
-                manifest.append(
-                    {
-                        "snapshot_id": row["snapshot_id"],
-                        "webcam_id": row["webcam_id"],
-                        "label_source": "llm",
-                        "label_value": row["label_value"],
-                        "target_label": mapped_label,
-                        "split": split,
-                        "image_path_or_url": row["image_path_or_url"],
-                        "phase": row["phase"],
-                        "captured_at": row["captured_at"],
-                        "rating_count": row["rating_count"],
-                        "source": row["data_source"],
-                    }
-                )
-
-        out_root = ensure_dir(Path(args.output_dir) / utc_timestamp())
-        write_csv(out_root / "manifest_full.csv", manifest)
-        write_csv(
-            out_root / "manifest_train.csv",
-            [r for r in manifest if r["split"] == "train"],
-        )
-        write_csv(
-            out_root / "manifest_val.csv",
-            [r for r in manifest if r["split"] == "val"],
-        )
-        write_csv(
-            out_root / "manifest_test.csv",
-            [r for r in manifest if r["split"] == "test"],
-        )
-
-        train_rows = [r for r in manifest if r["split"] == "train"]
-        val_rows = [r for r in manifest if r["split"] == "val"]
-        test_rows = [r for r in manifest if r["split"] == "test"]
-
-        webcam_rows = [r for r in manifest if r.get("source") == "webcam"]
-        external_rows = [r for r in manifest if r.get("source") not in ("webcam", None)]
+            external = fetch_external_rows(
+                conn,
+                args.external_categories,
+                itersize=args.itersize,
+                only_ids=external_ids,
+                as_frames=args.label_pipeline == "vectorized",
+            )
+            if args.label_pipeline == "rows":
+                for row in tqdm(external, desc="Building external manifest", unit="row", disable=args.no_progress):
+                    writer.write(external_manifest_row(row, labeling), delta=is_delta)
+            else:
+                for frame in progress_frames(external, "Building external manifest", args.no_progress):
+                    writer.write_frame(external_manifest_frame(frame, labeling), delta=is_delta)
+            print(f"  External rows in manifest: {writer.counts['external']}")
+        writer.close()
+        if labeling.split_table is not None:
+            labeling.split_table.save()
+        if delta_info is not None:
+            delta_info["delta_rows"] = writer.delta_rows
 
         meta = {
+            "exported_at": utc_timestamp(),
+            "export_mode": "incremental" if is_delta else "full",
+            "manifest_format": args.manifest_format,
+            "params_fingerprint": fingerprint,
+            "watermark": watermark,
+            "content_hash": file_sha256(writer.path("full")),
+            "base_export": (
+                {"output_dir": str(base_dir), "content_hash": base_meta.get("content_hash")} if is_delta else None
+            ),
+            "delta": delta_info,
             "label_source": args.label_source,
             "label_merge_strategy": args.label_merge_strategy,
             "llm_ratings_csv": args.llm_ratings_csv or None,
-            "llm_overrides_count": len(llm_overrides),
+            "llm_labels_from_db": args.llm_labels_from_db,
+            "llm_overrides_count": llm_db_labels if args.llm_labels_from_db else len(llm_overrides),
+            "label_pipeline": args.label_pipeline,
             "target_type": args.target_type,
             "binary_threshold": args.binary_threshold,
             "min_rating_count": args.min_rating_count,
             "include_external": args.include_external,
             "split_config": asdict(split_cfg),
-            "counts": {
-                "total": len(manifest),
-                "train": len(train_rows),
-                "val": len(val_rows),
-                "test": len(test_rows),
-                "webcam": len(webcam_rows),
-                "external": len(external_rows),
-            },
-            "target_distribution": {
-                "full": summarize_targets(manifest, args.target_type),
-                "train": summarize_targets(train_rows, args.target_type),
-                "val": summarize_targets(val_rows, args.target_type),
-                "test": summarize_targets(test_rows, args.target_type),
+            "split_table": labeling.split_table.stats() if labeling.split_table is not None else None,
+            "solar_window": {
+                "max_minutes_from_sunset": args.max_minutes_from_sunset,
+                "max_minutes_from_sunrise": args.max_minutes_from_sunrise,
+                "rows_dropped": solar_dropped,
             },
+            "counts": writer.counts,
+            "target_distribution": writer.target_distribution(),
         }
         write_json(out_root / "export_meta.json", meta)
 
         if args.training_run_id:
-            write_training_run_labels(
+            # Membership is read back from the written manifest rather than
+            # held in memory for the whole export. External rows are skipped:
+            # their ids are not webcam_snapshots ids.
+            membership = write_training_run_labels(
                 conn=conn,
                 training_run_id=args.training_run_id,
-                rows=manifest,
+                rows=(row for row in iter_manifest_rows(writer.path("full")) if row["source"] == "webcam"),
                 label_source=args.label_source,
+                method=args.membership_write,
+                chunk_rows=args.membership_chunk_rows,
+                progress=not args.no_progress,
             )
+            print(f"  Wrote {membership['rows']} training-run labels ({args.membership_write}) "
+                  f"in {membership['total_sec']:.2f}s, {membership['round_trips']} round-trips")
+            meta["training_run_labels"] = membership
+            write_json(out_root / "export_meta.json", meta)
 
     print(json.dumps({"ok": True, "output_dir": str(out_root), "meta": meta}, indent=2))
 
@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import argparse
-import hashlib
 import json
 from pathlib import Path
 
@@ -10,93 +9,81 @@ import numpy as np
 import onnxruntime as ort
 import torch
 from tqdm.auto import tqdm
-from torchvision import models
 
+from common.models import MODEL_NAMES, build_model, get_spec
+from common.onnx_utils import export_model, file_sha256
+from common.pruning import apply_prune_spec, read_prune_spec
+from common.quantization import finalize_qdq_onnx, freeze_for_export, prepare_qat
 
-def _make_head(in_features: int, out_features: int, dropout: float) -> torch.nn.Module:
-    if dropout > 0:
-        return torch.nn.Sequential(torch.nn.Dropout(p=dropout), torch.nn.Linear(in_features, out_features))
-    return torch.nn.Linear(in_features, out_features)
 
-
-def build_model(model_name: str, target_type: str, head_dropout: float = 0.0):
-    out_features = 1 if target_type == "regression" else 2
-    if model_name == "mobilenet_v3_small":
-        model = models.mobilenet_v3_small(weights=None)
-        in_features = model.classifier[-1].in_features
-        model.classifier[-1] = _make_head(in_features, out_features, head_dropout)
-        return model
-    model = models.resnet18(weights=None)
-    in_features = model.fc.in_features
-    model.fc = _make_head(in_features, out_features, head_dropout)
-    return model
-
-
-def file_sha256(path: Path) -> str:
-    h = hashlib.sha256()
-    with path.open("rb") as f:
-        while True:
-            chunk = f.read(8192)
-            if not chunk:
-                break
-            h.update(chunk)
-    return h.hexdigest()
-
-
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Export PyTorch checkpoint to ONNX")
     parser.add_argument("--checkpoint", required=True)
-    parser.add_argument("--model-name", choices=["resnet18", "mobilenet_v3_small"], default="resnet18")
+    parser.add_argument("--model-name", choices=MODEL_NAMES, default="resnet18")
     parser.add_argument("--target-type", choices=["binary", "regression"], default="binary")
     parser.add_argument("--output", default="ml/artifacts/models/model.onnx")
     parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--image-size", type=int, default=224, help="Must match training.")
     parser.add_argument(
         "--head-dropout",
         type=float,
         default=0.0,
         help="Must match training (Sequential(Dropout, Linear) when > 0).",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--prune-spec",
+        default="",
+        help="prune_spec.json written by prune_model.py when exporting a pruned checkpoint.",
+    )
+    parser.add_argument(
+        "--qat",
+        action="store_true",
+        help="Checkpoint comes from train.py --qat-epochs (best_qat.pt); emit an int8 QDQ model.",
+    )
+    return parser.parse_args(argv)
 
 
-def main() -> None:
-    args = parse_args()
+def main(args: argparse.Namespace | None = None) -> None:
+    args = args if args is not None else parse_args()
     out = Path(args.output)
     out.parent.mkdir(parents=True, exist_ok=True)
     progress = tqdm(total=4, desc="Export ONNX", unit="step")
 
     model = build_model(args.model_name, args.target_type, head_dropout=args.head_dropout)
+    if args.prune_spec:
+        apply_prune_spec(model, read_prune_spec(args.prune_spec))
+    if args.qat:
+        model = prepare_qat(model, args.image_size)
     state = torch.load(args.checkpoint, map_location="cpu")
     model.load_state_dict(state)
+    if args.qat:
+        freeze_for_export(model)
     model.eval()
     progress.update(1)
 
-    dummy = torch.randn(1, 3, 224, 224)
-    torch.onnx.export(
-        model,
-        dummy,
-        out.as_posix(),
-        input_names=["input"],
-        output_names=["output"],
-        dynamic_axes={"input": {0: "batch"}, "output": {0: "batch"}},
-        opset_version=args.opset,
-    )
+    export_model(model, out, image_size=args.image_size, opset=args.opset)
+    if args.qat:
+        finalize_qdq_onnx(out)
     progress.update(1)
 
     # Smoke test with onnxruntime
     sess = ort.InferenceSession(out.as_posix(), providers=["CPUExecutionProvider"])
+    dummy = torch.randn(1, 3, args.image_size, args.image_size)
     ort_out = sess.run(None, {"input": dummy.numpy().astype(np.float32)})
     progress.update(1)
 
     metadata = {
         "checkpoint": args.checkpoint,
         "model_name": args.model_name,
+        "model_cost": get_spec(args.model_name).cost(),
         "target_type": args.target_type,
         "head_dropout": args.head_dropout,
+        "prune_spec": args.prune_spec or None,
+        "quantization": "int8_qdq" if args.qat else None,
         "output": out.as_posix(),
         "sha256": file_sha256(out),
         "opset": args.opset,
-        "input_shape": [1, 3, 224, 224],
+        "input_shape": [1, 3, args.image_size, args.image_size],
         "smoke_output_shapes": [list(np.array(x).shape) for x in ort_out],
     }
     meta_path = out.with_suffix(".meta.json")
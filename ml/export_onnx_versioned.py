@@ -7,6 +7,8 @@ import subprocess
 import sys
 from pathlib import Path
 
+from common.models import MODEL_NAMES
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -24,7 +26,7 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--model-name",
-        choices=["resnet18", "mobilenet_v3_small"],
+        choices=MODEL_NAMES,
         default="resnet18",
     )
     parser.add_argument(
@@ -47,6 +49,11 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Override head dropout. Defaults to value from run's config.resolved.json.",
     )
+    parser.add_argument(
+        "--qat",
+        action="store_true",
+        help="Export train/best_qat.pt as an int8 QDQ model (model.int8.onnx).",
+    )
     return parser.parse_args()
 
 
@@ -60,18 +67,26 @@ def resolve_head_dropout(run_dir: Path, override: float | None) -> float:
     return float(data.get("model", {}).get("head_dropout", 0.0))
 
 
+def resolve_image_size(run_dir: Path) -> int:
+    resolved_config = run_dir / "config.resolved.json"
+    if not resolved_config.exists():
+        return 224
+    data = json.loads(resolved_config.read_text(encoding="utf-8"))
+    return int(data.get("model", {}).get("image_size") or 224)
+
+
 def main() -> None:
     args = parse_args()
     run_dir = Path(args.run_dir)
     version_tag = args.version_tag.strip() or run_dir.name
-    checkpoint = run_dir / "train" / "best.pt"
+    checkpoint = run_dir / "train" / ("best_qat.pt" if args.qat else "best.pt")
     if not checkpoint.exists():
         raise FileNotFoundError(f"Checkpoint not found: {checkpoint}")
 
     head_dropout = resolve_head_dropout(run_dir, args.head_dropout)
 
     target_folder = f"{args.target_type}_{args.model_name}"
-    output = Path(args.artifact_root) / target_folder / version_tag / "model.onnx"
+    output = Path(args.artifact_root) / target_folder / version_tag / ("model.int8.onnx" if args.qat else "model.onnx")
     output.parent.mkdir(parents=True, exist_ok=True)
 
     cmd = [
@@ -89,7 +104,11 @@ def main() -> None:
         str(args.opset),
         "--head-dropout",
         str(head_dropout),
+        "--image-size",
+        str(resolve_image_size(run_dir)),
     ]
+    if args.qat:
+        cmd.append("--qat")
     print(json.dumps({"cmd": cmd}))
     subprocess.run(cmd, check=True)
 
@@ -58,6 +58,7 @@ import requests
 from tqdm.auto import tqdm
 
 from common.io import ensure_dir, get_env_or_file, utc_timestamp
+from common.rating_stats import refresh_rating_stats
 
 RATING_PROMPT = """Analyze this webcam image and return a JSON object with these fields:
 
@@ -195,6 +196,11 @@ def parse_args() -> argparse.Namespace:
              "Recommended for tiny webcam thumbnails where the default "
              "constants over-estimate cost. (default: 0 = skip)",
     )
+    parser.add_argument(
+        "--skip-rating-stats-refresh", action="store_true",
+        help="Read human rating counts from webcam_snapshot_rating_stats as-is "
+             "instead of folding in new ratings first",
+    )
     parser.add_argument("--no-progress", action="store_true")
     return parser.parse_args()
 
@@ -697,33 +703,40 @@ def rate_image(
     raise RuntimeError("unreachable")
 
 
-def fetch_webcam_rows(
-    conn: psycopg2.extensions.connection,
-    skip_rated: bool,
-    limit: int,
-) -> list[dict[str, Any]]:
-    """Fetch webcam snapshots to rate."""
+def build_webcam_rows_query(skip_rated: bool, limit: int) -> str:
+    """Selection SQL for webcam snapshots to rate.
+
+    Human rating counts come from webcam_snapshot_rating_stats, so with
+    --limit the scan can stop early in id order instead of aggregating
+    every rating first.
+    """
     where_extra = "AND s.llm_quality IS NULL" if skip_rated else ""
     limit_clause = f"LIMIT {limit}" if limit > 0 else ""
-
-    query = f"""
+    return f"""
     SELECT
       s.id AS record_id,
       'webcam' AS source_table,
       s.webcam_id,
       s.firebase_url AS image_url,
       s.calculated_rating AS human_calculated_rating,
-      COUNT(r.id)::int AS human_rating_count
+      COALESCE(rs.rating_count, 0)::int AS human_rating_count
     FROM webcam_snapshots s
-    LEFT JOIN webcam_snapshot_ratings r ON r.snapshot_id = s.id
+    LEFT JOIN webcam_snapshot_rating_stats rs ON rs.snapshot_id = s.id
     WHERE s.firebase_url IS NOT NULL
       {where_extra}
-    GROUP BY s.id, s.webcam_id, s.firebase_url, s.calculated_rating
     ORDER BY s.id
     {limit_clause}
     """
+
+
+def fetch_webcam_rows(
+    conn: psycopg2.extensions.connection,
+    skip_rated: bool,
+    limit: int,
+) -> list[dict[str, Any]]:
+    """Fetch webcam snapshots to rate."""
     with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(query)
+        cur.execute(build_webcam_rows_query(skip_rated, limit))
         return [dict(r) for r in cur.fetchall()]
 
 
@@ -1470,6 +1483,8 @@ def main() -> None:
             print("--flagged-unrated implies --source webcam; ignoring --source", file=sys.stderr)
         rows = fetch_flagged_unrated_rows(conn, args.limit)
     elif args.source in ("webcam", "all"):
+        if not args.skip_rating_stats_refresh:
+            refresh_rating_stats(conn)
         rows.extend(fetch_webcam_rows(conn, args.skip_rated, args.limit))
 
     if args.source in ("external", "all") and not args.flagged_unrated:
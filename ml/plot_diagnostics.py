@@ -35,6 +35,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
+from common.manifest import manifest_file, read_manifest
+
 matplotlib.use("Agg")  # headless rendering; no display required
 
 
@@ -74,8 +76,8 @@ def load_run(run_dir: Path) -> dict:
     manifests: dict[str, pd.DataFrame | None] = {}
     if export_dir:
         for split in ("train", "val", "test"):
-            csv = export_dir / f"manifest_{split}.csv"
-            manifests[split] = pd.read_csv(csv) if csv.exists() else None
+            path = manifest_file(export_dir, split)
+            manifests[split] = read_manifest(path) if path.exists() else None
 
     # train_class_counts keys are strings in JSON ("0", "1")
     raw_counts = summary.get("train_class_counts", {})
@@ -382,7 +384,7 @@ def plot_comparison(runs: list[dict], output_path: Path) -> None:
 # Main
 # ---------------------------------------------------------------------------
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Generate diagnostic plots for sunset ML experiments.",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -405,11 +407,11 @@ def parse_args() -> argparse.Namespace:
         default="ml/artifacts/experiments",
         help="Root folder to search for runs when --all is used (default: ml/artifacts/experiments).",
     )
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
-def main() -> None:
-    args = parse_args()
+def main(args: argparse.Namespace | None = None) -> None:
+    args = args if args is not None else parse_args()
 
     run_paths: list[Path] = []
 
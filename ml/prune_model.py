@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""
+Structured channel pruning stage for a finished experiment run.
+
+Flow:
+1) Load the run's best.pt + config.resolved.json
+2) For each sparsity level: rank and physically remove ResNet block channels
+3) Fine-tune the pruned model for a few epochs with train.py's epoch loop
+4) Evaluate on the test manifest, export ONNX, benchmark CPU latency
+5) Write prune_report.json / prune_report.csv (accuracy vs latency vs size)
+"""
+
+import argparse
+import copy
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torchvision import transforms
+
+from common.io import ensure_dir, write_csv, write_json
+from common.metrics import confusion_from_labels, rates, regression_metrics
+from common.models import build_model, count_params
+from common.onnx_utils import cpu_latency, export_model, file_size_mb
+from common.pruning import prune_model
+from train import (
+    ManifestDataset,
+    build_loader,
+    build_train_transform,
+    is_improvement,
+    select_device,
+    selection_metric,
+    set_seed,
+    train_one_epoch,
+    validate,
+)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Prune + fine-tune + benchmark a trained run")
+    parser.add_argument("--run-dir", required=True, help="Experiment run directory (train/best.pt).")
+    parser.add_argument("--sparsity-levels", type=float, nargs="+", default=[0.25, 0.5, 0.75])
+    parser.add_argument(
+        "--channel-multiple",
+        type=int,
+        default=8,
+        help="Round kept channel counts up to a multiple of this (SIMD-friendly widths).",
+    )
+    parser.add_argument("--finetune-epochs", type=int, default=3)
+    parser.add_argument("--learning-rate", type=float, default=1e-4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--num-workers", type=int, default=0)
+    parser.add_argument("--max-train-samples", type=int, default=0)
+    parser.add_argument("--latency-runs", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--output-dir", default="", help="Defaults to <run-dir>/pruning.")
+    parser.add_argument("--no-progress", action="store_true")
+    args = parser.parse_args(argv)
+    for level in args.sparsity_levels:
+        if not 0.0 < level < 1.0:
+            parser.error("--sparsity-levels must be in (0, 1).")
+    if args.finetune_epochs < 0:
+        parser.error("--finetune-epochs must be >= 0.")
+    return args
+
+
+def score_test_split(target_type: str, y_true: list, y_pred: list) -> dict[str, Any]:
+    if target_type == "binary":
+        binary = rates(confusion_from_labels(y_true, y_pred))
+        return {"f1": float(binary["f1"]), "accuracy": float(binary["accuracy"])}
+    regression = regression_metrics(y_true, y_pred)
+    return {k: regression[k] for k in ("mae", "rmse", "pearson_r") if k in regression}
+
+
+def benchmark(model: nn.Module, onnx_path: Path, args: argparse.Namespace, image_size: int) -> dict[str, Any]:
+    export_model(copy.deepcopy(model).cpu(), onnx_path, image_size=image_size, opset=args.opset)
+    return {
+        "params_m": count_params(model) / 1e6,
+        "onnx_size_mb": file_size_mb(onnx_path),
+        "latency": cpu_latency(onnx_path, image_size=image_size, runs=args.latency_runs, threads=args.threads),
+    }
+
+
+def main(args: argparse.Namespace | None = None) -> None:
+    args = args if args is not None else parse_args()
+    run_dir = Path(args.run_dir)
+    resolved = json.loads((run_dir / "config.resolved.json").read_text(encoding="utf-8"))
+    paths = resolved["paths"]
+    data_cfg = resolved.get("data", {})
+    model_cfg = resolved.get("model", {})
+    cache_cfg = resolved.get("image_cache", {})
+    target_type = str(data_cfg.get("target_type", "binary"))
+    model_name = str(model_cfg.get("name", "resnet18"))
+    image_size = int(model_cfg.get("image_size") or 224)
+    seed = int(resolved.get("run", {}).get("seed", 20260212))
+    set_seed(seed)
+    device = select_device()
+    out_root = ensure_dir(args.output_dir or run_dir / "pruning")
+
+    loader_args = argparse.Namespace(
+        num_workers=args.num_workers,
+        pin_memory=False,
+        persistent_workers=False,
+        prefetch_factor=2,
+        crop_strategy=resolved.get("cropping", {}).get("strategy", "random_resized"),
+        crop_scale_min=float(resolved.get("cropping", {}).get("scale_min", 0.8)),
+        crop_scale_max=float(resolved.get("cropping", {}).get("scale_max", 1.0)),
+        augmentation_profile=resolved.get("augmentation", {}).get("profile", "light"),
+        image_size=image_size,
+    )
+    cache_kwargs = {
+        "cache_urls": bool(cache_cfg.get("enabled", False)),
+        "cache_dir": str(cache_cfg.get("cache_dir", "")) if cache_cfg.get("enabled") else "",
+    }
+    eval_tf = transforms.Compose([transforms.Resize((image_size, image_size)), transforms.ToTensor()])
+    train_ds = ManifestDataset(
+        paths["train_manifest"],
+        build_train_transform(loader_args),
+        target_type,
+        max_samples=args.max_train_samples,
+        seed=seed,
+        **cache_kwargs,
+    )
+    val_ds = ManifestDataset(paths["val_manifest"], eval_tf, target_type, **cache_kwargs)
+    test_ds = ManifestDataset(paths["test_manifest"], eval_tf, target_type, **cache_kwargs)
+    train_loader = build_loader(train_ds, args.batch_size, True, None, loader_args)
+    val_loader = build_loader(val_ds, args.batch_size, False, None, loader_args)
+    test_loader = build_loader(test_ds, args.batch_size, False, None, loader_args)
+    criterion = nn.MSELoss() if target_type == "regression" else nn.CrossEntropyLoss()
+    show_progress = not args.no_progress
+
+    state = torch.load(paths["checkpoint"], map_location=device)
+    base = build_model(
+        model_name,
+        target_type,
+        head_dropout=float(model_cfg.get("head_dropout", 0.0)),
+        state_dict=state,
+    ).to(device)
+    base.load_state_dict(state)
+
+    rows: list[dict[str, Any]] = []
+
+    def record(level: float, model: nn.Module, level_dir: Path, extra: dict[str, Any]) -> None:
+        _, y_true, y_pred = validate(
+            model, test_loader, criterion, device, target_type, desc="Test", show_progress=show_progress
+        )
+        bench = benchmark(model, level_dir / "model.onnx", args, image_size)
+        row = {
+            "sparsity": level,
+            **score_test_split(target_type, y_true, y_pred),
+            "params_m": bench["params_m"],
+            "onnx_size_mb": bench["onnx_size_mb"],
+            "latency_p50_ms": bench["latency"]["p50_ms"],
+            "latency_p99_ms": bench["latency"]["p99_ms"],
+            **extra,
+        }
+        rows.append(row)
+        print(json.dumps(row))
+
+    record(
+        0.0,
+        base,
+        ensure_dir(out_root / "sparsity_0.00"),
+        {"finetune_epochs": 0, "finetune_sec": 0.0, "best_val_metric": None},
+    )
+
+    for level in args.sparsity_levels:
+        level_dir = ensure_dir(out_root / f"sparsity_{level:.2f}")
+        model = copy.deepcopy(base)
+        spec = prune_model(model, level, channel_multiple=args.channel_multiple)
+        write_json(level_dir / "prune_spec.json", {"model_name": model_name, "sparsity": level, "blocks": spec})
+
+        optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+        best_path = level_dir / "best.pt"
+        best_metric = -1.0 if target_type == "binary" else float("inf")
+        torch.save(model.state_dict(), best_path)
+        finetune_start = time.perf_counter()
+        for epoch in range(args.finetune_epochs):
+            train_one_epoch(
+                model,
+                train_loader,
+                criterion,
+                optimizer,
+                device,
+                target_type,
+                desc=f"Fine-tune {level:.2f} {epoch + 1}/{args.finetune_epochs}",
+                show_progress=show_progress,
+            )
+            val_loss, all_y, all_pred = validate(
+                model, val_loader, criterion, device, target_type, show_progress=show_progress
+            )
+            val_metric = selection_metric(target_type, val_loss, all_y, all_pred)
+            if is_improvement(target_type, val_metric, best_metric):
+                best_metric = val_metric
+                torch.save(model.state_dict(), best_path)
+        model.load_state_dict(torch.load(best_path, map_location=device))
+        record(
+            level,
+            model,
+            level_dir,
+            {
+                "finetune_epochs": args.finetune_epochs,
+                "finetune_sec": time.perf_counter() - finetune_start,
+                "best_val_metric": best_metric if args.finetune_epochs > 0 else None,
+            },
+        )
+
+    report = {
+        "run_dir": str(run_dir),
+        "model_name": model_name,
+        "target_type": target_type,
+        "image_size": image_size,
+        "channel_multiple": args.channel_multiple,
+        "finetune_epochs": args.finetune_epochs,
+        "latency_threads": args.threads,
+        "levels": rows,
+    }
+    write_json(out_root / "prune_report.json", report)
+    write_csv(out_root / "prune_report.csv", rows)
+    print(json.dumps({"ok": True, "output_dir": str(out_root), "report": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
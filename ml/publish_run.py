@@ -4,10 +4,16 @@ from __future__ import annotations
 import json
 import re
 import shutil
+import sys
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+# Local imports — ml/ is the package root for these scripts.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common.manifest import read_manifest
+from common.metrics import rates
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 PUBLIC_RUNS_DIR = REPO_ROOT / "public" / "ml-runs"
@@ -66,23 +72,17 @@ def _bucket_label(value: float) -> str:
 
 
 def _label_distribution(path: Path | None) -> dict[str, int] | None:
-    """Count label_value bucket occurrences in a manifest CSV. None if
-    the file is missing or has no label_value column."""
+    """Count label_value bucket occurrences in a manifest (any format). None
+    if the file is missing or has no label_value column."""
     if path is None or not path.is_file():
         return None
-    import csv
+    df = read_manifest(path, columns=["label_value"])
+    if "label_value" not in df.columns:
+        return None
     counts: dict[str, int] = {}
-    with path.open() as f:
-        reader = csv.DictReader(f)
-        if reader.fieldnames is None or "label_value" not in reader.fieldnames:
-            return None
-        for row in reader:
-            try:
-                v = float(row["label_value"])
-            except (TypeError, ValueError):
-                continue
-            key = _bucket_label(v)
-            counts[key] = counts.get(key, 0) + 1
+    for v in df["label_value"].dropna().tolist():
+        key = _bucket_label(v)
+        counts[key] = counts.get(key, 0) + 1
     return counts or None
 
 
@@ -173,11 +173,9 @@ def _binary_metrics(eval_report: dict[str, Any]) -> dict[str, float]:
             if v is not None:
                 out[f"val_{k}"] = float(v)
         conf = eval_report.get("confusion", {}) or {}
-        total = sum((conf.get(k) or 0) for k in ("tn", "fp", "fn", "tp"))
-        if total > 0:
-            out["val_accuracy"] = (
-                (conf.get("tn") or 0) + (conf.get("tp") or 0)
-            ) / total
+        counts = {k: conf.get(k) or 0 for k in ("tn", "fp", "fn", "tp")}
+        if sum(counts.values()) > 0:
+            out["val_accuracy"] = float(rates(counts)["accuracy"])
     elif target_type == "regression":
         sweep = eval_report.get("derived_binary_sweep") or []
         if sweep:
@@ -325,11 +323,34 @@ def build_index_json(
         },
         "threshold_sweep": threshold_sweep,
         "best_threshold": best_threshold,
+        # Webcam-grouped bootstrap CIs per metric ({} for runs evaluated before they existed).
+        "confidence_intervals": (eval_report.get("bootstrap") or {}).get("metrics", {}),
+        "slices": eval_report.get("slices") or [],
+        "worst_slices": _worst_slices(eval_report.get("slices") or []),
         "decision_threshold": config.get("metrics", {}).get("decision_threshold")
             or config.get("decision_threshold"),
     }
 
 
+def _worst_slices(slices: list[dict[str, Any]], limit: int = 5) -> list[dict[str, Any]]:
+    """Slices furthest below the overall primary metric (F1 lower / MAE higher is worse)."""
+    scored = [s for s in slices if s.get("delta_vs_overall") is not None]
+
+    # delta = slice - overall: for F1 negative is worse, for MAE positive is worse.
+    def badness(s: dict[str, Any]) -> float:
+        return -s["delta_vs_overall"] if s.get("primary_metric") == "f1" else s["delta_vs_overall"]
+
+    return sorted(scored, key=badness, reverse=True)[:limit]
+
+
+def _metric_ci(intervals: dict[str, Any], metric_name: str) -> dict[str, Any] | None:
+    """[low, high] for an index metric name (val_f1 -> f1) from the eval bootstrap."""
+    ci = intervals.get(metric_name.removeprefix("val_"))
+    if not ci:
+        return None
+    return {"low": ci.get("low"), "high": ci.get("high")}
+
+
 def build_manifest_entry(idx: dict[str, Any]) -> dict[str, Any]:
     metrics = idx["metrics"]
     binary = {
@@ -364,6 +385,7 @@ def build_manifest_entry(idx: dict[str, Any]) -> dict[str, Any]:
         "regression_metrics": regression,
         "best_metric_name": primary_name,
         "best_metric_value": primary_value,
+        "best_metric_ci": _metric_ci(idx.get("confidence_intervals") or {}, primary_name),
         "best_epoch": metrics.get("best_epoch"),
         "epochs_total": metrics.get("epochs_completed"),
         "early_stopped": metrics.get("early_stopped_epoch") is not None,
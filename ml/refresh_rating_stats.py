@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Refresh webcam_snapshot_rating_stats from webcam_snapshot_ratings.
+
+By default only snapshots rated since the last refresh, or with a rating
+deleted since then, are re-aggregated. export_dataset.py,
+audit_snapshot_integrity.py and llm_rater.py run the same incremental
+refresh before they read, so call this directly for a cron or a --full
+rebuild.
+
+Usage:
+  python ml/refresh_rating_stats.py
+  python ml/refresh_rating_stats.py --full
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+
+import psycopg2
+
+from common.io import env_required
+from common.rating_stats import LOOKBACK_MINUTES, refresh_rating_stats
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Refresh per-snapshot rating statistics")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--full", action="store_true", help="Rebuild every row instead of only changed snapshots")
+    parser.add_argument(
+        "--lookback-minutes", type=float, default=LOOKBACK_MINUTES,
+        help="Re-check ratings this far behind the watermark (late-committing transactions)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    database_url = args.database_url or env_required("DATABASE_URL")
+    with psycopg2.connect(database_url) as conn:
+        result = refresh_rating_stats(conn, full=args.full, lookback_minutes=args.lookback_minutes)
+    print(json.dumps({"ok": True, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
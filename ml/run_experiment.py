@@ -2,6 +2,8 @@
 from __future__ import annotations
 
 import argparse
+import gc
+import importlib
 import json
 import os
 import re
@@ -13,14 +15,29 @@ from typing import Any
 
 import yaml
 
+from common.freezing import stage_to_cli
 from common.io import ensure_dir, utc_timestamp
+from common.manifest import manifest_file
+from common.stages import StageCache, path_digest, stage_fingerprint
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run unified ML experiment from one YAML config.")
     parser.add_argument("--config", required=True, help="Path to experiment YAML config.")
     parser.add_argument("--output-root", default="ml/artifacts/experiments")
     parser.add_argument("--no-progress", action="store_true")
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run export/train/evaluate/plot (and ONNX export, pruning) by calling their main() in this "
+             "interpreter instead of one child process each, so torch and friends are imported once.",
+    )
+    parser.add_argument(
+        "--no-reuse",
+        action="store_true",
+        help="Run every stage even when an earlier run under --output-root has the same stage "
+             "fingerprint (see ml/common/stages.py). Fingerprints are still recorded.",
+    )
     parser.add_argument(
         "--publish",
         action="store_true",
@@ -33,7 +50,7 @@ def parse_args() -> argparse.Namespace:
         default=20,
         help="Top-N worst predictions to include in failure_gallery.json.",
     )
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 
 def read_config(path: Path) -> dict[str, Any]:
@@ -53,13 +70,45 @@ def slugify(value: str) -> str:
     return safe.strip("_").lower() or "run"
 
 
-def run_cmd(cmd: list[str]) -> None:
+def run_cmd(cmd: list[str], in_process: bool = False) -> None:
+    """Run a stage script: as a child process, or via its `main(parse_args(argv))` in this interpreter."""
     print(json.dumps({"cmd": cmd}))
-    subprocess.run(cmd, check=True)
-
+    if not in_process:
+        subprocess.run(cmd, check=True)
+        return
+    module = importlib.import_module(Path(cmd[1]).stem)
+    module.main(module.parse_args(cmd[2:]))
+    sys.stdout.flush()
+    # Drop the stage's models and tensors before the next one starts.
+    gc.collect()
+
+
+def export_watermark(include_external: bool) -> dict[str, Any] | None:
+    """Current DB watermark for the export fingerprint; None (export always runs) without a DB."""
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        return None
+    import psycopg2
+
+    from export_dataset import fetch_watermark
+
+    try:
+        with psycopg2.connect(database_url) as conn:
+            return fetch_watermark(conn, include_external)
+    except psycopg2.Error as exc:
+        print(f"[stages] export watermark unavailable, export will run: {exc}")
+        return None
+
+
+def main(args: argparse.Namespace | None = None) -> None:
+    args = args if args is not None else parse_args()
+    # Make sibling modules importable when this script is run as a file
+    # (`python ml/run_experiment.py`) rather than as a package
+    # (`python -m ml.run_experiment`).
+    _ml_dir = Path(__file__).resolve().parent
+    if str(_ml_dir) not in sys.path:
+        sys.path.insert(0, str(_ml_dir))
 
-def main() -> None:
-    args = parse_args()
     config_path = Path(args.config)
     config = read_config(config_path)
 
@@ -76,6 +125,7 @@ def main() -> None:
     eval_dir = ensure_dir(run_dir / "eval")
 
     shutil.copy2(config_path, run_dir / "config.input.yaml")
+    stages = StageCache(root, run_dir, reuse=not args.no_reuse)
 
     data_cfg = cfg_get(config, "data", {})
     split_cfg = cfg_get(data_cfg, "splits", {})
@@ -87,6 +137,7 @@ def main() -> None:
     subset_cfg = cfg_get(config, "subset", {})
     cache_cfg = cfg_get(config, "image_cache", {})
     eval_cfg = cfg_get(config, "metrics", {})
+    prune_cfg = cfg_get(config, "pruning", {})
 
     export_cmd = [
         sys.executable,
@@ -112,6 +163,9 @@ def main() -> None:
         "--output-dir",
         str(dataset_dir),
     ]
+    split_table = cfg_get(split_cfg, "table", None)
+    if split_table is not None:
+        export_cmd.extend(["--split-table", str(split_table)])
     if bool(cfg_get(data_cfg, "include_external", False)):
         export_cmd.append("--include-external")
         ext_cats = cfg_get(data_cfg, "external_categories", [])
@@ -121,6 +175,8 @@ def main() -> None:
     llm_csv = str(cfg_get(data_cfg, "llm_ratings_csv", ""))
     if llm_csv:
         export_cmd.extend(["--llm-ratings-csv", llm_csv])
+    if bool(cfg_get(data_cfg, "llm_labels_from_db", False)):
+        export_cmd.append("--llm-labels-from-db")
 
     merge_strategy = str(cfg_get(data_cfg, "label_merge_strategy", ""))
     if merge_strategy:
@@ -130,17 +186,38 @@ def main() -> None:
     if llm_weight is not None:
         export_cmd.extend(["--llm-weight", str(llm_weight)])
 
+    for key in ("max_minutes_from_sunset", "max_minutes_from_sunrise"):
+        limit = cfg_get(data_cfg, key, None)
+        if limit is not None:
+            export_cmd.extend([f"--{key.replace('_', '-')}", str(limit)])
+
+    manifest_format = str(cfg_get(data_cfg, "manifest_format", "csv"))
+    export_cmd.extend(["--manifest-format", manifest_format])
+    if manifest_format != "csv" and bool(cfg_get(data_cfg, "csv_copy", False)):
+        export_cmd.append("--csv-copy")
+
+    if bool(cfg_get(data_cfg, "incremental_export", False)):
+        # Earlier runs under the same output root are the candidate bases.
+        export_cmd.extend(["--incremental-from", str(root)])
+
     if args.no_progress:
         export_cmd.append("--no-progress")
-    run_cmd(export_cmd)
+    include_external = bool(cfg_get(data_cfg, "include_external", False))
+    watermark = export_watermark(include_external)
+    stages.run(
+        "export",
+        stage_fingerprint(export_cmd, run_dir, "export_dataset.py", {"watermark": watermark}) if watermark else None,
+        [dataset_dir],
+        lambda: run_cmd(export_cmd, args.in_process),
+    )
 
     export_runs = sorted(dataset_dir.glob("*"), key=lambda p: p.name)
     if not export_runs:
         raise RuntimeError("Dataset export did not produce a timestamped output folder.")
     exported_dir = export_runs[-1]
-    train_manifest = exported_dir / "manifest_train.csv"
-    val_manifest = exported_dir / "manifest_val.csv"
-    test_manifest = exported_dir / "manifest_test.csv"
+    train_manifest = manifest_file(exported_dir, "train")
+    val_manifest = manifest_file(exported_dir, "val")
+    test_manifest = manifest_file(exported_dir, "test")
 
     train_cmd = [
         sys.executable,
@@ -183,9 +260,16 @@ def main() -> None:
         train_cmd.append("--pin-memory")
     if bool(cfg_get(perf_cfg, "persistent_workers", False)):
         train_cmd.append("--persistent-workers")
+    train_cmd.extend(["--grad-accum-steps", str(int(cfg_get(perf_cfg, "grad_accum_steps", 1)))])
+    if bool(cfg_get(perf_cfg, "grad_checkpointing", False)):
+        train_cmd.append("--grad-checkpointing")
 
     train_cmd.extend(["--max-train-samples", str(int(cfg_get(subset_cfg, "max_train_samples", 0)))])
     train_cmd.extend(["--max-val-samples", str(int(cfg_get(subset_cfg, "max_val_samples", 0)))])
+    train_cmd.extend(["--subset-strategy", str(cfg_get(subset_cfg, "strategy", "random"))])
+    coreset_model = str(cfg_get(subset_cfg, "embedding_model", ""))
+    if coreset_model:
+        train_cmd.extend(["--coreset-model", coreset_model])
 
     if bool(cfg_get(cache_cfg, "enabled", False)):
         train_cmd.append("--cache-urls")
@@ -193,6 +277,11 @@ def main() -> None:
         train_cmd.extend(["--cache-dir", cache_dir])
     if bool(cfg_get(cache_cfg, "precache", False)):
         train_cmd.append("--precache-urls")
+    train_cmd.extend(["--prefetch-lookahead", str(int(cfg_get(cache_cfg, "prefetch_lookahead", 64)))])
+    train_cmd.extend(["--prefetch-threads", str(int(cfg_get(cache_cfg, "prefetch_threads", 16)))])
+    failed_ttl = cfg_get(cache_cfg, "failed_download_ttl_sec", None)
+    if failed_ttl is not None:
+        train_cmd.extend(["--failed-download-ttl-sec", str(failed_ttl)])
 
     class_weighting = str(cfg_get(imbalance_cfg, "class_weighting", "none"))
     manual_weights = cfg_get(imbalance_cfg, "manual_weights", {})
@@ -218,9 +307,86 @@ def main() -> None:
     if head_dropout > 0:
         train_cmd.extend(["--head-dropout", str(head_dropout)])
 
+    image_size = int(cfg_get(model_cfg, "image_size", 224))
+    train_cmd.extend(["--image-size", str(image_size)])
+
+    unfreeze_schedule = cfg_get(model_cfg, "unfreeze_schedule", [])
+    if unfreeze_schedule:
+        train_cmd.extend(["--unfreeze-schedule"] + [stage_to_cli(s) for s in unfreeze_schedule])
+        head_lr = cfg_get(model_cfg, "head_learning_rate", None)
+        if head_lr is not None:
+            train_cmd.extend(["--head-learning-rate", str(head_lr)])
+
+    init_checkpoint = str(cfg_get(model_cfg, "init_checkpoint", ""))
+    if init_checkpoint:
+        train_cmd.extend(["--init-checkpoint", init_checkpoint])
+    qat_epochs = int(cfg_get(model_cfg, "qat_epochs", 0))
+    if qat_epochs > 0:
+        train_cmd.extend(["--qat-epochs", str(qat_epochs)])
+        train_cmd.extend(["--qat-learning-rate", str(cfg_get(model_cfg, "qat_learning_rate", 0.0))])
+
     if args.no_progress:
         train_cmd.append("--no-progress")
-    run_cmd(train_cmd)
+    stages.run(
+        "train",
+        stage_fingerprint(train_cmd, run_dir, "train.py"),
+        [train_dir],
+        lambda: run_cmd(train_cmd, args.in_process),
+    )
+
+    int8_onnx = None
+    if qat_epochs > 0:
+        int8_onnx = train_dir / "model.int8.onnx"
+        int8_cmd = [
+            sys.executable,
+            "ml/export_onnx.py",
+            "--checkpoint",
+            str(train_dir / "best_qat.pt"),
+            "--model-name",
+            str(cfg_get(model_cfg, "name", "resnet18")),
+            "--target-type",
+            str(cfg_get(data_cfg, "target_type", "binary")),
+            "--head-dropout",
+            str(head_dropout),
+            "--image-size",
+            str(image_size),
+            "--qat",
+            "--output",
+            str(int8_onnx),
+        ]
+        stages.run(
+            "onnx_int8",
+            stage_fingerprint(int8_cmd, run_dir, "export_onnx.py"),
+            [int8_onnx, int8_onnx.with_suffix(".meta.json")],
+            lambda: run_cmd(int8_cmd, args.in_process),
+        )
+
+    eval_backend = str(cfg_get(eval_cfg, "backend", "torch"))
+    float_onnx = None
+    if eval_backend in ("onnx", "parity"):
+        float_onnx = train_dir / "model.onnx"
+        float_cmd = [
+            sys.executable,
+            "ml/export_onnx.py",
+            "--checkpoint",
+            str(train_dir / "best.pt"),
+            "--model-name",
+            str(cfg_get(model_cfg, "name", "resnet18")),
+            "--target-type",
+            str(cfg_get(data_cfg, "target_type", "binary")),
+            "--head-dropout",
+            str(head_dropout),
+            "--image-size",
+            str(image_size),
+            "--output",
+            str(float_onnx),
+        ]
+        stages.run(
+            "onnx",
+            stage_fingerprint(float_cmd, run_dir, "export_onnx.py"),
+            [float_onnx, float_onnx.with_suffix(".meta.json")],
+            lambda: run_cmd(float_cmd, args.in_process),
+        )
 
     eval_cmd = [
         sys.executable,
@@ -233,6 +399,8 @@ def main() -> None:
         str(cfg_get(data_cfg, "target_type", "binary")),
         "--model-name",
         str(cfg_get(model_cfg, "name", "resnet18")),
+        "--image-size",
+        str(image_size),
         "--decision-threshold",
         str(cfg_get(eval_cfg, "decision_threshold", 0.5)),
         "--output",
@@ -243,9 +411,33 @@ def main() -> None:
         eval_cmd.extend(["--threshold-sweep-start", str(cfg_get(eval_cfg, "threshold_sweep_start", 0.1))])
         eval_cmd.extend(["--threshold-sweep-end", str(cfg_get(eval_cfg, "threshold_sweep_end", 0.9))])
         eval_cmd.extend(["--threshold-sweep-step", str(cfg_get(eval_cfg, "threshold_sweep_step", 0.1))])
+    eval_cmd.extend(["--backend", eval_backend])
+    if float_onnx is not None:
+        eval_cmd.extend(["--onnx-model", str(float_onnx)])
+        eval_cmd.extend(["--onnx-threads", str(int(cfg_get(eval_cfg, "onnx_threads", 0)))])
+        eval_cmd.extend(["--parity-tolerance", str(cfg_get(eval_cfg, "parity_tolerance", 1e-3))])
+    eval_cmd.extend(["--batch-size", str(int(cfg_get(eval_cfg, "batch_size", 32)))])
+    eval_cmd.extend(["--num-workers", str(num_workers)])
+    eval_cmd.extend(["--prefetch-factor", str(int(cfg_get(perf_cfg, "prefetch_factor", 2)))])
+    if bool(cfg_get(perf_cfg, "pin_memory", False)):
+        eval_cmd.append("--pin-memory")
+    if bool(cfg_get(cache_cfg, "enabled", False)):
+        eval_cmd.extend(["--cache-dir", str(cfg_get(cache_cfg, "cache_dir", "ml/artifacts/image_cache"))])
+    eval_cmd.extend(["--prefetch-lookahead", str(int(cfg_get(cache_cfg, "prefetch_lookahead", 64)))])
+    eval_cmd.extend(["--prefetch-threads", str(int(cfg_get(cache_cfg, "prefetch_threads", 16)))])
+    eval_cmd.extend(["--bootstrap-replicates", str(int(cfg_get(eval_cfg, "bootstrap_replicates", 2000)))])
+    eval_cmd.extend(["--bootstrap-seed", str(run_seed)])
+    eval_cmd.extend(["--slice-min-support", str(int(cfg_get(eval_cfg, "slice_min_support", 20)))])
+    if int8_onnx is not None:
+        eval_cmd.extend(["--int8-onnx", str(int8_onnx)])
     if args.no_progress:
         eval_cmd.append("--no-progress")
-    run_cmd(eval_cmd)
+    stages.run(
+        "evaluate",
+        stage_fingerprint(eval_cmd, run_dir, "evaluate.py"),
+        [eval_dir],
+        lambda: run_cmd(eval_cmd, args.in_process),
+    )
 
     plot_cmd = [
         sys.executable,
@@ -253,14 +445,18 @@ def main() -> None:
         "--run-dir",
         str(run_dir),
     ]
-    run_cmd(plot_cmd)
-
-    # Make sibling modules importable when this script is run as a file
-    # (`python ml/run_experiment.py`) rather than as a package
-    # (`python -m ml.run_experiment`).
-    _ml_dir = Path(__file__).resolve().parent
-    if str(_ml_dir) not in sys.path:
-        sys.path.insert(0, str(_ml_dir))
+    # plot_diagnostics reads the run dir itself, so its inputs are hashed here.
+    plot_inputs = {
+        "dataset": path_digest(exported_dir),
+        "train_summary": path_digest(train_dir / "train_summary.json"),
+        "eval_report": path_digest(eval_dir / "eval_report.json"),
+    }
+    stages.run(
+        "plot",
+        stage_fingerprint(plot_cmd, run_dir, "plot_diagnostics.py", plot_inputs),
+        [run_dir / "plots"],
+        lambda: run_cmd(plot_cmd, args.in_process),
+    )
 
     # Failure gallery (runs whenever --publish is set OR when DATABASE_URL is
     # available — the gallery is cheap and useful for the local dashboard too).
@@ -300,6 +496,7 @@ def main() -> None:
         "subset": subset_cfg,
         "image_cache": cache_cfg,
         "metrics": eval_cfg,
+        "pruning": prune_cfg,
         "paths": {
             "run_dir": str(run_dir),
             "dataset_dir": str(exported_dir),
@@ -309,17 +506,47 @@ def main() -> None:
             "val_manifest": str(val_manifest),
             "test_manifest": str(test_manifest),
             "checkpoint": str(train_dir / "best.pt"),
+            "int8_onnx": str(int8_onnx) if int8_onnx is not None else None,
+            "float_onnx": str(float_onnx) if float_onnx is not None else None,
             "eval_report": str(eval_dir / "eval_report.json"),
         },
     }
     (run_dir / "config.resolved.json").write_text(json.dumps(resolved, indent=2), encoding="utf-8")
 
+    # Pruning reads config.resolved.json, so it runs after that is written.
+    prune_report = None
+    if bool(cfg_get(prune_cfg, "enabled", False)):
+        prune_cmd = [
+            sys.executable,
+            "ml/prune_model.py",
+            "--run-dir",
+            str(run_dir),
+            "--sparsity-levels",
+            *[str(v) for v in cfg_get(prune_cfg, "sparsity_levels", [0.25, 0.5, 0.75])],
+            "--channel-multiple",
+            str(cfg_get(prune_cfg, "channel_multiple", 8)),
+            "--finetune-epochs",
+            str(cfg_get(prune_cfg, "finetune_epochs", 3)),
+            "--learning-rate",
+            str(cfg_get(prune_cfg, "learning_rate", 1e-4)),
+            "--batch-size",
+            str(cfg_get(model_cfg, "batch_size", 32)),
+            "--num-workers",
+            str(num_workers),
+        ]
+        if args.no_progress:
+            prune_cmd.append("--no-progress")
+        run_cmd(prune_cmd, args.in_process)
+        prune_report = str(run_dir / "pruning" / "prune_report.json")
+
     run_manifest = {
         "config_input": str(run_dir / "config.input.yaml"),
         "config_resolved": str(run_dir / "config.resolved.json"),
         "dataset_meta": str(exported_dir / "export_meta.json"),
         "train_summary": str(train_dir / "train_summary.json"),
         "eval_report": str(eval_dir / "eval_report.json"),
+        "prune_report": prune_report,
+        "stages": stages.records,
     }
     (run_dir / "run_manifest.json").write_text(json.dumps(run_manifest, indent=2), encoding="utf-8")
 
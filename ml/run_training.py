@@ -36,6 +36,12 @@ def parse_args() -> argparse.Namespace:
         default=20,
         help="Top-N worst predictions forwarded to run_experiment.py.",
     )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Call run_experiment.py in this interpreter and forward --in-process, so every stage "
+             "runs without a child process.",
+    )
     return parser.parse_args()
 
 
@@ -58,7 +64,15 @@ def main() -> None:
     if args.publish:
         cmd.append("--publish")
     cmd.extend(["--failure-gallery-n", str(args.failure_gallery_n)])
+    if args.in_process:
+        cmd.append("--in-process")
     print({"cmd": cmd, "env_file": args.env_file, "database_url_loaded": True})
+    if args.in_process:
+        os.environ["DATABASE_URL"] = db_url
+        import run_experiment
+
+        run_experiment.main(run_experiment.parse_args(cmd[2:]))
+        return
     subprocess.run(cmd, check=True, env=env)
 
 
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+"""
+Resolution x backbone sweep with a quality-vs-latency Pareto report.
+
+Flow:
+1) For each (model, image_size) pair, write a derived copy of the base
+   config (model.name / model.image_size / run.name) and train it with
+   run_experiment.py into one sweep folder
+2) Export each run's best.pt to ONNX at its input size and benchmark
+   onnxruntime CPU latency per image (batch 1)
+3) Join the latency with the compare_experiments.py row for the run and
+   mark the Pareto front (lower p50 latency, higher quality)
+4) Write pareto_<name>.json / .csv / .png next to the comparison reports
+
+Quality axes: pearson_r and MAE for regression, F1 for binary.
+
+Usage:
+  python ml/sweep_pareto.py --config ml/configs/v4_regression_llm_with_flickr.yaml \\
+    --image-sizes 224 160 128 --models resnet18 mobilenet_v3_large
+
+  # Re-benchmark finished runs without training again
+  python ml/sweep_pareto.py --run-dirs ml/artifacts/experiments/sweeps/<sweep>/*
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import matplotlib
+import matplotlib.pyplot as plt
+import torch
+import yaml
+
+from common.io import ensure_dir, utc_timestamp, write_csv, write_json
+from common.models import MODEL_NAMES, build_model
+from common.onnx_utils import cpu_latency, export_model, file_size_mb
+from compare_experiments import flatten_run, read_json
+from run_experiment import slugify
+
+matplotlib.use("Agg")  # headless rendering; no display required
+
+# (metric key, higher is better) per target type.
+QUALITY_METRICS = {
+    "regression": [("pearson_r", True), ("mae", False)],
+    "binary": [("f1", True)],
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Resolution/backbone sweep with a latency Pareto report")
+    parser.add_argument("--config", default="", help="Base experiment YAML to sweep.")
+    parser.add_argument("--image-sizes", type=int, nargs="+", default=[224, 160, 128])
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        choices=MODEL_NAMES,
+        default=None,
+        help="Backbones to sweep. Defaults to the config's model.name.",
+    )
+    parser.add_argument(
+        "--run-dirs",
+        nargs="+",
+        default=None,
+        help="Skip training and benchmark these finished run folders instead.",
+    )
+    parser.add_argument("--output-root", default="ml/artifacts/experiments/sweeps")
+    parser.add_argument("--report-dir", default="ml/artifacts/reports")
+    parser.add_argument("--name", default="", help="Report name. Defaults to the config run name.")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-progress", action="store_true")
+    args = parser.parse_args()
+    if not args.config and not args.run_dirs:
+        parser.error("Pass --config to run a sweep or --run-dirs to benchmark finished runs.")
+    if any(size < 32 for size in args.image_sizes):
+        parser.error("--image-sizes must be >= 32.")
+    return args
+
+
+def variant_config(base: dict[str, Any], model_name: str, image_size: int) -> dict[str, Any]:
+    """Copy of the base config with one backbone/resolution swapped in."""
+    config = json.loads(json.dumps(base))
+    run_cfg = config.setdefault("run", {}) or {}
+    model_cfg = config.setdefault("model", {}) or {}
+    run_cfg["name"] = f"{run_cfg.get('name', 'sweep')}_{model_name}_{image_size}px"
+    model_cfg["name"] = model_name
+    model_cfg["image_size"] = image_size
+    config["run"], config["model"] = run_cfg, model_cfg
+    return config
+
+
+def train_variants(args: argparse.Namespace, sweep_root: Path) -> list[Path]:
+    base = yaml.safe_load(Path(args.config).read_text(encoding="utf-8"))
+    models = args.models or [str((base.get("model") or {}).get("name", "resnet18"))]
+    config_dir = ensure_dir(sweep_root / "configs")
+    run_dirs: list[Path] = []
+    for model_name in models:
+        for image_size in args.image_sizes:
+            config = variant_config(base, model_name, image_size)
+            config_path = config_dir / f"{model_name}_{image_size}px.yaml"
+            config_path.write_text(yaml.safe_dump(config, sort_keys=False), encoding="utf-8")
+            cmd = [
+                sys.executable,
+                "ml/run_experiment.py",
+                "--config",
+                str(config_path),
+                "--output-root",
+                str(sweep_root),
+            ]
+            if args.no_progress:
+                cmd.append("--no-progress")
+            print(json.dumps({"cmd": cmd}))
+            subprocess.run(cmd, check=True)
+            slug = slugify(config["run"]["name"])
+            run_dirs.append(sorted(sweep_root.glob(f"*_{slug}"))[-1])
+    return run_dirs
+
+
+def benchmark_run(run_dir: Path, args: argparse.Namespace, onnx_dir: Path) -> dict[str, Any]:
+    """Export the run's checkpoint at its trained resolution and time it."""
+    manifest = read_json(run_dir / "run_manifest.json")
+    resolved = read_json(Path(manifest["config_resolved"]))
+    summary = read_json(Path(manifest["train_summary"]))
+    model_name = str(summary.get("model_name", "resnet18"))
+    image_size = int(summary.get("image_size", 224))
+
+    state = torch.load(resolved["paths"]["checkpoint"], map_location="cpu")
+    model = build_model(model_name, summary["target_type"], state_dict=state)
+    model.load_state_dict(state)
+    onnx_path = export_model(model, onnx_dir / f"{run_dir.name}.onnx", image_size, args.opset)
+    latency = cpu_latency(
+        onnx_path,
+        image_size=image_size,
+        batch_size=1,
+        runs=args.runs,
+        warmup=args.warmup,
+        threads=args.threads,
+    )
+    return {
+        "onnx_size_mb": file_size_mb(onnx_path),
+        "latency_p50_ms": latency["p50_ms"],
+        "latency_p99_ms": latency["p99_ms"],
+        "latency_mean_ms": latency["mean_ms"],
+    }
+
+
+def pareto_front(rows: list[dict[str, Any]], metric: str, higher_is_better: bool) -> list[bool]:
+    """Flag rows not dominated on (lower latency_p50_ms, better `metric`).
+
+    Rows with a missing metric are never on the front.
+    """
+    sign = 1.0 if higher_is_better else -1.0
+    points = [
+        (row["latency_p50_ms"], sign * row[metric]) if row.get(metric) is not None else None
+        for row in rows
+    ]
+    flags = []
+    for i, p in enumerate(points):
+        if p is None:
+            flags.append(False)
+            continue
+        dominated = any(
+            q is not None and q[0] <= p[0] and q[1] >= p[1] and q != p
+            for j, q in enumerate(points)
+            if j != i
+        )
+        flags.append(not dominated)
+    return flags
+
+
+def plot_pareto(rows: list[dict[str, Any]], target_type: str, output_path: Path) -> None:
+    metrics = QUALITY_METRICS[target_type]
+    fig, axes = plt.subplots(1, len(metrics), figsize=(6.5 * len(metrics), 5), squeeze=False)
+    for ax, (metric, higher_is_better) in zip(axes[0], metrics):
+        for row in rows:
+            if row.get(metric) is None:
+                continue
+            on_front = row[f"pareto_{metric}"]
+            p50, p99 = row["latency_p50_ms"], row["latency_p99_ms"]
+            ax.errorbar(
+                p50,
+                row[metric],
+                xerr=[[0.0], [max(p99 - p50, 0.0)]],
+                fmt="o",
+                color="tab:red" if on_front else "tab:gray",
+                ecolor="lightgray",
+                capsize=3,
+            )
+            ax.annotate(
+                f"{row['model_name']} {row['image_size']}px",
+                (p50, row[metric]),
+                textcoords="offset points",
+                xytext=(5, 5),
+                fontsize=8,
+            )
+        front = sorted(
+            (r["latency_p50_ms"], r[metric]) for r in rows if r.get(f"pareto_{metric}")
+        )
+        if front:
+            ax.plot(*zip(*front), color="tab:red", linestyle="--", linewidth=1, label="Pareto front")
+            ax.legend(loc="best", fontsize=8)
+        direction = "higher" if higher_is_better else "lower"
+        ax.set_xlabel("ONNX CPU latency per image, p50 ms (bar to p99)")
+        ax.set_ylabel(f"test {metric} ({direction} is better)")
+        ax.set_title(f"{metric} vs latency")
+        ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=120, bbox_inches="tight")
+    plt.close(fig)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.run_dirs:
+        run_dirs = [Path(d) for d in args.run_dirs]
+        name = args.name or "runs"
+    else:
+        base_name = (yaml.safe_load(Path(args.config).read_text(encoding="utf-8")).get("run") or {}).get(
+            "name", Path(args.config).stem
+        )
+        name = args.name or str(base_name)
+        sweep_root = ensure_dir(Path(args.output_root) / f"{utc_timestamp()}_{slugify(name)}")
+        run_dirs = train_variants(args, sweep_root)
+
+    rows: list[dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for run_dir in run_dirs:
+            row = flatten_run(run_dir)
+            row.update(benchmark_run(run_dir, args, Path(tmp)))
+            rows.append(row)
+            print(json.dumps({"run_dir": str(run_dir), "latency_p50_ms": row["latency_p50_ms"]}))
+
+    target_types = {row["target_type"] for row in rows}
+    if len(target_types) != 1:
+        raise ValueError(f"Sweep mixes target types: {sorted(target_types)}")
+    target_type = target_types.pop()
+    for metric, higher_is_better in QUALITY_METRICS[target_type]:
+        for row, flag in zip(rows, pareto_front(rows, metric, higher_is_better)):
+            row[f"pareto_{metric}"] = flag
+    rows.sort(key=lambda r: r["latency_p50_ms"])
+
+    report_dir = ensure_dir(args.report_dir)
+    stem = f"pareto_{slugify(name)}"
+    report = {
+        "name": name,
+        "target_type": target_type,
+        "image_sizes": sorted({row["image_size"] for row in rows}),
+        "models": sorted({row["model_name"] for row in rows}),
+        "latency_threads": args.threads,
+        "latency_batch_size": 1,
+        "quality_metrics": [m for m, _ in QUALITY_METRICS[target_type]],
+        "runs": rows,
+    }
+    write_json(report_dir / f"{stem}.json", report)
+    write_csv(report_dir / f"{stem}.csv", rows)
+    plot_pareto(rows, target_type, report_dir / f"{stem}.png")
+    print(json.dumps({"ok": True, "report": str(report_dir / f"{stem}.json"), "runs": len(rows)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Tests for the webcam-grouped bootstrap in common/bootstrap.py."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from scipy.stats import pearsonr, spearmanr
+from sklearn.metrics import f1_score, roc_auc_score
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.bootstrap import (
+    cluster_bootstrap,
+    group_weights,
+    resample_index_matrix,
+    weighted_auc,
+    weighted_midranks,
+    weighted_pearson,
+)
+
+
+def _data(n=120, groups=15, seed=0):
+    rng = np.random.default_rng(seed)
+    g = rng.integers(0, groups, n)
+    y = rng.integers(0, 2, n)
+    scores = np.round(np.clip(0.3 * y + 0.7 * rng.random(n), 0, 1), 2)
+    t = np.round(rng.random(n), 2)
+    p = np.round(t + rng.normal(scale=0.2, size=n), 1)
+    return g, y, scores, t, p
+
+
+def _expanded(picks_row, codes):
+    """Explicit resample: indices of every sample of every picked group."""
+    return np.concatenate([np.flatnonzero(codes == grp) for grp in picks_row])
+
+
+def test_weights_equal_explicit_group_resample():
+    g, *_ = _data()
+    picks = resample_index_matrix(15, 5, seed=3)
+    w = group_weights(picks, g, 15)
+    for b in range(5):
+        idx = _expanded(picks[b], g)
+        assert np.array_equal(w[b], np.bincount(idx, minlength=len(g)))
+
+
+def test_weighted_statistics_match_reference_on_expanded_sample():
+    g, y, scores, t, p = _data()
+    picks = resample_index_matrix(15, 4, seed=1)
+    w = group_weights(picks, g, 15)
+    auc = weighted_auc(y, scores, w)
+    r = weighted_pearson(t, p, w)
+    rho = weighted_pearson(weighted_midranks(t, w), weighted_midranks(p, w), w)
+    for b in range(4):
+        idx = _expanded(picks[b], g)
+        assert auc[b] == pytest.approx(roc_auc_score(y[idx], scores[idx]))
+        assert r[b] == pytest.approx(pearsonr(t[idx], p[idx])[0])
+        assert rho[b] == pytest.approx(spearmanr(t[idx], p[idx])[0])
+
+
+def test_binary_intervals_bracket_point_estimate_and_are_reproducible():
+    g, y, scores, *_ = _data(n=400, groups=40)
+    pred = (scores >= 0.5).astype(int)
+    a = cluster_bootstrap("binary", y, pred, g, y_scores=scores, n_boot=300, seed=5, block_elements=5000)
+    b = cluster_bootstrap("binary", y, pred, g, y_scores=scores, n_boot=300, seed=5)
+    assert a == b
+    f1 = a["metrics"]["f1"]
+    assert f1["low"] < f1_score(y, pred) < f1["high"]
+    assert set(a["metrics"]) == {"precision", "recall", "f1", "balanced_accuracy", "auc"}
+    assert a["n_groups"] == 40
+
+
+def test_grouping_widens_intervals_for_correlated_frames():
+    rng = np.random.default_rng(0)
+    groups = np.repeat(np.arange(20), 30)
+    # Every frame of a webcam shares its error: 600 images, but 20 independent draws.
+    webcam_error = rng.normal(scale=0.3, size=20)[groups]
+    t = rng.random(600)
+    p = t + webcam_error
+    grouped = cluster_bootstrap("regression", t, p, groups, n_boot=400, seed=0)["metrics"]["mae"]
+    per_image = cluster_bootstrap("regression", t, p, np.arange(600), n_boot=400, seed=0)["metrics"]["mae"]
+    assert grouped["high"] - grouped["low"] > 2 * (per_image["high"] - per_image["low"])
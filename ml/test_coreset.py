@@ -0,0 +1,99 @@
+"""Tests for embedding coreset selection in common/coreset.py."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.coreset import (
+    cached_embeddings,
+    cluster_quotas,
+    cluster_stratified,
+    k_center_greedy,
+    select_indices,
+)
+
+
+def _blobs(sizes, dim=8, seed=0):
+    """Well separated clusters along different axes; returns (x, cluster id)."""
+    rng = np.random.default_rng(seed)
+    xs, ids = [], []
+    for c, size in enumerate(sizes):
+        center = np.zeros(dim)
+        center[c] = 10.0
+        xs.append(center + rng.normal(scale=0.1, size=(size, dim)))
+        ids.extend([c] * size)
+    return np.concatenate(xs), np.array(ids)
+
+
+def test_k_center_covers_rare_clusters():
+    x, ids = _blobs([500, 10, 5])
+    picked = k_center_greedy(x, 3, seed=1)
+    assert sorted(ids[picked].tolist()) == [0, 1, 2]
+
+
+def test_k_center_is_deterministic_and_unique():
+    x, _ = _blobs([50, 50])
+    a = k_center_greedy(x, 20, seed=7)
+    assert np.array_equal(a, k_center_greedy(x, 20, seed=7))
+    assert len(np.unique(a)) == 20
+
+
+def test_cluster_quotas_sum_and_caps():
+    quotas = cluster_quotas(np.array([900, 50, 3]), 60)
+    assert quotas.sum() == 60
+    assert quotas[2] <= 3
+    # sqrt weighting: the small cluster gets more than its uniform share.
+    assert quotas[1] / 60 > 50 / 953
+
+
+def test_cluster_stratified_returns_n_and_all_clusters():
+    x, ids = _blobs([400, 30, 30])
+    picked = cluster_stratified(x, 40, n_clusters=3, seed=0)
+    assert len(picked) == 40
+    assert set(ids[picked].tolist()) == {0, 1, 2}
+
+
+def test_subset_larger_than_pool_returns_everything():
+    x, _ = _blobs([5])
+    assert np.array_equal(select_indices("k_center", x, 10), np.arange(5))
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        select_indices("random", np.zeros((3, 2)), 2)
+
+
+def test_embedding_cache_only_embeds_missing_refs(tmp_path, monkeypatch):
+    import common.coreset as coreset
+
+    calls = []
+
+    def fake_embed(refs, *args):
+        calls.append(list(refs))
+        return np.array([[float(len(r)), 1.0] for r in refs])
+
+    monkeypatch.setattr(coreset, "_embed", fake_embed)
+    cache = tmp_path / "emb.npz"
+    first = cached_embeddings(["a", "bb"], None, cache)
+    second = cached_embeddings(["bb", "ccc", "a"], None, cache)
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert first.shape == (2, 2)
+    assert second[:, 0].tolist() == [2.0, 3.0, 1.0]
+
+
+def test_images_that_fail_to_load_get_nan_rows_and_are_not_cached(tmp_path, monkeypatch):
+    import common.coreset as coreset
+
+    def fake_embed(refs, load_image, *args):
+        return np.array([[float(len(r)), 1.0] if load_image(r) is not None else [np.nan, np.nan] for r in refs])
+
+    monkeypatch.setattr(coreset, "_embed", fake_embed)
+    cache = tmp_path / "emb.npz"
+    first = cached_embeddings(["a", "bad", "cc"], lambda ref: None if ref == "bad" else ref, cache)
+    assert np.isnan(first[1]).all() and first[[0, 2], 0].tolist() == [1.0, 2.0]
+    assert np.load(cache)["refs"].tolist() == ["a", "cc"]
+    second = cached_embeddings(["bad"], lambda ref: ref, cache)
+    assert second[0].tolist() == [3.0, 1.0]
@@ -0,0 +1,59 @@
+"""Tests for the torch/ONNX backends and parity check in evaluate.py."""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.models import build_model
+from common.onnx_utils import export_model, make_session
+from evaluate import metric_deltas, onnx_runner, parity_check, predictions_from_outputs, torch_runner
+
+
+def _args(**overrides):
+    values = {"onnx_model": "m.onnx", "onnx_threads": 1, "parity_tolerance": 1e-3}
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_binary_outputs_become_softmax_probabilities():
+    logits = np.array([[0.0, 0.0], [0.0, 10.0], [3.0, -3.0]], dtype=np.float32)
+    pred, probs = predictions_from_outputs(logits, "binary", 0.5)
+    assert pred == [1, 1, 0]
+    expected = torch.softmax(torch.from_numpy(logits), dim=1)[:, 1].numpy()
+    np.testing.assert_allclose(probs, expected, rtol=1e-6)
+
+
+def test_regression_outputs_are_the_single_column():
+    pred, probs = predictions_from_outputs(np.array([[0.25], [0.75]]), "regression", 0.5)
+    assert pred == [0.25, 0.75]
+    assert probs == []
+
+
+def test_metric_deltas_skip_p_values_and_non_floats():
+    base = {"mae": 0.2, "pearson_p": 0.01, "num_samples": 10}
+    other = {"mae": 0.25, "pearson_p": 0.5, "num_samples": 10}
+    assert metric_deltas(base, other) == {"mae": other["mae"] - base["mae"]}
+
+
+def test_exported_model_passes_parity_and_drift_fails(tmp_path):
+    torch.manual_seed(0)
+    model = build_model("resnet18", "regression").eval()
+    onnx_path = export_model(model, tmp_path / "model.onnx", image_size=64)
+    x = torch.rand(3, 3, 64, 64)
+    outputs = {
+        "torch": torch_runner(model, torch.device("cpu"))(x),
+        "onnx": onnx_runner(make_session(onnx_path))(x),
+    }
+    timings = {"torch": 1.0, "onnx": 0.5}
+    report = {"mae": 0.1}
+    result = parity_check(_args(), report, {"mae": 0.1}, outputs, timings)
+    assert result["passed"]
+    assert result["output_abs_diff_max"] < 1e-3
+    assert result["latency_ms_per_image"] == timings
+
+    outputs["onnx"] = outputs["onnx"] + 0.01
+    assert not parity_check(_args(), report, report, outputs, timings)["passed"]
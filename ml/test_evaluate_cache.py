@@ -0,0 +1,86 @@
+"""Tests for URL-cache reuse and hit reporting in evaluate.py."""
+import argparse
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import common.prefetch as prefetch
+from common.prefetch import url_cache_path, url_cache_state
+from evaluate import EvalDataset, build_eval_loader, image_cache_report
+
+
+def _jpeg() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), (200, 100, 50)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class _Resp:
+    content = _jpeg()
+
+    def raise_for_status(self) -> None:
+        pass
+
+
+def _manifest(tmp_path: Path, urls: list[str]) -> str:
+    path = tmp_path / "test.csv"
+    pd.DataFrame(
+        {"snapshot_id": range(len(urls)), "image_path_or_url": urls, "target_label": [1, 0, 1][: len(urls)]}
+    ).to_csv(path, index=False)
+    return str(path)
+
+
+def _args(**overrides) -> argparse.Namespace:
+    base = {"batch_size": 2, "num_workers": 0, "pin_memory": False, "prefetch_factor": 2,
+            "prefetch_lookahead": 4, "prefetch_threads": 2}
+    return argparse.Namespace(**{**base, **overrides})
+
+
+def test_cached_images_are_hits_and_misses_are_downloaded_once(tmp_path, monkeypatch):
+    calls = []
+
+    def get(url, timeout):
+        calls.append(url)
+        return _Resp()
+
+    monkeypatch.setattr(prefetch.requests, "get", get)
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    urls = ["https://img.example/a.jpg", "https://img.example/b.jpg", "https://img.example/a.jpg"]
+    # Training already fetched a.jpg into the shared layout.
+    url_cache_path(cache, urls[0]).write_bytes(_jpeg())
+
+    ds = EvalDataset(_manifest(tmp_path, urls), "binary", image_size=8, cache_dir=str(cache))
+    # No lookahead: the loader's own read is the only possible download.
+    loader = build_eval_loader(ds, _args(prefetch_lookahead=0))
+    before = url_cache_state(ds.records.image_refs.tolist(), ds.cache_root)
+    labels = [y for _, batch in loader for y in batch.tolist()]
+    report = image_cache_report(ds, loader, before)
+
+    assert labels == [1, 0, 1]
+    assert calls == ["https://img.example/b.jpg"]
+    assert report["unique_url_count"] == 2
+    assert report["hits"] == 1 and report["misses"] == 1
+    assert report["hit_rate"] == 0.5
+    assert report["cached_count_after"] == 2
+    assert report["prefetch"] == {"enabled": False}
+
+
+def test_prefetcher_is_used_only_with_a_cache_dir(tmp_path):
+    manifest = _manifest(tmp_path, ["https://img.example/a.jpg"])
+    cached = EvalDataset(manifest, "binary", image_size=8, cache_dir=str(tmp_path / "cache"))
+    assert build_eval_loader(cached, _args()).sampler.lookahead == 4
+
+
+def test_without_cache_dir_reports_disabled(tmp_path):
+    ds = EvalDataset(_manifest(tmp_path, ["https://img.example/a.jpg"]), "binary", image_size=8)
+    loader = build_eval_loader(ds, _args())
+    report = image_cache_report(ds, loader, url_cache_state(ds.records.image_refs.tolist(), ds.cache_root))
+    assert report["enabled"] is False
+    assert report["hit_rate"] is None
+    assert report["prefetch"] == {"enabled": False}
@@ -0,0 +1,35 @@
+"""Tests for multi-checkpoint evaluation helpers in evaluate.py."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from evaluate import ModelSpec, parse_model_spec, targets_for
+
+
+def test_model_spec_parsing_with_and_without_image_size():
+    assert parse_model_spec("v3=runs/a/best.pt:resnet18:regression", 224) == ModelSpec(
+        "v3", "runs/a/best.pt", "resnet18", "regression", 224
+    )
+    spec = parse_model_spec("bin=C:/runs/b/best.pt:mobilenet_v3_small:binary:160", 224)
+    assert spec.checkpoint == "C:/runs/b/best.pt"
+    assert spec.image_size == 160
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["best.pt:resnet18:regression", "x=best.pt:resnet18", "x=best.pt:nope:binary", "x=best.pt:resnet18:ordinal"],
+)
+def test_bad_model_specs_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_model_spec(text, 224)
+
+
+def test_binary_targets_from_scores_use_threshold():
+    scores = np.array([0.1, 0.75, 0.9])
+    assert targets_for(scores, "binary", 0.75) == [0, 1, 1]
+    assert targets_for(scores, "regression", 0.75) == [0.1, 0.75, 0.9]
+    assert targets_for(np.array([0.0, 1.0]), "binary", 0.75) == [0, 1]
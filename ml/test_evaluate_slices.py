@@ -0,0 +1,54 @@
+"""Tests for per-slice metrics in evaluate.py."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from evaluate import label_buckets, manifest_groups, slice_columns, slice_report
+
+
+def test_label_buckets_use_star_edges():
+    values = np.array([0.0, 0.2, 0.5, 0.8, 0.95, 1.0, 1.5, np.nan])
+    assert label_buckets(values).tolist() == ["1", "2", "3", "4", "5", "5", "unnormalized", "unnormalized"]
+
+
+def test_slices_respect_min_support_and_report_delta(tmp_path):
+    manifest = tmp_path / "manifest_test.csv"
+    pd.DataFrame(
+        {
+            "webcam_id": [1, 1, 1, 2, 2, 2, 3],
+            "phase": ["sunset"] * 4 + ["sunrise"] * 3,
+            "source": ["webcam"] * 6 + ["flickr"],
+            "label_value": [0.1, 0.9, 0.9, 0.1, 0.9, 0.1, 0.9],
+            "target_label": [0, 1, 1, 0, 1, 0, 1],
+        }
+    ).to_csv(manifest, index=False)
+    y_true = [0, 1, 1, 0, 1, 0, 1]
+    y_pred = [0, 1, 1, 1, 0, 0, 1]
+    rows = slice_report("binary", slice_columns(str(manifest)), y_true, y_pred, [], 3, {"f1": 0.75})
+    by_key = {(r["dimension"], r["value"]): r for r in rows}
+    assert ("source", "flickr") not in by_key  # 1 image < min support
+    assert by_key[("webcam_id", "1")]["f1"] == 1.0
+    assert by_key[("webcam_id", "1")]["delta_vs_overall"] == 0.25
+    assert by_key[("webcam_id", "2")]["f1"] == 0.0
+    assert by_key[("label_bucket", "5")]["n"] == 4
+    assert "auc" not in by_key[("phase", "sunset")]
+
+
+def test_external_images_are_their_own_bootstrap_clusters(tmp_path):
+    manifest = tmp_path / "manifest_test.csv"
+    pd.DataFrame(
+        {
+            "snapshot_id": [10, 11, 12, 1, 2, 3, 4],
+            "webcam_id": ["7", "7", "8", "flickr", "flickr", "flickr", "flickr"],
+            "source": ["webcam"] * 3 + ["flickr"] * 4,
+            "image_path_or_url": [f"https://img.example/{i}.jpg" for i in range(7)],
+        }
+    ).to_csv(manifest, index=False)
+    groups, unit = manifest_groups(str(manifest))
+    assert unit == "webcam_id"
+    assert groups.tolist() == ["7", "7", "8", "ext_1", "ext_2", "ext_3", "ext_4"]
+    assert len(set(groups)) == 6
@@ -0,0 +1,161 @@
+"""Parity of the vectorized export labelling with the row-at-a-time reference."""
+import hashlib
+import os
+import subprocess
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.labels import LabelPolicy
+from common.splits import SplitConfig, SplitTable, assign_split, assign_splits, external_group_keys, stable_bucket
+from export_dataset import (
+    ExportLabeling,
+    external_manifest_frame,
+    external_manifest_row,
+    load_llm_overrides,
+    webcam_manifest_frame,
+    webcam_manifest_row,
+)
+
+
+def _rows(n: int = 400) -> list[dict]:
+    rng = np.random.default_rng(3)
+    rows = []
+    for i in range(n):
+        kind = i % 4
+        # Normalized, raw 1-5, NUMERIC (Decimal) and missing human labels.
+        human = [float(rng.random()), float(rng.uniform(1, 5)), Decimal(f"{rng.uniform(1, 5):.2f}"), None][kind]
+        # Webcams without a location get no sun-position columns.
+        located = i % 5 != 0
+        rows.append(
+            {
+                "snapshot_id": 1000 + i,
+                "webcam_id": int(rng.integers(1, 40)),
+                "image_path_or_url": f"https://img.example/{i}.jpg",
+                "phase": "sunset",
+                "captured_at": f"2026-03-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:00+00:00",
+                "label_value": human,
+                "llm_quality": float(rng.random()) if i % 3 else None,
+                "rating_count": int(rng.integers(0, 5)),
+                "latitude": Decimal(f"{rng.uniform(-60, 60):.5f}") if located else None,
+                "longitude": Decimal(f"{rng.uniform(-180, 180):.5f}") if located else None,
+            }
+        )
+    return rows
+
+
+def _labeling(strategy: str, target_type: str, use_llm: bool = True) -> ExportLabeling:
+    return ExportLabeling(
+        label_source="manual_only",
+        merge_strategy=strategy,
+        llm_weight=0.7,
+        use_llm_labels=use_llm,
+        split=SplitConfig(),
+        policy=LabelPolicy(target_type=target_type, binary_threshold=0.75),
+    )
+
+
+def _assert_same(expected: list[dict], frame: pd.DataFrame) -> None:
+    # The row path leaves unknown sun-position values as None, the frame path as NaN.
+    records = [{k: None if isinstance(v, float) and np.isnan(v) else v for k, v in r.items()}
+               for r in frame.to_dict("records")]
+    assert records == expected
+
+
+@pytest.mark.parametrize("strategy", ["human_only", "llm_only", "human_override", "weighted_average"])
+@pytest.mark.parametrize("target_type", ["binary", "regression"])
+@pytest.mark.parametrize("llm_source", ["csv", "db"])
+def test_vectorized_webcam_labels_match_row_path(strategy, target_type, llm_source):
+    rows = _rows()
+    labeling = _labeling(strategy, target_type)
+    if llm_source == "csv":
+        overrides = {r["snapshot_id"]: float(r["llm_quality"]) for r in rows[::2] if r["llm_quality"] is not None}
+        row_overrides, frame_overrides = overrides, pd.Series(overrides, dtype=np.float64)
+    else:
+        row_overrides = frame_overrides = None
+
+    expected = [m for m in (webcam_manifest_row(r, labeling, row_overrides) for r in rows) if m is not None]
+    assert expected
+    _assert_same(expected, webcam_manifest_frame(pd.DataFrame(rows), labeling, frame_overrides))
+
+
+def test_without_llm_labels_human_values_pass_through():
+    rows = _rows()
+    labeling = _labeling("human_only", "regression", use_llm=False)
+    expected = [m for m in (webcam_manifest_row(r, labeling, {}) for r in rows) if m is not None]
+    _assert_same(expected, webcam_manifest_frame(pd.DataFrame(rows), labeling, pd.Series(dtype=np.float64)))
+
+
+def test_vectorized_external_labels_match_row_path():
+    rows = [
+        {"snapshot_id": i, "webcam_id": "flickr", "image_path_or_url": f"https://img.example/e{i}.jpg",
+         "phase": "sunset", "captured_at": "2026-03-01", "label_value": i / 50, "rating_count": 0,
+         "data_source": "flickr"}
+        for i in range(50)
+    ]
+    labeling = _labeling("llm_only", "binary")
+    _assert_same([external_manifest_row(r, labeling) for r in rows],
+                 external_manifest_frame(pd.DataFrame(rows), labeling))
+
+
+def test_assign_splits_matches_assign_split():
+    cfg = SplitConfig(seed=7, train_pct=60, val_pct=20, test_pct=20)
+    keys = [5, 9, 5, 123, 9, 77]
+    assert assign_splits(keys, cfg).tolist() == [assign_split(k, cfg) for k in keys]
+
+
+def test_stable_bucket_keeps_the_hexdigest_buckets():
+    for key in ["1", "42", "ext_7", "webcam-9"]:
+        legacy = int(hashlib.sha256(f"{key}|20260212".encode("utf-8")).hexdigest()[:8], 16) % 100
+        assert stable_bucket(key, 20260212) == legacy
+
+
+def test_external_splits_do_not_depend_on_the_hash_seed():
+    code = (
+        "from common.splits import SplitConfig, assign_splits, external_group_keys;"
+        "print(''.join(s[0] for s in assign_splits(external_group_keys(range(200)), SplitConfig())))"
+    )
+    outputs = {
+        subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent, capture_output=True, text=True,
+                       check=True, env={**os.environ, "PYTHONHASHSEED": seed}).stdout
+        for seed in ("1", "2")
+    }
+    assert len(outputs) == 1
+    assert external_group_keys([3, 10]).tolist() == ["ext_3", "ext_10"]
+
+
+def test_split_table_lookups_match_hashing(tmp_path):
+    path = tmp_path / "splits.csv"
+    cfg = SplitConfig(seed=7, train_pct=60, val_pct=20, test_pct=20)
+    keys = [5, 9, 5, "ext_3", 123]
+    table = SplitTable(path, cfg)
+    assert table.assign(keys).tolist() == assign_splits(keys, cfg).tolist()
+    assert table.stats()["groups_hashed"] == 4
+    table.save()
+    other = SplitTable(path, SplitConfig())
+    other.assign([5])
+    other.save()
+
+    reloaded = SplitTable(path, cfg)
+    assert len(reloaded) == 4
+    assert reloaded.assign(keys + [77]).tolist() == assign_splits(keys + [77], cfg).tolist()
+    assert (reloaded.looked_up, reloaded.hashed) == (4, 1)
+    assert len(SplitTable(path, SplitConfig())) == 1
+
+
+def test_load_llm_overrides_keeps_rated_webcam_rows(tmp_path):
+    path = tmp_path / "llm.csv"
+    pd.DataFrame(
+        {
+            "source_table": ["webcam", "webcam", "external", "webcam"],
+            "record_id": [1, 2, 3, 1],
+            "llm_quality": [0.4, None, 0.9, 0.6],
+        }
+    ).to_csv(path, index=False)
+    assert load_llm_overrides(str(path)) == {1: 0.6}
@@ -0,0 +1,324 @@
+"""Tests for the streaming manifest export in export_dataset.py."""
+import csv
+import datetime as dt
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.manifest import iter_manifest_rows, read_manifest
+from export_dataset import SplitManifestWriter, TargetSummary, stream_query
+
+
+def _row(i: int, split: str, target, source: str = "webcam") -> dict:
+    return {
+        "snapshot_id": i,
+        "webcam_id": i % 3,
+        "label_source": "manual_only",
+        "label_value": 0.5,
+        "target_label": target,
+        "split": split,
+        "image_path_or_url": f"https://img.example/{i}.jpg",
+        "phase": "sunset",
+        "captured_at": "2026-03-01 18:00:00",
+        "rating_count": 2,
+        "source": source,
+    }
+
+
+def test_rows_are_routed_to_split_files_with_running_stats(tmp_path):
+    rows = [_row(1, "train", 1), _row(2, "val", 0), _row(3, "train", 0, source="flickr")]
+    with SplitManifestWriter(tmp_path, "binary") as writer:
+        for row in rows:
+            writer.write(row)
+
+    with (tmp_path / "manifest_train.csv").open(newline="") as f:
+        assert [r["snapshot_id"] for r in csv.DictReader(f)] == ["1", "3"]
+    assert (tmp_path / "manifest_test.csv").read_text() == ""
+    assert [r["snapshot_id"] for r in iter_manifest_rows(tmp_path / "manifest_full.csv")] == ["1", "2", "3"]
+    assert list(iter_manifest_rows(tmp_path / "manifest_test.csv")) == []
+    assert writer.counts == {"total": 3, "train": 2, "val": 1, "test": 0, "webcam": 2, "external": 1}
+    dist = writer.target_distribution()
+    assert dist["full"] == {"count": 3, "negative": 2, "positive": 1, "positive_rate": 1 / 3}
+    assert dist["test"] == {"count": 0}
+
+
+def test_regression_summary_matches_batch_statistics():
+    values = [0.2, 0.9, 0.4, 0.0]
+    summary = TargetSummary("regression")
+    for v in values:
+        summary.add(v)
+    assert summary.as_dict() == {"count": 4, "min": 0.0, "max": 0.9, "mean": sum(values) / 4}
+
+
+class _NamedCursor:
+    def __init__(self, conn, name, cursor_factory):
+        conn.opened.append(name)
+        self.conn = conn
+        self.itersize = 2000
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        self.conn.itersize = self.itersize
+
+    def __iter__(self):
+        return iter([{"snapshot_id": 1}, {"snapshot_id": 2}])
+
+
+class _Conn:
+    def __init__(self):
+        self.opened = []
+        self.itersize = None
+
+    def cursor(self, name=None, cursor_factory=None):
+        return _NamedCursor(self, name, cursor_factory)
+
+
+def test_stream_query_uses_a_named_cursor_with_itersize():
+    conn = _Conn()
+    rows = stream_query(conn, "export_snapshots", "SELECT 1", {}, itersize=250)
+    assert conn.opened == []  # nothing runs until the export consumes the stream
+    assert list(rows) == [{"snapshot_id": 1}, {"snapshot_id": 2}]
+    assert conn.opened == ["export_snapshots"]
+    assert conn.itersize == 250
+
+
+class _FakeDb:
+    """Just enough of a psycopg2 connection for export_dataset.main()."""
+
+    def __init__(self, snapshots, watermark, changed_ids=()):
+        self.snapshots = snapshots
+        self.watermark = watermark
+        self.changed_ids = list(changed_ids)
+        self.only_ids = "unset"
+        self.rating_stats_statements = 0
+
+    def cursor(self, name=None, cursor_factory=None):
+        return _FakeCursor(self, name)
+
+    def set_session(self, **kwargs):
+        pass
+
+    def commit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _FakeCursor:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.name == "export_snapshots":
+            self.db.only_ids = params["only_ids"]
+            ids = params["only_ids"]
+            self.rows = [r for r in self.db.snapshots if ids is None or r["snapshot_id"] in ids]
+            self.description = [(key,) for key in self.rows[0]] if self.rows else None
+        elif "MAX(captured_at)" in query:
+            self.rows = [self.db.watermark]
+        elif "rating_stats" in query or query == "SELECT MAX(created_at) FROM webcam_snapshot_ratings":
+            # refresh_rating_stats: empty state, nothing to fold in.
+            self.db.rating_stats_statements += 1
+            self.rows = [(None,)]
+            self.rowcount = 0
+        else:
+            self.db.changed_query, self.db.changed_params = " ".join(query.split()), params
+            self.rows = [(i,) for i in self.db.changed_ids]
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return [tuple(r.values()) for r in batch]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+def _snapshot(i: int, rating: float) -> dict:
+    return {"snapshot_id": i, "webcam_id": i, "image_path_or_url": f"https://img.example/{i}.jpg", "phase": "sunset",
+            "captured_at": "2026-03-01", "label_value": rating, "rating_count": 2}
+
+
+def _run_export(monkeypatch, tmp_path, db, *extra):
+    import export_dataset
+
+    monkeypatch.setattr(export_dataset.psycopg2, "connect", lambda url: db)
+    monkeypatch.setattr(export_dataset, "utc_timestamp", lambda: f"2026030{len(list(tmp_path.glob('*')))}_000000")
+    argv = ["export_dataset.py", "--database-url", "x", "--output-dir", str(tmp_path), "--target-type",
+            "regression", "--no-progress", "--split-table", str(tmp_path.with_name(f"{tmp_path.name}_splits.csv")),
+            *extra]
+    monkeypatch.setattr(sys, "argv", argv)
+    export_dataset.main()
+    out = sorted(tmp_path.glob("*"))[-1]
+    return out, json.loads((out / "export_meta.json").read_text())
+
+
+def test_incremental_export_is_base_plus_delta(tmp_path, monkeypatch):
+    stamp = dt.datetime(2026, 3, 1, tzinfo=dt.timezone.utc)
+    wm = {"snapshot_captured_at": stamp, "snapshot_llm_rated_at": None, "rating_created_at": stamp}
+    first = [_snapshot(1, 0.2), _snapshot(2, 0.4), _snapshot(3, 0.6)]
+    base_dir, base_meta = _run_export(monkeypatch, tmp_path, _FakeDb(first, wm))
+    assert base_meta["export_mode"] == "full" and base_meta["watermark"]["rating_created_at"] == stamp.isoformat()
+
+    # Snapshot 2 got a new rating, 3 lost its rating, 4 is new.
+    later = [_snapshot(1, 0.2), _snapshot(2, 0.9), _snapshot(4, 0.5)]
+    db = _FakeDb(later, wm, changed_ids=[2, 3, 4])
+    out, meta = _run_export(monkeypatch, tmp_path, db, "--incremental-from", str(tmp_path))
+
+    assert sorted(db.only_ids) == [2, 3, 4]
+    # Ratings committed up to 10 minutes behind the stored watermark are re-queried.
+    assert "created_at > COALESCE(%(rating_created_at)s::timestamptz - %(lookback)s" in db.changed_query
+    assert db.changed_params["rating_created_at"] == stamp.isoformat()
+    assert db.changed_params["lookback"] == dt.timedelta(minutes=10)
+    assert meta["export_mode"] == "incremental"
+    assert meta["base_export"] == {"output_dir": str(base_dir), "content_hash": base_meta["content_hash"]}
+    assert meta["delta"] == {"changed_webcam_ids": 3, "changed_external_ids": 0, "base_rows_kept": 1, "delta_rows": 2}
+    full = {r["snapshot_id"]: float(r["label_value"]) for r in iter_manifest_rows(out / "manifest_full.csv")}
+    assert full == {"1": 0.2, "2": 0.9, "4": 0.5}
+    assert [r["snapshot_id"] for r in iter_manifest_rows(out / "manifest_delta.csv")] == ["2", "4"]
+    assert meta["content_hash"] != base_meta["content_hash"]
+
+
+def test_changed_parameters_fall_back_to_full_export(tmp_path, monkeypatch):
+    wm = {"snapshot_captured_at": None, "snapshot_llm_rated_at": None, "rating_created_at": None}
+    _run_export(monkeypatch, tmp_path, _FakeDb([_snapshot(1, 0.2)], wm))
+    db = _FakeDb([_snapshot(1, 0.2)], wm)
+    _, meta = _run_export(monkeypatch, tmp_path, db, "--incremental-from", str(tmp_path), "--seed", "7")
+    assert meta["export_mode"] == "full" and db.only_ids is None
+
+
+def test_parquet_export_with_csv_copy_and_incremental_base(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    wm = {"snapshot_captured_at": None, "snapshot_llm_rated_at": None, "rating_created_at": None}
+    base_dir, _ = _run_export(monkeypatch, tmp_path, _FakeDb([_snapshot(1, 0.2), _snapshot(2, 0.4)], wm),
+                              "--manifest-format", "parquet", "--csv-copy")
+    assert (base_dir / "manifest_full.parquet").exists() and (base_dir / "manifest_full.csv").exists()
+    assert read_manifest(base_dir / "manifest_full.parquet")["snapshot_id"].tolist() == [1, 2]
+
+    db = _FakeDb([_snapshot(2, 0.8)], wm, changed_ids=[2])
+    out, meta = _run_export(monkeypatch, tmp_path, db, "--manifest-format", "parquet", "--csv-copy",
+                            "--incremental-from", str(tmp_path))
+    assert meta["export_mode"] == "incremental" and meta["manifest_format"] == "parquet"
+    full = read_manifest(out / "manifest_full.parquet")
+    assert dict(zip(full["snapshot_id"], full["label_value"])) == {1: 0.2, 2: 0.8}
+
+
+def test_vectorized_and_row_pipelines_write_the_same_export(tmp_path, monkeypatch):
+    wm = {"snapshot_captured_at": None, "snapshot_llm_rated_at": None, "rating_created_at": None}
+    snapshots = [{**_snapshot(i, 0.1 * i), "webcam_id": i % 4, "llm_quality": 0.95 - 0.1 * i if i % 3 else None}
+                 for i in range(1, 10)]
+    args = ("--llm-labels-from-db", "--label-merge-strategy", "weighted_average", "--itersize", "2")
+    outputs = {}
+    for pipeline in ("rows", "vectorized"):
+        out, meta = _run_export(monkeypatch, tmp_path / pipeline, _FakeDb(snapshots, wm), *args,
+                                "--label-pipeline", pipeline)
+        outputs[pipeline] = (out, meta)
+
+    (rows_out, rows_meta), (vec_out, vec_meta) = outputs["rows"], outputs["vectorized"]
+    for name in ("full", "train", "val", "test"):
+        pd.testing.assert_frame_equal(read_manifest(rows_out / f"manifest_{name}.csv"),
+                                      read_manifest(vec_out / f"manifest_{name}.csv"))
+    assert rows_meta["counts"] == vec_meta["counts"] and vec_meta["counts"]["total"] == 9
+    assert rows_meta["llm_overrides_count"] == vec_meta["llm_overrides_count"] == 6
+    for split, dist in rows_meta["target_distribution"].items():
+        assert vec_meta["target_distribution"][split] == pytest.approx(dist)
+
+
+def test_repeat_export_reads_splits_from_the_table(tmp_path, monkeypatch):
+    wm = {"snapshot_captured_at": None, "snapshot_llm_rated_at": None, "rating_created_at": None}
+    snapshots = [{**_snapshot(i, 0.1 * i), "webcam_id": i % 4} for i in range(1, 10)]
+    first_dir, first = _run_export(monkeypatch, tmp_path, _FakeDb(snapshots, wm))
+    second_dir, second = _run_export(monkeypatch, tmp_path, _FakeDb(snapshots, wm))
+    assert (first["split_table"]["groups_hashed"], first["split_table"]["lookups"]) == (4, 0)
+    assert (second["split_table"]["groups_hashed"], second["split_table"]["lookups"]) == (0, 4)
+    assert second["content_hash"] == first["content_hash"]
+
+
+def test_solar_window_drops_frames_far_from_sunset(tmp_path, monkeypatch):
+    wm = {"snapshot_captured_at": None, "snapshot_llm_rated_at": None, "rating_created_at": None}
+    # London on 2026-06-21: sunset at about 20:22 UTC. Snapshot 5 has no webcam location.
+    times = {1: "20:00", 2: "21:30", 3: "12:00", 4: "19:30", 5: "12:00"}
+    snapshots = [{**_snapshot(i, 0.1 * i), "captured_at": f"2026-06-21 {t}:00+00:00",
+                  "latitude": 51.5074 if i != 5 else None, "longitude": -0.1278 if i != 5 else None}
+                 for i, t in times.items()]
+    for pipeline in ("rows", "vectorized"):
+        out, meta = _run_export(monkeypatch, tmp_path / pipeline, _FakeDb(snapshots, wm),
+                                "--max-minutes-from-sunset", "60", "--label-pipeline", pipeline)
+        full = read_manifest(out / "manifest_full.csv")
+        assert full["snapshot_id"].tolist() == [1, 4, 5]
+        assert full["minutes_from_sunset"].iloc[0] == pytest.approx(-22, abs=2)
+        assert full["minutes_from_sunset"].isna().tolist() == [False, False, True]
+        assert meta["solar_window"]["rows_dropped"] == 2
+
+
+class _RecordingConn:
+    def __init__(self):
+        self.statements = []
+        self.copies = []
+        self.commits = 0
+
+    def cursor(self):
+        return _RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+class _RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.statements.append((" ".join(query.split()), params))
+
+    def copy_expert(self, sql, file):
+        self.conn.copies.append((sql, file.read()))
+
+
+def test_training_run_labels_are_copied_in_chunks_and_merged_once():
+    from export_dataset import write_training_run_labels
+
+    rows = [{"snapshot_id": str(i), "label_value": f"0.{i}", "source": "webcam"} for i in range(1, 6)]
+    conn = _RecordingConn()
+    stats = write_training_run_labels(conn, 42, iter(rows), "manual_only", chunk_rows=2, progress=False)
+
+    assert [body for _, body in conn.copies] == ["1\t0.1\n2\t0.2\n", "3\t0.3\n4\t0.4\n", "5\t0.5\n"]
+    assert conn.statements[0][0].startswith("CREATE TEMP TABLE training_run_labels_stage")
+    merge, params = conn.statements[1]
+    assert merge.startswith("INSERT INTO model_training_snapshot_labels") and "ON CONFLICT" in merge
+    assert params == {"training_run_id": 42, "label_source": "manual_only"}
+    assert len(conn.statements) == 2 and conn.commits == 1
+    assert stats["rows"] == 5 and stats["chunks"] == 3 and stats["round_trips"] == 5
@@ -0,0 +1,63 @@
+"""Tests for progressive unfreezing in common/freezing.py."""
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.freezing import (
+    apply_unfreeze,
+    assign_param_groups,
+    optimizer_param_groups,
+    parse_unfreeze_schedule,
+    stage_to_cli,
+)
+from common.models import build_model
+
+
+def test_parse_schedule_and_cli_round_trip():
+    stages = parse_unfreeze_schedule(["layer4:2:1e-4", "rest:5"])
+    assert stages[0].module == "layer4" and stages[0].epoch == 2 and stages[0].learning_rate == 1e-4
+    assert stages[1].learning_rate is None
+    assert stage_to_cli({"module": "layer4", "epoch": 2, "learning_rate": 1e-4}) == "layer4:2:0.0001"
+
+
+@pytest.mark.parametrize("entry", ["layer4", "layer4:0", "head:2", ":3"])
+def test_parse_schedule_rejects_bad_entries(entry):
+    with pytest.raises(ValueError):
+        parse_unfreeze_schedule([entry])
+
+
+def test_groups_unfreeze_on_schedule():
+    model = build_model("resnet18", "regression")
+    stages = parse_unfreeze_schedule(["layer4:2:1e-4", "layer3:3"])
+    groups = assign_param_groups(model, "fc", stages)
+    assert set(groups) == {"head", "layer4", "layer3"}
+    # Without a 'rest' entry the stem and layer1/2 never train.
+    assert not model.conv1.weight.requires_grad
+
+    assert apply_unfreeze(groups, stages, 1) == ["head"]
+    assert not model.layer4[0].conv1.weight.requires_grad
+    assert apply_unfreeze(groups, stages, 3) == ["head", "layer4", "layer3"]
+    assert model.layer3[0].conv1.weight.requires_grad
+
+    param_groups = optimizer_param_groups(groups, stages, head_lr=1e-3, default_lr=5e-5)
+    assert {g["name"]: g["lr"] for g in param_groups} == {"head": 1e-3, "layer4": 1e-4, "layer3": 5e-5}
+
+
+def test_frozen_backbone_gets_no_gradients():
+    model = build_model("resnet18", "regression")
+    stages = parse_unfreeze_schedule(["layer4:2", "rest:3"])
+    groups = assign_param_groups(model, "fc", stages)
+    apply_unfreeze(groups, stages, 1)
+    model(torch.randn(2, 3, 64, 64)).sum().backward()
+    assert model.fc.weight.grad is not None
+    assert model.layer4[1].conv2.weight.grad is None
+    assert model.conv1.weight.grad is None
+
+
+def test_unknown_module_is_rejected():
+    with pytest.raises(AttributeError):
+        assign_param_groups(build_model("resnet18", "regression"), "fc", parse_unfreeze_schedule(["layer9:2"]))
@@ -0,0 +1,78 @@
+"""Tests for the typed manifest formats in common/manifest.py."""
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.manifest import (
+    SUFFIXES,
+    ManifestWriter,
+    iter_manifest_rows,
+    manifest_file,
+    read_manifest,
+    write_manifest,
+)
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "snapshot_id": [1694, None, 12],
+            "webcam_id": [3, 3, "flickr"],
+            "label_value": [0.25, 0.5, 1.0],
+            "target_label": [0, 0, 1],
+            "split": ["train", "val", "test"],
+            "image_path_or_url": ["a.jpg", "b.jpg", "https://img.example/c.jpg"],
+            "captured_at": ["2026-03-01 18:23:49.229384", "2026-03-02 06:00:00", "2026-03-03T07:00:00+00:00"],
+            "source": ["webcam", "webcam", "flickr"],
+        }
+    )
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "arrow"])
+def test_every_format_reads_back_with_the_same_types(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    path = tmp_path / f"manifest_test{SUFFIXES[fmt]}"
+    write_manifest(path, _frame())
+    df = read_manifest(path)
+    assert str(df["snapshot_id"].dtype) == "Int64"
+    assert df["snapshot_id"].tolist()[0] == 1694 and pd.isna(df["snapshot_id"].iloc[1])
+    assert df["webcam_id"].tolist() == ["3", "3", "flickr"]
+    assert str(df["captured_at"].dtype) == "datetime64[us, UTC]"
+    assert df["captured_at"].iloc[2] == pd.Timestamp("2026-03-03 07:00", tz="UTC")
+    assert df["target_label"].tolist() == [0.0, 0.0, 1.0]
+    assert read_manifest(path, columns=["webcam_id", "not_there"]).columns.tolist() == ["webcam_id"]
+    assert [str(r["image_path_or_url"]) for r in iter_manifest_rows(path)] == ["a.jpg", "b.jpg",
+                                                                              "https://img.example/c.jpg"]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_streaming_writer_batches_and_empty_files(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    rows = _frame().to_dict("records")
+    writer = ManifestWriter(tmp_path / f"manifest_train{SUFFIXES[fmt]}", columns=list(_frame().columns), batch_rows=2)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+    assert read_manifest(writer.path)["label_value"].tolist() == [0.25, 0.5, 1.0]
+
+    empty = ManifestWriter(tmp_path / f"manifest_val{SUFFIXES[fmt]}")
+    empty.close()
+    assert len(read_manifest(empty.path)) == 0
+
+
+def test_manifest_file_prefers_columnar_and_falls_back_to_csv(tmp_path):
+    assert manifest_file(tmp_path, "train") == tmp_path / "manifest_train.csv"
+    (tmp_path / "manifest_train.csv").write_text("")
+    (tmp_path / "manifest_train.parquet").write_bytes(b"")
+    assert manifest_file(tmp_path, "train") == tmp_path / "manifest_train.parquet"
+
+
+def test_unknown_suffix_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        read_manifest(tmp_path / "manifest.tsv")
@@ -0,0 +1,49 @@
+"""Tests for the array-backed manifest rows in common/manifest_records.py."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.manifest_records import ManifestRecords, StringColumn
+
+
+def _frame():
+    return pd.DataFrame(
+        {
+            "snapshot_id": [11, 12, 13],
+            "image_path_or_url": ["https://x/a.jpg", "/tmp/ünïcode.jpg", ""],
+            "target_label": [0.932, 0.0, 1.0],
+            "phase": ["sunset", "sunrise", "sunset"],
+        }
+    )
+
+
+def test_string_column_round_trips_unicode_and_empty():
+    values = ["https://x/a.jpg", "/tmp/ünïcode.jpg", ""]
+    col = StringColumn.from_strings(values)
+    assert len(col) == 3
+    assert col.tolist() == values
+    assert col.take([2, 0]).tolist() == ["", "https://x/a.jpg"]
+
+
+def test_records_rows_match_frame_exactly():
+    records = ManifestRecords.from_frame(_frame())
+    assert len(records) == 3
+    assert records.row(0) == ("https://x/a.jpg", 0.932)
+    assert records.snapshot_ids.dtype == np.int64
+
+
+def test_take_and_to_frame():
+    records = ManifestRecords.from_frame(_frame()).take([2, 1])
+    frame = records.to_frame()
+    assert frame["snapshot_id"].tolist() == [13, 12]
+    assert frame["image_path_or_url"].tolist() == ["", "/tmp/ünïcode.jpg"]
+    assert frame["target_label"].tolist() == [1.0, 0.0]
+
+
+def test_missing_snapshot_id_column_uses_sentinel():
+    records = ManifestRecords.from_frame(_frame().drop(columns=["snapshot_id"]))
+    assert records.snapshot_ids.tolist() == [-1, -1, -1]
@@ -0,0 +1,131 @@
+"""Parity tests: common/metrics.py against sklearn/scipy reference implementations."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from scipy.stats import pearsonr, spearmanr
+from sklearn.metrics import (
+    balanced_accuracy_score,
+    confusion_matrix,
+    f1_score,
+    precision_score,
+    recall_score,
+    roc_auc_score,
+    roc_curve,
+)
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.metrics import (
+    binary_curves,
+    confusion_at_thresholds,
+    confusion_from_labels,
+    derived_binary_counts,
+    downsample_curves,
+    rates,
+    regression_metrics,
+    roc_auc,
+)
+
+
+@pytest.fixture
+def binary_data():
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 2, 500)
+    # Rounded scores create plenty of ties, the case sklearn handles specially.
+    scores = np.round(np.clip(0.3 * y + rng.random(500) * 0.7, 0, 1), 2)
+    return y, scores
+
+
+def test_sweep_counts_and_rates_match_sklearn(binary_data):
+    y, scores = binary_data
+    thresholds = np.round(np.arange(0.0, 1.0001, 0.01), 6)
+    counts = confusion_at_thresholds(y, scores, thresholds)
+    got = rates(counts)
+    for i, thr in enumerate(thresholds):
+        pred = (scores >= thr).astype(int)
+        tn, fp, fn, tp = confusion_matrix(y, pred, labels=[0, 1]).ravel()
+        assert (counts["tn"][i], counts["fp"][i], counts["fn"][i], counts["tp"][i]) == (tn, fp, fn, tp)
+        assert got["precision"][i] == pytest.approx(precision_score(y, pred, zero_division=0))
+        assert got["recall"][i] == pytest.approx(recall_score(y, pred, zero_division=0))
+        assert got["f1"][i] == pytest.approx(f1_score(y, pred, zero_division=0))
+        assert got["balanced_accuracy"][i] == pytest.approx(balanced_accuracy_score(y, pred))
+
+
+def test_label_confusion_and_auc_match_sklearn(binary_data):
+    y, scores = binary_data
+    pred = (scores >= 0.5).astype(int)
+    tn, fp, fn, tp = confusion_matrix(y, pred, labels=[0, 1]).ravel()
+    assert confusion_from_labels(y, pred) == {"tn": tn, "fp": fp, "fn": fn, "tp": tp}
+    assert roc_auc(y, scores) == pytest.approx(roc_auc_score(y, scores))
+    assert roc_auc(np.ones(4), np.arange(4)) is None
+
+
+def test_roc_curve_points_match_sklearn(binary_data):
+    y, scores = binary_data
+    fpr, tpr, thr = roc_curve(y, scores, drop_intermediate=False)
+    curves = binary_curves(y, scores)
+    # sklearn prepends an (inf, 0, 0) point.
+    np.testing.assert_allclose(curves["thresholds"], thr[1:])
+    np.testing.assert_allclose(curves["fpr"], fpr[1:])
+    np.testing.assert_allclose(curves["tpr"], tpr[1:])
+
+
+def test_downsampled_curves_keep_both_ends(binary_data):
+    y, scores = binary_data
+    curves = binary_curves(y, scores)
+    thin = downsample_curves(curves, 20)
+    assert len(thin["thresholds"]) == 20
+    assert thin["thresholds"][0] == curves["thresholds"][0] and thin["recall"][-1] == 1.0
+    assert downsample_curves(curves, 10_000)["fpr"] == curves["fpr"].tolist()
+
+
+def test_regression_metrics_match_scipy():
+    rng = np.random.default_rng(1)
+    t = rng.random(200)
+    p = np.round(t + rng.normal(scale=0.2, size=200), 1)
+    got = regression_metrics(t, p)
+    r, pv = pearsonr(t, p)
+    rs, ps = spearmanr(t, p)
+    assert got["mae"] == pytest.approx(np.mean(np.abs(t - p)))
+    assert got["rmse"] == pytest.approx(np.sqrt(np.mean((t - p) ** 2)))
+    assert got["pearson_r"] == pytest.approx(r)
+    assert got["pearson_p"] == pytest.approx(pv, rel=1e-6, abs=1e-300)
+    assert got["spearman_r"] == pytest.approx(rs)
+    assert got["spearman_p"] == pytest.approx(ps, rel=1e-6, abs=1e-300)
+    assert "pearson_r" not in regression_metrics(t[:2], p[:2])
+
+
+def test_derived_counts_cut_truth_and_prediction():
+    rng = np.random.default_rng(2)
+    t, p = rng.random(300), rng.random(300)
+    thresholds = [0.2, 0.5, 0.75]
+    counts = derived_binary_counts(t, p, thresholds)
+    for i, thr in enumerate(thresholds):
+        tn, fp, fn, tp = confusion_matrix(t >= thr, p >= thr, labels=[False, True]).ravel()
+        assert (counts["tn"][i], counts["fp"][i], counts["fn"][i], counts["tp"][i]) == (tn, fp, fn, tp)
+
+
+def test_grouped_metrics_match_per_group_reference(binary_data):
+    from common.metrics import grouped_metrics
+
+    y, scores = binary_data
+    rng = np.random.default_rng(3)
+    keys = rng.choice(["a", "b", "c"], len(y))
+    pred = (scores >= 0.5).astype(int)
+    table = grouped_metrics("binary", keys, y, pred, scores)
+    for key in "abc":
+        m = keys == key
+        assert table.loc[key, "n"] == m.sum()
+        assert table.loc[key, "f1"] == pytest.approx(f1_score(y[m], pred[m], zero_division=0))
+        assert table.loc[key, "auc"] == pytest.approx(roc_auc_score(y[m], scores[m]))
+
+    t = rng.random(len(y))
+    p = np.round(t + rng.normal(scale=0.2, size=len(y)), 1)
+    table = grouped_metrics("regression", keys, t, p)
+    for key in "abc":
+        m = keys == key
+        assert table.loc[key, "mae"] == pytest.approx(np.mean(np.abs(t[m] - p[m])))
+        assert table.loc[key, "pearson_r"] == pytest.approx(pearsonr(t[m], p[m])[0])
+        assert table.loc[key, "spearman_r"] == pytest.approx(spearmanr(t[m], p[m])[0])
@@ -0,0 +1,43 @@
+"""Tests for the shared backbone registry in common/models.py."""
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.models import MODEL_NAMES, build_model, get_head, get_spec
+
+
+@pytest.mark.parametrize("name", MODEL_NAMES)
+def test_every_backbone_builds_with_task_head(name):
+    model = build_model(name, "regression").eval()
+    with torch.no_grad():
+        out = model(torch.zeros(1, 3, 64, 64))
+    assert out.shape == (1, 1)
+
+
+def test_binary_head_has_two_logits():
+    head = get_head(build_model("mobilenet_v3_small", "binary"), get_spec("mobilenet_v3_small"))
+    assert head.out_features == 2
+
+
+def test_dropout_head_layout_is_inferred_from_state_dict():
+    trained = build_model("efficientnet_b0", "regression", head_dropout=0.3)
+    state = trained.state_dict()
+    assert "classifier.1.1.weight" in state
+
+    rebuilt = build_model("efficientnet_b0", "regression", state_dict=state)
+    rebuilt.load_state_dict(state)
+
+
+def test_plain_head_state_dict_does_not_get_dropout_wrapper():
+    state = build_model("resnet18", "binary").state_dict()
+    rebuilt = build_model("resnet18", "binary", head_dropout=0.3, state_dict=state)
+    rebuilt.load_state_dict(state)
+
+
+def test_unknown_model_lists_valid_names():
+    with pytest.raises(ValueError, match="resnet18"):
+        get_spec("vgg16")
@@ -0,0 +1,126 @@
+"""Tests for the lookahead image prefetcher in common/prefetch.py."""
+import sys
+import threading
+from pathlib import Path
+
+import torch
+from torch.utils.data import SequentialSampler
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import common.prefetch as prefetch
+from common.prefetch import PrefetchingSampler, collate_skip_failed, failure_marker
+
+
+class _Resp:
+    def __init__(self, content: bytes, status: int = 200) -> None:
+        self.content = content
+        self.status = status
+
+    def raise_for_status(self) -> None:
+        if self.status != 200:
+            raise RuntimeError(f"HTTP {self.status}")
+
+
+def _fake_get(calls, lock):
+    def get(url, timeout):
+        with lock:
+            calls.append(url)
+        if "broken" in url:
+            return _Resp(b"", 404)
+        return _Resp(url.encode())
+
+    return get
+
+
+def _sampler(tmp_path, refs, lookahead=2):
+    return PrefetchingSampler(
+        SequentialSampler(range(len(refs))),
+        refs,
+        lambda url: tmp_path / (url.rsplit("/", 1)[-1] + ".jpg"),
+        lookahead=lookahead,
+        threads=2,
+    )
+
+
+def _wait_for(path: Path, timeout: float = 5.0) -> bool:
+    done = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if path.exists():
+            return True
+        done.wait(0.01)
+    return False
+
+
+def test_order_is_unchanged_and_each_image_is_fetched_before_use(tmp_path, monkeypatch):
+    calls, lock = [], threading.Lock()
+    monkeypatch.setattr(prefetch.requests, "get", _fake_get(calls, lock))
+    refs = [f"https://img.example/{i}" for i in range(6)] + ["/local/file.jpg", "https://img.example/0"]
+    sampler = _sampler(tmp_path, refs)
+    order = []
+    for idx in sampler:
+        order.append(idx)
+        if refs[idx].startswith("https://"):
+            # Stand-in for a loader worker: the image arrives without it downloading.
+            assert _wait_for(tmp_path / (refs[idx].rsplit("/", 1)[-1] + ".jpg"))
+    assert order == list(range(len(refs)))
+    assert sorted(calls) == sorted(set(refs) - {"/local/file.jpg"})
+    assert (tmp_path / "3.jpg").read_bytes() == b"https://img.example/3"
+
+
+def test_failed_download_leaves_marker_and_is_not_retried(tmp_path, monkeypatch):
+    calls, lock = [], threading.Lock()
+    monkeypatch.setattr(prefetch.requests, "get", _fake_get(calls, lock))
+    refs = ["https://img.example/broken"]
+    marker = failure_marker(tmp_path / "broken.jpg")
+    for _ in _sampler(tmp_path, refs):
+        assert _wait_for(marker)
+    assert not (tmp_path / "broken.jpg").exists()
+    second = _sampler(tmp_path, refs)
+    list(second)
+    assert calls == ["https://img.example/broken"]
+    assert second.stats()["downloaded"] == 0
+
+
+def test_failure_marker_expires_after_the_ttl(tmp_path, monkeypatch):
+    calls, lock = [], threading.Lock()
+    monkeypatch.setattr(prefetch.requests, "get", _fake_get(calls, lock))
+    cache_path = tmp_path / "flaky.jpg"
+    prefetch.record_failure(cache_path, TimeoutError("read timed out"))
+    assert prefetch.recent_failure(cache_path)
+    assert not prefetch.recent_failure(cache_path, ttl_sec=0)
+
+    # Past the TTL the URL is fetched again and a success clears the marker.
+    sampler = PrefetchingSampler(SequentialSampler([0]), ["https://img.example/flaky"], lambda url: cache_path,
+                                 failure_ttl_sec=0)
+    for _ in sampler:
+        assert _wait_for(cache_path)
+    assert calls == ["https://img.example/flaky"]
+    for _ in range(500):
+        if not failure_marker(cache_path).exists():
+            break
+        threading.Event().wait(0.01)
+    assert not failure_marker(cache_path).exists()
+
+
+def test_sampler_without_markers_neither_writes_nor_honours_them(tmp_path, monkeypatch):
+    calls, lock = [], threading.Lock()
+    monkeypatch.setattr(prefetch.requests, "get", _fake_get(calls, lock))
+    prefetch.record_failure(tmp_path / "1.jpg", TimeoutError("read timed out"))
+    sampler = PrefetchingSampler(SequentialSampler(range(2)), ["https://img.example/1", "https://img.example/broken"],
+                                 lambda url: tmp_path / (url.rsplit("/", 1)[-1] + ".jpg"), failure_markers=False)
+    for _ in sampler:
+        for _ in range(500):
+            if sampler.stats()["failed"] and (tmp_path / "1.jpg").exists():
+                break
+            threading.Event().wait(0.01)
+    assert sorted(calls) == ["https://img.example/1", "https://img.example/broken"]
+    assert not failure_marker(tmp_path / "broken.jpg").exists()
+
+
+def test_collate_skips_failed_samples():
+    batch = [(torch.zeros(3), 1), None, (torch.ones(3), 0)]
+    x, y = collate_skip_failed(batch)
+    assert x.shape == (2, 3)
+    assert y.tolist() == [1, 0]
+    assert collate_skip_failed([None, None]) is None
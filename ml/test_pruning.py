@@ -0,0 +1,59 @@
+"""Tests for structured channel pruning in common/pruning.py."""
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.models import build_model, count_params
+from common.pruning import apply_prune_spec, kept_channel_count, prune_model
+
+
+def test_kept_channel_count_rounds_up_to_multiple():
+    assert kept_channel_count(64, 0.5) == 32
+    assert kept_channel_count(64, 0.7, multiple=8) == 24
+    assert kept_channel_count(10, 0.99, multiple=8) == 8
+
+
+def test_kept_channel_count_rejects_full_sparsity():
+    with pytest.raises(ValueError):
+        kept_channel_count(64, 1.0)
+
+
+def test_pruning_shrinks_model_and_keeps_output_shape():
+    model = build_model("resnet18", "regression").eval()
+    before = count_params(model)
+    spec = prune_model(model, 0.5)
+    assert spec["layer1.0"] == 32
+    assert spec["layer4.1"] == 256
+    assert count_params(model) < before
+    with torch.no_grad():
+        assert model(torch.zeros(2, 3, 64, 64)).shape == (2, 1)
+
+
+def test_pruning_keeps_most_important_channels():
+    model = build_model("resnet18", "regression")
+    block = model.layer1[0]
+    with torch.no_grad():
+        block.bn1.weight.fill_(0.0)
+        block.bn1.weight[[5, 9]] = 1.0
+        expected = block.conv1.weight[[5, 9]].clone()
+    prune_model(model, 0.97)
+    assert torch.equal(model.layer1[0].conv1.weight, expected)
+
+
+def test_prune_spec_round_trips_into_fresh_model():
+    pruned = build_model("resnet18", "binary", head_dropout=0.3)
+    spec = prune_model(pruned, 0.25, channel_multiple=8)
+    state = pruned.state_dict()
+
+    fresh = build_model("resnet18", "binary", state_dict=state)
+    apply_prune_spec(fresh, spec)
+    fresh.load_state_dict(state)
+
+
+def test_non_resnet_backbone_is_rejected():
+    with pytest.raises(ValueError, match="BasicBlock"):
+        prune_model(build_model("mobilenet_v3_small", "binary"), 0.5)
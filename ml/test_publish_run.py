@@ -4,6 +4,7 @@ import unittest
 from pathlib import Path
 
 from ml.publish_run import (
+    build_manifest_entry,
     classify_status,
     slugify,
     update_manifest,
@@ -196,6 +197,43 @@ class TestBuildIndexJson(unittest.TestCase):
         self.assertEqual(idx["data"]["class_balance"]["negative"], 40)
         self.assertEqual(idx["data"]["class_balance"]["positive"], 60)
 
+    def test_bootstrap_intervals_are_forwarded(self):
+        ci = {"low": 0.74, "high": 0.86, "std": 0.03, "valid_replicates": 2000}
+        eval_report = {
+            "target_type": "binary",
+            "f1": 0.81,
+            "confusion": {"tn": 30, "fp": 10, "fn": 12, "tp": 48},
+            "bootstrap": {"unit": "webcam_id", "n_boot": 2000, "metrics": {"f1": ci}},
+        }
+        train_summary = {"target_type": "binary", "history": []}
+        idx = build_index_json(
+            slug="ci_run",
+            eval_report=eval_report,
+            train_summary=train_summary,
+            config={"target_type": "binary"},
+            published_at="2026-05-11T00:00:00Z",
+        )
+        self.assertEqual(idx["confidence_intervals"]["f1"], ci)
+        entry = build_manifest_entry(idx)
+        self.assertEqual(entry["best_metric_ci"], {"low": 0.74, "high": 0.86})
+
+    def test_worst_slices_rank_by_primary_metric_direction(self):
+        slices = [
+            {"dimension": "webcam_id", "value": "7", "primary_metric": "mae", "delta_vs_overall": 0.2},
+            {"dimension": "source", "value": "flickr", "primary_metric": "mae", "delta_vs_overall": 0.05},
+            {"dimension": "phase", "value": "sunrise", "primary_metric": "mae", "delta_vs_overall": -0.1},
+        ]
+        eval_report = {"target_type": "regression", "mae": 0.2, "slices": slices}
+        idx = build_index_json(
+            slug="slice_run",
+            eval_report=eval_report,
+            train_summary={"target_type": "regression", "history": []},
+            config={"target_type": "regression"},
+            published_at="2026-05-11T00:00:00Z",
+        )
+        self.assertEqual(len(idx["slices"]), 3)
+        self.assertEqual([s["value"] for s in idx["worst_slices"]], ["7", "flickr", "sunrise"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,54 @@
+"""Tests for QAT preparation and int8 QDQ ONNX export in common/quantization.py."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import onnx
+import torch
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.models import build_model
+from common.onnx_utils import export_model, make_session
+from common.quantization import build_qat_model, finalize_qdq_onnx, freeze_for_export, prepare_qat
+
+
+def _calibrated_qat_model(image_size: int = 64):
+    torch.manual_seed(0)
+    model = prepare_qat(build_model("resnet18", "regression"), image_size)
+    with torch.no_grad():
+        for _ in range(3):
+            model(torch.rand(4, 3, image_size, image_size))
+    return model
+
+
+def test_prepare_qat_folds_batchnorm():
+    model = _calibrated_qat_model()
+    assert not any(isinstance(m, torch.nn.BatchNorm2d) for m in model.modules())
+
+
+def test_qat_checkpoint_round_trips():
+    model = _calibrated_qat_model()
+    rebuilt = build_qat_model("resnet18", "regression", model.state_dict(), image_size=64)
+    x = torch.rand(2, 3, 64, 64)
+    freeze_for_export(model)
+    freeze_for_export(rebuilt)
+    with torch.no_grad():
+        assert torch.allclose(model(x), rebuilt(x))
+
+
+def test_finalized_qdq_model_has_int8_weights_and_matches_torch(tmp_path):
+    model = freeze_for_export(_calibrated_qat_model())
+    out = export_model(model, tmp_path / "model.int8.onnx", image_size=64)
+    finalize_qdq_onnx(out)
+
+    graph = onnx.load(out.as_posix()).graph
+    int8_inits = [i for i in graph.initializer if i.data_type == onnx.TensorProto.INT8]
+    assert int8_inits
+    assert not any(n.op_type == "BatchNormalization" for n in graph.node)
+
+    x = torch.rand(2, 3, 64, 64)
+    with torch.no_grad():
+        expected = model(x).numpy()
+    got = make_session(out).run(None, {"input": x.numpy()})[0]
+    np.testing.assert_allclose(got, expected, atol=0.05)
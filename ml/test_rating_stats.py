@@ -0,0 +1,118 @@
+"""Tests for the incremental rating-stats refresh and the queries that read the stats table."""
+import datetime as dt
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from audit_snapshot_integrity import build_snapshot_rows_query
+from common.rating_stats import refresh_rating_stats
+from export_dataset import build_snapshot_query
+from llm_rater import build_webcam_rows_query
+
+WATERMARK = dt.datetime(2026, 10, 1, 12, 0, tzinfo=dt.timezone.utc)
+LATEST = dt.datetime(2026, 10, 2, 8, 30, tzinfo=dt.timezone.utc)
+
+
+class _StatsConn:
+    def __init__(self, state, dirty=()):
+        self.state = state
+        self.dirty = [(snapshot_id,) for snapshot_id in dirty]
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return _StatsCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+class _StatsCursor:
+    rowcount = 17
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        query = " ".join(query.split())
+        self.conn.statements.append((query, params))
+        if query.startswith("SELECT watermark"):
+            self.result = self.conn.state
+        elif query.startswith("SELECT MAX(created_at)"):
+            self.result = (LATEST,)
+        elif query.startswith("DELETE FROM webcam_snapshot_rating_stats_dirty"):
+            self.result = self.conn.dirty
+
+    def fetchone(self):
+        return self.result
+
+    def fetchall(self):
+        return self.result
+
+
+def test_incremental_refresh_reaggregates_only_recent_snapshots():
+    conn = _StatsConn((WATERMARK,))
+    result = refresh_rating_stats(conn, lookback_minutes=10)
+
+    upsert, params = conn.statements[3]
+    assert upsert.startswith("INSERT INTO webcam_snapshot_rating_stats")
+    assert "WHERE created_at > %(since)s" in upsert
+    assert params == {"since": WATERMARK - dt.timedelta(minutes=10), "dirty": []}
+    assert conn.statements[4][1] == {"latest": LATEST} and conn.commits == 1
+    assert result["mode"] == "incremental" and result["snapshots_refreshed"] == 17
+    assert result["snapshots_removed"] == 0
+    assert result["watermark"] == LATEST.isoformat()
+
+
+@pytest.mark.parametrize("state,full", [((None,), False), ((WATERMARK,), True)])
+def test_full_rebuild_without_watermark_or_on_request(state, full):
+    conn = _StatsConn(state)
+    assert refresh_rating_stats(conn, full=full)["mode"] == "full"
+    queries = [q for q, _ in conn.statements]
+    assert "DELETE FROM webcam_snapshot_rating_stats" in queries
+    assert "%(since)s" not in queries[4]
+
+
+def test_incremental_refresh_reaggregates_snapshots_with_deleted_ratings():
+    conn = _StatsConn((WATERMARK,), dirty=[5, 9])
+    result = refresh_rating_stats(conn)
+
+    claim, upsert, delete, update = (q for q, _ in conn.statements[2:])
+    assert claim == "DELETE FROM webcam_snapshot_rating_stats_dirty RETURNING snapshot_id"
+    assert "OR r.snapshot_id = ANY(%(dirty)s)" in upsert
+    assert conn.statements[3][1]["dirty"] == [5, 9]
+    # Snapshots whose last rating was deleted lose their stats row.
+    assert delete.startswith("DELETE FROM webcam_snapshot_rating_stats s")
+    assert "NOT EXISTS" in delete and conn.statements[4][1] == {"dirty": [5, 9]}
+    assert update.startswith("UPDATE webcam_snapshot_rating_stats_state")
+    assert result["snapshots_removed"] == 17
+
+
+def test_refresh_requires_the_migration():
+    with pytest.raises(RuntimeError, match="20261019_snapshot_rating_stats.sql"):
+        refresh_rating_stats(_StatsConn(None))
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        build_snapshot_query("manual_only"),
+        build_snapshot_query("public_aggregate"),
+        build_snapshot_query("manual_only", "llm_only", llm_labels_from_db=True),
+        build_snapshot_rows_query("captured_desc", 0),
+        build_webcam_rows_query(skip_rated=True, limit=50),
+    ],
+)
+def test_readers_join_the_stats_table_instead_of_aggregating_ratings(query):
+    assert "webcam_snapshot_rating_stats" in query
+    assert "webcam_snapshot_ratings" not in query and "GROUP BY" not in query
@@ -0,0 +1,48 @@
+"""Tests for the vectorized sun-position features in common/solar.py."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.solar import SOLAR_COLUMNS, solar_position, solar_window_mask
+
+LONDON = (51.5074, -0.1278)
+
+
+def test_london_midsummer_matches_published_times():
+    # Sunset 21:22 BST (20:22 UTC), sunrise 04:43 BST, noon elevation about 62 degrees.
+    solar = solar_position([LONDON[0]] * 3, [LONDON[1]] * 3,
+                           ["2026-06-21 20:22:00Z", "2026-06-21 03:43:00Z", "2026-06-21 12:02:00Z"])
+    assert list(solar) == SOLAR_COLUMNS
+    assert solar["minutes_from_sunset"][0] == pytest.approx(0, abs=2)
+    assert solar["minutes_from_sunrise"][1] == pytest.approx(0, abs=2)
+    assert solar["sun_elevation_deg"][0] == pytest.approx(-0.833, abs=0.3)
+    assert solar["sun_elevation_deg"][2] == pytest.approx(62.0, abs=0.5)
+    assert solar["sun_azimuth_deg"][2] == pytest.approx(180, abs=3)
+    assert solar["sun_azimuth_deg"][0] == pytest.approx(309, abs=3)
+
+
+def test_minutes_are_signed_and_wrapped_to_half_a_day():
+    solar = solar_position([LONDON[0]] * 2, [LONDON[1]] * 2, ["2026-06-21 19:22:00Z", "2026-06-21 23:22:00Z"])
+    assert solar["minutes_from_sunset"] == pytest.approx([-60, 180], abs=2)
+    assert np.all(np.abs(solar["minutes_from_sunrise"]) <= 720)
+
+
+def test_missing_location_time_and_polar_day_are_nan():
+    solar = solar_position([None, LONDON[0], 78.2], [LONDON[1], LONDON[1], 15.6],
+                           ["2026-06-21 12:00:00Z", None, "2026-06-21 12:00:00Z"])
+    assert np.isnan(solar["sun_elevation_deg"][:2]).all()
+    # Svalbard in June: the sun is up, but there is no sunset that day.
+    assert solar["sun_elevation_deg"][2] > 0
+    assert np.isnan(solar["minutes_from_sunset"][2]) and np.isnan(solar["minutes_from_sunrise"][2])
+
+
+def test_window_mask_keeps_either_window_and_unknown_rows():
+    sunset = np.array([-30.0, 200.0, 400.0, np.nan])
+    sunrise = np.array([500.0, 400.0, 10.0, np.nan])
+    assert solar_window_mask(sunset, sunrise).tolist() == [True] * 4
+    assert solar_window_mask(sunset, sunrise, 60).tolist() == [True, False, False, True]
+    assert solar_window_mask(sunset, sunrise, 60, 30).tolist() == [True, False, True, True]
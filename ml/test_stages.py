@@ -0,0 +1,126 @@
+"""Tests for run_experiment stage fingerprints and output reuse."""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common import stages
+from common.stages import STAGES_FILE, StageCache, code_version, stage_fingerprint
+
+
+def _run_dir(root: Path, name: str) -> Path:
+    run_dir = root / name
+    (run_dir / "dataset").mkdir(parents=True)
+    (run_dir / "dataset" / "manifest_train.csv").write_text("snapshot_id\n1\n", encoding="utf-8")
+    (run_dir / "eval").mkdir()
+    return run_dir
+
+
+def _eval_cmd(run_dir: Path, threshold: str = "0.5") -> list[str]:
+    return [sys.executable, "ml/evaluate.py", "--test-manifest", str(run_dir / "dataset" / "manifest_train.csv"),
+            "--decision-threshold", threshold, "--output", str(run_dir / "eval" / "eval_report.json"),
+            "--no-progress"]
+
+
+def test_fingerprint_follows_input_content_not_run_paths(tmp_path):
+    first, second = _run_dir(tmp_path, "20260101_000000_a"), _run_dir(tmp_path, "20260102_000000_a")
+    fp = stage_fingerprint(_eval_cmd(first), first, "evaluate.py")
+    assert stage_fingerprint(_eval_cmd(second)[:-1], second, "evaluate.py") == fp
+    assert stage_fingerprint(_eval_cmd(second) + ["--split-table", str(second / "dataset" / "manifest_train.csv")],
+                             second, "evaluate.py") == fp
+    assert stage_fingerprint(_eval_cmd(second, "0.4"), second, "evaluate.py") != fp
+
+    (second / "dataset" / "manifest_train.csv").write_text("snapshot_id\n2\n", encoding="utf-8")
+    assert stage_fingerprint(_eval_cmd(second), second, "evaluate.py") != fp
+
+
+def test_code_version_covers_imported_common_modules(tmp_path, monkeypatch):
+    (tmp_path / "common").mkdir()
+    (tmp_path / "stage.py").write_text("from common.a import f\n", encoding="utf-8")
+    (tmp_path / "common" / "a.py").write_text("from common.b import g\n", encoding="utf-8")
+    (tmp_path / "common" / "b.py").write_text("g = 1\n", encoding="utf-8")
+    (tmp_path / "common" / "unused.py").write_text("h = 1\n", encoding="utf-8")
+    monkeypatch.setattr(stages, "ML_DIR", tmp_path)
+
+    before = code_version("stage.py")
+    (tmp_path / "common" / "unused.py").write_text("h = 2\n", encoding="utf-8")
+    assert code_version("stage.py") == before
+    (tmp_path / "common" / "b.py").write_text("g = 2\n", encoding="utf-8")
+    assert code_version("stage.py") != before
+
+
+def _write_report(run_dir: Path, calls: list) -> None:
+    calls.append(run_dir.name)
+    (run_dir / "eval" / "eval_report.json").write_text('{"f1": 0.5}', encoding="utf-8")
+
+
+def test_matching_stage_is_hardlinked_from_the_earlier_run(tmp_path):
+    calls = []
+    first = _run_dir(tmp_path, "20260101_000000_a")
+    cache = StageCache(tmp_path, first)
+    fp = stage_fingerprint(_eval_cmd(first), first, "evaluate.py")
+    assert cache.run("evaluate", fp, [first / "eval"], lambda: _write_report(first, calls)) == "computed"
+    assert json.loads((first / STAGES_FILE).read_text())["evaluate"]["outputs"] == ["eval/eval_report.json"]
+
+    second = _run_dir(tmp_path, "20260102_000000_a")
+    cache = StageCache(tmp_path, second)
+    fp2 = stage_fingerprint(_eval_cmd(second), second, "evaluate.py")
+    assert cache.run("evaluate", fp2, [second / "eval"], lambda: _write_report(second, calls)) == "reused"
+    assert calls == [first.name]
+    assert (second / "eval" / "eval_report.json").stat().st_ino == (first / "eval" / "eval_report.json").stat().st_ino
+    assert cache.records["evaluate"]["reused_from"] == str(first)
+
+    third = _run_dir(tmp_path, "20260103_000000_a")
+    cache = StageCache(tmp_path, third)
+    fp3 = stage_fingerprint(_eval_cmd(third, "0.3"), third, "evaluate.py")
+    assert cache.run("evaluate", fp3, [third / "eval"], lambda: _write_report(third, calls)) == "computed"
+
+    fourth = _run_dir(tmp_path, "20260104_000000_a")
+    cache = StageCache(tmp_path, fourth, reuse=False)
+    assert cache.run("evaluate", fp2, [fourth / "eval"], lambda: _write_report(fourth, calls)) == "computed"
+    assert calls == [first.name, third.name, fourth.name]
+
+
+def test_missing_outputs_or_fingerprint_force_a_run(tmp_path):
+    calls = []
+    first = _run_dir(tmp_path, "20260101_000000_a")
+    StageCache(tmp_path, first).run("evaluate", "fp", [first / "eval"], lambda: _write_report(first, calls))
+    (first / "eval" / "eval_report.json").unlink()
+
+    second = _run_dir(tmp_path, "20260102_000000_a")
+    assert StageCache(tmp_path, second).run("evaluate", "fp", [second / "eval"],
+                                            lambda: _write_report(second, calls)) == "computed"
+    third = _run_dir(tmp_path, "20260103_000000_a")
+    assert StageCache(tmp_path, third).run("evaluate", None, [third / "eval"],
+                                           lambda: _write_report(third, calls)) == "computed"
+    assert calls == [first.name, second.name, third.name]
+
+
+def test_in_process_run_cmd_calls_main_with_parsed_argv(tmp_path, monkeypatch, capsys):
+    import run_experiment
+
+    (tmp_path / "fake_stage.py").write_text(
+        "import argparse, json\n"
+        "def parse_args(argv=None):\n"
+        "    parser = argparse.ArgumentParser()\n"
+        "    parser.add_argument('--value', type=int)\n"
+        "    return parser.parse_args(argv)\n"
+        "def main(args=None):\n"
+        "    print(json.dumps({'ok': True, 'value': args.value}))\n",
+        encoding="utf-8",
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    run_experiment.run_cmd([sys.executable, "ml/fake_stage.py", "--value", "3"], in_process=True)
+    lines = capsys.readouterr().out.splitlines()
+    assert json.loads(lines[0])["cmd"][1] == "ml/fake_stage.py"
+    assert json.loads(lines[1]) == {"ok": True, "value": 3}
+
+
+def test_stage_scripts_parse_an_explicit_argv():
+    import export_dataset
+    import plot_diagnostics
+
+    args = export_dataset.parse_args(["--database-url", "x", "--llm-labels-from-db", "--itersize", "7"])
+    assert (args.itersize, args.label_merge_strategy) == (7, "llm_only")
+    assert plot_diagnostics.parse_args(["--run-dir", "r1", "--run-dir", "r2"]).run_dirs == ["r1", "r2"]
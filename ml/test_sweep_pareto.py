@@ -0,0 +1,39 @@
+"""Tests for the Pareto-front and config helpers in sweep_pareto.py."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sweep_pareto import pareto_front, variant_config
+
+
+def _row(p50, **metrics):
+    return {"latency_p50_ms": p50, **metrics}
+
+
+def test_pareto_front_higher_is_better():
+    rows = [
+        _row(30.0, pearson_r=0.85),  # best quality
+        _row(10.0, pearson_r=0.80),  # faster, slightly worse: on front
+        _row(12.0, pearson_r=0.78),  # slower and worse than the 10 ms row
+        _row(5.0, pearson_r=0.60),   # fastest: on front
+    ]
+    assert pareto_front(rows, "pearson_r", higher_is_better=True) == [True, True, False, True]
+
+
+def test_pareto_front_lower_is_better_and_missing_metric():
+    rows = [_row(10.0, mae=0.12), _row(8.0, mae=0.15), _row(9.0, mae=0.16), _row(1.0, mae=None)]
+    assert pareto_front(rows, "mae", higher_is_better=False) == [True, True, False, False]
+
+
+def test_pareto_front_keeps_ties():
+    rows = [_row(10.0, f1=0.7), _row(10.0, f1=0.7)]
+    assert pareto_front(rows, "f1", higher_is_better=True) == [True, True]
+
+
+def test_variant_config_does_not_mutate_base():
+    base = {"run": {"name": "v4"}, "model": {"name": "resnet18", "epochs": 5}}
+    variant = variant_config(base, "mobilenet_v3_large", 160)
+    assert variant["run"]["name"] == "v4_mobilenet_v3_large_160px"
+    assert variant["model"] == {"name": "mobilenet_v3_large", "epochs": 5, "image_size": 160}
+    assert base["model"]["name"] == "resnet18"
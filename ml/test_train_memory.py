@@ -0,0 +1,111 @@
+"""Tests for gradient accumulation and gradient checkpointing in training."""
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common.models import build_model, enable_gradient_checkpointing
+from train import peak_memory_mb, train_one_epoch
+
+
+def _batches(n, batch_size, seed=0):
+    g = torch.Generator().manual_seed(seed)
+    return [
+        (torch.randn(batch_size, 4, generator=g), torch.randn(batch_size, generator=g))
+        for _ in range(n)
+    ]
+
+
+class _Linear(nn.Module):
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.fc = nn.Linear(4, 1)
+
+    def forward(self, x):
+        return self.fc(x)
+
+
+def _train(batches, accum_steps):
+    model = _Linear()
+    optimizer = optim.SGD(model.parameters(), lr=0.1)
+    train_one_epoch(
+        model, batches, nn.MSELoss(), optimizer, torch.device("cpu"), "regression",
+        show_progress=False, accum_steps=accum_steps,
+    )
+    return model.fc.weight.detach().clone()
+
+
+def test_accumulation_matches_one_large_batch():
+    micro = _batches(4, 2)
+    big = [(torch.cat([x for x, _ in micro]), torch.cat([y for _, y in micro]))]
+    assert torch.allclose(_train(micro, accum_steps=4), _train(big, accum_steps=1), atol=1e-6)
+
+
+def test_trailing_partial_group_is_stepped():
+    micro = _batches(3, 2)
+    expected = _train([micro[0], micro[1]], accum_steps=2)
+    tail = [(torch.cat([micro[0][0], micro[1][0]]), torch.cat([micro[0][1], micro[1][1]])), micro[2]]
+    assert not torch.equal(_train(micro, accum_steps=2), expected)
+    assert torch.allclose(_train(micro, accum_steps=2), _train(tail, accum_steps=1), atol=1e-6)
+
+
+def test_group_ending_in_a_failed_batch_is_still_stepped():
+    micro = _batches(4, 2)
+    # Second micro-batch of the first group failed entirely.
+    with_gap = [micro[0], None, micro[2], micro[3]]
+    model = _Linear()
+    optimizer = optim.SGD(model.parameters(), lr=0.1)
+    stats = {}
+    loss = train_one_epoch(
+        model, with_gap, nn.MSELoss(), optimizer, torch.device("cpu"), "regression",
+        show_progress=False, accum_steps=2, stats=stats,
+    )
+    assert stats == {"batches": 3, "skipped_batches": 1, "samples": 6}
+    assert all(p.grad is None or not p.grad.any() for p in model.parameters())
+
+    # Same updates as stepping micro[0] alone (at half scale), then micro[2:4] as a group.
+    reference = _Linear()
+    ref_opt = optim.SGD(reference.parameters(), lr=0.1)
+    (nn.MSELoss()(reference(micro[0][0]), micro[0][1].unsqueeze(1)) / 2).backward()
+    ref_opt.step()
+    ref_opt.zero_grad()
+    expected_loss = 0.0
+    with torch.no_grad():
+        expected_loss += nn.MSELoss()(_Linear()(micro[0][0]), micro[0][1].unsqueeze(1)).item()
+    for x, y in micro[2:]:
+        batch_loss = nn.MSELoss()(reference(x), y.unsqueeze(1))
+        expected_loss += batch_loss.item()
+        (batch_loss / 2).backward()
+    ref_opt.step()
+    assert torch.allclose(model.fc.weight, reference.fc.weight, atol=1e-6)
+    assert loss == pytest.approx(expected_loss / 3, rel=1e-5)
+
+
+def test_gradient_checkpointing_keeps_gradients_and_state_dict():
+    torch.manual_seed(0)
+    plain = build_model("resnet18", "regression")
+    ckpt = build_model("resnet18", "regression")
+    ckpt.load_state_dict(plain.state_dict())
+    assert enable_gradient_checkpointing(ckpt, "resnet18") == 8
+    assert list(ckpt.state_dict()) == list(plain.state_dict())
+
+    x = torch.randn(2, 3, 64, 64)
+    for model in (plain, ckpt):
+        model.train()  # checkpointing only engages in train mode
+        model(x).sum().backward()
+    for (name, p), q in zip(plain.named_parameters(), ckpt.parameters()):
+        assert torch.allclose(p.grad, q.grad, atol=1e-5), name
+
+
+def test_mps_allocation_is_not_reported_as_a_peak(monkeypatch):
+    monkeypatch.setattr(torch.mps, "driver_allocated_memory", lambda: 5 * 1024 * 1024)
+    memory = peak_memory_mb(torch.device("mps"))
+    assert memory["device_peak_mb"] is None
+    assert memory["mps_allocated_mb"] == 5.0
+    assert memory["process_peak_rss_mb"] > 0
@@ -8,18 +8,19 @@ Flow:
 1) Load train/val manifests
 2) Build transfer-learning model
 3) Train epoch loop with validation
+   (optional: last N epochs as quantization-aware training, --qat-epochs)
 4) Save best checkpoint + summary artifact
 """
 
 import argparse
-import hashlib
 import io
 import json
 import random
+import resource
+import sys
 import time
 from pathlib import Path
 from typing import Callable
-from urllib.parse import urlparse
 
 import numpy as np
 import pandas as pd
@@ -28,10 +29,34 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 from PIL import Image
-from sklearn.metrics import f1_score
-from torch.utils.data import DataLoader, Dataset, WeightedRandomSampler
+from torch.utils.data import DataLoader, Dataset, RandomSampler, SequentialSampler, WeightedRandomSampler
 from tqdm.auto import tqdm
-from torchvision import models, transforms
+from torchvision import transforms
+
+from common.coreset import STRATEGIES as SUBSET_STRATEGIES
+from common.coreset import cached_embeddings, select_indices
+from common.freezing import (
+    apply_unfreeze,
+    assign_param_groups,
+    optimizer_param_groups,
+    parse_unfreeze_schedule,
+)
+from common.manifest import read_manifest
+from common.manifest_records import ManifestRecords
+from common.metrics import confusion_from_labels, rates
+from common.models import MODEL_NAMES, build_model, enable_gradient_checkpointing, get_spec
+from common.prefetch import (
+    FAILURE_TTL_SEC,
+    PrefetchingSampler,
+    collate_skip_failed,
+    download_to_cache,
+    failure_marker,
+    recent_failure,
+    record_failure,
+    url_cache_path,
+    url_cache_state,
+)
+from common.quantization import prepare_qat
 
 
 class ManifestDataset(Dataset):
@@ -46,59 +71,51 @@ class ManifestDataset(Dataset):
         seed: int = 20260212,
         cache_urls: bool = False,
         cache_dir: str = "",
+        skip_failed: bool = False,
+        failure_ttl_sec: float = FAILURE_TTL_SEC,
     ) -> None:
-        self.df = pd.read_csv(csv_path)
-        if max_samples > 0 and len(self.df) > max_samples:
+        df = read_manifest(csv_path)
+        if max_samples > 0 and len(df) > max_samples:
             # Deterministic sub-sampling for fast pilot runs.
-            self.df = self.df.sample(n=max_samples, random_state=seed).reset_index(drop=True)
+            df = df.sample(n=max_samples, random_state=seed).reset_index(drop=True)
+        # Flat arrays instead of the DataFrame so forked workers do not
+        # copy the manifest page by page (see common/manifest_records.py).
+        self.records = ManifestRecords.from_frame(df)
         self.transform = transform
         self.target_type = target_type
         self.cache_urls = cache_urls
         self.cache_root = Path(cache_dir) if cache_dir else None
         if self.cache_urls and self.cache_root is not None:
             self.cache_root.mkdir(parents=True, exist_ok=True)
+        # Return None for unloadable images (dropped by collate_skip_failed)
+        # instead of failing the epoch.
+        self.skip_failed = skip_failed
+        self.failure_ttl_sec = failure_ttl_sec
 
     def __len__(self) -> int:
-        return len(self.df)
+        return len(self.records)
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """snapshot_id / image_path_or_url / target_label frame (built on each access)."""
+        return self.records.to_frame()
+
+    def select_rows(self, indices) -> None:
+        """Keep only `indices` (positional) of the manifest."""
+        self.records = self.records.take(indices)
 
     def _cache_path_for_url(self, image_ref: str) -> Path:
-        parsed = urlparse(image_ref)
-        ext = Path(parsed.path).suffix.lower()
-        if ext not in {".jpg", ".jpeg", ".png", ".webp"}:
-            ext = ".jpg"
-        digest = hashlib.sha256(image_ref.encode("utf-8")).hexdigest()
-        return (self.cache_root or Path(".")) / f"{digest}{ext}"
+        return url_cache_path(self.cache_root or Path("."), image_ref)
 
     def url_cache_state(self) -> dict:
-        url_series = self.df["image_path_or_url"].astype(str)
-        urls = [u for u in url_series.tolist() if u.startswith("http://") or u.startswith("https://")]
-        unique_urls = sorted(set(urls))
-        if not self.cache_urls or self.cache_root is None:
-            return {
-                "enabled": False,
-                "unique_url_count": len(unique_urls),
-                "cached_count": 0,
-                "missing_count": len(unique_urls),
-            }
-
-        cached_count = 0
-        for url in unique_urls:
-            if self._cache_path_for_url(url).exists():
-                cached_count += 1
-        return {
-            "enabled": True,
-            "cache_dir": str(self.cache_root),
-            "unique_url_count": len(unique_urls),
-            "cached_count": cached_count,
-            "missing_count": len(unique_urls) - cached_count,
-        }
+        cache_root = self.cache_root if self.cache_urls else None
+        return url_cache_state(self.records.image_refs.tolist(), cache_root)
 
     def warm_url_cache(self, show_progress: bool = True) -> dict:
         if not self.cache_urls or self.cache_root is None:
             return {"enabled": False, "downloaded": 0, "failed": 0}
         before = self.url_cache_state()
-        url_series = self.df["image_path_or_url"].astype(str)
-        urls = [u for u in url_series.tolist() if u.startswith("http://") or u.startswith("https://")]
+        urls = [u for u in self.records.image_refs.tolist() if u.startswith("http://") or u.startswith("https://")]
         unique_urls = sorted(set(urls))
         downloaded = 0
         failed = 0
@@ -133,55 +150,58 @@ class ManifestDataset(Dataset):
                 cache_path = self._cache_path_for_url(image_ref)
                 if cache_path.exists():
                     return Image.open(cache_path).convert("RGB")
-                resp = requests.get(image_ref, timeout=20)
-                resp.raise_for_status()
-                cache_path.write_bytes(resp.content)
+                if self.skip_failed and recent_failure(cache_path, self.failure_ttl_sec):
+                    marker = failure_marker(cache_path)
+                    raise OSError(f"Prefetch failed earlier: {marker.read_text(encoding='utf-8')}")
+                try:
+                    download_to_cache(image_ref, cache_path)
+                except Exception as exc:
+                    if self.skip_failed:
+                        record_failure(cache_path, exc)
+                    raise
                 return Image.open(cache_path).convert("RGB")
             resp = requests.get(image_ref, timeout=20)
             resp.raise_for_status()
             return Image.open(io.BytesIO(resp.content)).convert("RGB")
         return Image.open(image_ref).convert("RGB")
 
+    def try_load_image(self, image_ref: str) -> Image.Image | None:
+        """`load_image`, or None for an unloadable image when `skip_failed` is set."""
+        try:
+            return self.load_image(image_ref)
+        except OSError:
+            # Download and decode errors (requests and PIL raise OSError
+            # subclasses); counted per epoch as skipped samples.
+            if self.skip_failed:
+                return None
+            raise
+
     def __getitem__(self, idx: int):
-        row = self.df.iloc[idx]
-        image = self.load_image(str(row["image_path_or_url"]))
+        image_ref, y = self.records.row(idx)
+        image = self.try_load_image(image_ref)
+        if image is None:
+            return None
         x = self.transform(image)
-        y = float(row["target_label"])
         if self.target_type == "binary":
             y = int(y)
         return x, y
 
 
-def _make_head(in_features: int, out_features: int, dropout: float) -> nn.Module:
-    if dropout > 0:
-        return nn.Sequential(nn.Dropout(p=dropout), nn.Linear(in_features, out_features))
-    return nn.Linear(in_features, out_features)
-
-
-def build_model(model_name: str, target_type: str, head_dropout: float = 0.0) -> nn.Module:
-    """Build pretrained backbone and replace final layer for target mode."""
-    out_features = 1 if target_type == "regression" else 2
-
-    if model_name == "mobilenet_v3_small":
-        model = models.mobilenet_v3_small(weights=models.MobileNet_V3_Small_Weights.DEFAULT)
-        in_features = model.classifier[-1].in_features
-        model.classifier[-1] = _make_head(in_features, out_features, head_dropout)
-        return model
-
-    model = models.resnet18(weights=models.ResNet18_Weights.DEFAULT)
-    in_features = model.fc.in_features
-    model.fc = _make_head(in_features, out_features, head_dropout)
-    return model
-
-
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Train V2 sunset model")
     parser.add_argument("--train-manifest", required=True)
     parser.add_argument("--val-manifest", required=True)
     parser.add_argument("--target-type", choices=["binary", "regression"], default="binary")
-    parser.add_argument("--model-name", choices=["resnet18", "mobilenet_v3_small"], default="resnet18")
+    parser.add_argument("--model-name", choices=MODEL_NAMES, default="resnet18")
+    parser.add_argument("--image-size", type=int, default=224,
+                        help="Square input resolution; ONNX export must use the same value")
     parser.add_argument("--epochs", type=int, default=10)
-    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=32,
+                        help="Physical micro-batch size (effective batch = batch size x accumulation steps)")
+    parser.add_argument("--grad-accum-steps", type=int, default=1,
+                        help="Micro-batches per optimizer step")
+    parser.add_argument("--grad-checkpointing", action="store_true",
+                        help="Recompute backbone stage activations in backward to cut peak memory")
     parser.add_argument("--learning-rate", type=float, default=1e-4)
     parser.add_argument("--seed", type=int, default=20260212)
     parser.add_argument("--class-weighting", choices=["none", "balanced", "manual"], default="none")
@@ -198,17 +218,39 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--persistent-workers", action="store_true")
     parser.add_argument("--max-train-samples", type=int, default=0)
     parser.add_argument("--max-val-samples", type=int, default=0)
+    parser.add_argument("--subset-strategy", choices=SUBSET_STRATEGIES, default="random",
+                        help="How --max-train-samples picks rows: uniform sample or embedding coreset")
+    parser.add_argument("--coreset-model", choices=MODEL_NAMES, default="mobilenet_v3_small",
+                        help="Pretrained backbone used to embed images for coreset selection")
+    parser.add_argument("--embedding-cache-dir", default="ml/artifacts/embedding_cache")
     parser.add_argument("--cache-urls", action="store_true")
     parser.add_argument("--cache-dir", default="")
     parser.add_argument("--precache-urls", action="store_true")
+    parser.add_argument("--prefetch-lookahead", type=int, default=64,
+                        help="With --cache-urls (and no --precache-urls), download this many upcoming "
+                             "sampler indices in background threads (0 = disabled)")
+    parser.add_argument("--prefetch-threads", type=int, default=16)
+    parser.add_argument("--failed-download-ttl-sec", type=float, default=FAILURE_TTL_SEC,
+                        help="Skip a URL whose download failed less than this long ago; retry it after")
     parser.add_argument("--lr-schedule", choices=["none", "cosine"], default="none")
+    parser.add_argument("--unfreeze-schedule", nargs="+", default=None,
+                        help="Progressive unfreezing: head trains from epoch 1, backbone frozen except "
+                             "'module:epoch[:lr]' entries, e.g. layer4:3:1e-4 layer3:5:5e-5 rest:8")
+    parser.add_argument("--head-learning-rate", type=float, default=0.0,
+                        help="Head LR with --unfreeze-schedule (0 = --learning-rate)")
     parser.add_argument("--early-stopping-patience", type=int, default=0,
                         help="Stop if val loss does not improve for N epochs (0 = disabled)")
     parser.add_argument("--head-dropout", type=float, default=0.0,
                         help="Dropout probability on classifier head (0.0 = disabled)")
+    parser.add_argument("--init-checkpoint", default="",
+                        help="Start from this float checkpoint instead of ImageNet weights")
+    parser.add_argument("--qat-epochs", type=int, default=0,
+                        help="Run the last N epochs with int8 fake-quant observers (0 = float only)")
+    parser.add_argument("--qat-learning-rate", type=float, default=0.0,
+                        help="Learning rate for the QAT phase (0 = keep the current LR)")
     parser.add_argument("--output-dir", default="ml/artifacts/models")
     parser.add_argument("--no-progress", action="store_true")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.target_type != "binary":
         if args.class_weighting != "none":
@@ -230,6 +272,8 @@ def parse_args() -> argparse.Namespace:
         if args.crop_scale_min > args.crop_scale_max:
             parser.error("--crop-scale-min must be <= --crop-scale-max.")
 
+    if args.image_size < 32:
+        parser.error("--image-size must be >= 32.")
     if args.num_workers < 0:
         parser.error("--num-workers must be >= 0.")
     if args.prefetch_factor <= 0:
@@ -238,6 +282,26 @@ def parse_args() -> argparse.Namespace:
         parser.error("--max-train-samples/--max-val-samples must be >= 0.")
     if args.precache_urls and not args.cache_urls:
         parser.error("--precache-urls requires --cache-urls.")
+    if args.prefetch_lookahead < 0 or args.prefetch_threads < 1:
+        parser.error("--prefetch-lookahead must be >= 0 and --prefetch-threads >= 1.")
+    if not 0 <= args.qat_epochs <= args.epochs:
+        parser.error("--qat-epochs must be in [0, --epochs].")
+    if args.qat_epochs == args.epochs and args.qat_epochs > 0 and not args.init_checkpoint:
+        parser.error("QAT-only runs (--qat-epochs == --epochs) require --init-checkpoint.")
+    if args.qat_learning_rate < 0:
+        parser.error("--qat-learning-rate must be >= 0.")
+    args.unfreeze_stages = []
+    if args.unfreeze_schedule:
+        try:
+            args.unfreeze_stages = parse_unfreeze_schedule(args.unfreeze_schedule)
+        except ValueError as exc:
+            parser.error(str(exc))
+    if args.head_learning_rate < 0:
+        parser.error("--head-learning-rate must be >= 0.")
+    if args.grad_accum_steps < 1:
+        parser.error("--grad-accum-steps must be >= 1.")
+    if args.grad_checkpointing and args.qat_epochs > 0:
+        parser.error("--grad-checkpointing cannot be combined with --qat-epochs (FX tracing).")
 
     return args
 
@@ -252,20 +316,23 @@ def set_seed(seed: int) -> None:
 
 def build_train_transform(args: argparse.Namespace) -> transforms.Compose:
     ops: list[transforms.Transform] = []
+    size = args.image_size
+    # Crop strategies resize to 8/7 of the input first (256 -> 224 at default size).
+    resize = round(size * 8 / 7)
     if args.crop_strategy == "random_resized":
         ops.extend(
             [
-                transforms.Resize((256, 256)),
+                transforms.Resize((resize, resize)),
                 transforms.RandomResizedCrop(
-                    (224, 224),
+                    (size, size),
                     scale=(args.crop_scale_min, args.crop_scale_max),
                 ),
             ]
         )
     elif args.crop_strategy == "center":
-        ops.extend([transforms.Resize((256, 256)), transforms.CenterCrop((224, 224))])
+        ops.extend([transforms.Resize((resize, resize)), transforms.CenterCrop((size, size))])
     else:
-        ops.append(transforms.Resize((224, 224)))
+        ops.append(transforms.Resize((size, size)))
 
     if args.augmentation_profile == "light":
         ops.extend(
@@ -319,6 +386,11 @@ def build_sampler_if_needed(args: argparse.Namespace, train_df: pd.DataFrame) ->
     )
 
 
+def prefetch_enabled(args: argparse.Namespace) -> bool:
+    """Lookahead prefetch replaces the blocking per-item download, not --precache-urls."""
+    return bool(args.cache_urls and args.cache_dir and not args.precache_urls and args.prefetch_lookahead > 0)
+
+
 def build_loader(
     dataset: Dataset,
     batch_size: int,
@@ -326,6 +398,17 @@ def build_loader(
     sampler: WeightedRandomSampler | None,
     args: argparse.Namespace,
 ) -> DataLoader:
+    if getattr(dataset, "skip_failed", False) and prefetch_enabled(args):
+        base = sampler or (RandomSampler(dataset) if shuffle else SequentialSampler(dataset))
+        sampler = PrefetchingSampler(
+            base,
+            dataset.records.image_refs.tolist(),
+            dataset._cache_path_for_url,
+            lookahead=args.prefetch_lookahead,
+            threads=args.prefetch_threads,
+            failure_ttl_sec=args.failed_download_ttl_sec,
+        )
+        shuffle = False
     kwargs: dict = {
         "batch_size": batch_size,
         "shuffle": shuffle,
@@ -336,33 +419,267 @@ def build_loader(
     if args.num_workers > 0:
         kwargs["persistent_workers"] = args.persistent_workers
         kwargs["prefetch_factor"] = args.prefetch_factor
+    if isinstance(sampler, PrefetchingSampler):
+        kwargs["collate_fn"] = collate_skip_failed
     return DataLoader(dataset, **kwargs)
 
 
-def main() -> None:
-    args = parse_args()
-    set_seed(args.seed)
+def prefetch_stats(loader: DataLoader) -> dict:
+    if isinstance(loader.sampler, PrefetchingSampler):
+        return {"enabled": True, **loader.sampler.stats()}
+    return {"enabled": False}
+
+
+def batch_targets(y: torch.Tensor, target_type: str, device: torch.device) -> torch.Tensor:
+    if target_type == "regression":
+        return y.to(device=device, dtype=torch.float32).unsqueeze(1)
+    return y.to(device=device, dtype=torch.long)
+
+
+def train_one_epoch(
+    model: nn.Module,
+    loader: DataLoader,
+    criterion: nn.Module,
+    optimizer: optim.Optimizer,
+    device: torch.device,
+    target_type: str,
+    desc: str = "Train",
+    show_progress: bool = True,
+    accum_steps: int = 1,
+    stats: dict | None = None,
+) -> float:
+    """One optimization pass over `loader`; returns mean loss of the batches trained on.
+
+    With `accum_steps > 1` gradients from that many micro-batches are
+    summed (each loss scaled by 1/accum_steps) before one optimizer step.
+    A trailing partial group is stepped with its own, smaller scale.
+    Batches whose every image failed to load arrive as None and are skipped;
+    their group is still stepped on schedule if any other batch in it
+    contributed. `stats`, if given, receives the batch and sample counts.
+    """
+    model.train()
+    train_loss = 0.0
+    num_batches = len(loader)
+    contributed = 0
+    group_contributed = 0
+    samples = 0
+    optimizer.zero_grad()
+    # tqdm.auto calls iter() on what it wraps and discards the result; with a
+    # DataLoader that would start (and abandon) a second set of workers.
+    for i, batch in enumerate(
+        tqdm(iter(loader), total=num_batches, desc=desc, unit="batch", leave=False, disable=not show_progress)
+    ):
+        group_start = i - i % accum_steps
+        group_size = min(accum_steps, num_batches - group_start)
+        if batch is not None:
+            x, y = batch
+            x = x.to(device)
+            y_tensor = batch_targets(y, target_type, device)
+            pred = model(x)
+            loss = criterion(pred, y_tensor)
+            (loss / group_size).backward()
+            train_loss += loss.item()
+            contributed += 1
+            group_contributed += 1
+            samples += len(y)
+        if i - group_start + 1 == group_size and group_contributed:
+            optimizer.step()
+            optimizer.zero_grad()
+            group_contributed = 0
+    if stats is not None:
+        stats.update(batches=contributed, skipped_batches=num_batches - contributed, samples=samples)
+    return train_loss / max(1, contributed)
+
+
+def validate(
+    model: nn.Module,
+    loader: DataLoader,
+    criterion: nn.Module,
+    device: torch.device,
+    target_type: str,
+    desc: str = "Val",
+    show_progress: bool = True,
+) -> tuple[float, list, list]:
+    """Inference pass; returns (mean loss, targets, predictions).
+
+    Predictions are raw scores for regression and argmax classes for binary.
+    Batches that arrive as None (every image failed) are left out, so
+    `len(targets)` is the number of samples actually scored.
+    """
+    model.eval()
+    val_loss = 0.0
+    scored_batches = 0
+    all_y = []
+    all_pred = []
+    with torch.no_grad():
+        for batch in tqdm(iter(loader), total=len(loader), desc=desc, unit="batch", leave=False,
+                          disable=not show_progress):
+            if batch is None:
+                continue
+            x, y = batch
+            x = x.to(device)
+            y_tensor = batch_targets(y, target_type, device)
+            out = model(x)
+            val_loss += criterion(out, y_tensor).item()
+            scored_batches += 1
+            if target_type == "regression":
+                all_pred.extend(out.squeeze(1).cpu().tolist())
+            else:
+                all_pred.extend(torch.argmax(out, dim=1).cpu().tolist())
+            all_y.extend(y.cpu().tolist())
+    return val_loss / max(1, scored_batches), all_y, all_pred
+
+
+def selection_metric(target_type: str, val_loss: float, all_y: list, all_pred: list) -> float:
+    """Model-selection metric: val F1 for binary, val loss for regression."""
+    if target_type == "binary":
+        return float(rates(confusion_from_labels(all_y, all_pred))["f1"])
+    return val_loss
+
+
+def is_improvement(target_type: str, metric: float, best: float) -> bool:
+    # Binary maximizes F1; regression minimizes val loss.
+    if target_type == "binary":
+        return metric > best
+    return metric < best
+
+
+def target_profile(df: pd.DataFrame, target_type: str) -> dict:
+    """Label mix of a manifest, used to compare a subset against the full set."""
+    y = df["target_label"].astype(float)
+    if target_type == "binary":
+        return {"num_samples": len(df), "positive_rate": float(y.mean()) if len(df) else None}
+    return {
+        "num_samples": len(df),
+        "mean": float(y.mean()) if len(df) else None,
+        "std": float(y.std()) if len(df) > 1 else None,
+        "share_ge_0_75": float((y >= 0.75).mean()) if len(df) else None,
+    }
+
+
+def apply_coreset(train_ds: ManifestDataset, args: argparse.Namespace) -> dict:
+    """Replace the train manifest with an embedding coreset of --max-train-samples rows."""
+    full_profile = target_profile(train_ds.df, args.target_type)
+    refs = train_ds.records.image_refs.tolist()
+    cache_path = Path(args.embedding_cache_dir) / f"{args.coreset_model}_{args.image_size}.npz"
+    start = time.perf_counter()
+    embeddings = cached_embeddings(
+        refs,
+        train_ds.try_load_image,
+        cache_path,
+        model_name=args.coreset_model,
+        image_size=args.image_size,
+        show_progress=not args.no_progress,
+    )
+    # Images that could not be loaded have NaN embeddings; select among the rest.
+    loaded = np.flatnonzero(~np.isnan(embeddings).any(axis=1))
+    picked = select_indices(args.subset_strategy, embeddings[loaded], args.max_train_samples, args.seed)
+    train_ds.select_rows(loaded[picked])
+    return {
+        "strategy": args.subset_strategy,
+        "embedding_model": args.coreset_model,
+        "embedding_cache": str(cache_path),
+        "selection_sec": time.perf_counter() - start,
+        "failed_images": len(refs) - len(loaded),
+        "full": full_profile,
+        "subset": target_profile(train_ds.df, args.target_type),
+    }
+
+
+def freeze_phase_timings(history: list[dict]) -> list[dict]:
+    """Group epochs by trainable parameter count and report each phase's speed-up.
+
+    The speed-up is relative to the phase with the most trainable parameters
+    (normally the final, fully unfrozen one). Epoch 1 also pays warm-up
+    costs, so a head-only first phase slightly understates its speed-up.
+    """
+    phases: list[dict] = []
+    for h in history:
+        if not phases or phases[-1]["trainable_params"] != h["trainable_params"]:
+            phases.append(
+                {
+                    "start_epoch": h["epoch"],
+                    "trainable_groups": h["trainable_groups"],
+                    "trainable_params": h["trainable_params"],
+                    "epoch_secs": [],
+                }
+            )
+        phases[-1]["epoch_secs"].append(h["train_sec"])
+    for phase in phases:
+        secs = phase.pop("epoch_secs")
+        phase["mean_train_sec"] = float(np.mean(secs)) if secs else None
+    timed = [p for p in phases if p["mean_train_sec"]]
+    reference = max(timed, key=lambda p: p["trainable_params"])["mean_train_sec"] if timed else None
+    for phase in phases:
+        phase["speedup_vs_most_trainable"] = (
+            reference / phase["mean_train_sec"] if reference and phase["mean_train_sec"] else None
+        )
+    return phases
+
+
+def skipped_samples(loader: DataLoader, seen: int) -> int:
+    """Samples the loader's sampler yielded that never reached the model (failed images)."""
+    return len(loader.sampler) - seen
+
+
+def select_device() -> torch.device:
     if torch.cuda.is_available():
-        device = torch.device("cuda")
-    elif torch.backends.mps.is_available():
-        device = torch.device("mps")
-    else:
-        device = torch.device("cpu")
+        return torch.device("cuda")
+    if torch.backends.mps.is_available():
+        return torch.device("mps")
+    return torch.device("cpu")
+
+
+def reset_peak_memory(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+
+
+def peak_memory_mb(device: torch.device) -> dict[str, float | None]:
+    """Peak memory so far: allocator peak (CUDA, since last reset) and process RSS high-water mark.
+
+    RSS is what a small-RAM CPU host OOMs on; it covers the whole process
+    (DataLoader workers excluded) and cannot be reset, so it is monotonic.
+    MPS exposes no peak, only the current driver allocation; that goes
+    to `mps_allocated_mb` and `device_peak_mb` stays None.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    device_mb = None
+    mps_mb = None
+    if device.type == "cuda":
+        device_mb = torch.cuda.max_memory_allocated(device) / (1024 * 1024)
+    elif device.type == "mps":
+        mps_mb = torch.mps.driver_allocated_memory() / (1024 * 1024)
+    return {"device_peak_mb": device_mb, "process_peak_rss_mb": rss_mb, "mps_allocated_mb": mps_mb}
+
+
+def main(args: argparse.Namespace | None = None) -> None:
+    args = args if args is not None else parse_args()
+    set_seed(args.seed)
+    device = select_device()
     print(json.dumps({"device": str(device)}))
     run_start = time.perf_counter()
 
     train_tf = build_train_transform(args)
-    val_tf = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor()])
+    val_tf = transforms.Compose([transforms.Resize((args.image_size, args.image_size)), transforms.ToTensor()])
 
+    coreset = args.subset_strategy != "random" and args.max_train_samples > 0
     train_ds = ManifestDataset(
         args.train_manifest,
         train_tf,
         args.target_type,
-        max_samples=args.max_train_samples,
+        max_samples=0 if coreset else args.max_train_samples,
         seed=args.seed,
         cache_urls=args.cache_urls,
         cache_dir=args.cache_dir,
+        skip_failed=prefetch_enabled(args),
+        failure_ttl_sec=args.failed_download_ttl_sec,
     )
+    subset_selection = None
+    if coreset and len(train_ds) > args.max_train_samples:
+        subset_selection = apply_coreset(train_ds, args)
+        print(json.dumps({"subset_selection": subset_selection}))
     val_ds = ManifestDataset(
         args.val_manifest,
         val_tf,
@@ -371,6 +688,8 @@ def main() -> None:
         seed=args.seed + 1,
         cache_urls=args.cache_urls,
         cache_dir=args.cache_dir,
+        skip_failed=prefetch_enabled(args),
+        failure_ttl_sec=args.failed_download_ttl_sec,
     )
     cache_state_before_train = train_ds.url_cache_state()
     cache_state_before_val = val_ds.url_cache_state()
@@ -396,7 +715,20 @@ def main() -> None:
         args=args,
     )
 
-    model = build_model(args.model_name, args.target_type, head_dropout=args.head_dropout).to(device)
+    init_state = torch.load(args.init_checkpoint, map_location="cpu") if args.init_checkpoint else None
+    model = build_model(
+        args.model_name,
+        args.target_type,
+        head_dropout=args.head_dropout,
+        pretrained=init_state is None,
+        state_dict=init_state,
+    )
+    if init_state is not None:
+        model.load_state_dict(init_state)
+    model = model.to(device)
+    checkpointed_segments = 0
+    if args.grad_checkpointing:
+        checkpointed_segments = enable_gradient_checkpointing(model, args.model_name)
     class_counts = binary_class_counts(train_ds.df) if args.target_type == "binary" else {}
     class_weights = loss_class_weights(args, class_counts) if args.target_type == "binary" else None
     if args.target_type == "binary":
@@ -406,7 +738,19 @@ def main() -> None:
             criterion = nn.CrossEntropyLoss(weight=torch.tensor(class_weights, dtype=torch.float32, device=device))
     else:
         criterion = nn.MSELoss()
-    optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+    freeze_groups: dict[str, list] = {}
+    if args.unfreeze_stages:
+        freeze_groups = assign_param_groups(model, get_spec(args.model_name).head_path, args.unfreeze_stages)
+        optimizer = optim.Adam(
+            optimizer_param_groups(
+                freeze_groups,
+                args.unfreeze_stages,
+                head_lr=args.head_learning_rate or args.learning_rate,
+                default_lr=args.learning_rate,
+            )
+        )
+    else:
+        optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
 
     scheduler = None
     if args.lr_schedule == "cosine":
@@ -415,12 +759,22 @@ def main() -> None:
     out_dir = Path(args.output_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     best_path = out_dir / "best.pt"
+    best_qat_path = out_dir / "best_qat.pt"
 
-    best_metric = -1.0 if args.target_type == "binary" else float("inf")
+    initial_metric = -1.0 if args.target_type == "binary" else float("inf")
+    best_metric = initial_metric
+    best_qat_metric: float | None = None
     history: list[dict] = []
     patience_counter = 0
     early_stopped_epoch: int | None = None
 
+    # QAT phase: the last `qat_epochs` epochs fine-tune the best float weights
+    # with fake-quant observers. An early stop in the float phase pulls it in.
+    qat_start = args.epochs - args.qat_epochs if args.qat_epochs > 0 else None
+    qat_active = False
+    qat_start_epoch: int | None = None
+    end_epoch = args.epochs
+
     epoch_times_sec: list[float] = []
     for epoch in tqdm(
         range(args.epochs),
@@ -428,66 +782,70 @@ def main() -> None:
         unit="epoch",
         disable=args.no_progress,
     ):
+        if epoch >= end_epoch:
+            break
+        if qat_start is not None and epoch == qat_start:
+            if best_metric != initial_metric:
+                model.load_state_dict(torch.load(best_path, map_location=device))
+            else:
+                torch.save(model.state_dict(), best_path)
+            for param in model.parameters():
+                param.requires_grad_(True)
+            freeze_groups = {}
+            model = prepare_qat(model.cpu(), args.image_size).to(device)
+            qat_lr = args.qat_learning_rate or optimizer.param_groups[0]["lr"]
+            optimizer = optim.Adam(model.parameters(), lr=qat_lr)
+            scheduler = None
+            qat_active = True
+            qat_start_epoch = epoch + 1
+            best_qat_metric = initial_metric
+            patience_counter = 0
+        trainable_groups = None
+        if freeze_groups:
+            trainable_groups = apply_unfreeze(freeze_groups, args.unfreeze_stages, epoch + 1)
+        trainable_params = sum(p.numel() for p in model.parameters() if p.requires_grad)
         epoch_start = time.perf_counter()
-        # --- training phase ---
-        model.train()
-        train_loss = 0.0
-        for x, y in tqdm(
+        reset_peak_memory(device)
+        train_stats: dict = {}
+        train_loss = train_one_epoch(
+            model,
             train_loader,
+            criterion,
+            optimizer,
+            device,
+            args.target_type,
             desc=f"Train {epoch + 1}/{args.epochs}",
-            unit="batch",
-            leave=False,
-            disable=args.no_progress,
-        ):
-            x = x.to(device)
-            if args.target_type == "regression":
-                y_tensor = y.to(device=device, dtype=torch.float32).unsqueeze(1)
-            else:
-                y_tensor = y.to(device=device, dtype=torch.long)
-            optimizer.zero_grad()
-            pred = model(x)
-            loss = criterion(pred, y_tensor)
-            loss.backward()
-            optimizer.step()
-            train_loss += loss.item()
+            show_progress=not args.no_progress,
+            accum_steps=args.grad_accum_steps,
+            stats=train_stats,
+        )
+        train_sec = time.perf_counter() - epoch_start
+        train_samples_per_sec = len(train_ds) / max(train_sec, 1e-9)
+        train_peak = peak_memory_mb(device)
+        val_loss, all_y, all_pred = validate(
+            model,
+            val_loader,
+            criterion,
+            device,
+            args.target_type,
+            desc=f"Val {epoch + 1}/{args.epochs}",
+            show_progress=not args.no_progress,
+        )
+        # Failed images are dropped from the batch; count them so a shrinking
+        # train/val set is visible per epoch.
+        skipped = {
+            "train_skipped_samples": skipped_samples(train_loader, train_stats["samples"]),
+            "val_skipped_samples": skipped_samples(val_loader, len(all_y)),
+        }
 
-        model.eval()
-        val_loss = 0.0
-        all_y = []
-        all_pred = []
-        with torch.no_grad():
-            for x, y in tqdm(
-                val_loader,
-                desc=f"Val {epoch + 1}/{args.epochs}",
-                unit="batch",
-                leave=False,
-                disable=args.no_progress,
-            ):
-                x = x.to(device)
-                if args.target_type == "regression":
-                    y_tensor = y.to(device=device, dtype=torch.float32).unsqueeze(1)
-                    pred = model(x)
-                    val_loss += criterion(pred, y_tensor).item()
-                    all_pred.extend(pred.squeeze(1).cpu().tolist())
-                    all_y.extend(y.cpu().tolist())
-                else:
-                    y_tensor = y.to(device=device, dtype=torch.long)
-                    logits = model(x)
-                    val_loss += criterion(logits, y_tensor).item()
-                    all_pred.extend(torch.argmax(logits, dim=1).cpu().tolist())
-                    all_y.extend(y.cpu().tolist())
-
-        if args.target_type == "binary":
-            # For binary v1, use validation F1 as model-selection metric.
-            val_metric = f1_score(all_y, all_pred, zero_division=0)
-            is_better = val_metric > best_metric
+        val_metric = selection_metric(args.target_type, val_loss, all_y, all_pred)
+        if qat_active:
+            is_better = is_improvement(args.target_type, val_metric, best_qat_metric)
             if is_better:
-                best_metric = val_metric
-                torch.save(model.state_dict(), best_path)
+                best_qat_metric = val_metric
+                torch.save(model.state_dict(), best_qat_path)
         else:
-            # For regression, lower validation loss is better.
-            val_metric = val_loss / max(1, len(val_loader))
-            is_better = val_metric < best_metric
+            is_better = is_improvement(args.target_type, val_metric, best_metric)
             if is_better:
                 best_metric = val_metric
                 torch.save(model.state_dict(), best_path)
@@ -496,10 +854,17 @@ def main() -> None:
         history.append(
             {
                 "epoch": epoch + 1,
-                "train_loss": train_loss / max(1, len(train_loader)),
-                "val_loss": val_loss / max(1, len(val_loader)),
+                "train_loss": train_loss,
+                "val_loss": val_loss,
                 "val_metric": val_metric,
                 "lr": current_lr,
+                "qat": qat_active,
+                "train_sec": train_sec,
+                "trainable_params": trainable_params,
+                "trainable_groups": trainable_groups,
+                "train_samples_per_sec": train_samples_per_sec,
+                **skipped,
+                **train_peak,
             }
         )
         print(
@@ -510,6 +875,10 @@ def main() -> None:
                     "val_loss": history[-1]["val_loss"],
                     "val_metric": val_metric,
                     "lr": current_lr,
+                    "qat": qat_active,
+                    "train_sec": train_sec,
+                    "trainable_params": trainable_params,
+                    **skipped,
                 }
             )
         )
@@ -525,6 +894,11 @@ def main() -> None:
             else:
                 patience_counter += 1
             if patience_counter >= args.early_stopping_patience:
+                if qat_start is not None and not qat_active:
+                    # Float phase plateaued: start QAT now instead of stopping.
+                    qat_start = epoch + 1
+                    end_epoch = qat_start + args.qat_epochs
+                    continue
                 early_stopped_epoch = epoch + 1
                 print(json.dumps({"early_stop": True, "epoch": early_stopped_epoch,
                                    "patience": args.early_stopping_patience}))
@@ -535,13 +909,29 @@ def main() -> None:
     summary = {
         "target_type": args.target_type,
         "model_name": args.model_name,
+        "model_cost": get_spec(args.model_name).cost(),
+        "image_size": args.image_size,
         "epochs": args.epochs,
         "epochs_completed": len(history),
         "early_stopped_epoch": early_stopped_epoch,
         "early_stopping_patience": args.early_stopping_patience,
         "lr_schedule": args.lr_schedule,
+        "unfreeze_schedule": args.unfreeze_schedule,
+        "head_learning_rate": args.head_learning_rate or None,
+        "freeze_phases": freeze_phase_timings(history) if args.unfreeze_stages else None,
         "head_dropout": args.head_dropout,
         "batch_size": args.batch_size,
+        "grad_accum_steps": args.grad_accum_steps,
+        "effective_batch_size": args.batch_size * args.grad_accum_steps,
+        "grad_checkpointing": args.grad_checkpointing,
+        "checkpointed_segments": checkpointed_segments,
+        "train_samples_per_sec": (
+            float(np.mean([h["train_samples_per_sec"] for h in history])) if history else None
+        ),
+        "peak_memory": {
+            key: max((h[key] for h in history if h[key] is not None), default=None)
+            for key in ("device_peak_mb", "process_peak_rss_mb")
+        },
         "learning_rate": args.learning_rate,
         "seed": args.seed,
         "train_manifest": args.train_manifest,
@@ -561,15 +951,24 @@ def main() -> None:
         "persistent_workers": args.persistent_workers,
         "max_train_samples": args.max_train_samples,
         "max_val_samples": args.max_val_samples,
+        "subset_strategy": args.subset_strategy,
+        "subset_selection": subset_selection,
         "cache_urls": args.cache_urls,
         "cache_dir": args.cache_dir if args.cache_urls else None,
         "precache_urls": args.precache_urls,
+        "prefetch_lookahead": args.prefetch_lookahead if prefetch_enabled(args) else 0,
+        "prefetch_train": prefetch_stats(train_loader),
+        "prefetch_val": prefetch_stats(val_loader),
         "cache_state_before_train": cache_state_before_train,
         "cache_state_before_val": cache_state_before_val,
         "cache_warmup_train": cache_warmup_train,
         "cache_warmup_val": cache_warmup_val,
         "cache_state_after_train": train_ds.url_cache_state(),
         "cache_state_after_val": val_ds.url_cache_state(),
+        "skipped_samples": {
+            "train": sum(h["train_skipped_samples"] for h in history),
+            "val": sum(h["val_skipped_samples"] for h in history),
+        },
         "train_class_counts": class_counts,
         "train_num_samples": len(train_ds),
         "val_num_samples": len(val_ds),
@@ -577,6 +976,12 @@ def main() -> None:
         "epoch_times_sec": epoch_times_sec,
         "best_metric": best_metric,
         "best_checkpoint": str(best_path),
+        "init_checkpoint": args.init_checkpoint or None,
+        "qat_epochs": args.qat_epochs,
+        "qat_learning_rate": args.qat_learning_rate,
+        "qat_start_epoch": qat_start_epoch,
+        "best_qat_metric": best_qat_metric,
+        "best_qat_checkpoint": str(best_qat_path) if qat_start_epoch is not None else None,
         "history": history,
     }
     (out_dir / "train_summary.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
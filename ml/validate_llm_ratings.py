@@ -25,11 +25,10 @@ from pathlib import Path
 import matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
-from scipy.stats import pearsonr, spearmanr
 
 from common.io import ensure_dir
+from common.metrics import confusion_from_labels, rates, regression_metrics
 
 
 def parse_args() -> argparse.Namespace:
@@ -77,14 +76,16 @@ def main() -> None:
     llm_quality = has_human["llm_quality"].astype(float).values
     human_normalized = (has_human["human_calculated_rating"].astype(float) / 5.0).values
 
-    r_pearson, p_pearson = pearsonr(llm_quality, human_normalized)
-    r_spearman, p_spearman = spearmanr(llm_quality, human_normalized)
-    mae = float(np.mean(np.abs(llm_quality - human_normalized)))
+    agreement = regression_metrics(human_normalized, llm_quality)
+    r_pearson, p_pearson = agreement["pearson_r"], agreement["pearson_p"]
+    r_spearman, p_spearman = agreement["spearman_r"], agreement["spearman_p"]
+    mae = agreement["mae"]
 
     # Binary agreement: LLM >= 0.7 should agree with human >= 4.0 (normalized 0.8)
     llm_binary = (llm_quality >= 0.7).astype(int)
     human_binary = (human_normalized >= 0.8).astype(int)
-    binary_agreement = float(np.mean(llm_binary == human_binary))
+    binary = rates(confusion_from_labels(human_binary, llm_binary))
+    binary_agreement = float(binary["accuracy"])
 
     passed = r_pearson >= args.pass_threshold
 
@@ -99,6 +100,8 @@ def main() -> None:
         "spearman_p": round(p_spearman, 6),
         "mae": round(mae, 4),
         "binary_agreement": round(binary_agreement, 4),
+        "binary_precision": round(float(binary["precision"]), 4),
+        "binary_recall": round(float(binary["recall"]), 4),
         "pass_threshold": args.pass_threshold,
         "passed": passed,
     }